@@ -28,11 +28,13 @@ from typing import Dict, Any, Optional
 
 # Modelos
 from authentication.models import User
+from authentication.services import LoginService
 from usuarios.models import Perfil, SolicitudCambioRol
 from usuarios.solicitudes import GestorSolicitudCambioRol
 from proveedores.models import Proveedor
 from repartidores.models import Repartidor
 from pedidos.models import Pedido, EstadoPedido
+from utils.replica import LecturaReplicaMixin
 from .models import Administrador, AccionAdministrativa, ConfiguracionSistema
 
 # Serializers optimizados
@@ -455,6 +457,7 @@ class GestionUsuariosViewSet(BaseAdminViewSetMixin, viewsets.ModelViewSet):
         usuario.save(
             update_fields=["is_active", "cuenta_desactivada", "intentos_login_fallidos", "updated_at"]
         )
+        LoginService.desbloquear(usuario.pk)
 
         self._reactivar_perfiles_relacionados(usuario)
 
@@ -497,6 +500,7 @@ class GestionUsuariosViewSet(BaseAdminViewSetMixin, viewsets.ModelViewSet):
         usuario.set_password(nueva_password)
         usuario.intentos_login_fallidos = 0
         usuario.save(update_fields=["password", "intentos_login_fallidos", "updated_at"])
+        LoginService.desbloquear(usuario.pk)
 
         registrar_accion_admin(
             request,
@@ -1088,7 +1092,7 @@ class ConfiguracionSistemaViewSet(BaseAdminViewSetMixin, viewsets.ModelViewSet):
 # VIEWSET: DASHBOARD ADMINISTRATIVO
 # ============================================
 
-class DashboardAdminViewSet(BaseAdminViewSetMixin, viewsets.ViewSet):
+class DashboardAdminViewSet(LecturaReplicaMixin, BaseAdminViewSetMixin, viewsets.ViewSet):
     """ViewSet para dashboard administrativo con estadísticas generales"""
     
     permission_classes = [
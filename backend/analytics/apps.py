@@ -0,0 +1,12 @@
+# analytics/apps.py
+from django.apps import AppConfig
+
+
+class AnalyticsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'analytics'
+    verbose_name = 'Métricas en Tiempo Real'
+
+    def ready(self):
+        # Observador de consultas en cada conexión (métricas y perfilador SQL)
+        from utils import observador_sql  # noqa: F401
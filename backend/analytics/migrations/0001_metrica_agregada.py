@@ -0,0 +1,31 @@
+# Generated by Django 5.1.7 on 2026-10-19 04:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricaAgregada',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metrica', models.CharField(max_length=50, verbose_name='Métrica')),
+                ('granularidad', models.CharField(choices=[('minuto', 'Minuto'), ('hora', 'Hora'), ('dia', 'Día')], max_length=10, verbose_name='Granularidad')),
+                ('inicio', models.DateTimeField(verbose_name='Inicio del bucket')),
+                ('valor', models.BigIntegerField(default=0, verbose_name='Valor')),
+                ('actualizado_en', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Métrica Agregada',
+                'verbose_name_plural': 'Métricas Agregadas',
+                'db_table': 'analytics_metricas_agregadas',
+                'constraints': [models.UniqueConstraint(fields=('granularidad', 'inicio', 'metrica'), name='metrica_agregada_unica')],
+            },
+        ),
+    ]
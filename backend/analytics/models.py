@@ -0,0 +1,44 @@
+# analytics/models.py
+"""
+Rollup persistente de las métricas en tiempo real.
+
+Los contadores viven en Redis por bucket de minuto, hora y día
+(analytics/services.py) y expiran; la tarea `analytics.flush_metricas`
+copia aquí los buckets de hora y día para que las series sigan disponibles
+cuando Redis ya no los tiene.
+"""
+
+from django.db import models
+
+
+class Granularidad(models.TextChoices):
+    MINUTO = 'minuto', 'Minuto'
+    HORA = 'hora', 'Hora'
+    DIA = 'dia', 'Día'
+
+
+class MetricaAgregada(models.Model):
+    """
+    Valor acumulado de una métrica en un bucket. El flush escribe el valor
+    absoluto leído de Redis, así que repetirlo es idempotente.
+    """
+
+    metrica = models.CharField(max_length=50, verbose_name='Métrica')
+    granularidad = models.CharField(max_length=10, choices=Granularidad.choices, verbose_name='Granularidad')
+    inicio = models.DateTimeField(verbose_name='Inicio del bucket')
+    valor = models.BigIntegerField(default=0, verbose_name='Valor')
+    actualizado_en = models.DateTimeField()
+
+    class Meta:
+        db_table = 'analytics_metricas_agregadas'
+        verbose_name = 'Métrica Agregada'
+        verbose_name_plural = 'Métricas Agregadas'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['granularidad', 'inicio', 'metrica'],
+                name='metrica_agregada_unica',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.metrica} {self.granularidad} {self.inicio:%Y-%m-%d %H:%M} = {self.valor}"
@@ -1,21 +1,273 @@
-from django.core.cache import cache
+# analytics/services.py
+"""
+Métricas de negocio en tiempo real: pedidos, GMV, cancelaciones y latencia
+de aceptación.
+
+Cada evento suma sus contadores con HINCRBY en tres buckets a la vez (minuto,
+hora y día) usando un solo pipeline, así que el registro es atómico y cuesta
+un round-trip a Redis. Los dashboards leen series con un HMGET por bucket en
+otro pipeline; los buckets de hora y día que Redis ya expiró se completan
+desde el rollup MetricaAgregada, que `flush_metricas` mantiene al día.
+"""
+
 import logging
+from datetime import timedelta
+from decimal import Decimal
+
+from django.utils import timezone
 
 logger = logging.getLogger('analytics')
 
-def actualizar_metricas(metrica_key, incremento=1):
-    """Incrementa contadores en Redis/Memcached"""
+# Métricas (enteros: el GMV se guarda en centavos y la latencia en ms)
+PEDIDOS = 'pedidos'
+GMV_CENTAVOS = 'gmv_centavos'
+CANCELACIONES = 'cancelaciones'
+ACEPTACIONES = 'aceptaciones'
+LATENCIA_ACEPTACION_MS = 'latencia_aceptacion_ms'  # suma; promedio = suma / aceptaciones
+
+METRICAS = (PEDIDOS, GMV_CENTAVOS, CANCELACIONES, ACEPTACIONES, LATENCIA_ACEPTACION_MS)
+
+KEY_BUCKET = 'metricas:{granularidad}:{bucket}'
+
+# Granularidad -> (formato del bucket, retención en Redis en segundos)
+GRANULARIDADES = {
+    'minuto': ('%Y%m%d%H%M', 60 * 60 * 48),
+    'hora': ('%Y%m%d%H', 60 * 60 * 24 * 35),
+    'dia': ('%Y%m%d', 60 * 60 * 24 * 400),
+}
+
+# Granularidades que se copian al rollup (las de minuto solo viven en Redis)
+GRANULARIDADES_ROLLUP = ('hora', 'dia')
+
+MAX_PUNTOS = 1440
+
+
+class ConsultaMetricasInvalida(ValueError):
+    pass
+
+
+def _inicio_bucket(momento, granularidad):
+    local = timezone.localtime(momento)
+    if granularidad == 'minuto':
+        return local.replace(second=0, microsecond=0)
+    if granularidad == 'hora':
+        return local.replace(minute=0, second=0, microsecond=0)
+    return local.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _key(granularidad, inicio):
+    formato = GRANULARIDADES[granularidad][0]
+    return KEY_BUCKET.format(granularidad=granularidad, bucket=inicio.strftime(formato))
+
+
+def _inicios(granularidad, puntos, hasta=None):
+    """Inicios de los últimos `puntos` buckets hasta `hasta` (incluido), en orden."""
+    inicios = [_inicio_bucket(hasta or timezone.now(), granularidad)]
+    for _ in range(puntos - 1):
+        # Retroceder un segundo y truncar funciona igual con días de 23/25 h
+        inicios.append(_inicio_bucket(inicios[-1] - timedelta(seconds=1), granularidad))
+    inicios.reverse()
+    return inicios
+
+
+def _centavos(monto):
+    return int((Decimal(str(monto or 0)) * 100).to_integral_value())
+
+
+# ============================================
+# REGISTRO DE EVENTOS
+# ============================================
+
+def registrar(incrementos, momento=None):
+    """
+    Suma {metrica: delta} en los buckets de minuto, hora y día de `momento`
+    (ahora por defecto). Si Redis falla el evento se descarta con un warning:
+    las métricas en tiempo real nunca bloquean el flujo del pedido.
+    """
+    from utils.redis_client import get_redis
+
+    incrementos = {m: int(delta) for m, delta in incrementos.items() if delta}
+    if not incrementos:
+        return
+
+    momento = momento or timezone.now()
     try:
-        if cache.get(metrica_key) is None:
-            cache.set(metrica_key, 0, timeout=86400) # 24 horas
-        
-        nuevo_valor = cache.incr(metrica_key, delta=incremento)
-        logger.debug(f"📊 [METRICA] {metrica_key} actualizada a {nuevo_valor}")
+        pipe = get_redis().pipeline(transaction=False)
+        for granularidad, (_, ttl) in GRANULARIDADES.items():
+            key = _key(granularidad, _inicio_bucket(momento, granularidad))
+            for metrica, delta in incrementos.items():
+                pipe.hincrby(key, metrica, delta)
+            pipe.expire(key, ttl)
+        pipe.execute()
     except Exception as e:
-        # Fallback silencioso si Redis falla
-        logger.warning(f"No se pudo actualizar métrica {metrica_key}: {e}")
+        logger.warning(f"No se pudieron registrar métricas {list(incrementos)}: {e}")
+
+
+def actualizar_metricas(metrica_key, incremento=1):
+    """Incrementa un contador arbitrario en los buckets actuales."""
+    registrar({metrica_key: incremento})
+
+
+def registrar_venta(total):
+    """Pedido creado: cuenta el pedido y suma su total al GMV."""
+    registrar({PEDIDOS: 1, GMV_CENTAVOS: _centavos(total)})
+
 
 def registrar_cancelacion(pedido):
     """Registra eventos de cancelación"""
-    logger.info(f"📊 [ANALYTICS] Cancelación registrada: ID {pedido.id}")
-    actualizar_metricas('total_cancelaciones', 1)
\ No newline at end of file
+    logger.debug(f"Cancelación registrada: ID {pedido.id}")
+    registrar({CANCELACIONES: 1}, momento=pedido.fecha_cancelado)
+
+
+def registrar_aceptacion(pedido):
+    """Registra la latencia entre la creación del pedido y su asignación a un repartidor."""
+    if not pedido.fecha_asignado or not pedido.creado_en:
+        return
+    latencia_ms = max(0, int((pedido.fecha_asignado - pedido.creado_en).total_seconds() * 1000))
+    registrar({ACEPTACIONES: 1, LATENCIA_ACEPTACION_MS: latencia_ms}, momento=pedido.fecha_asignado)
+
+
+# ============================================
+# CONSULTAS
+# ============================================
+
+def series(metricas=METRICAS, granularidad='minuto', puntos=60, hasta=None):
+    """
+    Series de las métricas en los últimos `puntos` buckets.
+
+    Returns:
+        dict: {'inicios': [datetime], 'series': {metrica: [int]}}
+    """
+    from utils.redis_client import get_redis
+
+    if granularidad not in GRANULARIDADES:
+        raise ConsultaMetricasInvalida(f"Granularidad no soportada: {granularidad}")
+    desconocidas = [m for m in metricas if m not in METRICAS]
+    if desconocidas or not metricas:
+        raise ConsultaMetricasInvalida(f"Métricas no soportadas: {', '.join(desconocidas) or '(vacío)'}")
+
+    metricas = list(metricas)
+    inicios = _inicios(granularidad, max(1, min(int(puntos), MAX_PUNTOS)), hasta)
+    resultado = {m: [0] * len(inicios) for m in metricas}
+
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for inicio in inicios:
+            pipe.hmget(_key(granularidad, inicio), metricas)
+        respuestas = pipe.execute()
+    except Exception as e:
+        logger.warning(f"Redis no disponible para series de métricas: {e}")
+        respuestas = [[None] * len(metricas)] * len(inicios)
+
+    faltantes = {}
+    for i, (inicio, valores) in enumerate(zip(inicios, respuestas)):
+        if all(v is None for v in valores):
+            faltantes[inicio] = i
+            continue
+        for metrica, valor in zip(metricas, valores):
+            resultado[metrica][i] = int(valor or 0)
+
+    if faltantes and granularidad in GRANULARIDADES_ROLLUP:
+        from .models import MetricaAgregada
+
+        filas = MetricaAgregada.objects.filter(
+            granularidad=granularidad, inicio__in=list(faltantes), metrica__in=metricas
+        ).values_list('inicio', 'metrica', 'valor')
+        for inicio, metrica, valor in filas:
+            resultado[metrica][faltantes[inicio]] = valor
+
+    return {'inicios': inicios, 'series': resultado}
+
+
+def _punto(pedidos, gmv_centavos, cancelaciones, aceptaciones, latencia_ms):
+    return {
+        'pedidos': pedidos,
+        'gmv': Decimal(gmv_centavos) / 100,
+        'cancelaciones': cancelaciones,
+        'aceptaciones': aceptaciones,
+        'latencia_aceptacion_seg': round(latencia_ms / aceptaciones / 1000, 1) if aceptaciones else None,
+    }
+
+
+def tablero(granularidad='minuto', puntos=60, hasta=None):
+    """Serie y totales listos para el dashboard en tiempo real."""
+    datos = series(METRICAS, granularidad, puntos, hasta)
+    columnas = [datos['series'][m] for m in METRICAS]
+
+    totales = _punto(*(sum(c) for c in columnas))
+    totales['tasa_cancelacion'] = (
+        round(totales['cancelaciones'] * 100 / totales['pedidos'], 2) if totales['pedidos'] else 0
+    )
+
+    return {
+        'granularidad': granularidad,
+        'puntos': [
+            {'inicio': inicio, **_punto(*valores)}
+            for inicio, *valores in zip(datos['inicios'], *columnas)
+        ],
+        'totales': totales,
+    }
+
+
+# ============================================
+# FLUSH AL ROLLUP
+# ============================================
+
+def flush_metricas(horas=3, dias=2):
+    """
+    Copia los últimos buckets de hora y día de Redis a MetricaAgregada.
+
+    Los contadores son monótonos dentro de un bucket, así que se conserva el
+    mayor valor entre Redis y la tabla: un Redis reiniciado no pisa datos ya
+    persistidos con contadores parciales.
+
+    Returns:
+        int: filas escritas
+    """
+    from utils.redis_client import get_redis
+    from .models import MetricaAgregada
+
+    ahora = timezone.now()
+    buckets = (
+        [('hora', inicio) for inicio in _inicios('hora', horas, ahora)]
+        + [('dia', inicio) for inicio in _inicios('dia', dias, ahora)]
+    )
+
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for granularidad, inicio in buckets:
+            pipe.hgetall(_key(granularidad, inicio))
+        respuestas = pipe.execute()
+    except Exception as e:
+        logger.warning(f"Flush de métricas omitido, Redis no disponible: {e}")
+        return 0
+
+    valores = {
+        (granularidad, inicio, metrica.decode()): int(valor)
+        for (granularidad, inicio), hash_ in zip(buckets, respuestas)
+        for metrica, valor in hash_.items()
+    }
+    if not valores:
+        return 0
+
+    persistidos = MetricaAgregada.objects.filter(
+        granularidad__in=GRANULARIDADES_ROLLUP,
+        inicio__in={inicio for _, inicio in buckets},
+    ).values_list('granularidad', 'inicio', 'metrica', 'valor')
+    for granularidad, inicio, metrica, valor in persistidos:
+        clave = (granularidad, timezone.localtime(inicio), metrica)
+        if clave in valores and valores[clave] <= valor:
+            del valores[clave]
+
+    MetricaAgregada.objects.bulk_create(
+        [
+            MetricaAgregada(granularidad=g, inicio=inicio, metrica=m, valor=v, actualizado_en=ahora)
+            for (g, inicio, m), v in valores.items()
+        ],
+        update_conflicts=True,
+        unique_fields=['granularidad', 'inicio', 'metrica'],
+        update_fields=['valor', 'actualizado_en'],
+    )
+    if valores:
+        logger.info(f"Flush de métricas: {len(valores)} filas")
+    return len(valores)
@@ -0,0 +1,14 @@
+# analytics/tasks.py
+
+from celery import shared_task
+import logging
+
+logger = logging.getLogger('analytics')
+
+
+@shared_task(name='analytics.flush_metricas', ignore_result=True)
+def flush_metricas():
+    """Copia los buckets recientes de hora y día de Redis al rollup."""
+    from .services import flush_metricas as _flush
+
+    return _flush()
@@ -0,0 +1,175 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from pedidos.models import Pedido, EstadoPedido, TipoPedido
+from middleware import rutas
+from middleware.log_api_requests import cola as cola_log
+from utils.redis_client import get_redis
+
+from . import services as metricas
+from .models import MetricaAgregada
+
+User = get_user_model()
+
+
+class MetricasTiempoRealTest(APITestCase):
+    """Contadores por bucket en Redis, series para dashboards y flush al rollup."""
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser(
+            email="admin@app.com",
+            username="admin",
+            password="password123",
+        )
+
+    def _pedido(self, total):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Pedido.objects.create(
+                cliente=self.admin.perfil,
+                tipo=TipoPedido.DIRECTO,
+                total=total,
+                direccion_entrega="Calle 1",
+            )
+
+    def _transicion(self, pedido, estado):
+        pedido.estado = estado
+        with self.captureOnCommitCallbacks(execute=True):
+            pedido.save()
+
+    def test_eventos_de_pedido_alimentan_los_buckets(self):
+        pedido = self._pedido(Decimal('12.50'))
+        self._pedido(Decimal('7.25'))
+        self._transicion(pedido, EstadoPedido.ASIGNADO_REPARTIDOR)
+        self._transicion(pedido, EstadoPedido.CANCELADO)
+        # Guardar de nuevo un pedido cancelado no vuelve a contarlo
+        with self.captureOnCommitCallbacks(execute=True):
+            pedido.save()
+
+        for granularidad in metricas.GRANULARIDADES:
+            datos = metricas.series(granularidad=granularidad, puntos=1)['series']
+            self.assertEqual(datos[metricas.PEDIDOS], [2])
+            self.assertEqual(datos[metricas.GMV_CENTAVOS], [1975])
+            self.assertEqual(datos[metricas.CANCELACIONES], [1])
+            self.assertEqual(datos[metricas.ACEPTACIONES], [1])
+
+        totales = metricas.tablero(puntos=5)['totales']
+        self.assertEqual(totales['gmv'], Decimal('19.75'))
+        self.assertEqual(totales['tasa_cancelacion'], 50)
+        self.assertIsNotNone(totales['latencia_aceptacion_seg'])
+
+    def test_pedido_revertido_no_cuenta_como_venta(self):
+        from django.db import transaction
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                Pedido.objects.create(
+                    cliente=self.admin.perfil,
+                    tipo=TipoPedido.DIRECTO,
+                    total=Decimal('30.00'),
+                    direccion_entrega="Calle 1",
+                )
+                raise RuntimeError('checkout fallido')
+
+        datos = metricas.series(puntos=1)['series']
+        self.assertEqual(datos[metricas.PEDIDOS], [0])
+        self.assertEqual(datos[metricas.GMV_CENTAVOS], [0])
+
+    def test_series_completan_buckets_expirados_desde_el_rollup(self):
+        hace_dos_horas = timezone.now() - timedelta(hours=2)
+        metricas.registrar({metricas.PEDIDOS: 3}, momento=hace_dos_horas)
+        metricas.registrar({metricas.PEDIDOS: 1})
+
+        self.assertGreater(metricas.flush_metricas(), 0)
+        get_redis().flushdb()
+
+        serie = metricas.series([metricas.PEDIDOS], granularidad='hora', puntos=3)['series']
+        self.assertEqual(serie[metricas.PEDIDOS], [3, 0, 1])
+        # Los buckets de minuto no se persisten
+        self.assertEqual(sum(metricas.series([metricas.PEDIDOS], puntos=5)['series'][metricas.PEDIDOS]), 0)
+
+    def test_flush_no_pisa_valores_mayores_ya_persistidos(self):
+        metricas.registrar({metricas.PEDIDOS: 5})
+        metricas.flush_metricas()
+
+        # Redis reiniciado: el bucket vuelve a empezar desde cero
+        get_redis().flushdb()
+        metricas.registrar({metricas.PEDIDOS: 2})
+        metricas.flush_metricas()
+
+        fila = MetricaAgregada.objects.get(granularidad='hora', metrica=metricas.PEDIDOS)
+        self.assertEqual(fila.valor, 5)
+
+        metricas.registrar({metricas.PEDIDOS: 4})
+        metricas.flush_metricas()
+        fila.refresh_from_db()
+        self.assertEqual(fila.valor, 6)
+
+    def test_endpoint_tiempo_real(self):
+        self._pedido(10)
+        self.client.force_authenticate(self.admin)
+        url = reverse("reportes:reporte-admin-tiempo-real")
+
+        response = self.client.get(url, {'granularidad': 'hora', 'puntos': 24})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['puntos']), 24)
+        self.assertEqual(response.data['totales']['pedidos'], 1)
+
+        response = self.client.get(url, {'granularidad': 'semana'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RutasYLogSolicitudesTest(APITestCase):
+    """Clasificador de rutas compartido y log estructurado, muestreado y en cola."""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(email="admin@app.com", username="admin", password="password123")
+        self.client.force_authenticate(self.admin)
+
+    def test_clasificador_de_rutas(self):
+        clasificador = rutas.ClasificadorRutas()
+        self.assertEqual(clasificador.clasificar('/static/app.js'), rutas.PUBLICA | rutas.SIN_LOG)
+        self.assertEqual(clasificador.clasificar('/'), rutas.PUBLICA)
+        self.assertEqual(clasificador.clasificar('/api/reportes/admin/'), rutas.SOLO_ADMIN)
+        self.assertEqual(clasificador.clasificar('/api/productos/'), 0)
+        self.assertEqual(clasificador.clasificar('/api/auth/login/'), rutas.PUBLICA)
+
+    def test_registro_estructurado_en_cola(self):
+        with self.assertLogs('api_logger.solicitudes', level='INFO') as logs:
+            self.client.get(reverse('reportes:reporte-admin-list'))
+            self.client.get('/static/app.js')
+            cola_log.vaciar()
+
+        self.assertEqual(len(logs.records), 1)
+        datos = logs.records[0].datos
+        self.assertEqual(datos['vista'], 'reportes:reporte-admin-list')
+        self.assertEqual(datos['status'], 200)
+        self.assertEqual(datos['usuario_id'], self.admin.pk)
+        self.assertIn('REQ+RES GET', logs.output[0])
+
+    @override_settings(API_LOG_MUESTREO=0)
+    def test_muestreo_conserva_errores(self):
+        with self.assertLogs('api_logger.solicitudes', level='INFO') as logs:
+            self.client.get(reverse('reportes:reporte-admin-list'))
+            self.client.get('/api/no-existe/')
+            cola_log.vaciar()
+
+        self.assertEqual([r.datos['status'] for r in logs.records], [404])
+
+    async def test_asgi_no_resuelve_la_sesion_en_el_event_loop(self):
+        # Sesión de Django (no DRF): request.user queda perezoso hasta el log
+        await self.async_client.aforce_login(self.admin)
+        with self.assertLogs('api_logger.solicitudes', level='INFO') as logs:
+            res = await self.async_client.get('/api/no-existe/')
+            cola_log.vaciar()
+
+        self.assertEqual(res.status_code, 404)
+        self.assertEqual(logs.records[0].datos['status'], 404)
@@ -3,7 +3,9 @@
 
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User
+from .models import CampanaEmail, EnvioEmail, User
+from .principal import invalidar as invalidar_principal
+from .services import LoginService
 
 
 @admin.register(User)
@@ -161,6 +163,7 @@ class CustomUserAdmin(BaseUserAdmin):
     def activar_cuentas(self, request, queryset):
         """Activa cuentas de usuarios"""
         updated = queryset.update(is_active=True, cuenta_desactivada=False)
+        invalidar_principal(*queryset.values_list("pk", flat=True))
         self.message_user(request, f"{updated} cuentas activadas exitosamente")
 
     activar_cuentas.short_description = "✓ Activar cuentas seleccionadas"
@@ -168,6 +171,7 @@ class CustomUserAdmin(BaseUserAdmin):
     def desactivar_cuentas(self, request, queryset):
         """Desactiva cuentas de usuarios"""
         updated = queryset.update(is_active=False)
+        invalidar_principal(*queryset.values_list("pk", flat=True))
         self.message_user(request, f"✗ {updated} cuentas desactivadas")
 
     desactivar_cuentas.short_description = "✗ Desactivar cuentas seleccionadas"
@@ -177,6 +181,9 @@ class CustomUserAdmin(BaseUserAdmin):
         updated = queryset.update(
             intentos_login_fallidos=0, cuenta_bloqueada_hasta=None
         )
+        user_ids = list(queryset.values_list("pk", flat=True))
+        invalidar_principal(*user_ids)
+        LoginService.desbloquear(*user_ids)
         self.message_user(request, f"{updated} cuentas desbloqueadas exitosamente")
 
     resetear_intentos_login.short_description = (
@@ -225,4 +232,26 @@ class CustomUserAdmin(BaseUserAdmin):
 
     class Media:
         css = {"all": ("admin/css/custom_admin.css",)}
-        js = ("admin/js/custom_admin.js",)
\ No newline at end of file
+        js = ("admin/js/custom_admin.js",)
+
+
+
+class EnvioEmailInline(admin.TabularInline):
+    model = EnvioEmail
+    extra = 0
+    can_delete = False
+    fields = ('email', 'estado', 'enviado_en', 'error')
+    readonly_fields = fields
+    show_change_link = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(CampanaEmail)
+class CampanaEmailAdmin(admin.ModelAdmin):
+    list_display = ('nombre', 'estado', 'total', 'enviados', 'fallidos', 'creada_en', 'finalizada_en')
+    list_filter = ('estado',)
+    search_fields = ('nombre', 'asunto')
+    readonly_fields = ('estado', 'total', 'enviados', 'fallidos', 'creada_en', 'finalizada_en')
+    inlines = [EnvioEmailInline]
@@ -13,8 +13,6 @@ class AuthenticationConfig(AppConfig):
     def ready(self):
         """
         Importa signals cuando la app está lista
-        Descomenta si creas signals.py
         """
-        # from . import signals
-        pass
+        from . import signals  # noqa: F401
     
\ No newline at end of file
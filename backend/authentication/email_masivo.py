@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+# authentication/email_masivo.py
+"""
+Envío masivo de emails (CampanaEmail / EnvioEmail).
+
+- Las plantillas (asunto, .html y .txt) se renderizan UNA vez por campaña
+  con el contexto común. Los campos propios de cada destinatario quedan como
+  marcadores en el resultado y se sustituyen con un reemplazo de texto
+  (escapado en la versión HTML), sin volver a pasar por el motor de
+  plantillas. Esos campos se insertan tal cual: no admiten filtros.
+- Los mensajes salen por una sola conexión SMTP abierta con
+  `get_connection()` y reutilizada para todo el envío (ver
+  email_utils._enviar_con_pool), a un ritmo máximo de
+  EMAIL_MASIVO_POR_SEGUNDO.
+- El estado de cada destinatario se guarda con bulk_update por lote. Los
+  envíos quedan PENDIENTES hasta su lote, así que una campaña interrumpida
+  se retoma volviendo a encolarla.
+"""
+
+import logging
+import re
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives
+from django.db import transaction
+from django.db.models import Count
+from django.template import Context, Template
+from django.template.loader import render_to_string
+from django.template.exceptions import TemplateDoesNotExist
+from django.utils import timezone
+from django.utils.html import escape, strip_tags
+
+from .email_utils import EmailService, _enviar_con_pool, cerrar_conexion
+
+logger = logging.getLogger('authentication')
+
+EMAIL_MASIVO_POR_SEGUNDO = getattr(settings, 'EMAIL_MASIVO_POR_SEGUNDO', 10)
+EMAIL_MASIVO_LOTE = getattr(settings, 'EMAIL_MASIVO_LOTE', 100)
+
+# Campos por destinatario que siempre están disponibles en las plantillas
+CAMPOS_BASE = ('nombre', 'apellido', 'email', 'unsubscribe_url')
+
+_MARCADOR = re.compile(r'%%DEST_(\w+)%%')
+
+
+def _marcador(campo):
+    return f"%%DEST_{campo}%%"
+
+
+# ==========================================
+# PLANTILLAS PRE-RENDERIZADAS
+# ==========================================
+
+class PlantillaCampana:
+    """Asunto, HTML y texto de una campaña, renderizados una sola vez."""
+
+    def __init__(self, asunto, html, texto):
+        self.asunto = asunto
+        self.html = html
+        self.texto = texto
+
+    @classmethod
+    def compilar(cls, plantilla, asunto, contexto=None, campos=()):
+        contexto = {
+            'app_url': getattr(settings, 'FRONTEND_URL', 'http://localhost:3000'),
+            'year': datetime.now().year,
+            **(contexto or {}),
+            **{campo: _marcador(campo) for campo in (*CAMPOS_BASE, *campos)},
+        }
+
+        html = render_to_string(f'{plantilla}.html', contexto)
+        try:
+            texto = render_to_string(f'{plantilla}.txt', contexto)
+        except TemplateDoesNotExist:
+            texto = strip_tags(html)
+        asunto = Template(asunto).render(Context(contexto, autoescape=False))
+        return cls(asunto.strip(), html, texto)
+
+    @staticmethod
+    def _sustituir(contenido, valores, escapar):
+        def reemplazo(coincidencia):
+            valor = str(valores.get(coincidencia.group(1)) or '')
+            return escape(valor) if escapar else valor
+
+        return _MARCADOR.sub(reemplazo, contenido)
+
+    def para(self, valores):
+        """(asunto, html, texto) para un destinatario."""
+        return (
+            self._sustituir(self.asunto, valores, escapar=False),
+            self._sustituir(self.html, valores, escapar=True),
+            self._sustituir(self.texto, valores, escapar=False),
+        )
+
+
+# ==========================================
+# CREACIÓN DE CAMPAÑAS
+# ==========================================
+
+def crear_campana(nombre, plantilla, asunto, destinatarios, contexto=None, incluir_baja=True):
+    """
+    Registra una campaña y un EnvioEmail por destinatario (bulk_create).
+
+    Args:
+        destinatarios: Iterable de (usuario, datos) donde `datos` son los
+            campos propios del destinatario (dict, puede ser vacío).
+
+    Los usuarios que no pueden recibir emails quedan OMITIDOS.
+    """
+    from .models import CampanaEmail, EnvioEmail
+
+    envios, campos, vistos = [], set(), set()
+    for usuario, datos in destinatarios:
+        if usuario.email in vistos:
+            continue
+        vistos.add(usuario.email)
+        datos = datos or {}
+        campos.update(datos)
+        envios.append(EnvioEmail(
+            usuario=usuario,
+            email=usuario.email,
+            datos=datos,
+            estado=(
+                EnvioEmail.EstadoChoices.PENDIENTE if usuario.puede_recibir_emails()
+                else EnvioEmail.EstadoChoices.OMITIDO
+            ),
+        ))
+
+    with transaction.atomic():
+        campana = CampanaEmail.objects.create(
+            nombre=nombre,
+            plantilla=plantilla,
+            asunto=asunto,
+            contexto=contexto or {},
+            campos_destinatario=sorted(campos),
+            incluir_baja=incluir_baja,
+            total=len(envios),
+        )
+        for envio in envios:
+            envio.campana = campana
+        EnvioEmail.objects.bulk_create(envios, batch_size=EMAIL_MASIVO_LOTE)
+
+    return campana
+
+
+def encolar_campana(campana):
+    """Encola el envío de la campaña para después del commit."""
+    from .tasks import enviar_campana_email
+
+    transaction.on_commit(lambda: enviar_campana_email.delay(campana.pk))
+
+
+# ==========================================
+# ENVÍO
+# ==========================================
+
+def _valores(envio, incluir_baja):
+    usuario = envio.usuario
+    valores = {
+        'nombre': (usuario.first_name if usuario else '') or envio.email,
+        'apellido': usuario.last_name if usuario else '',
+        'email': envio.email,
+        **envio.datos,
+    }
+    if incluir_baja and usuario:
+        valores['unsubscribe_url'] = EmailService._get_unsubscribe_url(usuario)
+    return valores
+
+
+def _mensaje(plantilla, envio, incluir_baja):
+    valores = _valores(envio, incluir_baja)
+    asunto, html, texto = plantilla.para(valores)
+
+    mensaje = EmailMultiAlternatives(
+        subject=asunto,
+        body=texto,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[envio.email],
+    )
+    mensaje.attach_alternative(html, "text/html")
+    if valores.get('unsubscribe_url'):
+        mensaje.extra_headers = {
+            'List-Unsubscribe': f"<{valores['unsubscribe_url']}>",
+            'List-Unsubscribe-Post': 'List-Unsubscribe=One-Click',
+        }
+    return mensaje
+
+
+def enviar_campana(campana_id, por_segundo=None):
+    """
+    Envía los EnvioEmail pendientes de la campaña. Retorna (enviados, fallidos)
+    de esta ejecución.
+    """
+    from .models import CampanaEmail, EnvioEmail
+
+    campana = CampanaEmail.objects.filter(pk=campana_id).first()
+    if campana is None or campana.estado == CampanaEmail.EstadoChoices.FINALIZADA:
+        return 0, 0
+
+    por_segundo = EMAIL_MASIVO_POR_SEGUNDO if por_segundo is None else por_segundo
+    intervalo = 1 / por_segundo if por_segundo else 0
+
+    plantilla = PlantillaCampana.compilar(
+        campana.plantilla, campana.asunto,
+        {**campana.contexto, 'incluir_baja': campana.incluir_baja},
+        campana.campos_destinatario,
+    )
+    CampanaEmail.objects.filter(pk=campana.pk).update(estado=CampanaEmail.EstadoChoices.ENVIANDO)
+
+    pendientes = (
+        campana.envios.filter(estado=EnvioEmail.EstadoChoices.PENDIENTE)
+        .select_related('usuario')
+        .order_by('pk')
+    )
+    enviados = fallidos = 0
+    ultimo = 0
+    siguiente = time.monotonic()
+    try:
+        while True:
+            lote = list(pendientes.filter(pk__gt=ultimo)[:EMAIL_MASIVO_LOTE])
+            if not lote:
+                break
+            ultimo = lote[-1].pk
+
+            for envio in lote:
+                # Ritmo: como máximo `por_segundo` mensajes por segundo
+                espera = siguiente - time.monotonic()
+                if espera > 0:
+                    time.sleep(espera)
+                siguiente = max(siguiente, time.monotonic()) + intervalo
+
+                try:
+                    _enviar_con_pool(_mensaje(plantilla, envio, campana.incluir_baja))
+                    envio.estado = EnvioEmail.EstadoChoices.ENVIADO
+                    envio.enviado_en = timezone.now()
+                    enviados += 1
+                except Exception as e:
+                    envio.estado = EnvioEmail.EstadoChoices.FALLIDO
+                    envio.error = str(e)[:500]
+                    fallidos += 1
+                    logger.warning(f"Campaña {campana.pk}: fallo enviando a {envio.email}: {e}")
+
+            EnvioEmail.objects.bulk_update(lote, ['estado', 'error', 'enviado_en'])
+    finally:
+        cerrar_conexion()
+
+    conteos = dict(campana.envios.values_list('estado').annotate(n=Count('id')))
+    CampanaEmail.objects.filter(pk=campana.pk).update(
+        estado=CampanaEmail.EstadoChoices.FINALIZADA,
+        enviados=conteos.get(EnvioEmail.EstadoChoices.ENVIADO, 0),
+        fallidos=conteos.get(EnvioEmail.EstadoChoices.FALLIDO, 0),
+        finalizada_en=timezone.now(),
+    )
+    logger.info(f"Campaña '{campana.nombre}' finalizada: {enviados} enviados, {fallidos} fallidos")
+    return enviados, fallidos
@@ -1,17 +1,66 @@
 # -*- coding: utf-8 -*-
 # authentication/email_utils.py
 
-from django.core.mail import EmailMultiAlternatives
+from django.core.mail import EmailMultiAlternatives, get_connection
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 from django.conf import settings
+from django.db import transaction
 from django.urls import reverse
 from django.contrib.auth.tokens import default_token_generator
 import logging
+import smtplib
+import threading
 from datetime import datetime
 
 logger = logging.getLogger('authentication')
 
+# Mensajes por conexión SMTP antes de reciclarla (Gmail corta sesiones largas)
+EMAIL_MENSAJES_POR_CONEXION = getattr(settings, 'EMAIL_MENSAJES_POR_CONEXION', 100)
+
+
+# ==========================================
+# CONEXIÓN SMTP REUTILIZABLE
+# ==========================================
+
+_pool = threading.local()
+
+
+def _enviar_con_pool(mensaje):
+    """
+    Envía por una conexión SMTP abierta y reutilizada por el proceso (worker
+    de Celery) en lugar de hacer connect + STARTTLS + AUTH en cada email.
+    Si el servidor cerró la sesión, reconecta una vez.
+    """
+    for intento in range(2):
+        conexion = getattr(_pool, 'conexion', None)
+        if conexion is None:
+            conexion = get_connection(fail_silently=False)
+            conexion.open()
+            _pool.conexion, _pool.enviados = conexion, 0
+        try:
+            conexion.send_messages([mensaje])
+        except (smtplib.SMTPServerDisconnected, ConnectionError):
+            cerrar_conexion()
+            if intento:
+                raise
+            continue
+
+        _pool.enviados += 1
+        if _pool.enviados >= EMAIL_MENSAJES_POR_CONEXION:
+            cerrar_conexion()
+        return
+
+
+def cerrar_conexion():
+    conexion = getattr(_pool, 'conexion', None)
+    _pool.conexion = None
+    if conexion is not None:
+        try:
+            conexion.close()
+        except Exception:
+            pass
+
 
 class EmailService:
     """
@@ -53,7 +102,7 @@ class EmailService:
                     'List-Unsubscribe-Post': 'List-Unsubscribe=One-Click',
                 }
             
-            email.send(fail_silently=False)
+            _enviar_con_pool(email)
             logger.info(f"Email '{subject}' enviado exitosamente a {to_email}")
             return True
             
@@ -294,25 +343,39 @@ class EmailService:
         )
 
 
+# ==========================================
+# ENVÍO EN SEGUNDO PLANO
+# ==========================================
+
+def encolar_email(tipo, user, **datos):
+    """
+    Encola el email `tipo` (ver authentication.tasks.enviar_email) para
+    después del commit: la respuesta HTTP no espera al servidor SMTP.
+    """
+    from .tasks import enviar_email
+
+    transaction.on_commit(lambda: enviar_email.delay(tipo, user.pk, **datos))
+
+
 # ==========================================
 # FUNCIONES HELPER (SHORTCUTS)
 # ==========================================
 
 def enviar_email_bienvenida(user):
-    """Shortcut para enviar email de bienvenida"""
-    return EmailService.enviar_bienvenida(user)
+    """Shortcut para encolar email de bienvenida"""
+    encolar_email('bienvenida', user)
 
 
 def enviar_codigo_recuperacion_password(user, codigo):
-    """Shortcut para enviar código de recuperación"""
-    return EmailService.enviar_codigo_recuperacion(user, codigo)
+    """Shortcut para encolar código de recuperación"""
+    encolar_email('codigo_recuperacion', user, codigo=codigo)
 
 
 def enviar_confirmacion_cambio_password(user):
-    """Shortcut para enviar confirmación de cambio"""
-    return EmailService.enviar_confirmacion_cambio_password(user)
+    """Shortcut para encolar confirmación de cambio"""
+    encolar_email('confirmacion_cambio_password', user)
 
 
 def enviar_email_confirmacion_baja(user):
-    """Shortcut para enviar confirmación de baja"""
-    return EmailService.enviar_confirmacion_baja(user)
+    """Shortcut para encolar confirmación de baja"""
+    encolar_email('confirmacion_baja', user)
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.7 on 2026-10-19 04:29
+
+import django.contrib.auth.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0003_user_modo_silencio'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UsuarioPrincipal',
+            fields=[
+            ],
+            options={
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('authentication.user',),
+            managers=[
+                ('objects', django.contrib.auth.models.UserManager()),
+            ],
+        ),
+    ]
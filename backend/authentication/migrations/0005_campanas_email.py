@@ -0,0 +1,59 @@
+# Generated by Django 5.1.7 on 2026-10-19 04:38
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0004_usuario_principal'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CampanaEmail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=200, verbose_name='Nombre')),
+                ('asunto', models.CharField(help_text='Admite variables de plantilla, p. ej. {{ nombre }}', max_length=255, verbose_name='Asunto')),
+                ('plantilla', models.CharField(help_text='Ruta sin extensión: se usan <plantilla>.html y <plantilla>.txt', max_length=200, verbose_name='Plantilla')),
+                ('contexto', models.JSONField(blank=True, default=dict, verbose_name='Contexto común')),
+                ('campos_destinatario', models.JSONField(blank=True, default=list, help_text='Claves de EnvioEmail.datos que cambian en cada email', verbose_name='Campos por destinatario')),
+                ('incluir_baja', models.BooleanField(default=True, help_text='Agrega los headers List-Unsubscribe', verbose_name='Incluir enlace de baja')),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('enviando', 'Enviando'), ('finalizada', 'Finalizada')], default='pendiente', max_length=20, verbose_name='Estado')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Destinatarios')),
+                ('enviados', models.PositiveIntegerField(default=0, verbose_name='Enviados')),
+                ('fallidos', models.PositiveIntegerField(default=0, verbose_name='Fallidos')),
+                ('creada_en', models.DateTimeField(auto_now_add=True, verbose_name='Creada en')),
+                ('finalizada_en', models.DateTimeField(blank=True, null=True, verbose_name='Finalizada en')),
+            ],
+            options={
+                'verbose_name': 'Campaña de email',
+                'verbose_name_plural': 'Campañas de email',
+                'db_table': 'campanas_email',
+                'ordering': ['-creada_en'],
+            },
+        ),
+        migrations.CreateModel(
+            name='EnvioEmail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email', models.EmailField(max_length=254, verbose_name='Email')),
+                ('datos', models.JSONField(blank=True, default=dict, verbose_name='Datos del destinatario')),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('enviado', 'Enviado'), ('fallido', 'Fallido'), ('omitido', 'Omitido')], default='pendiente', max_length=20, verbose_name='Estado')),
+                ('error', models.TextField(blank=True, default='', verbose_name='Error')),
+                ('enviado_en', models.DateTimeField(blank=True, null=True, verbose_name='Enviado en')),
+                ('campana', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='envios', to='authentication.campanaemail', verbose_name='Campaña')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='envios_email', to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+            ],
+            options={
+                'verbose_name': 'Envío de email',
+                'verbose_name_plural': 'Envíos de email',
+                'db_table': 'envios_email',
+                'indexes': [models.Index(fields=['campana', 'estado'], name='envios_emai_campana_e49fa6_idx')],
+                'constraints': [models.UniqueConstraint(fields=('campana', 'email'), name='envio_email_unico_por_campana')],
+            },
+        ),
+    ]
@@ -520,71 +520,42 @@ class User(AbstractUser):
 
     def registrar_login_exitoso(self, ip_address=None):
         """
-        Registra un login exitoso y resetea contadores de seguridad
+        Registra un login exitoso y resetea contadores de seguridad.
+        La escritura en BD se difiere (ver authentication/services.py)
         
         Args:
             ip_address (str): Dirección IP del login
         """
-        self.intentos_login_fallidos = 0
-        self.cuenta_bloqueada_hasta = None
-        
-        if ip_address:
-            self.ultimo_login_ip = ip_address
-        
-        self.last_login = timezone.now()
-        self.save(update_fields=[
-            'intentos_login_fallidos',
-            'cuenta_bloqueada_hasta',
-            'ultimo_login_ip',
-            'last_login',
-            'updated_at'
-        ])
-        
+        from .services import LoginService
+
+        LoginService.registrar_exitoso(self, ip_address)
         logger.info(f"Login exitoso: {self.email} desde IP {ip_address}")
 
     def registrar_login_fallido(self):
         """
         Registra un intento de login fallido y bloquea la cuenta si es necesario
+        (contador y bloqueo en Redis)
         """
-        self.intentos_login_fallidos += 1
-        
-        # Bloquear cuenta después de 5 intentos fallidos
-        if self.intentos_login_fallidos >= 5:
-            self.cuenta_bloqueada_hasta = timezone.now() + timedelta(minutes=30)
-            logger.warning(
-                f"Cuenta bloqueada por intentos fallidos: {self.email} "
-                f"({self.intentos_login_fallidos} intentos)"
-            )
-        
-        self.save(update_fields=[
-            'intentos_login_fallidos',
-            'cuenta_bloqueada_hasta',
-            'updated_at'
-        ])
+        from .services import LoginService
+
+        return LoginService.registrar_fallido(self)
+
+    def bloqueado_hasta(self):
+        """
+        Retorna el fin del bloqueo temporal vigente o None
+        """
+        from .services import LoginService
+
+        return LoginService.bloqueado_hasta(self)
 
     def esta_bloqueado(self):
         """
-        Verifica si la cuenta está temporalmente bloqueada
+        Verifica si la cuenta está temporalmente bloqueada (solo lectura)
         
         Returns:
             bool: True si está bloqueada
         """
-        if not self.cuenta_bloqueada_hasta:
-            return False
-        
-        if timezone.now() < self.cuenta_bloqueada_hasta:
-            return True
-        
-        # Si ya pasó el tiempo de bloqueo, resetear
-        self.intentos_login_fallidos = 0
-        self.cuenta_bloqueada_hasta = None
-        self.save(update_fields=[
-            'intentos_login_fallidos',
-            'cuenta_bloqueada_hasta',
-            'updated_at'
-        ])
-        
-        return False
+        return self.bloqueado_hasta() is not None
 
     # ==========================================
     # MÉTODOS DE RECUPERACIÓN DE CONTRASEÑA
@@ -841,3 +812,133 @@ class User(AbstractUser):
             raise ValidationError('La contraseña debe tener al menos 5 caracteres')
 
         return True
+
+
+class UsuarioPrincipal(User):
+    """
+    Usuario autenticado construido desde el principal en caché
+    (ver authentication/principal.py).
+
+    Solo trae cargados los campos del principal. Al acceder al primer campo
+    diferido se cargan todos los diferidos en una consulta, en lugar de una
+    consulta por campo.
+    """
+
+    class Meta:
+        proxy = True
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        diferidos = self.get_deferred_fields()
+        if fields is not None and diferidos and set(fields) <= diferidos:
+            fields = diferidos
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+
+
+
+# ==========================================
+# ENVÍOS MASIVOS DE EMAIL
+# ==========================================
+
+class CampanaEmail(models.Model):
+    """
+    Un mismo email enviado a muchos destinatarios (ganadores de una rifa,
+    campañas). Ver authentication/email_masivo.py.
+    """
+
+    class EstadoChoices(models.TextChoices):
+        PENDIENTE = 'pendiente', 'Pendiente'
+        ENVIANDO = 'enviando', 'Enviando'
+        FINALIZADA = 'finalizada', 'Finalizada'
+
+    nombre = models.CharField(max_length=200, verbose_name='Nombre')
+    asunto = models.CharField(
+        max_length=255,
+        verbose_name='Asunto',
+        help_text='Admite variables de plantilla, p. ej. {{ nombre }}'
+    )
+    plantilla = models.CharField(
+        max_length=200,
+        verbose_name='Plantilla',
+        help_text='Ruta sin extensión: se usan <plantilla>.html y <plantilla>.txt'
+    )
+    contexto = models.JSONField(default=dict, blank=True, verbose_name='Contexto común')
+    campos_destinatario = models.JSONField(
+        default=list,
+        blank=True,
+        verbose_name='Campos por destinatario',
+        help_text='Claves de EnvioEmail.datos que cambian en cada email'
+    )
+    incluir_baja = models.BooleanField(
+        default=True,
+        verbose_name='Incluir enlace de baja',
+        help_text='Agrega los headers List-Unsubscribe'
+    )
+    estado = models.CharField(
+        max_length=20,
+        choices=EstadoChoices.choices,
+        default=EstadoChoices.PENDIENTE,
+        verbose_name='Estado'
+    )
+    total = models.PositiveIntegerField(default=0, verbose_name='Destinatarios')
+    enviados = models.PositiveIntegerField(default=0, verbose_name='Enviados')
+    fallidos = models.PositiveIntegerField(default=0, verbose_name='Fallidos')
+    creada_en = models.DateTimeField(auto_now_add=True, verbose_name='Creada en')
+    finalizada_en = models.DateTimeField(blank=True, null=True, verbose_name='Finalizada en')
+
+    class Meta:
+        db_table = 'campanas_email'
+        verbose_name = 'Campaña de email'
+        verbose_name_plural = 'Campañas de email'
+        ordering = ['-creada_en']
+
+    def __str__(self):
+        return f"{self.nombre} ({self.enviados}/{self.total})"
+
+
+class EnvioEmail(models.Model):
+    """Estado de entrega de una campaña para un destinatario"""
+
+    class EstadoChoices(models.TextChoices):
+        PENDIENTE = 'pendiente', 'Pendiente'
+        ENVIADO = 'enviado', 'Enviado'
+        FALLIDO = 'fallido', 'Fallido'
+        OMITIDO = 'omitido', 'Omitido'
+
+    campana = models.ForeignKey(
+        CampanaEmail,
+        on_delete=models.CASCADE,
+        related_name='envios',
+        verbose_name='Campaña'
+    )
+    usuario = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='envios_email',
+        verbose_name='Usuario'
+    )
+    email = models.EmailField(verbose_name='Email')
+    datos = models.JSONField(default=dict, blank=True, verbose_name='Datos del destinatario')
+    estado = models.CharField(
+        max_length=20,
+        choices=EstadoChoices.choices,
+        default=EstadoChoices.PENDIENTE,
+        verbose_name='Estado'
+    )
+    error = models.TextField(blank=True, default='', verbose_name='Error')
+    enviado_en = models.DateTimeField(blank=True, null=True, verbose_name='Enviado en')
+
+    class Meta:
+        db_table = 'envios_email'
+        verbose_name = 'Envío de email'
+        verbose_name_plural = 'Envíos de email'
+        indexes = [
+            models.Index(fields=['campana', 'estado']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['campana', 'email'], name='envio_email_unico_por_campana'),
+        ]
+
+    def __str__(self):
+        return f"{self.email} - {self.get_estado_display()}"
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+# authentication/principal.py
+"""
+Principal autenticado en caché para las solicitudes con JWT.
+
+`JWTAuthentication` carga el User completo en cada llamada y los permisos
+luego consultan `user.repartidor`, `user.perfil` o `user.proveedor`. Aquí
+se resuelve una sola vez (una consulta con LEFT JOINs) un principal compacto:
+id, rol activo, roles, ids de perfil/repartidor/proveedor y banderas de
+cuenta, y se guarda en caché con TTL corto. Las señales lo invalidan cuando
+cambia el usuario o alguno de sus perfiles.
+
+`PrincipalJWTAuthentication` construye `request.user` desde el principal
+como un `UsuarioPrincipal` (proxy de User) con el resto de campos diferidos:
+si la vista los necesita se cargan todos juntos en una consulta.
+"""
+
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from utils.metricas import registrar_cache
+
+logger = logging.getLogger('authentication')
+
+PRINCIPAL_TTL_SEGUNDOS = getattr(settings, 'AUTH_PRINCIPAL_TTL', 300)
+
+# Campos de User que se cargan desde el principal (el resto queda diferido)
+CAMPOS_USUARIO = (
+    'id', 'email', 'username', 'is_active', 'is_staff', 'is_superuser',
+    'tipo_usuario', 'roles_aprobados', 'rol_activo',
+    'cuenta_desactivada', 'cuenta_bloqueada_hasta',
+)
+
+# Perfiles relacionados (reverse one-to-one, LEFT JOIN)
+CAMPOS_RELACIONADOS = {
+    'perfil__id': 'perfil_id',
+    'repartidor__id': 'repartidor_id',
+    'repartidor__activo': 'repartidor_activo',
+    'repartidor__verificado': 'repartidor_verificado',
+    'proveedor__id': 'proveedor_id',
+}
+
+
+def _key(user_id):
+    return f"auth:principal:{user_id}"
+
+
+# ============================================
+# PRINCIPAL
+# ============================================
+
+def construir(user_id):
+    """Lee el principal de la BD en una consulta (None si el usuario no existe)."""
+    from .models import User
+
+    fila = User.objects.filter(pk=user_id).values(*CAMPOS_USUARIO, *CAMPOS_RELACIONADOS).first()
+    if fila is None:
+        return None
+    for origen, destino in CAMPOS_RELACIONADOS.items():
+        fila[destino] = fila.pop(origen)
+    return fila
+
+
+def obtener(user_id):
+    """Principal del usuario desde la caché, reconstruyéndolo si falta."""
+    principal = registrar_cache('principal', cache.get(_key(user_id)))
+    if principal is None:
+        principal = construir(user_id)
+        if principal is not None:
+            cache.set(_key(user_id), principal, PRINCIPAL_TTL_SEGUNDOS)
+    return principal
+
+
+def invalidar(*user_ids):
+    keys = [_key(uid) for uid in user_ids if uid]
+    if keys:
+        cache.delete_many(keys)
+
+
+def principal_de(user):
+    """
+    Principal de `request.user`. Reutiliza el de la autenticación JWT y, para
+    otros backends (sesión, force_authenticate), lo obtiene y lo memoriza en
+    la instancia.
+    """
+    if user is None or not user.is_authenticated:
+        return None
+    principal = getattr(user, '_principal', None)
+    if principal is None:
+        principal = obtener(user.pk)
+        user._principal = principal
+    return principal
+
+
+def usuario_desde_principal(principal):
+    """UsuarioPrincipal con los campos del principal cargados y el resto diferidos."""
+    from .models import UsuarioPrincipal
+
+    # from_db espera los valores en el orden de los campos del modelo
+    campos = [f.attname for f in UsuarioPrincipal._meta.concrete_fields if f.attname in CAMPOS_USUARIO]
+    usuario = UsuarioPrincipal.from_db('default', campos, [principal[campo] for campo in campos])
+    usuario._principal = principal
+    return usuario
+
+
+# ============================================
+# AUTENTICACIÓN
+# ============================================
+
+class PrincipalJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication que resuelve el usuario desde el principal en caché,
+    sin consultar la BD en la mayoría de las solicitudes.
+    """
+
+    def get_user(self, validated_token):
+        if api_settings.CHECK_REVOKE_TOKEN:
+            # La revocación compara el hash de la contraseña: requiere el User completo
+            return super().get_user(validated_token)
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+        principal = obtener(user_id)
+        if principal is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not principal['is_active']:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        return usuario_desde_principal(principal)
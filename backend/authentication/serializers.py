@@ -187,8 +187,9 @@ class LoginSerializer(serializers.Serializer):
             raise serializers.ValidationError("Credenciales inválidas")
 
         # Verificar si la cuenta está bloqueada
-        if user.esta_bloqueado():
-            tiempo_restante = (user.cuenta_bloqueada_hasta - timezone.now()).seconds // 60
+        bloqueado_hasta = user.bloqueado_hasta()
+        if bloqueado_hasta:
+            tiempo_restante = max(1, int((bloqueado_hasta - timezone.now()).total_seconds() // 60))
             raise serializers.ValidationError(
                 f"Cuenta bloqueada por múltiples intentos fallidos. Intenta en {tiempo_restante} minutos"
             )
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+# authentication/services.py
+"""
+Estado de login fuera del camino crítico.
+
+- Intentos fallidos y bloqueo temporal viven en Redis con TTL: verificar el
+  bloqueo es una lectura y nunca escribe en la BD.
+- La contabilidad de cada login (último login, IP, reseteo de contadores y
+  el reflejo del bloqueo en la BD para el admin) se acumula en un hash de
+  Redis y `authentication.flush_logins` la vuelca con bulk_update. Varios
+  logins del mismo usuario entre flushes se colapsan en una sola fila.
+
+Si Redis no está disponible se vuelve a la escritura directa en la BD.
+"""
+
+import json
+import logging
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.utils import timezone
+
+logger = logging.getLogger('authentication')
+
+MAX_INTENTOS_FALLIDOS = 5
+BLOQUEO_MINUTOS = 30
+LOTE_FLUSH = 500
+
+KEY_PENDIENTES = 'auth:logins_pendientes'
+
+
+def _key_fallidos(user_id):
+    return f"auth:login_fallidos:{user_id}"
+
+
+def _key_bloqueo(user_id):
+    return f"auth:bloqueo:{user_id}"
+
+
+def _ts(fecha):
+    return fecha.timestamp() if fecha else None
+
+
+def _fecha(ts):
+    return datetime.fromtimestamp(ts, tz=dt_timezone.utc) if ts is not None else None
+
+
+class LoginService:
+    """Bloqueo por intentos fallidos y contabilidad diferida de logins"""
+
+    # ==========================================
+    # BLOQUEO
+    # ==========================================
+
+    @staticmethod
+    def bloqueado_hasta(user):
+        """
+        Fin del bloqueo vigente de la cuenta o None. Considera el bloqueo en
+        Redis y el de la BD (reflejado o puesto por un administrador).
+        """
+        from utils.redis_client import get_redis
+
+        ahora = timezone.now()
+        if user.cuenta_bloqueada_hasta and user.cuenta_bloqueada_hasta > ahora:
+            return user.cuenta_bloqueada_hasta
+        try:
+            pttl = get_redis().pttl(_key_bloqueo(user.pk))
+        except Exception as e:
+            logger.warning(f"No se pudo consultar el bloqueo de {user.pk}: {e}")
+            return None
+        return ahora + timedelta(milliseconds=pttl) if pttl > 0 else None
+
+    @staticmethod
+    def registrar_fallido(user):
+        """Cuenta un intento fallido; al llegar al máximo bloquea la cuenta. Retorna los intentos."""
+        from utils.redis_client import get_redis
+
+        ventana = BLOQUEO_MINUTOS * 60
+        try:
+            r = get_redis()
+            pipe = r.pipeline(transaction=False)
+            pipe.incr(_key_fallidos(user.pk))
+            pipe.expire(_key_fallidos(user.pk), ventana)
+            intentos = pipe.execute()[0]
+
+            if intentos >= MAX_INTENTOS_FALLIDOS:
+                hasta = timezone.now() + timedelta(seconds=ventana)
+                pipe = r.pipeline(transaction=False)
+                pipe.set(_key_bloqueo(user.pk), 1, ex=ventana)
+                pipe.delete(_key_fallidos(user.pk))
+                pipe.execute()
+                LoginService._encolar(r, user.pk, {
+                    'intentos_login_fallidos': intentos,
+                    'cuenta_bloqueada_hasta': _ts(hasta),
+                })
+                logger.warning(
+                    f"Cuenta bloqueada por intentos fallidos: {user.email} ({intentos} intentos)"
+                )
+            return intentos
+        except Exception as e:
+            logger.warning(f"Bloqueo en Redis no disponible, registrando en BD: {e}")
+            user.intentos_login_fallidos += 1
+            if user.intentos_login_fallidos >= MAX_INTENTOS_FALLIDOS:
+                user.cuenta_bloqueada_hasta = timezone.now() + timedelta(minutes=BLOQUEO_MINUTOS)
+            user.save(update_fields=['intentos_login_fallidos', 'cuenta_bloqueada_hasta', 'updated_at'])
+            return user.intentos_login_fallidos
+
+    @staticmethod
+    def desbloquear(*user_ids):
+        """Borra intentos y bloqueo en Redis (p. ej. cuando un admin resetea la cuenta)."""
+        from utils.redis_client import get_redis
+
+        keys = [k for uid in user_ids for k in (_key_fallidos(uid), _key_bloqueo(uid))]
+        if not keys:
+            return
+        try:
+            get_redis().delete(*keys)
+        except Exception as e:
+            logger.warning(f"No se pudo limpiar el bloqueo de {list(user_ids)}: {e}")
+
+    # ==========================================
+    # CONTABILIDAD DIFERIDA
+    # ==========================================
+
+    @staticmethod
+    def registrar_exitoso(user, ip_address=None):
+        """
+        Resetea los intentos y agenda el registro del login. La instancia
+        queda actualizada en memoria para la respuesta.
+        """
+        from utils.redis_client import get_redis
+
+        ahora = timezone.now()
+        user.intentos_login_fallidos = 0
+        user.cuenta_bloqueada_hasta = None
+        user.last_login = ahora
+        if ip_address:
+            user.ultimo_login_ip = ip_address
+
+        try:
+            r = get_redis()
+            r.delete(_key_fallidos(user.pk))
+            LoginService._encolar(r, user.pk, {
+                'intentos_login_fallidos': 0,
+                'cuenta_bloqueada_hasta': None,
+                'last_login': _ts(ahora),
+                'ultimo_login_ip': user.ultimo_login_ip,
+            })
+        except Exception as e:
+            logger.warning(f"Buffer de logins no disponible, guardando directo: {e}")
+            user.save(update_fields=[
+                'intentos_login_fallidos', 'cuenta_bloqueada_hasta',
+                'ultimo_login_ip', 'last_login', 'updated_at',
+            ])
+
+    @staticmethod
+    def _encolar(r, user_id, campos):
+        # El último evento del usuario reemplaza al anterior (estado final)
+        r.hset(KEY_PENDIENTES, user_id, json.dumps(campos))
+
+    @staticmethod
+    def flush_logins():
+        """Vuelca los logins pendientes con bulk_update. Retorna los usuarios actualizados."""
+        from django.db import transaction
+        from utils.redis_client import drenar, get_redis
+        from .models import User
+        from .principal import invalidar as invalidar_principal
+
+        r = get_redis()
+        pendientes = drenar(r, KEY_PENDIENTES, r.hgetall)
+        if not pendientes:
+            return 0
+        pendientes = {int(uid): json.loads(valor) for uid, valor in pendientes.items()}
+
+        # Agrupar por conjunto de campos: un bulk_update por forma de evento
+        grupos = {}
+        for user_id, campos in pendientes.items():
+            usuario = User(pk=user_id)
+            for campo, valor in campos.items():
+                if campo in ('last_login', 'cuenta_bloqueada_hasta'):
+                    valor = _fecha(valor)
+                setattr(usuario, campo, valor)
+            grupos.setdefault(tuple(sorted(campos)), []).append(usuario)
+
+        try:
+            with transaction.atomic():
+                for campos, usuarios in grupos.items():
+                    User.objects.bulk_update(usuarios, list(campos), batch_size=LOTE_FLUSH)
+        except Exception:
+            # Devolver al buffer sin pisar eventos más nuevos
+            pipe = r.pipeline(transaction=False)
+            for user_id, campos in pendientes.items():
+                pipe.hsetnx(KEY_PENDIENTES, user_id, json.dumps(campos))
+            pipe.execute()
+            raise
+
+        invalidar_principal(*pendientes)
+        return len(pendientes)
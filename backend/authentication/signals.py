@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+# authentication/signals.py
+"""
+Invalidación del principal en caché (authentication/principal.py) cuando
+cambian el usuario, sus roles o alguno de sus perfiles.
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import principal
+from .models import User, UsuarioPrincipal
+
+
+# ============================================
+# UsuarioPrincipal -> User
+# ============================================
+
+# request.user de PrincipalJWTAuthentication es un UsuarioPrincipal (proxy):
+# Django emite sus señales con sender=UsuarioPrincipal, así que
+# `request.user.save()` no llegaría a los receptores de sender=User (este
+# módulo, usuarios, administradores, calificaciones). Se reenvían con el
+# modelo concreto.
+
+def _reenviar_a_user(senal):
+    def reenviar(sender, signal=None, **kwargs):
+        senal.send(sender=User, **kwargs)
+    return reenviar
+
+
+for _nombre, _senal in (
+    ('pre_save', pre_save), ('post_save', post_save),
+    ('pre_delete', pre_delete), ('post_delete', post_delete),
+):
+    _senal.connect(
+        _reenviar_a_user(_senal),
+        sender=UsuarioPrincipal,
+        weak=False,
+        dispatch_uid=f"usuario_principal_{_nombre}",
+    )
+
+
+def _invalidar_principal(user_id):
+    # Ahora y al confirmar: una lectura concurrente pudo volver a cachear
+    # el estado anterior antes del commit
+    principal.invalidar(user_id)
+    transaction.on_commit(lambda: principal.invalidar(user_id))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidar_principal_usuario(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _invalidar_principal(instance.pk)
+
+
+@receiver(post_save, sender='usuarios.Perfil')
+@receiver(post_delete, sender='usuarios.Perfil')
+@receiver(post_save, sender='repartidores.Repartidor')
+@receiver(post_delete, sender='repartidores.Repartidor')
+@receiver(post_save, sender='proveedores.Proveedor')
+@receiver(post_delete, sender='proveedores.Proveedor')
+def invalidar_principal_perfil(sender, instance, raw=False, **kwargs):
+    if not raw and instance.user_id:
+        _invalidar_principal(instance.user_id)
@@ -0,0 +1,75 @@
+# authentication/tasks.py
+
+from celery import shared_task
+from celery.signals import worker_process_shutdown
+import logging
+
+logger = logging.getLogger('authentication')
+
+
+# ==========================================================
+# EMAILS TRANSACCIONALES
+# ==========================================================
+
+@shared_task(name='authentication.enviar_email', ignore_result=True)
+def enviar_email(tipo, user_id, **datos):
+    """
+    Renderiza y envía un email de EmailService por la conexión SMTP del worker.
+
+    Tipos: bienvenida, codigo_recuperacion, confirmacion_cambio_password,
+    confirmacion_baja, rifa_ganada (rifa_id, premio_id, posicion).
+    """
+    from .email_utils import EmailService
+    from .models import User
+
+    user = User.objects.filter(pk=user_id).first()
+    if user is None:
+        logger.warning(f"Email '{tipo}' descartado: usuario {user_id} no existe")
+        return
+
+    if tipo == 'rifa_ganada':
+        from rifas.models import Premio, Rifa
+
+        rifa = Rifa.objects.filter(pk=datos['rifa_id']).first()
+        if rifa is None:
+            return
+        premio = Premio.objects.filter(pk=datos.get('premio_id')).first() if datos.get('premio_id') else None
+        EmailService.enviar_rifa_ganada(user, rifa, premio=premio, posicion=datos.get('posicion'))
+        return
+
+    metodos = {
+        'bienvenida': EmailService.enviar_bienvenida,
+        'codigo_recuperacion': EmailService.enviar_codigo_recuperacion,
+        'confirmacion_cambio_password': EmailService.enviar_confirmacion_cambio_password,
+        'confirmacion_baja': EmailService.enviar_confirmacion_baja,
+    }
+    metodos[tipo](user, **datos)
+
+
+@shared_task(name='authentication.enviar_campana_email', ignore_result=True)
+def enviar_campana_email(campana_id):
+    """Envía una CampanaEmail por una sola conexión SMTP (ver email_masivo)."""
+    from .email_masivo import enviar_campana
+
+    enviar_campana(campana_id)
+
+
+@worker_process_shutdown.connect
+def cerrar_conexion_smtp(**kwargs):
+    from .email_utils import cerrar_conexion
+
+    cerrar_conexion()
+
+
+# ==========================================================
+# CONTABILIDAD DE LOGINS
+# ==========================================================
+
+@shared_task(name='authentication.flush_logins', ignore_result=True)
+def flush_logins():
+    """Vuelca a la BD los logins y bloqueos acumulados en Redis."""
+    from .services import LoginService
+
+    total = LoginService.flush_logins()
+    if total:
+        logger.info(f"Logins volcados: {total} usuarios")
@@ -1,7 +1,27 @@
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from unittest import mock
+
+import httpx
+
 from django.urls import reverse
 from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIRequestFactory, APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from repartidores.models import Repartidor
+from utils import limitador
+from utils.throttles import UbicacionThrottle
+from repartidores.permissions import IsRepartidor, IsRepartidorActivo
+from .models import EnvioEmail, UsuarioPrincipal
+from . import email_masivo, email_utils, tasks, views
+from .principal import PrincipalJWTAuthentication, principal_de
+from .services import LoginService
+from .throttles import LoginRateThrottle, check_custom_rate_limit, reset_rate_limit
 
 User = get_user_model()
 
@@ -78,3 +98,300 @@ class AuthenticationAPITest(APITestCase):
         }
         res = self.client.post(self.login_url, payload, format="json")
         self.assertIn(res.status_code, [status.HTTP_400_BAD_REQUEST, status.HTTP_401_UNAUTHORIZED])
+
+
+class PrincipalCacheTest(APITestCase):
+    """Principal autenticado en caché para JWT."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            first_name="Ana",
+            last_name="Ruiz",
+            username="principal",
+            email="principal@app.com",
+            celular="+593922222222",
+            password="Passw0rd!",
+        )
+        self.auth = PrincipalJWTAuthentication()
+        self.token = AccessToken.for_user(self.user)
+
+    def test_usuario_desde_cache_sin_consultas(self):
+        self.auth.get_user(self.token)  # construye el principal
+
+        with self.assertNumQueries(0):
+            usuario = self.auth.get_user(self.token)
+            self.assertIsInstance(usuario, UsuarioPrincipal)
+            self.assertEqual(usuario.pk, self.user.pk)
+            self.assertEqual(usuario.email, "principal@app.com")
+            self.assertTrue(usuario.es_cliente)
+
+        # Los campos diferidos se cargan juntos en una consulta
+        with self.assertNumQueries(1):
+            self.assertEqual(usuario.get_full_name(), "Ana Ruiz")
+            self.assertEqual(usuario.celular, "+593922222222")
+
+    def test_cambio_de_rol_invalida_principal(self):
+        request = SimpleNamespace(user=self.auth.get_user(self.token))
+        self.assertFalse(IsRepartidor().has_permission(request, None))
+
+        self.user.agregar_rol("repartidor")
+        Repartidor.objects.create(
+            user=self.user, cedula="0102030406", telefono="0999999998", verificado=False,
+        )
+
+        request = SimpleNamespace(user=self.auth.get_user(self.token))
+        self.assertIn("repartidor", principal_de(request.user)["roles_aprobados"])
+        with self.assertNumQueries(0):
+            self.assertTrue(IsRepartidor().has_permission(request, None))
+            self.assertFalse(IsRepartidorActivo().has_permission(request, None))
+
+    def test_cambio_de_rol_por_api_actualiza_principal(self):
+        Repartidor.objects.create(
+            user=self.user, cedula="0102030407", telefono="0999999997", verificado=True,
+        )
+        self.assertEqual(self.auth.get_user(self.token).rol_activo, "cliente")
+
+        # La vista guarda request.user, un UsuarioPrincipal (proxy de User)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.token}")
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post(
+                reverse("usuarios:cambiar_rol_activo"), {"nuevo_rol": "REPARTIDOR"}, format="json",
+            )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.auth.get_user(self.token).rol_activo, "repartidor")
+
+    def test_usuario_inactivo_rechazado(self):
+        self.auth.get_user(self.token)
+        self.user.is_active = False
+        self.user.save()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.get_user(self.token)
+
+
+class LimitadorAtomicoTest(APITestCase):
+    """Limitador GCRA en Redis compartido por los throttles."""
+
+    def setUp(self):
+        for clave in ("test:rafaga", "test:hilos", "throttle_login_10.0.0.1", "manual_10.0.0.1"):
+            limitador.reiniciar(clave)
+        self.factory = APIRequestFactory()
+
+    def test_rafaga_y_espera(self):
+        resultados = [limitador.consumir("test:rafaga", 3, 60) for _ in range(4)]
+        self.assertEqual([r.permitido for r in resultados], [True, True, True, False])
+        self.assertEqual(resultados[0].restantes, 2)
+        # Se recupera una solicitud cada periodo/limite
+        self.assertGreater(resultados[3].espera, 0)
+        self.assertLessEqual(resultados[3].espera, 20)
+
+    def test_consumo_concurrente_no_excede_limite(self):
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            resultados = list(pool.map(lambda _: limitador.consumir("test:hilos", 10, 60), range(30)))
+        self.assertEqual(sum(r.permitido for r in resultados), 10)
+
+    def test_throttles_usan_limitador(self):
+        request = self.factory.post("/api/auth/login/", REMOTE_ADDR="10.0.0.1")
+        throttle = LoginRateThrottle()
+        permitidos = [throttle.allow_request(request, None) for _ in range(throttle.num_requests + 1)]
+        self.assertEqual(permitidos.count(True), throttle.num_requests)
+        self.assertFalse(permitidos[-1])
+        self.assertGreater(throttle.wait(), 0)
+
+        user = SimpleNamespace(pk=987654, is_authenticated=True)
+        request = self.factory.post("/api/repartidores/ubicacion/")
+        request.user = user
+        limitador.reiniciar(UbicacionThrottle().get_cache_key(request, None))
+        self.assertTrue(UbicacionThrottle().allow_request(request, None))
+
+    def test_check_custom_rate_limit(self):
+        request = self.factory.post("/", REMOTE_ADDR="10.0.0.1")
+        self.assertEqual(check_custom_rate_limit(request, "manual", 2, 60)["intentos_restantes"], 1)
+        check_custom_rate_limit(request, "manual", 2, 60)
+        bloqueado = check_custom_rate_limit(request, "manual", 2, 60)
+        self.assertTrue(bloqueado["bloqueado"])
+        self.assertGreater(bloqueado["tiempo_espera"], 0)
+
+        self.assertTrue(reset_rate_limit(request, "manual"))
+        self.assertTrue(check_custom_rate_limit(request, "manual", 2, 60)["permitido"])
+
+
+class LoginDiferidoTest(APITestCase):
+    """Login sin escrituras síncronas: bloqueo en Redis y contabilidad diferida."""
+
+    def setUp(self):
+        cache.clear()
+        self.login_url = reverse("authentication:login")
+        self.user = User.objects.create_user(
+            first_name="Luis",
+            last_name="Mora",
+            username="diferido",
+            email="diferido@app.com",
+            celular="+593933333333",
+            password="Passw0rd!",
+        )
+
+    def _login(self, password):
+        return self.client.post(
+            self.login_url, {"identificador": "diferido@app.com", "password": password}, format="json",
+        )
+
+    def test_login_exitoso_se_vuelca_en_lote(self):
+        res = self._login("Passw0rd!")
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        self.user.refresh_from_db()
+        self.assertIsNone(self.user.last_login)
+
+        self.assertEqual(LoginService.flush_logins(), 1)
+        self.user.refresh_from_db()
+        self.assertIsNotNone(self.user.last_login)
+        self.assertEqual(self.user.ultimo_login_ip, "127.0.0.1")
+        self.assertEqual(LoginService.flush_logins(), 0)
+
+    def test_bloqueo_en_redis_sin_escrituras(self):
+        for _ in range(5):
+            self.user.registrar_login_fallido()
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.intentos_login_fallidos, 0)
+        with self.assertNumQueries(0):
+            self.assertTrue(self.user.esta_bloqueado())
+
+        res = self._login("Passw0rd!")
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn("bloqueada", str(res.data))
+
+        # El bloqueo se refleja en la BD para el admin
+        LoginService.flush_logins()
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.intentos_login_fallidos, 5)
+        self.assertIsNotNone(self.user.cuenta_bloqueada_hasta)
+
+        LoginService.desbloquear(self.user.pk)
+        self.user.cuenta_bloqueada_hasta = None
+        self.assertFalse(self.user.esta_bloqueado())
+
+    def test_emails_encolados_con_conexion_reutilizada(self):
+        email_utils.cerrar_conexion()
+        # La tarea se encola al hacer commit; aquí corre en el proceso de la prueba
+        with mock.patch.object(tasks.enviar_email, "delay", side_effect=tasks.enviar_email), \
+                self.captureOnCommitCallbacks(execute=True) as callbacks:
+            email_utils.enviar_codigo_recuperacion_password(self.user, "123456")
+            email_utils.enviar_codigo_recuperacion_password(self.user, "654321")
+            self.assertEqual(len(mail.outbox), 0)
+
+        self.assertEqual(len(callbacks), 2)
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertIn("123456", mail.outbox[0].body)
+        self.assertEqual(email_utils._pool.enviados, 2)
+
+
+class EmailMasivoTest(APITestCase):
+    """Campañas: plantilla renderizada una vez, una conexión y estado por destinatario."""
+
+    def setUp(self):
+        email_utils.cerrar_conexion()
+        self.usuarios = [
+            User.objects.create_user(
+                first_name=nombre,
+                last_name="Prueba",
+                username=f"masivo{i}",
+                email=f"masivo{i}@app.com",
+                celular=f"+59394444444{i}",
+                password="Passw0rd!",
+            )
+            for i, nombre in enumerate(["Ana <b>", "Beto", "Carla"])
+        ]
+        self.usuarios[2].notificaciones_email = False
+        self.usuarios[2].save(update_fields=["notificaciones_email"])
+
+    def _campana(self):
+        return email_masivo.crear_campana(
+            nombre="Ganadores",
+            plantilla="authentication/emails/rifa_ganada",
+            asunto="Ganaste la rifa: {{ rifa }}, {{ nombre }}",
+            contexto={"rifa": "Rifa de octubre"},
+            destinatarios=[(u, {"premio": f"Premio {i}", "posicion": ""}) for i, u in enumerate(self.usuarios)],
+            incluir_baja=False,
+        )
+
+    def test_campana_una_conexion_y_un_render(self):
+        campana = self._campana()
+        with mock.patch.object(email_utils, "get_connection", wraps=email_utils.get_connection) as conexiones, \
+                mock.patch.object(email_masivo, "render_to_string", wraps=email_masivo.render_to_string) as renders, \
+                mock.patch.object(email_masivo.time, "sleep"), \
+                mock.patch.object(tasks.enviar_campana_email, "delay", side_effect=tasks.enviar_campana_email):
+            with self.captureOnCommitCallbacks(execute=True):
+                email_masivo.encolar_campana(campana)
+
+        self.assertEqual(conexiones.call_count, 1)
+        self.assertEqual(renders.call_count, 2)
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(mail.outbox[0].subject, "Ganaste la rifa: Rifa de octubre, Ana <b>")
+        self.assertIn("Premio 0", mail.outbox[0].body)
+        self.assertIn("Ana &lt;b&gt;", mail.outbox[0].alternatives[0][0])
+        self.assertIn("Beto", mail.outbox[1].body)
+
+        estados = dict(campana.envios.values_list("email", "estado"))
+        self.assertEqual(estados["masivo0@app.com"], EnvioEmail.EstadoChoices.ENVIADO)
+        self.assertEqual(estados["masivo2@app.com"], EnvioEmail.EstadoChoices.OMITIDO)
+        campana.refresh_from_db()
+        self.assertEqual((campana.total, campana.enviados, campana.fallidos), (3, 2, 0))
+
+        # Una campaña finalizada no se reenvía
+        self.assertEqual(email_masivo.enviar_campana(campana.pk), (0, 0))
+
+    def test_campana_ritmo_y_fallos(self):
+        campana = self._campana()
+        enviar = email_utils._enviar_con_pool
+
+        def fallar_segundo(mensaje):
+            if mensaje.to == ["masivo1@app.com"]:
+                raise ConnectionError("rechazado")
+            enviar(mensaje)
+
+        with mock.patch.object(email_masivo, "_enviar_con_pool", side_effect=fallar_segundo), \
+                mock.patch.object(email_masivo.time, "sleep") as sleep:
+            self.assertEqual(email_masivo.enviar_campana(campana.pk, por_segundo=2), (1, 1))
+
+        self.assertEqual(sleep.call_count, 1)
+        self.assertAlmostEqual(sleep.call_args[0][0], 0.5, places=1)
+        fallido = campana.envios.get(email="masivo1@app.com")
+        self.assertEqual(fallido.estado, EnvioEmail.EstadoChoices.FALLIDO)
+        self.assertIn("rechazado", fallido.error)
+
+
+class GoogleLoginAsyncTest(APITestCase):
+    """Login con Google: vista async que valida el token con httpx."""
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse("authentication:google_login")
+
+    def _cliente(self, status_code, datos=None):
+        self.solicitudes = []
+
+        def handler(request):
+            self.solicitudes.append(request)
+            return httpx.Response(status_code, json=datos or {})
+
+        return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    def test_crea_usuario_y_devuelve_tokens(self):
+        datos = {"email": "Nuevo@Gmail.com", "given_name": "Nuevo", "sub": "123", "email_verified": True}
+        with mock.patch.object(views, "cliente_http", return_value=self._cliente(200, datos)):
+            res = self.client.post(self.url, {"access_token": "tok"}, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.data["nuevo_usuario"])
+        self.assertIn("access", res.data["tokens"])
+        self.assertEqual(self.solicitudes[0].headers["Authorization"], "Bearer tok")
+        self.assertTrue(User.objects.filter(email="nuevo@gmail.com").exists())
+
+    def test_token_invalido(self):
+        with mock.patch.object(views, "cliente_http", return_value=self._cliente(401)):
+            res = self.client.post(self.url, {"access_token": "malo"}, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -3,9 +3,11 @@
 
 from rest_framework.throttling import AnonRateThrottle, UserRateThrottle
 from django.conf import settings
-from django.core.cache import cache
-from django.utils import timezone
 import logging
+import math
+
+from utils import limitador
+from utils.throttles import LimitadorThrottleMixin
 
 logger = logging.getLogger('authentication')
 
@@ -14,7 +16,7 @@ logger = logging.getLogger('authentication')
 # THROTTLES PERSONALIZADOS POR ENDPOINT
 # ==========================================
 
-class LoginRateThrottle(AnonRateThrottle):
+class LoginRateThrottle(LimitadorThrottleMixin, AnonRateThrottle):
     """
     Rate limiting específico para login
     Protege contra ataques de fuerza bruta
@@ -38,7 +40,7 @@ class LoginRateThrottle(AnonRateThrottle):
         return super().throttle_failure()
 
 
-class RegisterRateThrottle(AnonRateThrottle):
+class RegisterRateThrottle(LimitadorThrottleMixin, AnonRateThrottle):
     """
     Rate limiting para registro
     Más permisivo que login pero con protección
@@ -61,7 +63,7 @@ class RegisterRateThrottle(AnonRateThrottle):
         return super().throttle_failure()
 
 
-class PasswordResetRateThrottle(AnonRateThrottle):
+class PasswordResetRateThrottle(LimitadorThrottleMixin, AnonRateThrottle):
     """
     Rate limiting para reset de password
     Muy restrictivo para evitar spam y ataques
@@ -83,7 +85,7 @@ class PasswordResetRateThrottle(AnonRateThrottle):
         return super().throttle_failure()
 
 
-class CodeVerificationThrottle(AnonRateThrottle):
+class CodeVerificationThrottle(LimitadorThrottleMixin, AnonRateThrottle):
     """
     Rate limiting para verificación de código de recuperación
     Protege contra ataques de fuerza bruta en códigos de 6 dígitos
@@ -105,7 +107,7 @@ class CodeVerificationThrottle(AnonRateThrottle):
         return super().throttle_failure()
 
 
-class AuthenticatedUserThrottle(UserRateThrottle):
+class AuthenticatedUserThrottle(LimitadorThrottleMixin, UserRateThrottle):
     """
     Rate limiting para usuarios autenticados
     Más permisivo que anónimos
@@ -122,7 +124,7 @@ class AuthenticatedUserThrottle(UserRateThrottle):
         return f'throttle_user_{ident}'
 
 
-class BurstRateThrottle(AnonRateThrottle):
+class BurstRateThrottle(LimitadorThrottleMixin, AnonRateThrottle):
     """
     Detecta ráfagas de peticiones (posible ataque)
     """
@@ -162,14 +164,21 @@ def get_throttle_message(throttle_scope):
     return messages.get(throttle_scope, 'Demasiadas peticiones. Intenta más tarde.')
 
 
+def _client_ip(request):
+    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if x_forwarded_for:
+        return x_forwarded_for.split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR')
+
+
 def check_custom_rate_limit(request, key_prefix, max_attempts, window_seconds):
     """
-    Sistema de rate limiting manual usando Redis
+    Rate limiting manual por IP sobre el limitador atómico (utils/limitador.py)
     Útil para casos muy específicos
     
     Args:
         request: Request de Django
-        key_prefix: Prefijo para la key de cache
+        key_prefix: Prefijo para la key del límite
         max_attempts: Número máximo de intentos
         window_seconds: Ventana de tiempo en segundos
     
@@ -181,66 +190,26 @@ def check_custom_rate_limit(request, key_prefix, max_attempts, window_seconds):
             'bloqueado': bool
         }
     """
-    # Obtener IP
-    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-    if x_forwarded_for:
-        ip = x_forwarded_for.split(',')[0].strip()
-    else:
-        ip = request.META.get('REMOTE_ADDR')
+    cache_key = f'{key_prefix}_{_client_ip(request)}'
     
-    cache_key = f'{key_prefix}_{ip}'
+    # Verificar y consumir en un solo round-trip (si Redis falla, permite)
+    resultado = limitador.consumir(cache_key, max_attempts, window_seconds)
     
-    try:
-        # Obtener datos del cache
-        data = cache.get(cache_key, {
-            'intentos': 0,
-            'primer_intento': timezone.now().timestamp()
-        })
-        
-        intentos = data.get('intentos', 0)
-        primer_intento = data.get('primer_intento', timezone.now().timestamp())
-        tiempo_transcurrido = timezone.now().timestamp() - primer_intento
-        
-        # Si pasó la ventana, resetear
-        if tiempo_transcurrido > window_seconds:
-            intentos = 0
-            primer_intento = timezone.now().timestamp()
-        
-        # Verificar si excedió el límite
-        if intentos >= max_attempts:
-            tiempo_restante = int(window_seconds - tiempo_transcurrido)
-            logger.warning(f"Rate limit excedido: {cache_key} ({intentos}/{max_attempts})")
-            return {
-                'permitido': False,
-                'intentos_restantes': 0,
-                'tiempo_espera': max(tiempo_restante, 0),
-                'bloqueado': True
-            }
-        
-        # Incrementar contador
-        intentos += 1
-        cache.set(cache_key, {
-            'intentos': intentos,
-            'primer_intento': primer_intento
-        }, window_seconds)
-        
-        intentos_restantes = max_attempts - intentos
-        return {
-            'permitido': True,
-            'intentos_restantes': intentos_restantes,
-            'tiempo_espera': 0,
-            'bloqueado': False
-        }
-        
-    except Exception as e:
-        logger.error(f"Error en check_custom_rate_limit: {e}")
-        # En caso de error, permitir la petición
+    if not resultado.permitido:
+        logger.warning(f"Rate limit excedido: {cache_key} ({max_attempts}/{window_seconds}s)")
         return {
-            'permitido': True,
-            'intentos_restantes': 999,
-            'tiempo_espera': 0,
-            'bloqueado': False
+            'permitido': False,
+            'intentos_restantes': 0,
+            'tiempo_espera': math.ceil(resultado.espera),
+            'bloqueado': True
         }
+    
+    return {
+        'permitido': True,
+        'intentos_restantes': resultado.restantes,
+        'tiempo_espera': 0,
+        'bloqueado': False
+    }
 
 
 def reset_rate_limit(request, key_prefix):
@@ -250,26 +219,16 @@ def reset_rate_limit(request, key_prefix):
     
     Args:
         request: Request de Django
-        key_prefix: Prefijo de la cache key a resetear
+        key_prefix: Prefijo de la key a resetear
     
     Returns:
         bool: True si se reseteó exitosamente
     """
-    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-    if x_forwarded_for:
-        ip = x_forwarded_for.split(',')[0].strip()
-    else:
-        ip = request.META.get('REMOTE_ADDR')
-    
-    cache_key = f'{key_prefix}_{ip}'
-    
-    try:
-        cache.delete(cache_key)
+    ip = _client_ip(request)
+    if limitador.reiniciar(f'{key_prefix}_{ip}'):
         logger.debug(f"Rate limit reseteado para IP {ip} en key {key_prefix}")
         return True
-    except Exception as e:
-        logger.error(f"Error reseteando rate limit: {e}")
-        return False
+    return False
 
 
 def get_rate_limit_info(request, key_prefix):
@@ -279,35 +238,20 @@ def get_rate_limit_info(request, key_prefix):
     
     Args:
         request: Request de Django
-        key_prefix: Prefijo de la cache key
+        key_prefix: Prefijo de la key
     
     Returns:
         dict: Información del rate limit o None si no existe
     """
-    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-    if x_forwarded_for:
-        ip = x_forwarded_for.split(',')[0].strip()
-    else:
-        ip = request.META.get('REMOTE_ADDR')
-    
+    ip = _client_ip(request)
     cache_key = f'{key_prefix}_{ip}'
     
-    try:
-        data = cache.get(cache_key)
-        if not data:
-            return None
-        
-        intentos = data.get('intentos', 0)
-        primer_intento = data.get('primer_intento', timezone.now().timestamp())
-        tiempo_transcurrido = int(timezone.now().timestamp() - primer_intento)
-        
-        return {
-            'ip': ip,
-            'cache_key': cache_key,
-            'intentos': intentos,
-            'tiempo_transcurrido_segundos': tiempo_transcurrido,
-            'primer_intento_timestamp': primer_intento
-        }
-    except Exception as e:
-        logger.error(f"Error obteniendo info de rate limit: {e}")
-        return None
\ No newline at end of file
+    segundos = limitador.segundos_para_reinicio(cache_key)
+    if segundos is None:
+        return None
+    
+    return {
+        'ip': ip,
+        'cache_key': cache_key,
+        'segundos_para_reinicio': segundos,
+    }
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 # authentication/views.py
 
+from asgiref.sync import sync_to_async
 from django.contrib.auth import authenticate
 from django.contrib.auth.hashers import make_password, check_password
 from django.conf import settings
@@ -11,6 +12,8 @@ from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework_simplejwt.tokens import RefreshToken
+from utils.metricas import medir_llamada_externa
+from utils.vistas_async import AsyncAPIView, cliente_http
 from .models import User
 from .serializers import (
     RegistroSerializer,
@@ -179,7 +182,7 @@ def registro(request):
                 from .email_utils import enviar_email_bienvenida
 
                 enviar_email_bienvenida(user)
-                logger.info(f"Email de bienvenida enviado a: {user.email}")
+                logger.info(f"Email de bienvenida encolado para: {user.email}")
             except Exception as email_error:
                 logger.error(f"Error enviando email: {email_error}")
 
@@ -431,7 +434,7 @@ def solicitar_codigo_recuperacion(request):
 
                 enviar_codigo_recuperacion_password(user, codigo)
 
-                logger.info(f"Código de recuperación enviado a: {email}")
+                logger.info(f"Código de recuperación encolado para: {email}")
 
                 return Response(
                     {
@@ -781,9 +784,10 @@ def cerrar_sesion_dispositivo(request, dispositivo_id):
 # ==========================================
 
 
-@api_view(["POST"])
-@permission_classes([AllowAny])
-def google_login(request):
+GOOGLE_USERINFO_URL = "https://www.googleapis.com/oauth2/v3/userinfo"
+
+
+class GoogleLoginView(AsyncAPIView):
     """
     Login/Registro con Google OAuth 2.0
     
@@ -795,33 +799,48 @@ def google_login(request):
     El access_token se obtiene desde la app Flutter usando google_sign_in.
     Este endpoint valida el token con Google, crea o autentica al usuario,
     y devuelve tokens JWT.
+
+    Vista async: la validación con Google usa httpx sin ocupar un hilo;
+    la parte de BD (usuario, perfil, tokens) corre con sync_to_async.
     """
-    try:
-        access_token = request.data.get("access_token")
-        
-        if not access_token:
-            return Response(
-                {"error": "access_token es requerido"},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-        
-        # Validar token con Google
-        import requests as http_requests
-        
-        google_url = f"https://www.googleapis.com/oauth2/v3/userinfo"
-        headers = {"Authorization": f"Bearer {access_token}"}
-        
-        google_response = http_requests.get(google_url, headers=headers, timeout=10)
-        
-        if google_response.status_code != 200:
-            logger.warning(f"Token de Google inválido: {google_response.status_code}")
+    permission_classes = [AllowAny]
+
+    async def post(self, request):
+        try:
+            access_token = request.data.get("access_token")
+            
+            if not access_token:
+                return Response(
+                    {"error": "access_token es requerido"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            
+            # Validar token con Google
+            headers = {"Authorization": f"Bearer {access_token}"}
+            
+            with medir_llamada_externa('google_oauth', 'userinfo'):
+                google_response = await cliente_http().get(GOOGLE_USERINFO_URL, headers=headers)
+            
+            if google_response.status_code != 200:
+                logger.warning(f"Token de Google inválido: {google_response.status_code}")
+                return Response(
+                    {"error": "Token de Google inválido o expirado"},
+                    status=status.HTTP_401_UNAUTHORIZED,
+                )
+            
+            return await sync_to_async(self._login_con_datos_google)(request, google_response.json())
+            
+        except Exception as e:
+            logger.error(f"[ERROR] Error en login Google: {e}", exc_info=True)
             return Response(
-                {"error": "Token de Google inválido o expirado"},
-                status=status.HTTP_401_UNAUTHORIZED,
+                {
+                    "error": "Error al autenticar con Google",
+                    "detalle": str(e) if settings.DEBUG else None,
+                },
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
-        
-        google_data = google_response.json()
-        
+
+    def _login_con_datos_google(self, request, google_data):
         # Extraer datos del usuario de Google
         email = google_data.get("email")
         nombre = google_data.get("given_name", "")
@@ -914,13 +933,6 @@ def google_login(request):
             },
             status=status.HTTP_200_OK,
         )
-        
-    except Exception as e:
-        logger.error(f"[ERROR] Error en login Google: {e}", exc_info=True)
-        return Response(
-            {
-                "error": "Error al autenticar con Google",
-                "detalle": str(e) if settings.DEBUG else None,
-            },
-            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
-        )
+
+
+google_login = GoogleLoginView.as_view()
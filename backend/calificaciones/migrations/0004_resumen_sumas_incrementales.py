@@ -0,0 +1,76 @@
+# Generated by Django 5.1.7 on 2026-10-19 04:04
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def poblar_sumas(apps, schema_editor):
+    """Inicializa las sumas acumuladas desde las calificaciones existentes"""
+    Calificacion = apps.get_model('calificaciones', 'Calificacion')
+    ResumenCalificacion = apps.get_model('calificaciones', 'ResumenCalificacion')
+    Proveedor = apps.get_model('proveedores', 'Proveedor')
+
+    categorias = ('puntualidad', 'amabilidad', 'calidad_producto')
+    agregados = Calificacion.objects.order_by().values('calificado_id').annotate(
+        suma_estrellas=Sum('estrellas'),
+        **{f'suma_{c}': Sum(c) for c in categorias},
+        **{f'total_{c}': Count(c) for c in categorias},
+    )
+    for fila in agregados.iterator():
+        user_id = fila.pop('calificado_id')
+        ResumenCalificacion.objects.filter(user_id=user_id).update(
+            **{campo: valor or 0 for campo, valor in fila.items()}
+        )
+
+    por_proveedor = Calificacion.objects.filter(
+        tipo__in=['cliente_a_proveedor', 'repartidor_a_proveedor']
+    ).order_by().values('calificado_id').annotate(suma=Sum('estrellas'))
+    for fila in por_proveedor.iterator():
+        Proveedor.objects.filter(user_id=fila['calificado_id']).update(suma_calificaciones=fila['suma'] or 0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proveedores', '0004_proveedor_suma_calificaciones'),
+        ('calificaciones', '0003_eliminar_calificacion_producto'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resumencalificacion',
+            name='suma_amabilidad',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='resumencalificacion',
+            name='suma_calidad_producto',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='resumencalificacion',
+            name='suma_estrellas',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='resumencalificacion',
+            name='suma_puntualidad',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='resumencalificacion',
+            name='total_amabilidad',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='resumencalificacion',
+            name='total_calidad_producto',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='resumencalificacion',
+            name='total_puntualidad',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(poblar_sumas, migrations.RunPython.noop),
+    ]
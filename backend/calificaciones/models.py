@@ -1,6 +1,7 @@
 # calificaciones/models.py
 
 import logging
+from decimal import Decimal, ROUND_HALF_UP
 from django.apps import apps
 from django.db import models, transaction
 from django.core.cache import cache
@@ -14,6 +15,26 @@ from authentication.models import User
 
 logger = logging.getLogger('calificaciones')
 
+# Columnas de una calificación que alimentan los resúmenes
+CAMPOS_APORTE = ('calificado_id', 'tipo', 'estrellas', 'puntualidad', 'amabilidad', 'calidad_producto')
+CATEGORIAS = ('puntualidad', 'amabilidad', 'calidad_producto')
+CAMPO_POR_ESTRELLAS = {
+    5: 'total_5_estrellas',
+    4: 'total_4_estrellas',
+    3: 'total_3_estrellas',
+    2: 'total_2_estrellas',
+    1: 'total_1_estrella',
+}
+
+# Agregados que reconstruyen un resumen desde cero (recalcular / reconciliación)
+AGREGADOS_RESUMEN = {
+    'total_calificaciones': Count('id'),
+    **{campo: Count('id', filter=Q(estrellas=n)) for n, campo in CAMPO_POR_ESTRELLAS.items()},
+    'suma_estrellas': Sum('estrellas'),
+    **{f'suma_{c}': Sum(c) for c in CATEGORIAS},
+    **{f'total_{c}': Count(c) for c in CATEGORIAS},
+}
+
 
 def _cache_version_key(entity_type, entity_id):
     return f"ratings:v:{entity_type}:{entity_id}"
@@ -359,13 +380,15 @@ class Calificacion(models.Model):
         is_new = self.pk is None
         is_update = not is_new
 
+        anterior = None
         if is_update:
             self.editada = True
+            anterior = Calificacion.objects.filter(pk=self.pk).values(*CAMPOS_APORTE).first()
 
         super().save(*args, **kwargs)
 
-        # Actualizar promedio del usuario calificado
-        self._actualizar_promedio_calificado()
+        # Aplicar al resumen solo la diferencia con la versión anterior
+        self._actualizar_promedio_calificado(anterior)
         _invalidate_cache_for_calificacion(self)
 
         # Log
@@ -375,19 +398,18 @@ class Calificacion(models.Model):
             f"({self.estrellas}⭐) - Pedido #{self.pedido_id}"
         )
 
-    def _actualizar_promedio_calificado(self):
-        """Actualiza el promedio de calificaciones del usuario calificado"""
+    def _actualizar_promedio_calificado(self, anterior=None):
+        """
+        Actualiza el resumen del calificado (y el rating del proveedor si aplica)
+        con el delta de esta calificación. Coste constante: no depende de
+        cuántas reseñas tenga el usuario.
+        """
         from calificaciones.services import CalificacionService
-        CalificacionService.actualizar_promedio_usuario(self.calificado)
+        CalificacionService.aplicar_cambio(anterior=anterior, nuevo=self.valores_aporte())
 
-        # Si es calificación a proveedor, actualizar también el promedio del proveedor
-        if self.tipo in [TipoCalificacion.CLIENTE_A_PROVEEDOR, TipoCalificacion.REPARTIDOR_A_PROVEEDOR]:
-            Proveedor = apps.get_model('proveedores', 'Proveedor')
-            try:
-                proveedor = Proveedor.objects.get(user=self.calificado)
-                _recalcular_rating_proveedor(proveedor)
-            except Proveedor.DoesNotExist:
-                pass
+    def valores_aporte(self):
+        """Valores de la calificación que cuentan para los resúmenes"""
+        return {campo: getattr(self, campo) for campo in CAMPOS_APORTE}
 
     # ============================================
     # PROPIEDADES
@@ -438,7 +460,10 @@ class Calificacion(models.Model):
 class ResumenCalificacion(models.Model):
     """
     Tabla desnormalizada para consultas rápidas de promedios.
-    Se actualiza automáticamente cuando se crea/edita una calificación.
+
+    Se mantiene de forma incremental: cada alta, edición o baja de una
+    calificación aplica su delta a contadores y sumas con un UPDATE F().
+    `recalcular` y la reconciliación periódica corrigen cualquier deriva.
     """
 
     user = models.OneToOneField(
@@ -469,6 +494,15 @@ class ResumenCalificacion(models.Model):
     total_2_estrellas = models.PositiveIntegerField(default=0)
     total_1_estrella = models.PositiveIntegerField(default=0)
 
+    # --- Sumas acumuladas (base de los promedios incrementales) ---
+    suma_estrellas = models.PositiveIntegerField(default=0)
+    suma_puntualidad = models.PositiveIntegerField(default=0)
+    total_puntualidad = models.PositiveIntegerField(default=0)
+    suma_amabilidad = models.PositiveIntegerField(default=0)
+    total_amabilidad = models.PositiveIntegerField(default=0)
+    suma_calidad_producto = models.PositiveIntegerField(default=0)
+    total_calidad_producto = models.PositiveIntegerField(default=0)
+
     # --- Promedios por categoría ---
     promedio_puntualidad = models.DecimalField(
         max_digits=3,
@@ -503,35 +537,27 @@ class ResumenCalificacion(models.Model):
         return f"{self.user.email}: {self.promedio_general}⭐ ({self.total_calificaciones} reseñas)"
 
     def recalcular(self):
-        """Recalcula todos los valores del resumen"""
-        calificaciones = Calificacion.objects.filter(calificado=self.user)
-
-        # Totales por estrellas
-        self.total_5_estrellas = calificaciones.filter(estrellas=5).count()
-        self.total_4_estrellas = calificaciones.filter(estrellas=4).count()
-        self.total_3_estrellas = calificaciones.filter(estrellas=3).count()
-        self.total_2_estrellas = calificaciones.filter(estrellas=2).count()
-        self.total_1_estrella = calificaciones.filter(estrellas=1).count()
-
-        self.total_calificaciones = calificaciones.count()
-
-        # Promedio general
-        if self.total_calificaciones > 0:
-            agregados = calificaciones.aggregate(
-                promedio=Avg('estrellas'),
-                puntualidad=Avg('puntualidad'),
-                amabilidad=Avg('amabilidad'),
-                calidad=Avg('calidad_producto')
-            )
-            self.promedio_general = round(agregados['promedio'] or 5.0, 2)
-            self.promedio_puntualidad = round(agregados['puntualidad'], 2) if agregados['puntualidad'] else None
-            self.promedio_amabilidad = round(agregados['amabilidad'], 2) if agregados['amabilidad'] else None
-            self.promedio_calidad_producto = round(agregados['calidad'], 2) if agregados['calidad'] else None
-        else:
-            self.promedio_general = 5.00
-
+        """Recalcula todos los valores del resumen (una sola consulta agregada)"""
+        agregados = Calificacion.objects.filter(calificado_id=self.user_id).aggregate(**AGREGADOS_RESUMEN)
+        for campo, valor in self.valores_desde_agregados(agregados).items():
+            setattr(self, campo, valor)
         self.save()
 
+    @staticmethod
+    def valores_desde_agregados(agregados):
+        """Convierte una fila de AGREGADOS_RESUMEN en los valores del resumen"""
+        agregados = agregados or {}
+        valores = {campo: agregados.get(campo) or 0 for campo in AGREGADOS_RESUMEN}
+
+        valores['promedio_general'] = _promedio(
+            valores['suma_estrellas'], valores['total_calificaciones']
+        ) or Decimal('5.00')
+        for categoria in CATEGORIAS:
+            valores[f'promedio_{categoria}'] = _promedio(
+                valores[f'suma_{categoria}'], valores[f'total_{categoria}']
+            )
+        return valores
+
     @property
     def porcentaje_positivas(self):
         """Porcentaje de calificaciones de 4-5 estrellas"""
@@ -541,44 +567,50 @@ class ResumenCalificacion(models.Model):
         return round((positivas / self.total_calificaciones) * 100, 1)
 
 
+def _promedio(suma, total):
+    """Promedio redondeado a 2 decimales (mismo redondeo que ROUND en SQL)"""
+    if not total:
+        return None
+    return (Decimal(suma) / Decimal(total)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+# Calificaciones que cuentan para el rating propio del proveedor
+TIPOS_A_PROVEEDOR = (
+    TipoCalificacion.CLIENTE_A_PROVEEDOR,
+    TipoCalificacion.REPARTIDOR_A_PROVEEDOR,
+)
+
+
 def _recalcular_rating_proveedor(proveedor):
     """
-    Recalcula la calificación del proveedor basado en las calificaciones directas
-    que ha recibido (CLIENTE_A_PROVEEDOR y REPARTIDOR_A_PROVEEDOR).
+    Recalcula desde cero la calificación del proveedor basado en las calificaciones
+    directas que ha recibido (CLIENTE_A_PROVEEDOR y REPARTIDOR_A_PROVEEDOR).
+    El camino normal es incremental (CalificacionService.aplicar_cambio).
     """
     if proveedor is None:
         return
 
-    # Calcular promedio de calificaciones directas al proveedor
-    tipos_validos = [
-        TipoCalificacion.CLIENTE_A_PROVEEDOR,
-        TipoCalificacion.REPARTIDOR_A_PROVEEDOR,
-    ]
-
     agregados = Calificacion.objects.filter(
-        calificado=proveedor.user,
-        tipo__in=tipos_validos
+        calificado_id=proveedor.user_id,
+        tipo__in=TIPOS_A_PROVEEDOR
     ).aggregate(
-        promedio=Avg('estrellas'),
         total=Count('id'),
-        promedio_puntualidad=Avg('puntualidad'),
-        promedio_amabilidad=Avg('amabilidad'),
-        promedio_calidad=Avg('calidad_producto')
+        suma=Sum('estrellas')
     )
 
-    total_calificaciones = agregados['total'] or 0
-
-    if total_calificaciones > 0:
-        proveedor.calificacion_promedio = round(float(agregados['promedio'] or 0.0), 2)
-        proveedor.total_resenas = total_calificaciones
-    else:
-        proveedor.calificacion_promedio = 0.0
-        proveedor.total_resenas = 0
+    proveedor.total_resenas = agregados['total'] or 0
+    proveedor.suma_calificaciones = agregados['suma'] or 0
+    proveedor.calificacion_promedio = _promedio(
+        proveedor.suma_calificaciones, proveedor.total_resenas
+    ) or Decimal('0.00')
 
-    proveedor.save(update_fields=['calificacion_promedio', 'total_resenas'])
+    proveedor.save(update_fields=['calificacion_promedio', 'total_resenas', 'suma_calificaciones'])
     _bump_cache_version('proveedor', proveedor.id)
 
 
 @receiver(post_delete, sender=Calificacion)
-def _invalidar_cache_calificacion_eliminada(sender, instance, **kwargs):
+def _calificacion_eliminada(sender, instance, **kwargs):
+    """Descuenta la calificación borrada de los resúmenes e invalida la caché"""
+    from calificaciones.services import CalificacionService
+    CalificacionService.aplicar_cambio(anterior=instance.valores_aporte(), nuevo=None)
     _invalidate_cache_for_calificacion(instance)
@@ -1,13 +1,44 @@
 # calificaciones/services.py
 
 import logging
+from collections import Counter, defaultdict
+from decimal import Decimal
 from django.apps import apps
 from django.db import transaction
-from django.db.models import Avg
+from django.db.models import Case, Count, DecimalField, F, FloatField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Round
 from django.core.exceptions import ValidationError
+from django.utils import timezone
 
 logger = logging.getLogger('calificaciones')
 
+_DECIMAL_CALCULO = DecimalField(max_digits=20, decimal_places=10)
+_DECIMAL_PROMEDIO = DecimalField(max_digits=3, decimal_places=2)
+
+
+def _promedio_con_delta(campo_suma, campo_total, delta, por_defecto):
+    """
+    Expresión SQL del promedio tras aplicar el delta. En un UPDATE todas las
+    columnas se leen con su valor previo, así que el delta se suma aquí también.
+    """
+    d_suma = delta.get(campo_suma, 0)
+    d_total = delta.get(campo_total, 0)
+    return Case(
+        When(
+            **{f'{campo_total}__gt': -d_total},
+            then=Round(
+                Cast(
+                    Cast(F(campo_suma) + d_suma, FloatField())
+                    / Cast(F(campo_total) + d_total, FloatField()),
+                    _DECIMAL_CALCULO
+                ),
+                2
+            )
+        ),
+        default=Value(por_defecto),
+        output_field=_DECIMAL_PROMEDIO,
+    )
+
 
 class CalificacionService:
     """
@@ -76,42 +107,220 @@ class CalificacionService:
     @transaction.atomic
     def actualizar_promedio_usuario(user):
         """
-        Actualiza el promedio de calificaciones de un usuario.
-        Sincroniza con Perfil, Repartidor y Proveedor según corresponda.
+        Recalcula desde cero el resumen de un usuario y lo sincroniza con
+        Perfil, Repartidor y Proveedor. El camino normal es incremental
+        (`aplicar_cambio`); esto queda para reparaciones puntuales.
         """
-        from calificaciones.models import Calificacion, ResumenCalificacion
+        from calificaciones.models import ResumenCalificacion, _recalcular_rating_proveedor
 
-        # Obtener o crear resumen
-        resumen, created = ResumenCalificacion.objects.get_or_create(user=user)
+        user_id = getattr(user, 'pk', user)
+        resumen, _ = ResumenCalificacion.objects.get_or_create(user_id=user_id)
         resumen.recalcular()
+        CalificacionService._sincronizar_perfiles([user_id])
 
-        promedio = float(resumen.promedio_general)
-        total = resumen.total_calificaciones
-
-        # Sincronizar con Perfil (si existe)
-        if hasattr(user, 'perfil') and user.perfil:
-            user.perfil.calificacion = promedio
-            user.perfil.total_resenas = total
-            user.perfil.save(update_fields=['calificacion', 'total_resenas', 'actualizado_en'])
-            logger.debug(f"Perfil actualizado: {user.email} → {promedio}⭐")
-
-        # Sincronizar con Repartidor (si existe)
-        if hasattr(user, 'repartidor') and user.repartidor:
-            user.repartidor.calificacion_promedio = promedio
-            user.repartidor.save(update_fields=['calificacion_promedio', 'actualizado_en'])
-            logger.debug(f"Repartidor actualizado: {user.email} → {promedio}⭐")
-
-        # Sincronizar con Proveedor (si existe y tiene el campo)
-        if hasattr(user, 'proveedor') and user.proveedor:
-            # Verificar si el modelo Proveedor tiene el campo calificacion_promedio
-            if hasattr(user.proveedor, 'calificacion_promedio'):
-                user.proveedor.calificacion_promedio = promedio
-                user.proveedor.total_resenas = total
-                user.proveedor.save(update_fields=['calificacion_promedio', 'total_resenas', 'updated_at'])
-                logger.debug(f"Proveedor actualizado: {user.email} → {promedio}⭐")
+        Proveedor = apps.get_model('proveedores', 'Proveedor')
+        _recalcular_rating_proveedor(Proveedor.objects.filter(user_id=user_id).first())
 
         return resumen
 
+    # ============================================
+    # MANTENIMIENTO INCREMENTAL
+    # ============================================
+
+    @staticmethod
+    def _aporte_resumen(valores, signo):
+        """Contribución de una calificación a las columnas del resumen"""
+        from calificaciones.models import CAMPO_POR_ESTRELLAS, CATEGORIAS
+
+        aporte = {
+            'total_calificaciones': signo,
+            CAMPO_POR_ESTRELLAS[valores['estrellas']]: signo,
+            'suma_estrellas': signo * valores['estrellas'],
+        }
+        for categoria in CATEGORIAS:
+            if valores[categoria] is not None:
+                aporte[f'suma_{categoria}'] = signo * valores[categoria]
+                aporte[f'total_{categoria}'] = signo
+        return aporte
+
+    @staticmethod
+    def aplicar_cambio(anterior=None, nuevo=None):
+        """
+        Aplica a los resúmenes la diferencia entre dos versiones de una
+        calificación (`anterior=None`: alta, `nuevo=None`: baja). Cada valor es
+        un dict con CAMPOS_APORTE.
+
+        Son UPDATE con F() sobre una fila por usuario: el coste no crece con
+        el número de reseñas y no hay carreras entre calificaciones simultáneas.
+        """
+        from calificaciones.models import TIPOS_A_PROVEEDOR
+
+        deltas_resumen = defaultdict(Counter)
+        deltas_proveedor = defaultdict(Counter)
+
+        for valores, signo in ((anterior, -1), (nuevo, 1)):
+            if not valores:
+                continue
+            user_id = valores['calificado_id']
+            deltas_resumen[user_id].update(CalificacionService._aporte_resumen(valores, signo))
+            if valores['tipo'] in TIPOS_A_PROVEEDOR:
+                deltas_proveedor[user_id].update({
+                    'total_resenas': signo,
+                    'suma_calificaciones': signo * valores['estrellas'],
+                })
+
+        for user_id, delta in deltas_resumen.items():
+            # En una baja no se crea el resumen (puede ser el borrado en cascada del usuario)
+            crear_si_falta = bool(nuevo) and user_id == nuevo['calificado_id']
+            CalificacionService._aplicar_delta_resumen(user_id, delta, crear_si_falta)
+
+        for user_id, delta in deltas_proveedor.items():
+            CalificacionService._aplicar_delta_proveedor(user_id, delta)
+
+    @staticmethod
+    def _aplicar_delta_resumen(user_id, delta, crear_si_falta=True):
+        from calificaciones.models import CATEGORIAS, ResumenCalificacion
+
+        delta = {campo: d for campo, d in delta.items() if d}
+        if not delta:
+            # Edición que no afecta a los promedios (p. ej. solo el comentario)
+            return
+
+        cambios = {campo: F(campo) + d for campo, d in delta.items()}
+        cambios['promedio_general'] = _promedio_con_delta(
+            'suma_estrellas', 'total_calificaciones', delta, Decimal('5.00')
+        )
+        for categoria in CATEGORIAS:
+            if f'suma_{categoria}' in delta or f'total_{categoria}' in delta:
+                cambios[f'promedio_{categoria}'] = _promedio_con_delta(
+                    f'suma_{categoria}', f'total_{categoria}', delta, None
+                )
+        cambios['updated_at'] = timezone.now()
+
+        if ResumenCalificacion.objects.filter(user_id=user_id).update(**cambios):
+            CalificacionService._sincronizar_perfiles([user_id])
+        elif crear_si_falta:
+            # Usuario sin resumen (creado antes de la señal): se construye completo
+            ResumenCalificacion.objects.get_or_create(user_id=user_id)[0].recalcular()
+            CalificacionService._sincronizar_perfiles([user_id])
+
+    @staticmethod
+    def _aplicar_delta_proveedor(user_id, delta):
+        Proveedor = apps.get_model('proveedores', 'Proveedor')
+
+        delta = {campo: d for campo, d in delta.items() if d}
+        if not delta:
+            return
+
+        Proveedor.objects.filter(user_id=user_id).update(
+            **{campo: F(campo) + d for campo, d in delta.items()},
+            calificacion_promedio=_promedio_con_delta(
+                'suma_calificaciones', 'total_resenas', delta, Decimal('0.00')
+            ),
+            updated_at=timezone.now(),
+        )
+
+    @staticmethod
+    def _sincronizar_perfiles(user_ids):
+        """Copia promedio y total del resumen a Perfil y Repartidor en un UPDATE cada uno"""
+        from calificaciones.models import ResumenCalificacion
+
+        Perfil = apps.get_model('usuarios', 'Perfil')
+        Repartidor = apps.get_model('repartidores', 'Repartidor')
+
+        resumen = ResumenCalificacion.objects.filter(user_id=OuterRef('user_id'))
+        promedio = Subquery(resumen.values('promedio_general')[:1])
+        ahora = timezone.now()
+
+        Perfil.objects.filter(user_id__in=user_ids).update(
+            calificacion=Cast(promedio, FloatField()),
+            total_resenas=Subquery(resumen.values('total_calificaciones')[:1]),
+            actualizado_en=ahora,
+        )
+        Repartidor.objects.filter(user_id__in=user_ids).update(
+            calificacion_promedio=promedio,
+            actualizado_en=ahora,
+        )
+
+    @staticmethod
+    def reconciliar_resumenes(lote=500):
+        """
+        Recalcula todos los resúmenes y ratings de proveedor con agregados
+        agrupados y corrige solo las filas que se desviaron del valor real.
+
+        Returns:
+            dict: {'resumenes': n_corregidos, 'proveedores': n_corregidos}
+        """
+        from calificaciones.models import (
+            AGREGADOS_RESUMEN, TIPOS_A_PROVEEDOR, Calificacion, ResumenCalificacion,
+            _bump_cache_version, _promedio,
+        )
+        Proveedor = apps.get_model('proveedores', 'Proveedor')
+
+        agregados = {
+            fila.pop('calificado_id'): fila
+            for fila in Calificacion.objects.order_by().values('calificado_id').annotate(**AGREGADOS_RESUMEN)
+        }
+
+        corregidos = []
+        vistos = set()
+        campos = None
+        ahora = timezone.now()
+        for resumen in ResumenCalificacion.objects.order_by('pk').iterator(chunk_size=lote):
+            vistos.add(resumen.user_id)
+            esperado = ResumenCalificacion.valores_desde_agregados(agregados.get(resumen.user_id))
+            campos = list(esperado)
+            if any(getattr(resumen, campo) != valor for campo, valor in esperado.items()):
+                for campo, valor in esperado.items():
+                    setattr(resumen, campo, valor)
+                resumen.updated_at = ahora
+                corregidos.append(resumen)
+
+        if corregidos:
+            ResumenCalificacion.objects.bulk_update(corregidos, campos + ['updated_at'], batch_size=lote)
+
+        # Usuarios con calificaciones pero sin fila de resumen
+        nuevos = [
+            ResumenCalificacion(user_id=user_id, **ResumenCalificacion.valores_desde_agregados(fila))
+            for user_id, fila in agregados.items() if user_id not in vistos
+        ]
+        ResumenCalificacion.objects.bulk_create(nuevos, batch_size=lote, ignore_conflicts=True)
+
+        user_ids = [r.user_id for r in corregidos] + [r.user_id for r in nuevos]
+        for i in range(0, len(user_ids), lote):
+            CalificacionService._sincronizar_perfiles(user_ids[i:i + lote])
+
+        # Rating propio de proveedores
+        por_proveedor = {
+            fila['calificado_id']: fila
+            for fila in Calificacion.objects.filter(tipo__in=TIPOS_A_PROVEEDOR).order_by()
+            .values('calificado_id').annotate(total=Count('id'), suma=Sum('estrellas'))
+        }
+        proveedores = []
+        for proveedor in Proveedor.objects.only(
+            'id', 'user_id', 'total_resenas', 'suma_calificaciones', 'calificacion_promedio'
+        ).order_by('pk').iterator(chunk_size=lote):
+            fila = por_proveedor.get(proveedor.user_id, {})
+            total, suma = fila.get('total') or 0, fila.get('suma') or 0
+            promedio = _promedio(suma, total) or Decimal('0.00')
+            if (proveedor.total_resenas, proveedor.suma_calificaciones, proveedor.calificacion_promedio) != (total, suma, promedio):
+                proveedor.total_resenas = total
+                proveedor.suma_calificaciones = suma
+                proveedor.calificacion_promedio = promedio
+                proveedores.append(proveedor)
+
+        if proveedores:
+            Proveedor.objects.bulk_update(
+                proveedores, ['total_resenas', 'suma_calificaciones', 'calificacion_promedio'], batch_size=lote
+            )
+            for proveedor in proveedores:
+                _bump_cache_version('proveedor', proveedor.id)
+
+        resultado = {'resumenes': len(corregidos) + len(nuevos), 'proveedores': len(proveedores)}
+        if resultado['resumenes'] or resultado['proveedores']:
+            logger.warning(f"Reconciliación de calificaciones corrigió deriva: {resultado}")
+        return resultado
+
     @staticmethod
     def obtener_calificaciones_pendientes(pedido, user):
         """
@@ -0,0 +1,19 @@
+# calificaciones/tasks.py
+
+from celery import shared_task
+import logging
+
+logger = logging.getLogger('calificaciones')
+
+
+@shared_task(name='calificaciones.reconciliar_resumenes', ignore_result=True, acks_late=True)
+def reconciliar_resumenes():
+    """
+    Corrige la deriva de los resúmenes incrementales (fallos parciales,
+    ediciones directas en BD) recalculándolos con agregados agrupados.
+    """
+    from .services import CalificacionService
+
+    resultado = CalificacionService.reconciliar_resumenes()
+    logger.info(f"Reconciliación de calificaciones: {resultado}")
+    return resultado
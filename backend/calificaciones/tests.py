@@ -1,3 +1,5 @@
+from decimal import Decimal
+
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from rest_framework import status
@@ -7,7 +9,8 @@ from pedidos.models import Pedido, EstadoPedido
 from proveedores.models import Proveedor
 from repartidores.models import Repartidor
 from productos.models import Categoria, Producto
-from .models import Calificacion, TipoCalificacion
+from .models import Calificacion, ResumenCalificacion, TipoCalificacion
+from .services import CalificacionService
 
 User = get_user_model()
 
@@ -125,6 +128,72 @@ class CalificacionModelTest(APITestCase):
         self.assertEqual(stats["promedio"], 4.5)
         self.assertEqual(stats["total_resenas"], 2)
 
+    def _calificar(self, pedido, estrellas, **kwargs):
+        return Calificacion.objects.create(
+            pedido=pedido,
+            calificador=self.user_cliente,
+            calificado=self.user_rep,
+            tipo=TipoCalificacion.CLIENTE_A_REPARTIDOR,
+            estrellas=estrellas,
+            **kwargs,
+        )
+
+    def test_resumen_incremental(self):
+        otro_pedido = Pedido.objects.create(
+            cliente=self.user_cliente.perfil,
+            proveedor=self.proveedor,
+            repartidor=self.rep,
+            descripcion="Pedido 2",
+            total=12,
+            direccion_entrega="Dir2",
+            estado=EstadoPedido.ENTREGADO,
+        )
+        c1 = self._calificar(self.pedido, 4, puntualidad=3)
+        self._calificar(otro_pedido, 5)
+
+        resumen = ResumenCalificacion.objects.get(user=self.user_rep)
+        self.assertEqual(resumen.total_calificaciones, 2)
+        self.assertEqual(resumen.promedio_general, Decimal("4.50"))
+        self.assertEqual(resumen.promedio_puntualidad, Decimal("3.00"))
+        self.rep.refresh_from_db()
+        self.assertEqual(self.rep.calificacion_promedio, Decimal("4.50"))
+
+        # Edición: se mueve de bucket de estrellas sin recontar
+        c1.estrellas = 2
+        c1.puntualidad = None
+        c1.save()
+        resumen.refresh_from_db()
+        self.assertEqual((resumen.total_4_estrellas, resumen.total_2_estrellas), (0, 1))
+        self.assertEqual(resumen.promedio_general, Decimal("3.50"))
+        self.assertIsNone(resumen.promedio_puntualidad)
+
+        c1.delete()
+        resumen.refresh_from_db()
+        self.assertEqual(resumen.total_calificaciones, 1)
+        self.assertEqual(resumen.promedio_general, Decimal("5.00"))
+
+    def test_reconciliacion_corrige_deriva(self):
+        self._calificar(self.pedido, 3)
+        Calificacion.objects.create(
+            pedido=self.pedido,
+            calificador=self.user_cliente,
+            calificado=self.user_prov,
+            tipo=TipoCalificacion.CLIENTE_A_PROVEEDOR,
+            estrellas=4,
+        )
+        self.proveedor.refresh_from_db()
+        self.assertEqual(self.proveedor.calificacion_promedio, Decimal("4.00"))
+
+        # Deriva simulada (p. ej. un UPDATE manual)
+        ResumenCalificacion.objects.filter(user=self.user_rep).update(total_calificaciones=7, suma_estrellas=30)
+        Proveedor.objects.filter(pk=self.proveedor.pk).update(total_resenas=0)
+
+        resultado = CalificacionService.reconciliar_resumenes()
+        self.assertEqual(resultado, {"resumenes": 1, "proveedores": 1})
+        resumen = ResumenCalificacion.objects.get(user=self.user_rep)
+        self.assertEqual((resumen.total_calificaciones, resumen.suma_estrellas), (1, 3))
+        self.assertEqual(CalificacionService.reconciliar_resumenes(), {"resumenes": 0, "proveedores": 0})
+
 
 class CalificacionAPITest(APITestCase):
     """Pruebas básicas de API para calificaciones."""
@@ -9,6 +9,8 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
 
+from utils.metricas import registrar_cache
+
 from .models import Calificacion, ResumenCalificacion, TipoCalificacion
 from .serializers import (
     CalificacionListSerializer,
@@ -225,11 +227,9 @@ class CalificacionViewSet(viewsets.ModelViewSet):
                 'error': 'Solo puedes eliminar tus propias calificaciones.'
             }, status=status.HTTP_403_FORBIDDEN)
         
+        # El post_delete descuenta la calificación del resumen del calificado
         instance.delete()
         
-        # Recalcular promedio del calificado
-        CalificacionService.actualizar_promedio_usuario(instance.calificado)
-        
         return Response({
             'message': 'Calificación eliminada correctamente.'
         }, status=status.HTTP_200_OK)
@@ -436,7 +436,7 @@ class CalificacionViewSet(viewsets.ModelViewSet):
         cache_key = (
             f"ratings:{entity_type}:{entity_id}:list:v{version}:p{page_number}:s{page_size}"
         )
-        cached = cache.get(cache_key)
+        cached = registrar_cache('calificaciones', cache.get(cache_key))
         if cached is not None:
             return Response(cached)
 
@@ -468,7 +468,7 @@ class CalificacionViewSet(viewsets.ModelViewSet):
 
         version = _get_cache_version(entity_type, entity_id)
         cache_key = f"ratings:{entity_type}:{entity_id}:summary:v{version}"
-        cached = cache.get(cache_key)
+        cached = registrar_cache('calificaciones', cache.get(cache_key))
         if cached is not None:
             return Response(cached)
 
@@ -3,6 +3,7 @@
 # ============================================
 
 from django.contrib import admin
+from django.forms.models import BaseInlineFormSet
 from django.utils.html import format_html
 from django.utils import timezone
 from .models import Chat, Mensaje, TipoChat, TipoMensaje
@@ -12,9 +13,32 @@ from .models import Chat, Mensaje, TipoChat, TipoMensaje
 # ADMIN: MENSAJE (INLINE)
 # ============================================
 
+def _leido_en(obj):
+    """
+    Fecha de lectura con las marcas del chat precargadas en `obj.marcas_chat`
+    (listado e inline); en el detalle se consultan una vez por mensaje.
+    """
+    marcas = getattr(obj, 'marcas_chat', None)
+    if marcas is None:
+        obj.marcas_chat = marcas = obj.chat.marcas_lectura()
+    return obj.leido_en_segun(marcas)
+
+
+class MensajeInlineFormSet(BaseInlineFormSet):
+    """Todos los mensajes del inline son del mismo chat: una sola consulta de marcas"""
+
+    def get_queryset(self):
+        mensajes = super().get_queryset()
+        marcas = self.instance.marcas_lectura()
+        for mensaje in mensajes:
+            mensaje.marcas_chat = marcas
+        return mensajes
+
+
 class MensajeInline(admin.TabularInline):
     """Inline para ver mensajes dentro de un chat"""
     model = Mensaje
+    formset = MensajeInlineFormSet
     extra = 0
     fields = ['remitente', 'tipo', 'contenido_preview', 'leido', 'creado_en']
     readonly_fields = ['remitente', 'tipo', 'contenido_preview', 'leido', 'creado_en']
@@ -32,6 +56,11 @@ class MensajeInline(admin.TabularInline):
 
     contenido_preview.short_description = 'Contenido'
 
+    def leido(self, obj):
+        return _leido_en(obj) is not None
+    leido.boolean = True
+    leido.short_description = 'Leído'
+
     def has_add_permission(self, request, obj=None):
         return False
 
@@ -178,7 +207,6 @@ class MensajeAdmin(admin.ModelAdmin):
 
     list_filter = [
         'tipo',
-        'leido',
         'eliminado',
         'creado_en',
         'chat__tipo'
@@ -203,6 +231,7 @@ class MensajeAdmin(admin.ModelAdmin):
         'nombre_archivo',
         'tamano_archivo_mb',
         'duracion_audio',
+        'leido',
         'leido_en',
         'creado_en',
         'actualizado_en'
@@ -298,9 +327,18 @@ class MensajeAdmin(admin.ModelAdmin):
         return '-'
     archivo_preview.short_description = 'Preview Archivo'
 
+    def leido(self, obj):
+        return _leido_en(obj) is not None
+    leido.boolean = True
+    leido.short_description = 'Leído'
+
+    def leido_en(self, obj):
+        return _leido_en(obj) or '-'
+    leido_en.short_description = 'Leído en'
+
     def leido_badge(self, obj):
         """Badge de leído"""
-        if obj.leido:
+        if self.leido(obj):
             return format_html(
                 '<span style="background-color: #28a745; color: white; '
                 'padding: 3px 8px; border-radius: 10px;">✓✓</span>'
@@ -326,6 +364,14 @@ class MensajeAdmin(admin.ModelAdmin):
         qs = super().get_queryset(request)
         return qs.select_related('chat', 'remitente')
 
+    def get_changelist_instance(self, request):
+        """Marcas de lectura de los chats de la página en una sola consulta"""
+        changelist = super().get_changelist_instance(request)
+        marcas = Chat.marcas_lectura_varios({m.chat_id for m in changelist.result_list})
+        for mensaje in changelist.result_list:
+            mensaje.marcas_chat = marcas.get(mensaje.chat_id, {})
+        return changelist
+
     def has_add_permission(self, request):
         """No permitir agregar mensajes desde el admin"""
         return False
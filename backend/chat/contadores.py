@@ -0,0 +1,80 @@
+# chat/contadores.py
+"""
+Contadores materializados de mensajes no leídos por (usuario, chat).
+
+Viven en la caché (Redis) y se mantienen al crear mensajes y al mover la
+marca de lectura del usuario (LecturaChat). Si un contador no existe (primer acceso, expiró o fue
+invalidado) se reconstruye con un único COUNT agrupado para todos los chats
+que falten, de modo que listar N chats con contador cuesta un solo
+round-trip a Redis.
+"""
+
+import logging
+
+from django.core.cache import cache
+from django.db.models import Count
+
+logger = logging.getLogger('chat')
+
+CONTADOR_TTL_SEGUNDOS = 60 * 60 * 24
+
+
+def _key(chat_id, user_id):
+    return f"chat:no_leidos:{chat_id}:{user_id}"
+
+
+def obtener_varios(chat_ids, usuario):
+    """Retorna {chat_id: no_leidos} para los chats indicados."""
+    from .models import LecturaChat, Mensaje, TipoMensaje
+
+    keys = {_key(chat_id, usuario.id): chat_id for chat_id in chat_ids}
+    if not keys:
+        return {}
+
+    resultado = {keys[k]: max(0, v) for k, v in cache.get_many(list(keys)).items()}
+
+    faltantes = [chat_id for chat_id in chat_ids if chat_id not in resultado]
+    if faltantes:
+        conteos = dict(
+            Mensaje.objects.filter(
+                chat_id__in=faltantes,
+                eliminado=False,
+                creado_en__gt=LecturaChat.marca_de(usuario)
+            )
+            .exclude(remitente=usuario)
+            .exclude(tipo=TipoMensaje.SISTEMA)
+            .values_list('chat_id')
+            .annotate(total=Count('id'))
+        )
+        nuevos = {chat_id: conteos.get(chat_id, 0) for chat_id in faltantes}
+        for chat_id, n in nuevos.items():
+            # add: no pisa un contador reconstruido (y quizá ya incrementado)
+            # por otra lectura mientras se contaba
+            cache.add(_key(chat_id, usuario.id), n, CONTADOR_TTL_SEGUNDOS)
+        resultado.update(nuevos)
+
+    return resultado
+
+
+def obtener(chat_id, usuario):
+    return obtener_varios([chat_id], usuario)[chat_id]
+
+
+def incrementar(chat_id, user_ids, delta=1):
+    """
+    Suma `delta` al contador de cada usuario. Si el contador no existe no se
+    crea: la siguiente lectura lo reconstruye desde la BD con el valor exacto.
+    """
+    for user_id in user_ids:
+        try:
+            cache.incr(_key(chat_id, user_id), delta)
+        except ValueError:
+            pass
+
+
+def reiniciar(chat_id, user_id):
+    cache.set(_key(chat_id, user_id), 0, CONTADOR_TTL_SEGUNDOS)
+
+
+def invalidar(chat_id, user_ids):
+    cache.delete_many([_key(chat_id, user_id) for user_id in user_ids])
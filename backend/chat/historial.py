@@ -0,0 +1,90 @@
+# chat/historial.py
+"""
+Paginación keyset del historial de mensajes.
+
+Las páginas se recorren hacia atrás sobre el índice (chat, creado_en, id)
+con un cursor opaco que codifica la última fila entregada, de modo que
+cargar mensajes antiguos cuesta una única consulta con LIMIT sin importar
+lo largo que sea el chat (sin OFFSET ni COUNT).
+"""
+
+import binascii
+import uuid
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+
+from django.db.models import Q
+
+from .models import Mensaje
+
+LIMITE_POR_DEFECTO = 50
+LIMITE_MAXIMO = 100
+
+
+class CursorInvalido(ValueError):
+    """Cursor o ID de referencia mal formado"""
+
+
+def codificar_cursor(mensaje):
+    crudo = f"{mensaje.creado_en.isoformat()}|{mensaje.id}"
+    return urlsafe_b64encode(crudo.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    """Retorna (creado_en, id) del mensaje al que apunta el cursor."""
+    try:
+        crudo = urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        fecha, mensaje_id = crudo.split('|', 1)
+        return datetime.fromisoformat(fecha), uuid.UUID(mensaje_id)
+    except (ValueError, binascii.Error, UnicodeDecodeError) as e:
+        raise CursorInvalido(f"Cursor inválido: {cursor}") from e
+
+
+def pagina_mensajes(chat, limite=LIMITE_POR_DEFECTO, cursor=None, antes_de=None, offset=0):
+    """
+    Página de mensajes anteriores al cursor (o los más recientes si no hay).
+
+    Args:
+        chat (Chat): Chat a consultar
+        limite (int): Máximo de mensajes de la página
+        cursor (str): Cursor devuelto por la página anterior
+        antes_de (str): ID de mensaje de referencia (compatibilidad con clientes
+            antiguos); debe pertenecer al chat
+        offset (int): Mensajes a saltar desde el punto de partida (clientes
+            antiguos; con el cursor no hace falta)
+
+    Returns:
+        tuple: (mensajes en orden cronológico, cursor siguiente o None)
+
+    Raises:
+        CursorInvalido: cursor mal formado, o `antes_de` que no es un mensaje del chat
+    """
+    mensajes = Mensaje.objects.filter(chat=chat, eliminado=False).select_related('remitente')
+
+    if cursor:
+        creado_en, mensaje_id = decodificar_cursor(cursor)
+        mensajes = mensajes.filter(
+            Q(creado_en__lt=creado_en) | Q(creado_en=creado_en, id__lt=mensaje_id)
+        )
+    elif antes_de:
+        try:
+            mensaje_id = uuid.UUID(str(antes_de))
+        except ValueError as e:
+            raise CursorInvalido(f"ID de mensaje inválido: {antes_de}") from e
+        creado_en = (
+            Mensaje.objects.filter(pk=mensaje_id, chat=chat)
+            .values_list('creado_en', flat=True).first()
+        )
+        if creado_en is None:
+            raise CursorInvalido(f"Mensaje no encontrado en el chat: {antes_de}")
+        mensajes = mensajes.filter(
+            Q(creado_en__lt=creado_en) | Q(creado_en=creado_en, id__lt=mensaje_id)
+        )
+
+    # Una fila extra indica si quedan mensajes más antiguos
+    filas = list(mensajes.order_by('-creado_en', '-id')[offset:offset + limite + 1])
+    siguiente = codificar_cursor(filas[limite - 1]) if len(filas) > limite else None
+
+    filas = filas[:limite]
+    filas.reverse()
+    return filas, siguiente
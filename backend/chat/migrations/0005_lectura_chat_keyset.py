@@ -0,0 +1,88 @@
+# Generated by Django 5.1.7 on 2026-10-19 04:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def sembrar_marcas_lectura(apps, schema_editor):
+    """
+    Convierte los flags `leido` por mensaje en marcas de lectura: para cada
+    participante, el último mensaje recibido que ya estaba leído.
+    """
+    Mensaje = apps.get_model('chat', 'Mensaje')
+    LecturaChat = apps.get_model('chat', 'LecturaChat')
+    Chat = apps.get_model('chat', 'Chat')
+
+    marcas = []
+    for chat in Chat.objects.prefetch_related('participantes').iterator(chunk_size=500):
+        for usuario in chat.participantes.all():
+            leido_hasta = Mensaje.objects.filter(
+                chat=chat, leido=True
+            ).exclude(remitente=usuario).aggregate(m=Max('creado_en'))['m']
+            if leido_hasta:
+                marcas.append(LecturaChat(chat=chat, usuario=usuario, leido_hasta=leido_hasta))
+        if len(marcas) >= 1000:
+            LecturaChat.objects.bulk_create(marcas, ignore_conflicts=True)
+            marcas = []
+    LecturaChat.objects.bulk_create(marcas, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0004_chat_chat_pedido_proveedor_require_proveedor'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LecturaChat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('leido_hasta', models.DateTimeField(verbose_name='Leído Hasta')),
+                ('actualizado_en', models.DateTimeField(auto_now=True, verbose_name='Última Modificación')),
+            ],
+            options={
+                'verbose_name': 'Lectura de Chat',
+                'verbose_name_plural': 'Lecturas de Chat',
+                'db_table': 'chat_lecturas',
+            },
+        ),
+        migrations.AddField(
+            model_name='lecturachat',
+            name='chat',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lecturas', to='chat.chat', verbose_name='Chat'),
+        ),
+        migrations.AddField(
+            model_name='lecturachat',
+            name='usuario',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lecturas_chat', to=settings.AUTH_USER_MODEL, verbose_name='Usuario'),
+        ),
+        migrations.AddConstraint(
+            model_name='lecturachat',
+            constraint=models.UniqueConstraint(fields=('chat', 'usuario'), name='chat_lectura_unica_por_usuario'),
+        ),
+        migrations.RunPython(sembrar_marcas_lectura, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='mensaje',
+            name='mensajes_chat_id_bf6913_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='mensaje',
+            name='mensajes_chat_id_28d905_idx',
+        ),
+        migrations.RemoveField(
+            model_name='mensaje',
+            name='leido',
+        ),
+        migrations.RemoveField(
+            model_name='mensaje',
+            name='leido_en',
+        ),
+        migrations.AddIndex(
+            model_name='mensaje',
+            index=models.Index(fields=['chat', 'creado_en', 'id'], name='mensajes_chat_id_0efe50_idx'),
+        ),
+    ]
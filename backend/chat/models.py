@@ -15,17 +15,23 @@ FUNCIONALIDADES:
 """
 
 from django.db import models
+from django.db.models import DateTimeField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 from django.core.validators import FileExtensionValidator
 from authentication.models import User
 from pedidos.models import Pedido
 from proveedores.models import Proveedor
+from datetime import datetime, timezone as dt_timezone
 import uuid
 import logging
 
 logger = logging.getLogger('chat')
 
+# Marca de lectura implícita para quien nunca abrió el chat
+MARCA_INICIAL = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
 
 # ============================================
 # UTILIDADES Y VALIDADORES
@@ -276,7 +282,7 @@ class Chat(models.Model):
             bool: True si puede participar
         """
         # Admin puede ver todos
-        if usuario.es_admin():
+        if usuario.es_admin:
             return True
 
         # Verificar si es participante
@@ -298,7 +304,9 @@ class Chat(models.Model):
 
     def obtener_mensajes_no_leidos(self, usuario):
         """
-        Obtiene mensajes no leídos para un usuario
+        Obtiene mensajes no leídos para un usuario: los posteriores
+        a su marca de lectura (resuelta como subconsulta). Los mensajes
+        del sistema nunca cuentan como pendientes.
 
         Args:
             usuario (User): Usuario que consulta
@@ -307,10 +315,12 @@ class Chat(models.Model):
             QuerySet: Mensajes no leídos
         """
         return self.mensajes.filter(
-            leido=False,
-            eliminado=False
+            eliminado=False,
+            creado_en__gt=LecturaChat.marca_de(usuario, chat=self.pk)
         ).exclude(
             remitente=usuario
+        ).exclude(
+            tipo=TipoMensaje.SISTEMA
         )
 
     def contar_no_leidos(self, usuario):
@@ -323,26 +333,62 @@ class Chat(models.Model):
         Returns:
             int: Cantidad de mensajes no leídos
         """
-        return self.obtener_mensajes_no_leidos(usuario).count()
+        from . import contadores
+        return contadores.obtener(self.pk, usuario)
 
     def marcar_todos_como_leidos(self, usuario):
         """
-        Marca todos los mensajes como leídos para un usuario
+        Marca todos los mensajes como leídos para un usuario.
+
+        Solo adelanta su marca de lectura (un UPSERT), sin tocar
+        las filas de mensajes.
 
         Args:
             usuario (User): Usuario que leyó los mensajes
+
+        Returns:
+            int: Mensajes que estaban pendientes de leer
         """
-        mensajes_no_leidos = self.obtener_mensajes_no_leidos(usuario)
-        count = mensajes_no_leidos.update(
-            leido=True,
-            leido_en=timezone.now()
-        )
+        from . import contadores
+        count = contadores.obtener(self.pk, usuario)
+
+        LecturaChat.marcar_hasta(self.pk, usuario.id, timezone.now())
+        contadores.reiniciar(self.pk, usuario.id)
 
         if count > 0:
             logger.debug(f"{count} mensajes marcados como leídos para {usuario.email}")
 
         return count
 
+    def marcas_lectura(self):
+        """
+        Marca de lectura de cada participante en una sola consulta
+
+        Returns:
+            dict: {usuario_id: leido_hasta | None}
+        """
+        return Chat.marcas_lectura_varios([self.pk]).get(self.pk, {})
+
+    @staticmethod
+    def marcas_lectura_varios(chat_ids):
+        """
+        Marcas de lectura de varios chats en una sola consulta (listados)
+
+        Returns:
+            dict: {chat_id: {usuario_id: leido_hasta | None}}
+        """
+        marca = LecturaChat.objects.filter(
+            chat_id=OuterRef('chat_id'), usuario_id=OuterRef('user_id')
+        ).values('leido_hasta')[:1]
+        filas = Chat.participantes.through.objects.filter(
+            chat_id__in=list(chat_ids)
+        ).annotate(leido_hasta=Subquery(marca)).values_list('chat_id', 'user_id', 'leido_hasta')
+
+        marcas = {}
+        for chat_id, usuario_id, leido_hasta in filas:
+            marcas.setdefault(chat_id, {})[usuario_id] = leido_hasta
+        return marcas
+
     def obtener_ultimo_mensaje(self):
         """
         Obtiene el último mensaje del chat
@@ -365,8 +411,7 @@ class Chat(models.Model):
         mensaje = Mensaje.objects.create(
             chat=self,
             tipo=TipoMensaje.SISTEMA,
-            contenido=contenido,
-            leido=True  # Mensajes del sistema se marcan como leídos
+            contenido=contenido
         )
 
         logger.info(f"Mensaje del sistema enviado en chat {self.id}")
@@ -480,8 +525,13 @@ class Chat(models.Model):
 
     @property
     def tiene_mensajes_sin_leer(self):
-        """Verifica si hay mensajes sin leer"""
-        return self.mensajes.filter(leido=False, eliminado=False).exists()
+        """Verifica si algún participante tiene mensajes sin leer"""
+        pendientes = Q(pk__in=[])
+        for usuario_id, leido_hasta in self.marcas_lectura().items():
+            pendientes |= ~Q(remitente_id=usuario_id) & Q(creado_en__gt=leido_hasta or MARCA_INICIAL)
+        return self.mensajes.filter(pendientes, eliminado=False).exclude(
+            tipo=TipoMensaje.SISTEMA
+        ).exists()
 
     @property
     def total_mensajes(self):
@@ -587,17 +637,7 @@ class Mensaje(models.Model):
     # ESTADO
     # ============================================
 
-    leido = models.BooleanField(
-        default=False,
-        verbose_name='Mensaje Leído',
-        db_index=True
-    )
-
-    leido_en = models.DateTimeField(
-        null=True,
-        blank=True,
-        verbose_name='Fecha de Lectura'
-    )
+    # La lectura no se guarda por mensaje: se deriva de LecturaChat
 
     eliminado = models.BooleanField(
         default=False,
@@ -627,8 +667,8 @@ class Mensaje(models.Model):
         verbose_name_plural = 'Mensajes'
         ordering = ['creado_en']
         indexes = [
-            models.Index(fields=['chat', 'creado_en']),
-            models.Index(fields=['chat', 'leido', 'eliminado']),
+            # Keyset del historial: (chat, creado_en, id)
+            models.Index(fields=['chat', 'creado_en', 'id']),
             models.Index(fields=['remitente']),
             models.Index(fields=['tipo']),
             models.Index(fields=['-creado_en']),
@@ -710,26 +750,59 @@ class Mensaje(models.Model):
     #  MÉTODOS DE NEGOCIO
     # ============================================
 
-    def marcar_como_leido(self):
-        """Marca el mensaje como leído"""
-        if not self.leido:
-            self.leido = True
-            self.leido_en = timezone.now()
-            self.save(update_fields=['leido', 'leido_en', 'actualizado_en'])
-            logger.debug(f"Mensaje {self.id} marcado como leído")
+    def marcar_como_leido(self, usuario):
+        """
+        Marca el mensaje (y todos los anteriores del chat) como leído
+        por el usuario adelantando su marca de lectura
+        """
+        if LecturaChat.avanzar(self.chat_id, usuario.id, self.creado_en):
+            from . import contadores
+            contadores.invalidar(self.chat_id, [usuario.id])
+            logger.debug(f"Mensaje {self.id} marcado como leído por {usuario.email}")
+
+    def leido_en_segun(self, marcas):
+        """
+        Fecha de lectura según las marcas del chat ({usuario_id: leido_hasta}).
+        Un mensaje está leído cuando todos sus destinatarios lo alcanzaron;
+        los del sistema se consideran leídos desde su creación.
+        """
+        if self.tipo == TipoMensaje.SISTEMA:
+            return self.creado_en
+        destinatarios = [m for uid, m in marcas.items() if uid != self.remitente_id]
+        if not destinatarios or any(m is None or m < self.creado_en for m in destinatarios):
+            return None
+        return min(destinatarios)
 
     def eliminar_mensaje(self):
         """Soft delete del mensaje"""
         self.eliminado = True
         self.save(update_fields=['eliminado', 'actualizado_en'])
+        self._invalidar_contadores()
         logger.info(f"Mensaje {self.id} eliminado (soft delete)")
 
     def restaurar_mensaje(self):
         """Restaura un mensaje eliminado"""
         self.eliminado = False
         self.save(update_fields=['eliminado', 'actualizado_en'])
+        self._invalidar_contadores()
         logger.info(f"Mensaje {self.id} restaurado")
 
+    def destinatarios_ids(self):
+        """IDs de los participantes que reciben el mensaje (todos menos el remitente)"""
+        return list(
+            self.chat.participantes.exclude(id=self.remitente_id).values_list('id', flat=True)
+        )
+
+    def _ajustar_contadores(self, delta):
+        """Propaga el cambio de estado a los contadores de no leídos"""
+        from . import contadores
+        contadores.incrementar(self.chat_id, self.destinatarios_ids(), delta)
+
+    def _invalidar_contadores(self):
+        """El mensaje puede estar leído para unos y no para otros: recalcular"""
+        from . import contadores
+        contadores.invalidar(self.chat_id, self.destinatarios_ids())
+
     @property
     def es_imagen(self):
         """Verifica si es un mensaje de imagen"""
@@ -758,3 +831,99 @@ class Mensaje(models.Model):
         if self.tamano_archivo:
             return round(self.tamano_archivo / (1024 * 1024), 2)
         return 0
+
+
+# ============================================
+#  MODELO: LECTURA DE CHAT
+# ============================================
+
+class LecturaChat(models.Model):
+    """
+    Marca de lectura ("leído hasta") de un participante en un chat.
+
+    Todo mensaje con creado_en <= leido_hasta cuenta como leído por ese
+    usuario, así que marcar un chat como leído es un único UPSERT sin
+    importar cuántos mensajes tenga.
+    """
+
+    chat = models.ForeignKey(
+        Chat,
+        on_delete=models.CASCADE,
+        related_name='lecturas',
+        verbose_name='Chat'
+    )
+
+    usuario = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='lecturas_chat',
+        verbose_name='Usuario'
+    )
+
+    leido_hasta = models.DateTimeField(
+        verbose_name='Leído Hasta'
+    )
+
+    actualizado_en = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Última Modificación'
+    )
+
+    class Meta:
+        db_table = 'chat_lecturas'
+        verbose_name = 'Lectura de Chat'
+        verbose_name_plural = 'Lecturas de Chat'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['chat', 'usuario'],
+                name='chat_lectura_unica_por_usuario'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.usuario_id} leyó chat {self.chat_id} hasta {self.leido_hasta}"
+
+    @classmethod
+    def marca_de(cls, usuario, chat=OuterRef('chat_id')):
+        """
+        Expresión SQL con la marca del usuario en `chat` (por defecto, el chat
+        de la fila externa). Sin marca, todo el chat cuenta como no leído.
+        """
+        marca = cls.objects.filter(chat_id=chat, usuario=usuario).values('leido_hasta')[:1]
+        return Coalesce(Subquery(marca), Value(MARCA_INICIAL, output_field=DateTimeField()))
+
+    @classmethod
+    def marcar_hasta(cls, chat_id, usuario_id, hasta):
+        """
+        UPSERT incondicional de la marca. Usar solo con `hasta` = ahora,
+        que nunca retrocede respecto a una marca anterior.
+        """
+        cls.objects.bulk_create(
+            [cls(chat_id=chat_id, usuario_id=usuario_id, leido_hasta=hasta)],
+            update_conflicts=True,
+            unique_fields=['chat', 'usuario'],
+            update_fields=['leido_hasta', 'actualizado_en'],
+        )
+
+    @classmethod
+    def avanzar(cls, chat_id, usuario_id, hasta):
+        """
+        Adelanta la marca hasta `hasta` si es posterior a la actual.
+
+        Returns:
+            bool: False si la marca ya era igual o posterior
+        """
+        if cls.objects.filter(
+            chat_id=chat_id, usuario_id=usuario_id, leido_hasta__lt=hasta
+        ).update(leido_hasta=hasta, actualizado_en=timezone.now()):
+            return True
+
+        if cls.objects.filter(chat_id=chat_id, usuario_id=usuario_id).exists():
+            return False
+
+        # Primera lectura; si otra petición la creó antes, gana la existente
+        cls.objects.bulk_create(
+            [cls(chat_id=chat_id, usuario_id=usuario_id, leido_hasta=hasta)],
+            ignore_conflicts=True,
+        )
+        return True
@@ -14,6 +14,18 @@ import logging
 logger = logging.getLogger('chat')
 
 
+def marcas_lectura(context, chat):
+    """
+    Marcas de lectura del chat desde el contexto ({chat_id: marcas}, que las
+    vistas de listado precargan con `Chat.marcas_lectura_varios`). Si faltan
+    se consultan una vez por chat y quedan en el contexto compartido.
+    """
+    marcas = context.setdefault('marcas_lectura', {})
+    if chat.pk not in marcas:
+        marcas[chat.pk] = chat.marcas_lectura()
+    return marcas[chat.pk]
+
+
 # ============================================
 # SERIALIZER: USER (NESTED)
 # ============================================
@@ -108,6 +120,10 @@ class MensajeSerializer(serializers.ModelSerializer):
         read_only=True
     )
 
+    # Estado de lectura (derivado de las marcas de lectura del chat)
+    leido = serializers.SerializerMethodField()
+    leido_en = serializers.SerializerMethodField()
+
     # Estado del mensaje para el usuario actual
     es_propio = serializers.SerializerMethodField()
 
@@ -158,6 +174,12 @@ class MensajeSerializer(serializers.ModelSerializer):
             return obj.archivo.url
         return None
 
+    def get_leido_en(self, obj):
+        return obj.leido_en_segun(marcas_lectura(self.context, obj.chat))
+
+    def get_leido(self, obj):
+        return self.get_leido_en(obj) is not None
+
     def get_es_propio(self, obj):
         """Verifica si el mensaje es del usuario autenticado"""
         request = self.context.get('request')
@@ -330,7 +352,10 @@ class ChatListSerializer(serializers.ModelSerializer):
         return mensaje.contenido
 
     def get_mensajes_no_leidos(self, obj):
-        """Cuenta mensajes no leídos para el usuario actual"""
+        """Contador materializado (la vista lo precarga para todos los chats)"""
+        precargados = self.context.get('no_leidos')
+        if precargados is not None and obj.pk in precargados:
+            return precargados[obj.pk]
         request = self.context.get('request')
         if request and request.user:
             return obj.contar_no_leidos(request.user)
@@ -408,7 +433,7 @@ class ChatSerializer(serializers.ModelSerializer):
                 'es_audio': ultimo.es_audio,
                 'url_archivo': self._get_url_archivo_mensaje(ultimo),
                 'duracion_audio': ultimo.duracion_audio,
-                'leido': ultimo.leido,
+                'leido': ultimo.leido_en_segun(marcas_lectura(self.context, obj)) is not None,
                 'creado_en': ultimo.creado_en
             }
 
@@ -440,7 +465,10 @@ class ChatSerializer(serializers.ModelSerializer):
         return None
 
     def get_mensajes_no_leidos(self, obj):
-        """Cuenta no leídos para el usuario actual"""
+        """Cuenta no leídos para el usuario actual (contador materializado)"""
+        precargados = self.context.get('no_leidos')
+        if precargados is not None and obj.pk in precargados:
+            return precargados[obj.pk]
         request = self.context.get('request')
         if request and request.user:
             return obj.contar_no_leidos(request.user)
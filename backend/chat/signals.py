@@ -3,7 +3,7 @@ from django.db.models.signals import pre_save, post_save
 from django.dispatch import receiver
 from django.db import transaction
 from pedidos.models import Pedido
-from .models import Chat, TipoChat
+from .models import Chat, Mensaje, TipoChat, TipoMensaje
 import logging
 
 logger = logging.getLogger('chat')
@@ -55,4 +55,15 @@ def gestionar_chats_pedido(sender, instance, created, **kwargs):
         return
 
     # 2. Si no existen chats y hay repartidor, crearlos (Caso inicial)
-    transaction.on_commit(lambda: Chat.crear_chats_para_pedido(instance))
\ No newline at end of file
+    transaction.on_commit(lambda: Chat.crear_chats_para_pedido(instance))
+
+
+@receiver(post_save, sender=Mensaje)
+def actualizar_contadores_no_leidos(sender, instance, created, **kwargs):
+    """Suma el mensaje nuevo al contador de no leídos de cada destinatario."""
+    if kwargs.get('raw', False) or not created or instance.eliminado:
+        return
+    if instance.tipo == TipoMensaje.SISTEMA:
+        return
+
+    instance._ajustar_contadores(1)
@@ -2,6 +2,7 @@ import uuid
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from django.utils import timezone
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from rest_framework import status
 from rest_framework.test import APITestCase
@@ -10,7 +11,7 @@ from pedidos.models import Pedido, EstadoPedido
 from proveedores.models import Proveedor
 from repartidores.models import Repartidor
 from productos.models import Categoria, Producto
-from .models import Chat, Mensaje, TipoChat, TipoMensaje
+from .models import Chat, LecturaChat, Mensaje, TipoChat, TipoMensaje
 
 User = get_user_model()
 
@@ -19,6 +20,7 @@ class ChatModelTest(APITestCase):
     """Pruebas de dominio para Chat y Mensaje."""
 
     def setUp(self):
+        cache.clear()
         self.user_cliente = User.objects.create_user(
             email="cliente@app.com",
             username="cliente",
@@ -100,11 +102,70 @@ class ChatModelTest(APITestCase):
         chat.marcar_todos_como_leidos(self.user_rep)
         self.assertEqual(chat.contar_no_leidos(self.user_rep), 0)
 
+    def test_contador_no_leidos_materializado(self):
+        chat = Chat.objects.create(tipo=TipoChat.SOPORTE, proveedor=self.proveedor)
+        chat.participantes.add(self.user_prov, self.user_rep)
+        Mensaje.objects.create(chat=chat, remitente=self.user_prov, tipo=TipoMensaje.TEXTO, contenido="1")
+        self.assertEqual(chat.contar_no_leidos(self.user_rep), 1)
+
+        # Con el contador ya hidratado, los cambios se aplican como deltas
+        m2 = Mensaje.objects.create(chat=chat, remitente=self.user_prov, tipo=TipoMensaje.TEXTO, contenido="2")
+        Mensaje.objects.create(chat=chat, remitente=self.user_rep, tipo=TipoMensaje.TEXTO, contenido="propio")
+        with self.assertNumQueries(0):
+            self.assertEqual(chat.contar_no_leidos(self.user_rep), 2)
+
+        # Leer m2 adelanta la marca: también cuenta m1 como leído
+        m2.marcar_como_leido(self.user_rep)
+        self.assertEqual(chat.contar_no_leidos(self.user_rep), 0)
+        self.assertEqual(chat.contar_no_leidos(self.user_prov), 1)
+
+    def test_reconstruccion_no_pisa_contador_existente(self):
+        from unittest import mock
+        from . import contadores
+
+        chat = Chat.objects.create(tipo=TipoChat.SOPORTE, proveedor=self.proveedor)
+        chat.participantes.add(self.user_prov, self.user_rep)
+        Mensaje.objects.create(chat=chat, remitente=self.user_prov, tipo=TipoMensaje.TEXTO, contenido="1")
+
+        key = contadores._key(chat.id, self.user_rep.id)
+        cache.delete(key)
+        # Otra lectura reconstruye e incrementa el contador mientras esta cuenta
+        with mock.patch.object(contadores.cache, "get_many", return_value={}):
+            cache.set(key, 7)
+            self.assertEqual(contadores.obtener(chat.id, self.user_rep), 1)
+        self.assertEqual(cache.get(key), 7)
+
+    def test_marca_de_lectura(self):
+        chat = Chat.objects.create(tipo=TipoChat.SOPORTE, proveedor=self.proveedor)
+        chat.participantes.add(self.user_prov, self.user_rep)
+        m1 = Mensaje.objects.create(chat=chat, remitente=self.user_prov, tipo=TipoMensaje.TEXTO, contenido="1")
+        m2 = Mensaje.objects.create(chat=chat, remitente=self.user_prov, tipo=TipoMensaje.TEXTO, contenido="2")
+
+        def leido(mensaje):
+            return mensaje.leido_en_segun(chat.marcas_lectura()) is not None
+
+        self.assertFalse(leido(m1))
+        self.assertTrue(chat.tiene_mensajes_sin_leer)
+
+        # Marcar todo es un UPSERT de la marca, sin actualizar mensajes
+        self.assertEqual(chat.contar_no_leidos(self.user_rep), 2)
+        with self.assertNumQueries(1):
+            self.assertEqual(chat.marcar_todos_como_leidos(self.user_rep), 2)
+        self.assertTrue(leido(m1))
+        self.assertTrue(leido(m2))
+        self.assertFalse(chat.tiene_mensajes_sin_leer)
+
+        # La marca nunca retrocede
+        m1.marcar_como_leido(self.user_rep)
+        self.assertTrue(leido(m2))
+        self.assertEqual(LecturaChat.objects.filter(chat=chat).count(), 1)
+
 
 class ChatAPITest(APITestCase):
     """Smoke tests de endpoints de chat (listado y creación de mensaje)."""
 
     def setUp(self):
+        cache.clear()
         self.user = User.objects.create_user(
             email="user@app.com",
             username="user",
@@ -144,3 +205,89 @@ class ChatAPITest(APITestCase):
             chats = res.data
         ids = [c["id"] for c in chats]
         self.assertIn(str(self.chat.id), ids)
+
+    def test_badge_no_leidos(self):
+        Mensaje.objects.create(
+            chat=self.chat, remitente=self.user_prov, tipo=TipoMensaje.TEXTO, contenido="Hola"
+        )
+        res = self.client.get(reverse("chat:chat-no-leidos"))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["total"], 1)
+        self.assertEqual(res.data["por_chat"], {str(self.chat.id): 1})
+
+    def test_historial_keyset(self):
+        for i in range(5):
+            Mensaje.objects.create(
+                chat=self.chat, remitente=self.user_prov, tipo=TipoMensaje.TEXTO, contenido=f"m{i}"
+            )
+        url = reverse("chat:chat-listar-mensajes", args=[self.chat.id])
+
+        vistos, cursor, paginas = [], None, 0
+        while True:
+            params = {"limit": 2}
+            if cursor:
+                params["cursor"] = cursor
+            res = self.client.get(url, params)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            vistos = [m["contenido"] for m in res.data["mensajes"]] + vistos
+            paginas += 1
+            cursor = res.data["siguiente_cursor"]
+            self.assertEqual(res.data["tiene_mas"], cursor is not None)
+            if not cursor:
+                break
+
+        self.assertEqual(paginas, 3)
+        self.assertEqual(vistos, [f"m{i}" for i in range(5)])
+
+        res = self.client.get(url, {"cursor": "no-es-un-cursor"})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_historial_parametros_antiguos(self):
+        mensajes = [
+            Mensaje.objects.create(
+                chat=self.chat, remitente=self.user_prov, tipo=TipoMensaje.TEXTO, contenido=f"m{i}"
+            )
+            for i in range(5)
+        ]
+        url = reverse("chat:chat-listar-mensajes", args=[self.chat.id])
+
+        res = self.client.get(url, {"limit": 2, "offset": 1})
+        self.assertEqual([m["contenido"] for m in res.data["mensajes"]], ["m2", "m3"])
+
+        res = self.client.get(url, {"antes_de": str(mensajes[3].id), "offset": 1})
+        self.assertEqual([m["contenido"] for m in res.data["mensajes"]], ["m0", "m1"])
+
+        # Referencias que no existen en el chat o parámetros mal formados: 400, no una página vacía
+        for params in ({"antes_de": str(uuid.uuid4())}, {"antes_de": "abc"}, {"offset": "-1"}, {"offset": "x"}):
+            res = self.client.get(url, params)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+    def test_historial_muestra_lectura_del_destinatario(self):
+        Mensaje.objects.create(chat=self.chat, remitente=self.user, tipo=TipoMensaje.TEXTO, contenido="Hola")
+        url = reverse("chat:chat-listar-mensajes", args=[self.chat.id])
+        self.assertFalse(self.client.get(url).data["mensajes"][0]["leido"])
+
+        self.chat.marcar_todos_como_leidos(self.user_prov)
+        self.assertTrue(self.client.get(url).data["mensajes"][0]["leido"])
+
+    def test_marcas_de_lectura_una_consulta_por_listado(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        otro = Chat.objects.create(tipo=TipoChat.SOPORTE, proveedor=self.proveedor)
+        otro.participantes.add(self.user, self.user_prov)
+        for chat in (self.chat, otro):
+            for i in range(3):
+                Mensaje.objects.create(chat=chat, remitente=self.user_prov, tipo=TipoMensaje.TEXTO, contenido=f"m{i}")
+        self.chat.marcar_todos_como_leidos(self.user)
+
+        with CaptureQueriesContext(connection) as consultas:
+            res = self.client.get(reverse("chat:mensaje-list"))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        marcas = [q for q in consultas.captured_queries if 'FROM "chats_participantes"' in q['sql']]
+        self.assertEqual(len(marcas), 1)
+
+        mensajes = res.data.get('results', res.data) if isinstance(res.data, dict) else res.data
+        self.assertEqual(len(mensajes), 6)
+        leidos = {m['chat']: m['leido'] for m in mensajes}
+        self.assertEqual(leidos, {self.chat.id: True, otro.id: False})
@@ -9,6 +9,7 @@ APIs REST para el sistema de chat
 - GET /chats/{id}/mensajes/ - Listar mensajes de un chat
 - POST /chats/{id}/mensajes/ - Enviar mensaje
 - POST /chats/{id}/marcar-leidos/ - Marcar mensajes como leídos
+- GET /chats/no-leidos/ - Total de no leídos (badge)
 - POST /chats/{id}/escribiendo/ - Indicar que está escribiendo
 """
 
@@ -18,7 +19,7 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from django.shortcuts import get_object_or_404
-from django.db.models import Q, Prefetch
+from django.db.models import Q
 from .models import Chat, Mensaje, TipoChat
 from .serializers import (
     ChatSerializer,
@@ -28,6 +29,7 @@ from .serializers import (
     ChatSoporteCreateSerializer
 )
 from .utils import enviar_notificacion_nuevo_mensaje
+from . import contadores, historial
 import logging
 
 logger = logging.getLogger('chat')
@@ -65,11 +67,11 @@ class ChatViewSet(viewsets.ReadOnlyModelViewSet):
         if not user.is_authenticated:
             return Chat.objects.none()
 
+        # Los mensajes no se precargan: el historial se pagina aparte
         # Admin puede ver todos
         if user.es_admin:
             return Chat.objects.all().prefetch_related(
-                'participantes',
-                Prefetch('mensajes', queryset=Mensaje.objects.filter(eliminado=False))
+                'participantes'
             ).select_related('pedido', 'proveedor')
 
         # Usuario normal: solo sus chats
@@ -77,8 +79,7 @@ class ChatViewSet(viewsets.ReadOnlyModelViewSet):
             participantes=user,
             activo=True
         ).prefetch_related(
-            'participantes',
-            Prefetch('mensajes', queryset=Mensaje.objects.filter(eliminado=False))
+            'participantes'
         ).select_related('pedido', 'proveedor').distinct()
         
     def get_serializer_class(self):
@@ -105,14 +106,36 @@ class ChatViewSet(viewsets.ReadOnlyModelViewSet):
         if activo is not None:
             queryset = queryset.filter(activo=activo.lower() == 'true')
 
-        serializer = self.get_serializer(queryset, many=True)
+        chats = list(queryset)
+
+        # Contadores de no leídos de todos los chats en un solo round-trip
+        context = self.get_serializer_context()
+        context['no_leidos'] = contadores.obtener_varios([c.pk for c in chats], request.user)
+        serializer = self.get_serializer(chats, many=True, context=context)
 
         return Response({
             'success': True,
-            'count': queryset.count(),
+            'count': len(chats),
             'chats': serializer.data
         })
 
+    @action(detail=False, methods=['get'], url_path='no-leidos')
+    def no_leidos(self, request):
+        """
+        Badge de chat: total de mensajes no leídos y desglose por chat.
+        Lee solo los contadores materializados.
+        """
+        chat_ids = list(
+            Chat.objects.filter(participantes=request.user, activo=True).values_list('id', flat=True)
+        )
+        por_chat = contadores.obtener_varios(chat_ids, request.user)
+
+        return Response({
+            'success': True,
+            'total': sum(por_chat.values()),
+            'por_chat': {str(chat_id): n for chat_id, n in por_chat.items() if n}
+        })
+
     def retrieve(self, request, *args, **kwargs):
         """Detalle de un chat específico"""
         chat = self.get_object()
@@ -158,12 +181,13 @@ class ChatViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=True, methods=['get'], url_path='mensajes')
     def listar_mensajes(self, request, pk=None):
         """
-        Lista mensajes de un chat con paginación
+        Lista mensajes de un chat con paginación keyset (scroll hacia atrás)
 
         Query params:
-        - limit: Cantidad de mensajes (default: 50)
-        - offset: Saltar mensajes (default: 0)
-        - antes_de: ID de mensaje para cargar anteriores
+        - limit: Cantidad de mensajes (default: 50, máximo: 100)
+        - cursor: `siguiente_cursor` de la respuesta anterior
+        - antes_de: ID de mensaje para cargar anteriores (alternativa al cursor)
+        - offset: Saltar mensajes (clientes antiguos; default: 0)
         """
         chat = self.get_object()
 
@@ -174,42 +198,54 @@ class ChatViewSet(viewsets.ReadOnlyModelViewSet):
                 'error': 'No tienes permiso para ver los mensajes de este chat'
             }, status=status.HTTP_403_FORBIDDEN)
 
-        # Obtener mensajes
-        mensajes = chat.mensajes.filter(eliminado=False).select_related('remitente')
-
-        # Filtro: mensajes antes de un ID específico (para scroll infinito)
-        antes_de = request.query_params.get('antes_de')
-        if antes_de:
-            try:
-                mensaje_ref = Mensaje.objects.get(id=antes_de)
-                mensajes = mensajes.filter(creado_en__lt=mensaje_ref.creado_en)
-            except Mensaje.DoesNotExist:
-                pass
-
-        # Paginación
-        limit = int(request.query_params.get('limit', 50))
-        offset = int(request.query_params.get('offset', 0))
+        try:
+            limit = int(request.query_params.get('limit', historial.LIMITE_POR_DEFECTO))
+        except ValueError:
+            limit = historial.LIMITE_POR_DEFECTO
+        limit = max(1, min(limit, historial.LIMITE_MAXIMO))
 
-        # Ordenar (más recientes primero) y paginar
-        mensajes = mensajes.order_by('-creado_en')[offset:offset+limit]
+        try:
+            offset = int(request.query_params.get('offset', 0))
+        except ValueError:
+            offset = -1
+        if offset < 0:
+            return Response({
+                'success': False,
+                'error': 'offset debe ser un entero no negativo'
+            }, status=status.HTTP_400_BAD_REQUEST)
 
-        # Invertir para mostrar en orden cronológico
-        mensajes = list(reversed(mensajes))
+        # Una sola consulta con LIMIT sobre el índice (chat, creado_en, id)
+        try:
+            mensajes, siguiente_cursor = historial.pagina_mensajes(
+                chat,
+                limite=limit,
+                cursor=request.query_params.get('cursor'),
+                antes_de=request.query_params.get('antes_de'),
+                offset=offset
+            )
+        except historial.CursorInvalido as e:
+            return Response({
+                'success': False,
+                'error': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
 
         serializer = MensajeSerializer(
             mensajes,
             many=True,
-            context={'request': request}
+            context={'request': request, 'marcas_lectura': {chat.pk: chat.marcas_lectura()}}
         )
 
         return Response({
             'success': True,
             'count': len(mensajes),
             'mensajes': serializer.data,
-            'tiene_mas': chat.mensajes.filter(eliminado=False).count() > (offset + limit)
+            'tiene_mas': siguiente_cursor is not None,
+            'siguiente_cursor': siguiente_cursor
         })
 
-    @action(detail=True, methods=['post'], url_path='mensajes')
+    # Misma URL que listar_mensajes: dos @action con el mismo url_path
+    # generan rutas duplicadas y el GET quedaba respondiendo 405
+    @listar_mensajes.mapping.post
     def enviar_mensaje(self, request, pk=None):
         """
         Envía un mensaje en el chat
@@ -380,6 +416,14 @@ class MensajeViewSet(viewsets.ReadOnlyModelViewSet):
             eliminado=False
         ).select_related('chat', 'remitente').distinct()
 
+    def get_serializer(self, *args, **kwargs):
+        """Precarga las marcas de lectura de los chats de la página en una consulta"""
+        if args:
+            mensajes = args[0] if kwargs.get('many') else [args[0]]
+            context = kwargs.setdefault('context', self.get_serializer_context())
+            context['marcas_lectura'] = Chat.marcas_lectura_varios({m.chat_id for m in mensajes})
+        return super().get_serializer(*args, **kwargs)
+
     @action(detail=True, methods=['post'], url_path='marcar-leido')
     def marcar_leido(self, request, pk=None):
         """Marca un mensaje específico como leído"""
@@ -387,7 +431,7 @@ class MensajeViewSet(viewsets.ReadOnlyModelViewSet):
 
         # Solo si no es el remitente
         if mensaje.remitente != request.user:
-            mensaje.marcar_como_leido()
+            mensaje.marcar_como_leido(request.user)
 
             return Response({
                 'success': True,
@@ -6,9 +6,12 @@ Integración: Google Maps + Fallback Matemático + Detección de Horario.
 import googlemaps
 import logging
 import pytz
+from asgiref.sync import sync_to_async
 from decimal import Decimal
 from django.conf import settings
 from django.utils import timezone
+from utils.metricas import medir_llamada_externa
+from utils.vistas_async import cliente_http
 from math import radians, cos, sin, asin, sqrt
 
 from .models import (
@@ -21,6 +24,9 @@ from .models import (
 
 logger = logging.getLogger("envios")
 
+GOOGLE_MAPS_BASE_URL = getattr(settings, "GOOGLE_MAPS_BASE_URL", "https://maps.googleapis.com")
+DISTANCE_MATRIX_PATH = "/maps/api/distancematrix/json"
+
 
 class CalculadoraEnvioService:
     """
@@ -44,7 +50,39 @@ class CalculadoraEnvioService:
         1. Delivery (Comida): Calcula desde Hub (Baños/Tena) -> Cliente.
         2. Courier (Paquete): Calcula desde Cliente A -> Cliente B.
         """
-        
+        ruta = cls._preparar_ruta(lat_destino, lng_destino, lat_origen, lng_origen, tipo_servicio)
+
+        # Calcular Distancia (Google Maps PRIORITARIO, fallback SOLO en caso de error)
+        try:
+            distancia = cls._distancia_google_maps(ruta)
+        except Exception as e:
+            distancia = cls._distancia_fallback(ruta, e)
+
+        return cls._armar_cotizacion(ruta, distancia)
+
+    @classmethod
+    async def acotizar_envio(cls, lat_destino, lng_destino, lat_origen=None, lng_origen=None, tipo_servicio="delivery"):
+        """
+        Igual que `cotizar_envio`, para vistas async: la consulta a Google
+        Maps se hace con httpx sin bloquear el event loop.
+        """
+        ruta = await sync_to_async(cls._preparar_ruta)(
+            lat_destino, lng_destino, lat_origen, lng_origen, tipo_servicio
+        )
+
+        try:
+            distancia = await cls._adistancia_google_maps(ruta)
+        except Exception as e:
+            distancia = cls._distancia_fallback(ruta, e)
+
+        return cls._armar_cotizacion(ruta, distancia)
+
+    @classmethod
+    def _preparar_ruta(cls, lat_destino, lng_destino, lat_origen, lng_origen, tipo_servicio):
+        """
+        Puntos A y B y toda la configuración de BD/caché que necesita la
+        cotización, para que el resto del cálculo no haga consultas.
+        """
         # 1. DEFINICIÓN DE PUNTOS A y B
         es_courier = (tipo_servicio == 'courier')
         
@@ -62,57 +100,98 @@ class CalculadoraEnvioService:
             ciudad_nombre = hub_origen["nombre"]
             radio_cobertura = hub_origen["radio_max_cobertura_km"]
 
-        config_envios = cls._obtener_configuracion()
+        return {
+            "es_courier": es_courier,
+            "tipo_servicio": tipo_servicio,
+            "origen": (origen_lat, origen_lng),
+            "destino": (lat_destino, lng_destino),
+            "ciudad_nombre": ciudad_nombre,
+            "radio_cobertura": radio_cobertura,
+            "config": cls._obtener_configuracion(),
+            "zonas": None if es_courier else cls._obtener_zonas_configuradas(),
+        }
 
-        distancia_km = Decimal("0.0")
-        tiempo_mins = 0
-        metodo_calculo = "Google Maps API"
-        usa_fallback = False
-        error_maps = None
+    @staticmethod
+    def _leer_distance_matrix(resultado, ciudad_nombre):
+        """(distancia_km, tiempo_mins) de una respuesta de Distance Matrix."""
+        if resultado["status"] != "OK":
+            raise Exception(f"Error en respuesta de API: {resultado['status']}")
+
+        elemento = resultado["rows"][0]["elements"][0]
+        if elemento["status"] != "OK":
+            raise Exception(f"Ruta no disponible: {elemento['status']}")
+
+        distancia_km = Decimal(elemento["distance"]["value"]) / Decimal(1000)
+        tiempo_mins = int(elemento["duration"]["value"] / 60)
+        logger.info(f"Google Maps: {distancia_km}km desde {ciudad_nombre}")
+        return {
+            "distancia_km": distancia_km,
+            "tiempo_mins": tiempo_mins,
+            "metodo_calculo": "Google Maps API",
+            "error_maps": None,
+        }
 
-        # 2. Calcular Distancia (Google Maps PRIORITARIO)
-        try:
-            api_key = getattr(settings, "GOOGLE_MAPS_API_KEY", None)
-            if not api_key:
-                raise ValueError("GOOGLE_MAPS_API_KEY no configurada en settings")
+    @staticmethod
+    def _api_key_maps():
+        api_key = getattr(settings, "GOOGLE_MAPS_API_KEY", None)
+        if not api_key:
+            raise ValueError("GOOGLE_MAPS_API_KEY no configurada en settings")
+        return api_key
 
-            gmaps = googlemaps.Client(key=api_key)
+    @classmethod
+    def _distancia_google_maps(cls, ruta):
+        gmaps = googlemaps.Client(key=cls._api_key_maps(), base_url=GOOGLE_MAPS_BASE_URL)
 
+        with medir_llamada_externa("google_maps", "distance_matrix"):
             resultado = gmaps.distance_matrix(
-                origins=[(origen_lat, origen_lng)],
-                destinations=[(lat_destino, lng_destino)],
+                origins=[ruta["origen"]],
+                destinations=[ruta["destino"]],
                 mode="driving",
                 language="es",
                 units="metric",
             )
+        return cls._leer_distance_matrix(resultado, ruta["ciudad_nombre"])
 
-            if resultado["status"] == "OK":
-                elemento = resultado["rows"][0]["elements"][0]
-                if elemento["status"] == "OK":
-                    metros = elemento["distance"]["value"]
-                    segundos = elemento["duration"]["value"]
-                    distancia_km = Decimal(metros) / Decimal(1000)
-                    tiempo_mins = int(segundos / 60)
-                    logger.info(f"Google Maps: {distancia_km}km desde {ciudad_nombre}")
-                else:
-                    raise Exception(f"Ruta no disponible: {elemento['status']}")
-            else:
-                raise Exception(f"Error en respuesta de API: {resultado['status']}")
+    @classmethod
+    async def _adistancia_google_maps(cls, ruta):
+        params = {
+            "origins": "%s,%s" % ruta["origen"],
+            "destinations": "%s,%s" % ruta["destino"],
+            "mode": "driving",
+            "language": "es",
+            "units": "metric",
+            "key": cls._api_key_maps(),
+        }
+        with medir_llamada_externa("google_maps", "distance_matrix"):
+            respuesta = await cliente_http().get(f"{GOOGLE_MAPS_BASE_URL}{DISTANCE_MATRIX_PATH}", params=params)
+            respuesta.raise_for_status()
+        return cls._leer_distance_matrix(respuesta.json(), ruta["ciudad_nombre"])
 
-        except Exception as e:
-            usa_fallback = True
-            error_maps = str(e)
-            logger.error(
-                f"⚠️ Error Google Maps: {e}. Usando cálculo matemático de respaldo."
-            )
-            # Fallback matemático SOLO en caso de error
-            distancia_km = cls._calcular_fallback_haversine(
-                origen_lat, origen_lng, lat_destino, lng_destino
-            )
-            tiempo_mins = int(distancia_km * 5) + 5
-            metodo_calculo = f"Estimación Matemática ({ciudad_nombre})"
+    @classmethod
+    def _distancia_fallback(cls, ruta, error):
+        logger.error(
+            f"⚠️ Error Google Maps: {error}. Usando cálculo matemático de respaldo."
+        )
+        distancia_km = cls._calcular_fallback_haversine(*ruta["origen"], *ruta["destino"])
+        return {
+            "distancia_km": distancia_km,
+            "tiempo_mins": int(distancia_km * 5) + 5,
+            "metodo_calculo": f"Estimación Matemática ({ruta['ciudad_nombre']})",
+            "error_maps": str(error),
+        }
 
-        if es_courier:
+    @classmethod
+    def _armar_cotizacion(cls, ruta, distancia):
+        """Costos, recargos y advertencias (sin I/O)."""
+        distancia_km = distancia["distancia_km"]
+        tiempo_mins = distancia["tiempo_mins"]
+        usa_fallback = distancia["error_maps"] is not None
+        ciudad_nombre = ruta["ciudad_nombre"]
+        radio_cobertura = ruta["radio_cobertura"]
+        tipo_servicio = ruta["tipo_servicio"]
+        lat_destino, lng_destino = ruta["destino"]
+
+        if ruta["es_courier"]:
             # --- FÓRMULA LINEAL PARA COURIER ---
             # Precio = Base + (Km * Precio)
             tarifa_base = cls.COURIER_TARIFA_BASE
@@ -126,7 +205,7 @@ class CalculadoraEnvioService:
             
         else:
             # 4. Calcular Costos Base + Distancia (según zona) - MODO DELIVERY
-            zona_actual = cls._determinar_zona(distancia_km)
+            zona_actual = cls._determinar_zona(distancia_km, ruta["zonas"])
             tarifa_base = zona_actual["tarifa_base"]
             km_incluidos = zona_actual["km_incluidos"]
             precio_km_extra = zona_actual["precio_km_extra"]
@@ -140,6 +219,7 @@ class CalculadoraEnvioService:
                 costo_total += costo_extra_km
 
         # 5. Aplicar Recargo Nocturno
+        config_envios = ruta["config"]
         es_noche = cls._es_horario_nocturno(config_envios)
         valor_nocturno = Decimal("0.00")
 
@@ -160,7 +240,7 @@ class CalculadoraEnvioService:
             "zona_destino": zona_actual.get("codigo", "courier"),
             "zona_nombre": zona_actual.get("nombre_display", "Tarifa por Distancia"),
             "es_horario_nocturno": es_noche,
-            "metodo_calculo": metodo_calculo,
+            "metodo_calculo": distancia["metodo_calculo"],
             "tipo_servicio": tipo_servicio,
             "ganancia_repartidor_estimada": float(round(costo_total, 2)), # Por ahora 100%
             "comision_app_estimada": 0.0,
@@ -170,7 +250,7 @@ class CalculadoraEnvioService:
         # Agregar advertencia si se usó fallback
         if usa_fallback:
             resultado_dict["advertencia_calculo"] = (
-                f"No se pudo calcular la distancia con Google Maps ({error_maps}). "
+                f"No se pudo calcular la distancia con Google Maps ({distancia['error_maps']}). "
                 f"Se usó cálculo matemático de respaldo. La distancia puede variar de la real."
             )
             logger.warning(
@@ -209,17 +289,19 @@ class CalculadoraEnvioService:
         return mejor_ciudad or ciudades[0]
 
     @classmethod
-    def _determinar_zona(cls, distancia_km):
+    def _determinar_zona(cls, distancia_km, zonas=None):
         """
         Determina la zona tarifaria basándose en la distancia desde el hub.
 
         Args:
             distancia_km: Distancia en kilómetros desde el centro de la ciudad
+            zonas: Zonas ya cargadas (si no, se consultan)
 
         Returns:
             dict: Configuración completa de la zona aplicable
         """
-        zonas = cls._obtener_zonas_configuradas()
+        if zonas is None:
+            zonas = cls._obtener_zonas_configuradas()
         distancia = Decimal(str(distancia_km))
 
         for zona in zonas:
@@ -1,11 +1,13 @@
 # envios/tests.py
-from django.test import TestCase
+import httpx
+from asgiref.sync import async_to_sync
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from rest_framework.test import APIClient
 from rest_framework import status
 from decimal import Decimal
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 
 from .services import CalculadoraEnvioService
 
@@ -186,6 +188,49 @@ class CalculadoraServiceTest(TestCase):
         self.assertIn('fuera del radio', resultado['advertencia'].lower())
 
 
+class CotizacionAsyncTest(TestCase):
+    """
+    Camino async (acotizar_envio): Distance Matrix por httpx, sin bloquear
+    el event loop. Se simula el upstream con httpx.MockTransport.
+    """
+
+    def _cliente(self, handler):
+        return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    @override_settings(GOOGLE_MAPS_API_KEY='clave-test')
+    def test_cotizacion_async_usa_distance_matrix(self):
+        solicitudes = []
+
+        def handler(request):
+            solicitudes.append(request)
+            return httpx.Response(200, json={
+                'status': 'OK',
+                'rows': [{'elements': [{'status': 'OK', 'distance': {'value': 10000}, 'duration': {'value': 1200}}]}]
+            })
+
+        with patch('envios.services.cliente_http', return_value=self._cliente(handler)):
+            resultado = async_to_sync(CalculadoraEnvioService.acotizar_envio)(-1.3964, -78.4247)
+
+        self.assertEqual(len(solicitudes), 1)
+        self.assertEqual(solicitudes[0].url.path, '/maps/api/distancematrix/json')
+        self.assertEqual(solicitudes[0].url.params['key'], 'clave-test')
+        self.assertEqual(resultado['distancia_km'], 10.0)
+        self.assertEqual(resultado['tiempo_mins'], 20)
+        self.assertTrue(resultado['usa_google_maps'])
+
+    @override_settings(GOOGLE_MAPS_API_KEY='clave-test')
+    def test_cotizacion_async_fallback_si_upstream_falla(self):
+        def handler(request):
+            return httpx.Response(503)
+
+        with patch('envios.services.cliente_http', return_value=self._cliente(handler)):
+            resultado = async_to_sync(CalculadoraEnvioService.acotizar_envio)(-1.4000, -78.4300)
+
+        self.assertFalse(resultado['usa_google_maps'])
+        self.assertIn('Estimación', resultado['metodo_calculo'])
+        self.assertIn('advertencia_calculo', resultado)
+
+
 class CotizarEnvioViewTest(TestCase):
     """
     Pruebas de integración para el Endpoint (API).
@@ -210,7 +255,7 @@ class CotizarEnvioViewTest(TestCase):
         response = client_sin_auth.post(self.url, {})
         self.assertIn(response.status_code, [status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN])
 
-    @patch('envios.views.CalculadoraEnvioService.cotizar_envio')
+    @patch('envios.views.CalculadoraEnvioService.acotizar_envio', new_callable=AsyncMock)
     def test_cotizacion_exitosa(self, mock_servicio):
         """
         Petición válida con token debe devolver 200 OK y datos.
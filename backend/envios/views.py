@@ -25,10 +25,11 @@ from .serializers import (
     ConfiguracionEnviosSerializer,
 )
 from .services import CalculadoraEnvioService
+from utils.vistas_async import AsyncAPIView
 
 logger = logging.getLogger('envios')
 
-class CotizarEnvioView(APIView):
+class CotizarEnvioView(AsyncAPIView):
     """
     Endpoint: POST /api/envios/cotizar/
     Calcula el costo de envío.
@@ -37,10 +38,12 @@ class CotizarEnvioView(APIView):
     1. Recibe coordenadas de destino.
     2. El servicio detecta automáticamente el Hub más cercano (Baños o Tena).
     3. Devuelve tarifa base + extras.
+
+    Vista async: la consulta a Google Maps no ocupa un hilo bajo ASGI.
     """
     permission_classes = [IsAuthenticated]
 
-    def post(self, request):
+    async def post(self, request):
         try:
             # 1. Validar entrada de datos
             # El serializer verifica que lat_destino y lng_destino existan y sean números
@@ -54,7 +57,7 @@ class CotizarEnvioView(APIView):
 
             # 2. Llamar al servicio lógico (CORREGIDO)
             # Pasamos TODOS los parámetros, incluyendo los nuevos opcionales para courier
-            resultado = CalculadoraEnvioService.cotizar_envio(
+            resultado = await CalculadoraEnvioService.acotizar_envio(
                 lat_destino=data['lat_destino'],
                 lng_destino=data['lng_destino'],
                 lat_origen=data.get('lat_origen'), # Nuevo: Puede ser None
@@ -0,0 +1,120 @@
+# gunicorn.conf.py
+"""
+Servidor de producción: gunicorn con workers uvicorn (ASGI).
+
+    gunicorn -c gunicorn.conf.py            # usa wsgi_app (settings.asgi)
+
+Con ASGI las vistas async (utils/vistas_async.py: cotización de envíos,
+login con Google, push de prueba) esperan a los servicios externos sin
+ocupar un hilo; las vistas síncronas siguen funcionando vía sync_to_async.
+
+- La app se carga y se calienta en el master antes del fork
+  (settings/calentamiento.py): los workers nacen con URLconf, vistas,
+  serializers y Firebase ya importados y comparten esa memoria
+  (copy-on-write, con gc.freeze para que el GC no toque esas páginas).
+- Workers según las CPUs disponibles (respeta el límite del contenedor).
+- Cada worker se recicla tras GUNICORN_MAX_REQUESTS solicitudes (con
+  jitter para que no se reinicien todos a la vez).
+
+`python manage.py medir_arranque` mide arranque en frío y memoria por worker.
+"""
+
+import gc
+import math
+import os
+
+# ==========================================
+# CPUs Y WORKERS
+# ==========================================
+
+
+def _cpus():
+    """CPUs utilizables por el proceso (afinidad y cuota de cgroup, p. ej. `cpus: 2.0`)."""
+    cpus = len(os.sched_getaffinity(0))
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            cuota, periodo = f.read().split()
+        if cuota != "max":
+            cpus = min(cpus, max(1, math.ceil(int(cuota) / int(periodo))))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+def _activo(variable, defecto):
+    return os.getenv(variable, defecto).lower() in ("true", "1", "yes")
+
+
+CPUS = _cpus()
+
+wsgi_app = os.getenv("GUNICORN_APP", "settings.asgi:application")
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "uvicorn_worker.UvicornWorker")
+
+if worker_class == "gthread":
+    # WSGI con hilos: las vistas bloquean su hilo mientras esperan I/O
+    workers = int(os.getenv("GUNICORN_WORKERS", CPUS * 2 + 1))
+    threads = int(os.getenv("GUNICORN_THREADS", "4"))
+else:
+    # Un event loop por CPU; el código síncrono corre en los hilos de sync_to_async
+    workers = int(os.getenv("GUNICORN_WORKERS", CPUS + 1))
+
+# ==========================================
+# CICLO DE VIDA DE LOS WORKERS
+# ==========================================
+
+preload_app = _activo("GUNICORN_PRELOAD", "true")
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "1000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", str(max_requests // 10)))
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+
+# Heartbeat de los workers en memoria (en contenedores /tmp puede ser overlayfs)
+worker_tmp_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+accesslog = None  # El log de solicitudes lo escribe LogAPIRequestsMiddleware
+errorlog = "-"
+loglevel = os.getenv("GUNICORN_LOG_LEVEL", "info")
+
+# ==========================================
+# HOOKS
+# ==========================================
+
+
+def _calentar(log):
+    from django.conf import settings
+
+    from settings.calentamiento import calentar
+
+    resumen = calentar()
+    log.info(
+        "Modo: %s | calentamiento en %.2fs (%d módulos)",
+        settings.MODO_EJECUCION, resumen["segundos"], resumen["modulos"],
+    )
+
+
+def when_ready(server):
+    # Con preload la app ya está importada en el master: calentar antes del fork
+    if server.cfg.preload_app:
+        _calentar(server.log)
+        # Lo importado hasta aquí queda fuera del GC: sus páginas se comparten con los workers
+        gc.freeze()
+    server.log.info(
+        "%d workers %s (%d CPUs), max_requests=%d",
+        server.cfg.workers, server.cfg.worker_class_str, CPUS, server.cfg.max_requests,
+    )
+
+
+def post_worker_init(worker):
+    if not worker.cfg.preload_app:
+        _calentar(worker.log)
+
+
+def child_exit(server, worker):
+    # Métricas multiproceso: los gauges del worker muerto dejan de contarse
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
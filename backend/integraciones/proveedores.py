@@ -1,24 +1,37 @@
+import asyncio
 import logging
-import time
 import random
 
+from asgiref.sync import async_to_sync
+
 logger = logging.getLogger('integraciones')
 
-def sincronizar_pedido(pedido):
+async def asincronizar_pedido(pedido):
     """
     Simula una petición API al sistema externo del proveedor.
+
+    Async: la espera al proveedor no bloquea el event loop (bajo ASGI otras
+    solicitudes siguen atendiéndose mientras tanto).
     """
-    logger.info(f"[INTEGRACIÓN] Conectando con sistema de {pedido.proveedor.nombre}...")
-    
+    from proveedores.models import Proveedor
+
+    proveedor = await Proveedor.objects.only('nombre').aget(pk=pedido.proveedor_id)
+    logger.info(f"[INTEGRACIÓN] Conectando con sistema de {proveedor.nombre}...")
+
     # Simular latencia de red
-    time.sleep(0.5)
-    
+    await asyncio.sleep(0.5)
+
     # Simular respuesta exitosa
     external_id = f"EXT-{pedido.id}-{random.randint(1000, 9999)}"
     logger.info(f"[INTEGRACIÓN] Pedido #{pedido.id} sincronizado. ID Externo: {external_id}")
-    
+
     return {
         'sincronizado': True,
         'external_id': external_id,
         'status_remoto': 'RECEIVED'
-    }
\ No newline at end of file
+    }
+
+
+def sincronizar_pedido(pedido):
+    """Versión síncrona de `asincronizar_pedido` (Celery, código WSGI)."""
+    return async_to_sync(asincronizar_pedido)(pedido)
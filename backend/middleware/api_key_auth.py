@@ -6,6 +6,8 @@ from django.http import JsonResponse
 from django.utils.deprecation import MiddlewareMixin
 from django.conf import settings
 
+from .rutas import PREFIJOS_PUBLICOS, PREFIJOS_SOLO_ADMIN, PUBLICA, RUTAS_PUBLICAS, SOLO_ADMIN, ruta_de
+
 logger = logging.getLogger('api_logger')
 
 
@@ -22,40 +24,9 @@ class ApiKeyAuthenticationMiddleware(MiddlewareMixin):
     Esto permite que los tests usen force_authenticate() sin API Key.
     """
 
-    # Rutas que NO requieren ni API Key ni JWT
-    PUBLIC_PREFIXES = (
-        '/admin/',
-        '/api/auth/login/',
-        '/api/auth/registro/',
-        '/api/auth/google-login/',
-        '/api/auth/token/',
-        '/api/auth/solicitar-codigo',
-        '/api/auth/verificar-codigo',
-        '/api/auth/reset-password',
-        '/accounts/',
-        '/static/',  
-        '/media/',   
-        '/health/',
-        '/api/swagger',
-        '/api/redoc',
-        '/api/health/',
-    )
-
-    PUBLIC_EXACT_PATHS = {
-        '/',
-        '/favicon.ico',   
-        '/robots.txt',    
-        '/sitemap.xml',   
-        '/api/',         
-    }
-
-    # Rutas que requieren autenticación (API Key O JWT) pero ambos son válidos
-    PROTECTED_PREFIXES = (
-        '/api/envios/',
-        '/api/pedidos/',
-        '/api/productos/',
-        '/api/usuarios/',
-    )
+    # Clasificación compartida con el resto de middlewares (middleware/rutas.py)
+    PUBLIC_PREFIXES = PREFIJOS_PUBLICOS
+    PUBLIC_EXACT_PATHS = RUTAS_PUBLICAS
 
     def __init__(self, get_response):
         import sys
@@ -86,7 +57,7 @@ class ApiKeyAuthenticationMiddleware(MiddlewareMixin):
             return None
 
         # 1. Bypass endpoints completamente públicos
-        if request.path in self.PUBLIC_EXACT_PATHS or request.path.startswith(self.PUBLIC_PREFIXES):
+        if ruta_de(request) & PUBLICA:
             return None
 
         # 2. Extracción de Headers
@@ -99,29 +70,29 @@ class ApiKeyAuthenticationMiddleware(MiddlewareMixin):
             if client_type:
                 request.client_type = client_type
                 request.api_key_validated = True
-                logger.debug(f"✓ API Key válida ({client_type}): {request.path}")
+                logger.debug("✓ API Key válida (%s): %s", client_type, request.path)
                 return None
             else:
                 # API Key presente pero inválida → RECHAZAR
-                logger.warning(f"✗ API Key inválida en {request.path}")
+                logger.warning("✗ API Key inválida en %s", request.path)
                 return self._error_response('API Key inválida')
 
         # 4. ¿Tiene JWT Bearer Token? → Permitir que DRF lo valide
         if auth_header and auth_header.startswith('Bearer '):
             request.client_type = 'jwt_authenticated'
             request.api_key_validated = False
-            logger.debug(f"✓ JWT Token detectado: {request.path}")
+            logger.debug("✓ JWT Token detectado: %s", request.path)
             return None
 
         # 5. Modo DEBUG sin credenciales → Permitir (facilita desarrollo)
         if self.debug_mode:
-            logger.debug(f"DEBUG MODE: Bypass en {request.path}")
+            logger.debug("DEBUG MODE: Bypass en %s", request.path)
             request.client_type = 'debug'
             request.api_key_validated = False
             return None
 
         # 6. RECHAZO FINAL: Sin API Key ni JWT en ruta protegida
-        logger.warning(f"Acceso denegado: Sin credenciales en {request.path}")
+        logger.warning("Acceso denegado: Sin credenciales en %s", request.path)
         return self._error_response('Se requiere autenticación')
 
     def _error_response(self, reason='Credenciales inválidas'):
@@ -138,10 +109,7 @@ class ClientTypePermissionMiddleware(MiddlewareMixin):
     Solo aplica restricciones si se identificó por API Key.
     """
 
-    ADMIN_ONLY_PREFIXES = (
-        '/api/admin/',
-        '/api/reportes/',
-    )
+    ADMIN_ONLY_PREFIXES = PREFIJOS_SOLO_ADMIN
 
     def process_request(self, request):
         # Si no pasó por validación previa, ignorar
@@ -153,9 +121,9 @@ class ClientTypePermissionMiddleware(MiddlewareMixin):
             return None
 
         # Validar acceso a rutas administrativas
-        if request.path.startswith(self.ADMIN_ONLY_PREFIXES):
+        if ruta_de(request) & SOLO_ADMIN:
             if request.client_type != 'web':
-                logger.warning(f"Intento de acceso admin desde {request.client_type}: {request.path}")
+                logger.warning("Intento de acceso admin desde %s: %s", request.client_type, request.path)
                 return JsonResponse({
                     'error': 'Acceso restringido a clientes administrativos.',
                     'status': 'forbidden',
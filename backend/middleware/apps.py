@@ -0,0 +1,7 @@
+# middleware/apps.py
+from django.apps import AppConfig
+
+
+class MiddlewareConfig(AppConfig):
+    name = 'middleware'
+    verbose_name = 'Middleware e Instrumentación'
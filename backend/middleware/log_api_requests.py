@@ -1,81 +1,130 @@
 import logging
+import random
 import time
-import json
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
 from django.conf import settings
-from django.utils.deprecation import MiddlewareMixin
+from django.utils.functional import SimpleLazyObject, empty
 
-logger = logging.getLogger('api_logger')
+from utils.log_cola import RegistroEnCola, salida_json
+from .rutas import SIN_LOG, ruta_de
 
-class LogAPIRequestsMiddleware(MiddlewareMixin):
+# Registro estructurado de solicitudes (una línea JSON por solicitud)
+solicitudes_logger = logging.getLogger('api_logger.solicitudes')
+
+MENSAJE = 'REQ+RES %(metodo)s %(path)s | %(status)s | %(duracion_ms)sms'
+
+cola = RegistroEnCola(solicitudes_logger, MENSAJE, maxsize=int(getattr(settings, 'API_LOG_COLA_MAX', 10000)))
+
+
+class LogAPIRequestsMiddleware:
     """
     Middleware para logging estructurado de peticiones HTTP.
     Optimizado para producción.
+
+    - Las rutas ignoradas (API_LOG_IGNORED_PATHS) no pagan nada más que la
+      clasificación memorizada del path (middleware/rutas.py).
+    - Nada se calcula si el nivel no está habilitado; las respuestas 2xx/3xx
+      rápidas se muestrean con API_LOG_MUESTREO (4xx, 5xx y las más lentas
+      que API_LOG_LENTO_MS se registran siempre).
+    - El registro es un dict que se encola; el LogRecord se crea y se
+      serializa a JSON en un hilo de fondo (utils/log_cola.py).
     """
 
-    async_mode = False  # Django 5.1+
+    sync_capable = True
+    async_capable = True
 
     def __init__(self, get_response):
         self.get_response = get_response
-        
-        self.log_body = getattr(settings, 'API_LOG_BODY', False)
-        self.body_max_length = getattr(settings, 'API_LOG_BODY_MAX_LENGTH', 1000)
-        self.colorize = getattr(settings, 'API_LOG_COLORIZE', settings.DEBUG)
-        
-        self.ignored_paths = tuple(getattr(settings, 'API_LOG_IGNORED_PATHS', [
-            '/admin', '/static', '/media', '/favicon.ico', '/__debug__', '/health'
-        ]))
-
-        self.sensitive_fields = {
-            'password', 'token', 'secret', 'api_key', 'credit_card',
-            'access', 'refresh'
-        }
-
-    def process_request(self, request):
-        if request.path.startswith(self.ignored_paths):
-            return None
-
-        request.start_time = time.time()
-
-        return None
-
-    def process_response(self, request, response):
-        if not hasattr(request, 'start_time'):
-            return response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+        self.muestreo = float(getattr(settings, 'API_LOG_MUESTREO', 1.0))
+        self.lento_ms = float(getattr(settings, 'API_LOG_LENTO_MS', 1000))
+        self.en_cola = getattr(settings, 'API_LOG_COLA', True)
+
+        nivel = getattr(settings, 'API_LOG_NIVEL', '')
+        if nivel:
+            solicitudes_logger.setLevel(nivel)
+        salida_json(solicitudes_logger)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if ruta_de(request) & SIN_LOG:
+            return self.get_response(request)
+
+        inicio = time.perf_counter()
+        response = self.get_response(request)
+        self._registrar(request, response, inicio)
+        return response
 
-        duration = time.time() - request.start_time
+    async def __acall__(self, request):
+        if ruta_de(request) & SIN_LOG:
+            return await self.get_response(request)
 
-        # ✔ Ahora sí: usuario ya autenticado por DRF
-        user = "Anonymous"
-        if hasattr(request, "user") and request.user and request.user.is_authenticated:
-            user = getattr(request.user, "email", None) or request.user.username
+        inicio = time.perf_counter()
+        response = await self.get_response(request)
+        self._registrar(request, response, inicio, resolver_usuario=False)
+        return response
 
-        ip = self._get_client_ip(request)
+    def _registrar(self, request, response, inicio, resolver_usuario=True):
+        duracion_ms = (time.perf_counter() - inicio) * 1000
 
         status_code = response.status_code
-        duration_ms = duration * 1000
-        
-        size_info = "Streaming" if getattr(response, "streaming", False) else self._format_size(len(response.content))
-
-        log_msg = f"REQ+RES {request.method} {request.path} | User: {user} | IP: {ip} | {status_code} | {duration_ms:.2f}ms | {size_info}"
-
         if status_code >= 500:
-            logger.error(log_msg)
+            nivel = logging.ERROR
         elif status_code >= 400:
-            logger.warning(log_msg)
+            nivel = logging.WARNING
         else:
-            logger.info(log_msg)
+            nivel = logging.INFO
 
-        return response
+        if not solicitudes_logger.isEnabledFor(nivel):
+            return
+        if (nivel == logging.INFO and duracion_ms < self.lento_ms
+                and self.muestreo < 1 and random.random() >= self.muestreo):
+            return
+
+        datos = self._datos(request, response, duracion_ms, resolver_usuario)
+        if self.en_cola:
+            cola.registrar(nivel, datos)
+        else:
+            solicitudes_logger.log(nivel, MENSAJE, datos, extra={'datos': datos})
+
+    def _datos(self, request, response, duracion_ms, resolver_usuario=True):
+        user = self._usuario(request, resolver_usuario)
+        match = getattr(request, 'resolver_match', None)
+        return {
+            'metodo': request.method,
+            'path': request.path,
+            'vista': match.view_name if match else None,
+            'status': response.status_code,
+            'duracion_ms': round(duracion_ms, 2),
+            'bytes': self._tamano(response),
+            'usuario_id': user.pk if user is not None and user.is_authenticated else None,
+            'ip': self._get_client_ip(request),
+            'cliente': getattr(request, 'client_type', None),
+        }
+
+    def _usuario(self, request, resolver):
+        """
+        request.user: DRF ya lo deja resuelto. El perezoso de
+        AuthenticationMiddleware (sesión) solo se resuelve en modo síncrono;
+        en el event loop consultaría la BD (SynchronousOnlyOperation).
+        """
+        user = getattr(request, 'user', None)
+        if resolver or not isinstance(user, SimpleLazyObject):
+            return user
+        return None if user._wrapped is empty else user._wrapped
+
+    def _tamano(self, response):
+        if getattr(response, 'streaming', False):
+            return None
+        longitud = response.get('Content-Length')
+        return int(longitud) if longitud else len(response.content)
 
     def _get_client_ip(self, request):
         x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
         if x_forwarded_for:
             return x_forwarded_for.split(',')[0].strip()
         return request.META.get('HTTP_X_REAL_IP') or request.META.get('REMOTE_ADDR', 'unknown')
-
-    def _format_size(self, size_bytes):
-        for unit in ['B', 'KB', 'MB', 'GB']:
-            if size_bytes < 1024:
-                return f"{size_bytes:.2f} {unit}"
-            size_bytes /= 1024
-        return f"{size_bytes:.2f} TB"
@@ -0,0 +1,69 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+
+from middleware.api_key_auth import ApiKeyAuthenticationMiddleware
+from middleware.log_api_requests import LogAPIRequestsMiddleware, cola, solicitudes_logger
+
+
+class Command(BaseCommand):
+    help = (
+        'Micro-benchmark del costo por solicitud de ApiKeyAuthenticationMiddleware + '
+        'LogAPIRequestsMiddleware sobre una vista vacía (rutas públicas, ignoradas y de API)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iteraciones', type=int, default=20000)
+
+    def _medir(self, llamable, request, iteraciones, repeticiones=5):
+        """Mejor de `repeticiones` corridas, en ns por solicitud."""
+        mejor = float('inf')
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            for _ in range(iteraciones):
+                # Sin la clasificación de una solicitud anterior
+                request.__dict__.pop('_ruta', None)
+                llamable(request)
+            mejor = min(mejor, time.perf_counter() - inicio)
+        return mejor / iteraciones * 1e9
+
+    def handle(self, *args, **options):
+        iteraciones = options['iteraciones']
+        respuesta = HttpResponse(b'{}', content_type='application/json')
+
+        def vista(request):
+            return respuesta
+
+        factory = RequestFactory()
+        escenarios = [
+            ('ruta pública e ignorada', factory.get('/static/app.js'), logging.INFO, 1.0),
+            ('API, log INFO deshabilitado', factory.get('/api/productos/', HTTP_AUTHORIZATION='Bearer x'), logging.WARNING, 1.0),
+            ('API, muestreo 1%', factory.get('/api/productos/', HTTP_AUTHORIZATION='Bearer x'), logging.INFO, 0.01),
+            ('API, registrada (cola)', factory.get('/api/productos/', HTTP_AUTHORIZATION='Bearer x'), logging.INFO, 1.0),
+        ]
+
+        # Los registros van a la cola de fondo con un destino nulo
+        handlers, nivel, propagar = solicitudes_logger.handlers[:], solicitudes_logger.level, solicitudes_logger.propagate
+        solicitudes_logger.handlers = [logging.NullHandler()]
+        solicitudes_logger.propagate = False
+        try:
+            base = self._medir(vista, escenarios[0][1], iteraciones)
+            self.stdout.write(f"Vista sin middlewares: {base:,.0f} ns/solicitud")
+            for nombre, request, nivel_log, muestreo in escenarios:
+                solicitudes_logger.setLevel(nivel_log)
+                with override_settings(API_LOG_MUESTREO=muestreo, API_LOG_LENTO_MS=1e9):
+                    cadena = ApiKeyAuthenticationMiddleware(LogAPIRequestsMiddleware(vista))
+                    cadena.testing_mode = False
+                    cadena.debug_mode = True
+                    total = self._medir(cadena, request, iteraciones)
+                self.stdout.write(f"{nombre}: {total - base:,.0f} ns/solicitud de overhead")
+            cola.vaciar()
+            if cola.descartados:
+                self.stdout.write(f"Registros descartados por cola llena: {cola.descartados}")
+        finally:
+            solicitudes_logger.handlers = handlers
+            solicitudes_logger.setLevel(nivel)
+            solicitudes_logger.propagate = propagar
@@ -0,0 +1,203 @@
+# middleware/perfilador_sql.py
+
+import hmac
+import json
+import logging
+import random
+import re
+import sys
+import time
+import uuid
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.utils import timezone
+
+from utils import observador_sql
+
+logger = logging.getLogger('api_logger')
+
+# Literales e IN-lists que hacen distintas a consultas con la misma forma
+_RE_IN = re.compile(r'\bIN\s*\((?:\s*%s\s*,?)+\)', re.IGNORECASE)
+_RE_CADENA = re.compile(r"'(?:[^']|'')*'")
+_RE_NUMERO = re.compile(r'\b\d+(?:\.\d+)?\b')
+_RE_ESPACIOS = re.compile(r'\s+')
+
+
+def normalizar_sql(sql):
+    """SQL sin literales ni tamaño de IN-lists, para agrupar consultas repetidas."""
+    sql = _RE_IN.sub('IN (...)', sql)
+    sql = _RE_CADENA.sub('?', sql)
+    sql = _RE_NUMERO.sub('?', sql)
+    return _RE_ESPACIOS.sub(' ', sql).strip()
+
+
+# Frames de la instrumentación, fuera de las pilas reportadas
+_PROPIOS = (__file__, observador_sql.__file__)
+
+
+class _Registro:
+    """execute_wrapper que guarda (sql normalizado, pila de la app, duración) por consulta."""
+
+    def __init__(self, raiz, max_grupos, profundidad):
+        self.raiz = raiz
+        self.max_grupos = max_grupos
+        self.profundidad = profundidad
+        self.grupos = {}
+        self.total = 0
+        self.duracion = 0.0
+
+    def _pila(self):
+        """Frames del código del proyecto (sin site-packages ni este módulo), del más interno al externo."""
+        pila = []
+        frame = sys._getframe(3)
+        while frame and len(pila) < self.profundidad:
+            archivo = frame.f_code.co_filename
+            if archivo.startswith(self.raiz) and 'site-packages' not in archivo and archivo not in _PROPIOS:
+                pila.append(f"{archivo[len(self.raiz):].lstrip('/')}:{frame.f_lineno} {frame.f_code.co_name}")
+            frame = frame.f_back
+        return tuple(pila)
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self._anotar(sql, time.perf_counter() - inicio)
+
+    def _anotar(self, sql, duracion):
+        self.total += 1
+        self.duracion += duracion
+        clave = (normalizar_sql(sql), self._pila())
+        grupo = self.grupos.get(clave)
+        if grupo is None:
+            if len(self.grupos) >= self.max_grupos:
+                return
+            grupo = self.grupos[clave] = {'veces': 0, 'ms': 0.0}
+        grupo['veces'] += 1
+        grupo['ms'] += duracion * 1000
+
+
+class PerfiladorSQLMiddleware:
+    """
+    Perfilador de consultas SQL por solicitud, desactivado por defecto.
+
+    Se activa por solicitud con el header `X-Perfilar-SQL: <PERFILADOR_SQL_TOKEN>`
+    (en DEBUG basta cualquier valor) o por muestreo con
+    PERFILADOR_SQL_MUESTREO (0.0-1.0). Agrupa las consultas por SQL
+    normalizado y pila de llamadas del proyecto; un grupo que se repite
+    PERFILADOR_SQL_UMBRAL_N1 veces o más se marca como N+1.
+
+    El resumen va a `api_logger` y, si PERFILADOR_SQL_DIRECTORIO está
+    configurado, el detalle se escribe como JSON. Nunca se guardan los
+    parámetros de las consultas.
+
+    Las consultas se observan con utils/observador_sql.py, también bajo
+    ASGI (vistas en los hilos de sync_to_async).
+    """
+
+    HEADER = 'HTTP_X_PERFILAR_SQL'
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        self.token = getattr(settings, 'PERFILADOR_SQL_TOKEN', '')
+        self.muestreo = float(getattr(settings, 'PERFILADOR_SQL_MUESTREO', 0))
+        self.umbral_n1 = int(getattr(settings, 'PERFILADOR_SQL_UMBRAL_N1', 5))
+        self.max_grupos = int(getattr(settings, 'PERFILADOR_SQL_MAX_GRUPOS', 500))
+        self.profundidad = int(getattr(settings, 'PERFILADOR_SQL_PROFUNDIDAD_PILA', 4))
+        directorio = getattr(settings, 'PERFILADOR_SQL_DIRECTORIO', '')
+        self.directorio = Path(directorio) if directorio else None
+        self.raiz = str(settings.BASE_DIR)
+
+    def _activo(self, request):
+        header = request.META.get(self.HEADER)
+        if header:
+            if self.token:
+                return hmac.compare_digest(header.encode(), self.token.encode())
+            return settings.DEBUG
+        return self.muestreo > 0 and random.random() < self.muestreo
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self._activo(request):
+            return self.get_response(request)
+
+        inicio = time.perf_counter()
+        with observador_sql.observar(_Registro(self.raiz, self.max_grupos, self.profundidad)) as registro:
+            response = self.get_response(request)
+        return self._terminar(request, response, registro, inicio)
+
+    async def __acall__(self, request):
+        if not self._activo(request):
+            return await self.get_response(request)
+
+        inicio = time.perf_counter()
+        with observador_sql.observar(_Registro(self.raiz, self.max_grupos, self.profundidad)) as registro:
+            response = await self.get_response(request)
+        # Puede escribir el perfil en disco: fuera del event loop
+        return await sync_to_async(self._terminar)(request, response, registro, inicio)
+
+    def _terminar(self, request, response, registro, inicio):
+        duracion_ms = (time.perf_counter() - inicio) * 1000
+        try:
+            perfil = self._perfil(request, response, registro, duracion_ms)
+            self._reportar(perfil)
+            response['X-Perfil-SQL'] = f"{perfil['id']} consultas={registro.total} n1={len(perfil['n_mas_1'])}"
+        except Exception as e:
+            # El perfilado nunca debe romper la respuesta
+            logger.error(f"Error generando perfil SQL de {request.path}: {e}")
+        return response
+
+    def _perfil(self, request, response, registro, duracion_ms):
+        grupos = sorted(
+            (
+                {'sql': sql, 'pila': list(pila), 'veces': g['veces'], 'ms': round(g['ms'], 2)}
+                for (sql, pila), g in registro.grupos.items()
+            ),
+            key=lambda g: g['ms'],
+            reverse=True,
+        )
+        match = getattr(request, 'resolver_match', None)
+        return {
+            'id': uuid.uuid4().hex[:12],
+            'fecha': timezone.now().isoformat(),
+            'metodo': request.method,
+            'path': request.path,
+            'vista': match.view_name if match else None,
+            'status': response.status_code,
+            'duracion_ms': round(duracion_ms, 2),
+            'consultas': registro.total,
+            'sql_ms': round(registro.duracion * 1000, 2),
+            'duplicadas': sum(g['veces'] - 1 for g in grupos),
+            'n_mas_1': [g for g in grupos if g['veces'] >= self.umbral_n1],
+            'grupos': grupos,
+        }
+
+    def _reportar(self, perfil):
+        resumen = (
+            f"PERFIL SQL [{perfil['id']}] {perfil['metodo']} {perfil['path']} | {perfil['status']} | "
+            f"{perfil['duracion_ms']:.2f}ms | {perfil['consultas']} consultas en {perfil['sql_ms']:.2f}ms | "
+            f"{perfil['duplicadas']} duplicadas | N+1: {len(perfil['n_mas_1'])}"
+        )
+        if perfil['n_mas_1']:
+            detalle = '\n'.join(
+                f"  x{g['veces']} {g['ms']:.2f}ms {g['sql'][:200]} <- {' < '.join(g['pila'][:2]) or '?'}"
+                for g in perfil['n_mas_1']
+            )
+            logger.warning(f"{resumen}\n{detalle}")
+        else:
+            logger.info(resumen)
+
+        if self.directorio:
+            self.directorio.mkdir(parents=True, exist_ok=True)
+            nombre = f"{timezone.now():%Y%m%dT%H%M%S}_{perfil['id']}.json"
+            with open(self.directorio / nombre, 'w', encoding='utf-8') as f:
+                json.dump(perfil, f, ensure_ascii=False, indent=2)
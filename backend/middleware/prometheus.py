@@ -0,0 +1,66 @@
+# middleware/prometheus.py
+
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from utils import metricas
+from utils.observador_sql import observar
+
+
+class PrometheusMiddleware:
+    """
+    Registra latencia, consultas SQL y tiempo en BD por vista.
+
+    La etiqueta `vista` es el nombre de la ruta resuelta (p. ej.
+    `pedidos:pedido-list`), nunca el path, para que la cardinalidad no crezca
+    con los ids. Va primero en MIDDLEWARE para medir toda la cadena.
+
+    Las consultas se cuentan con utils/observador_sql.py, así que también
+    bajo ASGI, donde corren en los hilos de sync_to_async.
+    """
+
+    IGNORED_PATHS = ('/metrics', '/health/', '/static/', '/media/', '/favicon.ico')
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if request.path.startswith(self.IGNORED_PATHS):
+            return self.get_response(request)
+
+        inicio = time.perf_counter()
+        with observar(metricas.MedidorConsultas()) as medidor:
+            response = self.get_response(request)
+        self._registrar(request, response, medidor, time.perf_counter() - inicio)
+        return response
+
+    async def __acall__(self, request):
+        if request.path.startswith(self.IGNORED_PATHS):
+            return await self.get_response(request)
+
+        inicio = time.perf_counter()
+        with observar(metricas.MedidorConsultas()) as medidor:
+            response = await self.get_response(request)
+        self._registrar(request, response, medidor, time.perf_counter() - inicio)
+        return response
+
+    def _registrar(self, request, response, medidor, duracion):
+        vista = self._vista(request)
+        metricas.HTTP_DURACION.labels(vista, request.method, response.status_code).observe(duracion)
+        metricas.DB_CONSULTAS.labels(vista).observe(medidor.consultas)
+        metricas.DB_DURACION.labels(vista).observe(medidor.duracion)
+        metricas.registrar_pool()
+
+    def _vista(self, request):
+        match = getattr(request, 'resolver_match', None)
+        return match.view_name if match else 'sin_ruta'
+
@@ -0,0 +1,52 @@
+# middleware/replica.py
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+
+from utils import replica
+
+
+class ReplicaMiddleware:
+    """
+    Contexto de enrutamiento réplica/primario por solicitud (utils/replica.py).
+
+    Si la solicitud escribió en la base de datos, el usuario queda pegado al
+    primario durante REPLICA_PEGADO_SEGUNDOS: sus siguientes lecturas no ven
+    la réplica atrasada.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        estado, token = replica.iniciar()
+        try:
+            response = self.get_response(request)
+        finally:
+            replica.terminar(token)
+        if estado.escritas and replica.replica_configurada():
+            self._pegar(request)
+        return response
+
+    async def __acall__(self, request):
+        estado, token = replica.iniciar()
+        try:
+            response = await self.get_response(request)
+        finally:
+            replica.terminar(token)
+        if estado.escritas and replica.replica_configurada():
+            # request.user puede ser perezoso (consulta la BD)
+            await sync_to_async(self._pegar)(request)
+        return response
+
+    def _pegar(self, request):
+        usuario = getattr(request, 'user', None)
+        if usuario is not None and usuario.is_authenticated:
+            replica.pegar(usuario)
@@ -0,0 +1,119 @@
+# middleware/rutas.py
+"""
+Clasificador de rutas compartido por los middlewares de API Key y de log.
+
+Las listas de prefijos se compilan una vez (una expresión regular por
+categoría) y la clasificación de cada path se memoriza en una LRU acotada:
+en las rutas frecuentes clasificar cuesta una búsqueda en un dict. El
+resultado se guarda en el request, así que los middlewares que lo consultan
+no repiten el trabajo.
+"""
+
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+# Banderas de clasificación
+PUBLICA = 1     # No requiere API Key ni JWT
+SIN_LOG = 2     # No se registra en el log de solicitudes
+SOLO_ADMIN = 4  # Restringida a clientes web cuando se identifican por API Key
+
+# Rutas que NO requieren ni API Key ni JWT
+PREFIJOS_PUBLICOS = (
+    '/admin/',
+    '/api/auth/login/',
+    '/api/auth/registro/',
+    '/api/auth/google-login/',
+    '/api/auth/token/',
+    '/api/auth/solicitar-codigo',
+    '/api/auth/verificar-codigo',
+    '/api/auth/reset-password',
+    '/accounts/',
+    '/static/',
+    '/media/',
+    '/health/',
+    '/metrics',
+    '/api/swagger',
+    '/api/redoc',
+    '/api/health/',
+)
+
+RUTAS_PUBLICAS = frozenset({
+    '/',
+    '/favicon.ico',
+    '/robots.txt',
+    '/sitemap.xml',
+    '/api/',
+})
+
+PREFIJOS_SIN_LOG = (
+    '/admin', '/static', '/media', '/favicon.ico', '/__debug__', '/health', '/metrics',
+)
+
+PREFIJOS_SOLO_ADMIN = (
+    '/api/admin/',
+    '/api/reportes/',
+)
+
+MAX_RUTAS_EN_CACHE = 4096
+
+
+def _compilar(prefijos):
+    if not prefijos:
+        return None
+    # Los más largos primero: la alternancia se detiene en la primera coincidencia
+    return re.compile('|'.join(re.escape(p) for p in sorted(prefijos, key=len, reverse=True)))
+
+
+class ClasificadorRutas:
+    """Clasifica un path en banderas PUBLICA | SIN_LOG | SOLO_ADMIN."""
+
+    def __init__(self, publicos=PREFIJOS_PUBLICOS, exactas=RUTAS_PUBLICAS,
+                 sin_log=PREFIJOS_SIN_LOG, solo_admin=PREFIJOS_SOLO_ADMIN,
+                 max_cache=MAX_RUTAS_EN_CACHE):
+        self._reglas = [
+            (bandera, _compilar(prefijos), frozenset(rutas))
+            for bandera, prefijos, rutas in (
+                (PUBLICA, tuple(publicos), exactas),
+                (SIN_LOG, tuple(sin_log), ()),
+                (SOLO_ADMIN, tuple(solo_admin), ()),
+            )
+        ]
+        self.clasificar = lru_cache(maxsize=max_cache)(self._clasificar)
+
+    def _clasificar(self, path):
+        banderas = 0
+        for bandera, patron, rutas in self._reglas:
+            if path in rutas or (patron is not None and patron.match(path)):
+                banderas |= bandera
+        return banderas
+
+
+_clasificador = None
+
+
+def clasificador():
+    global _clasificador
+    if _clasificador is None:
+        _clasificador = ClasificadorRutas(
+            sin_log=getattr(settings, 'API_LOG_IGNORED_PATHS', PREFIJOS_SIN_LOG),
+        )
+    return _clasificador
+
+
+@receiver(setting_changed)
+def _reiniciar(setting, **kwargs):
+    global _clasificador
+    if setting == 'API_LOG_IGNORED_PATHS':
+        _clasificador = None
+
+
+def ruta_de(request):
+    """Banderas del path del request (calculadas una vez por request)."""
+    ruta = request.__dict__.get('_ruta')
+    if ruta is None:
+        ruta = request._ruta = clasificador().clasificar(request.path)
+    return ruta
@@ -0,0 +1,141 @@
+import json
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from middleware.perfilador_sql import normalizar_sql
+from utils import metricas as prometheus
+
+User = get_user_model()
+
+
+class MetricasPrometheusTest(APITestCase):
+    """Instrumentación Prometheus y endpoint /metrics."""
+
+    def _muestra(self, nombre, **labels):
+        from prometheus_client import REGISTRY
+        return REGISTRY.get_sample_value(nombre, labels) or 0
+
+    @override_settings(METRICS_TOKEN='secreto')
+    def test_metrics_exige_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secreto')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'http_solicitud_duracion_segundos', response.content)
+
+    def test_middleware_registra_latencia_y_consultas_por_vista(self):
+        admin = User.objects.create_superuser(email="admin@app.com", username="admin", password="password123")
+        self.client.force_authenticate(admin)
+        vista = 'reportes:reporte-admin-list'
+        antes = self._muestra('db_consultas_por_solicitud_count', vista=vista)
+
+        self.client.get(reverse(vista))
+
+        self.assertEqual(self._muestra('db_consultas_por_solicitud_count', vista=vista), antes + 1)
+        self.assertGreater(self._muestra('db_consultas_por_solicitud_sum', vista=vista), 0)
+        self.assertGreater(
+            self._muestra('http_solicitud_duracion_segundos_count', vista=vista, metodo='GET', codigo='200'), 0
+        )
+
+    async def test_asgi_registra_consultas_de_la_vista(self):
+        from asgiref.sync import sync_to_async
+        from rest_framework_simplejwt.tokens import AccessToken
+
+        admin = await sync_to_async(User.objects.create_superuser)(
+            email="admin@app.com", username="admin", password="password123"
+        )
+        vista = 'reportes:reporte-admin-list'
+        antes = self._muestra('db_consultas_por_solicitud_sum', vista=vista)
+
+        res = await self.async_client.get(
+            reverse(vista), headers={'Authorization': f'Bearer {AccessToken.for_user(admin)}'}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        # La vista corre en un hilo de sync_to_async: sus consultas también cuentan
+        self.assertGreater(self._muestra('db_consultas_por_solicitud_sum', vista=vista), antes)
+
+    def test_helpers_de_cache_servicios_externos_y_tareas(self):
+        aciertos = self._muestra('cache_consultas_total', cache='prueba', resultado='acierto')
+        prometheus.registrar_cache('prueba', {'x': 1})
+        prometheus.registrar_cache('prueba', None)
+        self.assertEqual(self._muestra('cache_consultas_total', cache='prueba', resultado='acierto'), aciertos + 1)
+
+        errores = self._muestra('servicio_externo_errores_total', servicio='prueba', operacion='op')
+        with self.assertRaises(RuntimeError):
+            with prometheus.medir_llamada_externa('prueba', 'op'):
+                raise RuntimeError('caído')
+        self.assertEqual(self._muestra('servicio_externo_errores_total', servicio='prueba', operacion='op'), errores + 1)
+
+        prometheus.inicio_tarea('t-1')
+        prometheus.fin_tarea('t-1', 'prueba.tarea', 'SUCCESS')
+        self.assertEqual(
+            self._muestra('celery_tarea_duracion_segundos_count', tarea='prueba.tarea', estado='SUCCESS'), 1
+        )
+
+
+class PerfiladorSQLTest(APITestCase):
+    """Perfilador SQL opt-in: agrupación de consultas y detección de N+1."""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(email="admin@app.com", username="admin", password="password123")
+        self.client.force_authenticate(self.admin)
+        self.directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directorio, ignore_errors=True)
+
+    def test_normalizar_sql_agrupa_literales_e_in_lists(self):
+        self.assertEqual(
+            normalizar_sql("SELECT * FROM t WHERE id IN (%s, %s, %s) AND nombre = 'x'  LIMIT 21"),
+            normalizar_sql("SELECT * FROM t WHERE id IN (%s) AND nombre = 'yy' LIMIT 5"),
+        )
+
+    def test_desactivado_sin_header(self):
+        response = self.client.get(reverse('reportes:reporte-admin-list'))
+        self.assertNotIn('X-Perfil-SQL', response)
+
+    def test_header_con_token_genera_perfil(self):
+        with override_settings(PERFILADOR_SQL_TOKEN='secreto', PERFILADOR_SQL_DIRECTORIO=self.directorio):
+            rechazado = self.client.get(reverse('reportes:reporte-admin-list'), HTTP_X_PERFILAR_SQL='otro')
+            self.assertNotIn('X-Perfil-SQL', rechazado)
+
+            self.client = self.client_class()
+            self.client.force_authenticate(self.admin)
+            with self.assertLogs('api_logger', level='INFO') as logs:
+                response = self.client.get(reverse('reportes:reporte-admin-list'), HTTP_X_PERFILAR_SQL='secreto')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('X-Perfil-SQL', response)
+        self.assertTrue(any('PERFIL SQL' in linea for linea in logs.output))
+
+        archivos = list(Path(self.directorio).glob('*.json'))
+        self.assertEqual(len(archivos), 1)
+        perfil = json.loads(archivos[0].read_text(encoding='utf-8'))
+        self.assertEqual(perfil['vista'], 'reportes:reporte-admin-list')
+        self.assertGreater(perfil['consultas'], 0)
+        self.assertEqual(sum(g['veces'] for g in perfil['grupos']), perfil['consultas'])
+
+    def test_consultas_en_bucle_se_agrupan_por_sql_y_pila(self):
+        from django.conf import settings
+        from django.db import connection
+        from middleware.perfilador_sql import _Registro
+
+        otros = [
+            User.objects.create_user(email=f"u{i}@app.com", username=f"u{i}", password="password123")
+            for i in range(4)
+        ]
+        registro = _Registro(str(settings.BASE_DIR), max_grupos=50, profundidad=4)
+        with connection.execute_wrapper(registro):
+            for usuario in otros:
+                User.objects.get(pk=usuario.pk)
+
+        (sql, pila), grupo = next(iter(registro.grupos.items()))
+        self.assertEqual(len(registro.grupos), 1)
+        self.assertEqual(grupo['veces'], 4)
+        self.assertIn('middleware/tests.py', pila[0])
@@ -5,12 +5,20 @@ Modelo de Notificaciones con Managers personalizados y optimización de índices
 
 import uuid
 import logging
+from django.core.cache import cache
 from django.db import models
 from django.utils import timezone
 from django.conf import settings # Para referenciar al modelo User correctamente
 
 logger = logging.getLogger('notificaciones')
 
+# Contador materializado de no leídas (badge de la campanita)
+NO_LEIDAS_TTL_SEGUNDOS = 60 * 60
+
+
+def _key_no_leidas(usuario_id):
+    return f"notif:no_leidas:{usuario_id}"
+
 
 # ==========================================================
 #  1. MANAGER Y QUERYSET PERSONALIZADO
@@ -49,17 +57,40 @@ class NotificacionManager(models.Manager):
         return self.get_queryset().no_leidas()
 
     def contar_no_leidas(self, usuario):
-        """Cuenta rápida usando índices"""
-        return self.get_queryset().para_usuario(usuario).no_leidas().count()
+        """
+        Lee el contador materializado; si no existe lo reconstruye
+        con un COUNT sobre el índice (usuario, leida).
+        """
+        key = _key_no_leidas(usuario.id)
+        total = cache.get(key)
+        if total is None:
+            total = self.get_queryset().para_usuario(usuario).no_leidas().count()
+            # add: no pisa un contador reconstruido (y quizá ya ajustado)
+            # por otra lectura mientras se contaba
+            cache.add(key, total, NO_LEIDAS_TTL_SEGUNDOS)
+        return max(0, total)
+
+    def ajustar_no_leidas(self, usuario_id, delta):
+        """Suma `delta` al contador solo si ya está materializado"""
+        try:
+            cache.incr(_key_no_leidas(usuario_id), delta)
+        except ValueError:
+            pass
+
+    def invalidar_no_leidas(self, *usuario_ids):
+        """Para updates masivos: la siguiente lectura recalcula el valor exacto"""
+        cache.delete_many([_key_no_leidas(uid) for uid in usuario_ids])
 
     def limpiar_antiguas(self, dias=30):
         """Elimina notificaciones viejas para mantener la BD ligera"""
         from datetime import timedelta
         fecha_limite = timezone.now() - timedelta(days=dias)
         # Solo borramos las que ya fueron leídas o son muy viejas
-        count, _ = self.get_queryset().filter(
-            creada_en__lt=fecha_limite
-        ).delete()
+        antiguas = self.get_queryset().filter(creada_en__lt=fecha_limite)
+        afectados = list(antiguas.no_leidas().values_list('usuario_id', flat=True).distinct())
+        count, _ = antiguas.delete()
+        if afectados:
+            self.invalidar_no_leidas(*afectados)
         return count
 
 
@@ -156,6 +187,15 @@ class Notificacion(models.Model):
             self.leida_en = timezone.now()
             # update_fields es vital para no sobrescribir otros datos concurrentes
             self.save(update_fields=['leida', 'leida_en'])
+            Notificacion.objects.ajustar_no_leidas(self.usuario_id, -1)
+
+    def marcar_no_leida(self):
+        """Revierte la lectura (botón 'marcar como no leída')"""
+        if self.leida:
+            self.leida = False
+            self.leida_en = None
+            self.save(update_fields=['leida', 'leida_en'])
+            Notificacion.objects.ajustar_no_leidas(self.usuario_id, 1)
 
     @property
     def hace_cuanto(self):
@@ -10,8 +10,11 @@ from firebase_admin import credentials, messaging
 from django.conf import settings
 from typing import Optional, Dict, Any
 import os
+from asgiref.sync import sync_to_async
 from django.utils import timezone
 
+from utils.metricas import medir_llamada_externa
+
 logger = logging.getLogger('notificaciones')
 
 # Variable global para cachear la inicialización y evitar recargas
@@ -59,18 +62,20 @@ def inicializar_firebase():
         logger.error(f"Error crítico inicializando Firebase: {e}", exc_info=True)
 
 
-def enviar_notificacion_push(
-    usuario,
-    titulo: str,
-    mensaje: str,
-    datos_extra: Optional[Dict[str, Any]] = None,
-    guardar_en_bd: bool = True,
-    tipo: str = 'sistema',
-    pedido = None
-) -> tuple[bool, Optional[str]]:
+class _PushNoEnviable(Exception):
+    """El push no se intenta (sin token, desactivado, Firebase sin inicializar)."""
+
+    def __init__(self, error, error_bd=None, registrar=True):
+        super().__init__(error)
+        self.error = error
+        self.error_bd = error_bd or error
+        self.registrar = registrar
+
+
+def _preparar_push(usuario, datos_extra):
     """
-    Envía una notificación push a un usuario específico y guarda el registro.
-    Maneja la limpieza de tokens inválidos automáticamente.
+    Validaciones previas al envío (pueden consultar la BD: perfil del usuario).
+    Retorna (perfil, token_fcm, datos_str) o lanza _PushNoEnviable.
     """
     # 1. Inicialización Lazy
     if not _firebase_initialized:
@@ -85,14 +90,11 @@ def enviar_notificacion_push(
         token_fcm = usuario.fcm_token
 
     if not token_fcm:
-        error = "Usuario sin token FCM registrado"
-        if guardar_en_bd:
-            _guardar_notificacion_en_bd(usuario, titulo, mensaje, datos_extra, False, error, tipo, pedido)
-        return False, error
+        raise _PushNoEnviable("Usuario sin token FCM registrado")
 
     # Verificar preferencias (si tu modelo Perfil tiene este campo)
     if hasattr(perfil, 'recibir_notificaciones') and not perfil.recibir_notificaciones:
-        return False, "Usuario tiene notificaciones desactivadas"
+        raise _PushNoEnviable("Usuario tiene notificaciones desactivadas", registrar=False)
 
     # 3. Preparación de Datos (IMPORTANTE PARA FLUTTER)
     datos_extra = datos_extra or {}
@@ -109,49 +111,58 @@ def enviar_notificacion_push(
     if 'timestamp' not in datos_str:
         datos_str['timestamp'] = str(timezone.now().timestamp())
 
-    # 4. Construcción y Envío del Mensaje
     if not _firebase_initialized:
          # Fallback si falló la inicialización pero queremos guardar en BD
-        if guardar_en_bd:
-            _guardar_notificacion_en_bd(usuario, titulo, mensaje, datos_extra, False, "Firebase no init", tipo, pedido)
-        return False, "Firebase no inicializado"
-
-    try:
-        message = messaging.Message(
-            notification=messaging.Notification(
-                title=titulo, 
-                body=mensaje
-            ),
-            data=datos_str,
-            token=token_fcm,
-            # Configuración específica para Android (Icono, Color, Canal)
-            android=messaging.AndroidConfig(
-                priority='high',
-                notification=messaging.AndroidNotification(
-                    sound='default',
-                    color='#FF6B35', # Color naranja de tu marca
-                    channel_id='pedidos_channel',
-                    click_action='FLUTTER_NOTIFICATION_CLICK',
-                    icon='ic_notification' # Asegúrate de tener este recurso en tu app Android
-                )
-            ),
-            # Configuración básica para iOS
-            apns=messaging.APNSConfig(
-                payload=messaging.APNSPayload(
-                    aps=messaging.Aps(sound='default')
-                )
+        raise _PushNoEnviable("Firebase no inicializado", error_bd="Firebase no init")
+
+    return perfil, token_fcm, datos_str
+
+
+def _enviar_mensaje(token_fcm, titulo, mensaje, datos_str):
+    """Construye el mensaje y lo envía a FCM (solo red, sin BD). Retorna el ID de FCM."""
+    message = messaging.Message(
+        notification=messaging.Notification(
+            title=titulo, 
+            body=mensaje
+        ),
+        data=datos_str,
+        token=token_fcm,
+        # Configuración específica para Android (Icono, Color, Canal)
+        android=messaging.AndroidConfig(
+            priority='high',
+            notification=messaging.AndroidNotification(
+                sound='default',
+                color='#FF6B35', # Color naranja de tu marca
+                channel_id='pedidos_channel',
+                click_action='FLUTTER_NOTIFICATION_CLICK',
+                icon='ic_notification' # Asegúrate de tener este recurso en tu app Android
+            )
+        ),
+        # Configuración básica para iOS
+        apns=messaging.APNSConfig(
+            payload=messaging.APNSPayload(
+                aps=messaging.Aps(sound='default')
             )
         )
+    )
+
+    with medir_llamada_externa('fcm', 'send'):
+        return messaging.send(message)
 
-        response = messaging.send(message)
-        logger.info(f"Push enviado a {usuario.email}. ID: {response}")
 
+def _registrar_resultado(usuario, perfil, titulo, mensaje, datos_extra, guardar_en_bd, tipo, pedido, excepcion=None):
+    """Registra el resultado del envío en BD. Retorna (exito, error)."""
+    if excepcion is None:
         if guardar_en_bd:
             _guardar_notificacion_en_bd(usuario, titulo, mensaje, datos_extra, True, None, tipo, pedido)
-
         return True, None
 
-    except messaging.UnregisteredError:
+    if isinstance(excepcion, _PushNoEnviable):
+        if guardar_en_bd and excepcion.registrar:
+            _guardar_notificacion_en_bd(usuario, titulo, mensaje, datos_extra, False, excepcion.error_bd, tipo, pedido)
+        return False, excepcion.error
+
+    if isinstance(excepcion, messaging.UnregisteredError):
         # EL TOKEN YA NO SIRVE (Usuario desinstaló o borró datos)
         # Lo borramos para no intentar enviar de nuevo
         if perfil:
@@ -160,17 +171,70 @@ def enviar_notificacion_push(
         
         error = "Token FCM inválido (eliminado automáticamente)"
         logger.warning(f"{error} para {usuario.email}")
-        
-        if guardar_en_bd:
-            _guardar_notificacion_en_bd(usuario, titulo, mensaje, datos_extra, False, error, tipo, pedido)
-        return False, error
+    else:
+        error = str(excepcion)
+        logger.error(f"Error enviando push: {excepcion}")
 
+    if guardar_en_bd:
+        _guardar_notificacion_en_bd(usuario, titulo, mensaje, datos_extra, False, error, tipo, pedido)
+    return False, error
+
+
+def enviar_notificacion_push(
+    usuario,
+    titulo: str,
+    mensaje: str,
+    datos_extra: Optional[Dict[str, Any]] = None,
+    guardar_en_bd: bool = True,
+    tipo: str = 'sistema',
+    pedido = None
+) -> tuple[bool, Optional[str]]:
+    """
+    Envía una notificación push a un usuario específico y guarda el registro.
+    Maneja la limpieza de tokens inválidos automáticamente.
+    """
+    perfil = None
+    try:
+        perfil, token_fcm, datos_str = _preparar_push(usuario, datos_extra)
+        response = _enviar_mensaje(token_fcm, titulo, mensaje, datos_str)
     except Exception as e:
-        error = str(e)
-        logger.error(f"Error enviando push: {e}")
-        if guardar_en_bd:
-            _guardar_notificacion_en_bd(usuario, titulo, mensaje, datos_extra, False, error, tipo, pedido)
-        return False, error
+        return _registrar_resultado(usuario, perfil, titulo, mensaje, datos_extra, guardar_en_bd, tipo, pedido, e)
+
+    logger.info(f"Push enviado a {usuario.email}. ID: {response}")
+    return _registrar_resultado(usuario, perfil, titulo, mensaje, datos_extra, guardar_en_bd, tipo, pedido)
+
+
+async def aenviar_notificacion_push(
+    usuario,
+    titulo: str,
+    mensaje: str,
+    datos_extra: Optional[Dict[str, Any]] = None,
+    guardar_en_bd: bool = True,
+    tipo: str = 'sistema',
+    pedido = None
+) -> tuple[bool, Optional[str]]:
+    """
+    Versión async de `enviar_notificacion_push` para vistas ASGI.
+
+    Las partes de BD corren con sync_to_async (hilo compartido del ORM). El
+    SDK de Firebase es bloqueante: el envío corre en el pool de hilos
+    (thread_sensitive=False) y no ocupa el hilo del ORM mientras espera a FCM.
+    """
+    perfil = None
+    try:
+        perfil, token_fcm, datos_str = await sync_to_async(_preparar_push)(usuario, datos_extra)
+        response = await sync_to_async(_enviar_mensaje, thread_sensitive=False)(
+            token_fcm, titulo, mensaje, datos_str
+        )
+    except Exception as e:
+        return await sync_to_async(_registrar_resultado)(
+            usuario, perfil, titulo, mensaje, datos_extra, guardar_en_bd, tipo, pedido, e
+        )
+
+    logger.info(f"Push enviado a {usuario.email}. ID: {response}")
+    return await sync_to_async(_registrar_resultado)(
+        usuario, perfil, titulo, mensaje, datos_extra, guardar_en_bd, tipo, pedido
+    )
 
 
 def _guardar_notificacion_en_bd(usuario, titulo, mensaje, datos_extra, enviada_push, error_envio, tipo, pedido):
@@ -195,6 +259,19 @@ def _guardar_notificacion_en_bd(usuario, titulo, mensaje, datos_extra, enviada_p
 #  2. FACHADA PARA SIGNALS (EL PUENTE CRÍTICO)
 # ==========================================================
 
+def _datos_evento(tipo, pedido, datos_extra):
+    # Preparar metadatos útiles para la App
+    datos = datos_extra or {}
+    datos['tipo_evento'] = tipo
+    
+    if pedido:
+        datos['pedido_id'] = str(pedido.id)
+        # Añadir estado actual si existe
+        if hasattr(pedido, 'estado'):
+            datos['pedido_estado'] = str(pedido.estado)
+    return datos
+
+
 def crear_y_enviar_notificacion(
     usuario,
     titulo: str,
@@ -208,22 +285,12 @@ def crear_y_enviar_notificacion(
     Orquesta el envío real y el registro.
     REEMPLAZA AL STUB QUE TENÍAS ANTES.
     """
-    # Preparar metadatos útiles para la App
-    datos = datos_extra or {}
-    datos['tipo_evento'] = tipo
-    
-    if pedido:
-        datos['pedido_id'] = str(pedido.id)
-        # Añadir estado actual si existe
-        if hasattr(pedido, 'estado'):
-            datos['pedido_estado'] = str(pedido.estado)
-
     # Llamada al core real
     exito, error = enviar_notificacion_push(
         usuario=usuario,
         titulo=titulo,
         mensaje=mensaje,
-        datos_extra=datos,
+        datos_extra=_datos_evento(tipo, pedido, datos_extra),
         guardar_en_bd=True,
         tipo=tipo,
         pedido=pedido
@@ -232,6 +299,28 @@ def crear_y_enviar_notificacion(
     return exito
 
 
+async def acrear_y_enviar_notificacion(
+    usuario,
+    titulo: str,
+    mensaje: str,
+    tipo: str = "general",
+    pedido=None,
+    datos_extra: Optional[Dict] = None,
+):
+    """Versión async de `crear_y_enviar_notificacion` (vistas ASGI)."""
+    exito, error = await aenviar_notificacion_push(
+        usuario=usuario,
+        titulo=titulo,
+        mensaje=mensaje,
+        datos_extra=_datos_evento(tipo, pedido, datos_extra),
+        guardar_en_bd=True,
+        tipo=tipo,
+        pedido=pedido
+    )
+
+    return exito
+
+
 # ==========================================================
 #  3. FUNCIONES DE NEGOCIO (HELPERS)
 # ==========================================================
@@ -12,6 +12,7 @@ from django.conf import settings
 
 # Modelos
 from pedidos.models import Pedido, EstadoPedido, TipoPedido
+from notificaciones.models import Notificacion
 
 # Servicios
 from notificaciones.services import crear_y_enviar_notificacion
@@ -179,3 +180,15 @@ def _obtener_plantilla_mensaje(pedido, evento, estado_anterior):
 
     # Si es un estado intermedio sin importancia para el usuario, retornamos None
     return None
+
+
+# ==========================================================
+#  4. CONTADOR DE NO LEÍDAS
+# ==========================================================
+
+@receiver(post_save, sender=Notificacion)
+def incrementar_no_leidas(sender, instance, created, **kwargs):
+    """Cada notificación nueva suma 1 al badge del usuario."""
+    if kwargs.get('raw', False) or not created or instance.leida:
+        return
+    Notificacion.objects.ajustar_no_leidas(instance.usuario_id, 1)
@@ -7,7 +7,7 @@ personalizadas (marcar_leida, estadisticas, etc).
 
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import NotificacionViewSet
+from .views import NotificacionViewSet, TestPushView
 
 # Namespace para reversión de URLs (ej: 'notificaciones:notificacion-list')
 app_name = 'notificaciones'
@@ -15,5 +15,7 @@ router = DefaultRouter()
 router.register(r'', NotificacionViewSet, basename='notificacion')
 
 urlpatterns = [
+    # Antes del router: 'test_push/' coincidiría con el detalle del ViewSet
+    path('test_push/', TestPushView.as_view(), name='notificacion-test-push'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
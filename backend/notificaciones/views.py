@@ -20,6 +20,7 @@ from notificaciones.serializers import (
     EstadisticasNotificacionesSerializer
 )
 from utils.pagination import StandardResultsSetPagination
+from utils.vistas_async import AsyncAPIView
 
 logger = logging.getLogger('notificaciones.views')
 
@@ -87,9 +88,7 @@ class NotificacionViewSet(viewsets.ReadOnlyModelViewSet):
     def marcar_no_leida(self, request, pk=None):
         """Marca una notificación específica como NO leída"""
         notificacion = self.get_object()
-        notificacion.leida = False
-        notificacion.leida_en = None
-        notificacion.save(update_fields=['leida', 'leida_en'])
+        notificacion.marcar_no_leida()
         return Response({'status': 'ok', 'leida': False})
 
     @action(detail=False, methods=['post'])
@@ -103,6 +102,7 @@ class NotificacionViewSet(viewsets.ReadOnlyModelViewSet):
             usuario=request.user, 
             leida=False
         ).marcar_como_leidas()
+        Notificacion.objects.invalidar_no_leidas(request.user.id)
         
         return Response({
             'status': 'ok', 
@@ -124,6 +124,8 @@ class NotificacionViewSet(viewsets.ReadOnlyModelViewSet):
                 id__in=ids, 
                 usuario=request.user
             ).marcar_como_leidas()
+            if count:
+                Notificacion.objects.invalidar_no_leidas(request.user.id)
             
             return Response({'status': 'ok', 'actualizadas': count})
             
@@ -141,7 +143,7 @@ class NotificacionViewSet(viewsets.ReadOnlyModelViewSet):
         """
         user = request.user
         
-        # Consultas optimizadas usando índices
+        # Total por índice; no leídas desde el contador materializado
         total = Notificacion.objects.filter(usuario=user).count()
         no_leidas = Notificacion.objects.contar_no_leidas(user)
         
@@ -180,19 +182,25 @@ class NotificacionViewSet(viewsets.ReadOnlyModelViewSet):
             'mensaje': f'Se eliminaron {count} notificaciones antiguas'
         })
 
-    # ==========================================================
-    #  HERRAMIENTAS DE DESARROLLO (ADMIN ONLY)
-    # ==========================================================
 
-    @action(detail=False, methods=['post'], permission_classes=[IsAdminUser])
-    def test_push(self, request):
-        """
-        Solo para Admins: Envía una notificación de prueba a sí mismo
-        para verificar que Firebase funciona.
-        """
-        from notificaciones.services import crear_y_enviar_notificacion
-        
-        exito = crear_y_enviar_notificacion(
+# ==========================================================
+#  HERRAMIENTAS DE DESARROLLO (ADMIN ONLY)
+# ==========================================================
+
+class TestPushView(AsyncAPIView):
+    """
+    Solo para Admins: Envía una notificación de prueba a sí mismo
+    para verificar que Firebase funciona.
+
+    POST /api/notificaciones/test_push/ (vista async: la espera a FCM no
+    ocupa el hilo del ORM bajo ASGI)
+    """
+    permission_classes = [IsAdminUser]
+
+    async def post(self, request):
+        from notificaciones.services import acrear_y_enviar_notificacion
+
+        exito = await acrear_y_enviar_notificacion(
             usuario=request.user,
             titulo="Test de Sistema",
             mensaje="Si lees esto, Firebase está funcionando correctamente.",
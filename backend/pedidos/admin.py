@@ -495,10 +495,18 @@ class PedidoAdmin(admin.ModelAdmin):
 
     def _actualizar_estado_masivo(self, request, queryset, nuevo_estado, validos):
         """Helper para actualizar estados masivamente de forma segura"""
-        actualizados = queryset.filter(estado__in=validos).update(
-            estado=nuevo_estado, 
-            actualizado_en=timezone.now()
-        )
+        from reportes.services import MetricasPedidosService
+
+        pedidos = queryset.filter(estado__in=validos)
+        with transaction.atomic():
+            dias = list(pedidos.dates('creado_en', 'day'))
+            actualizados = pedidos.update(
+                estado=nuevo_estado, 
+                actualizado_en=timezone.now()
+            )
+            # update() no emite señales: el rollup diario se recalcula para esos días
+            if actualizados:
+                MetricasPedidosService.reconstruir(desde=dias[0], hasta=dias[-1])
         if actualizados:
             self.message_user(request, f"{actualizados} pedidos actualizados a '{nuevo_estado}'.", messages.SUCCESS)
         else:
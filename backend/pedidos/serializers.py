@@ -13,6 +13,8 @@ from repartidores.models import Repartidor
 from repartidores.models import Repartidor
 from proveedores.models import Proveedor
 from productos.models import Producto
+from productos.services import ContadorProductoService
+from utils.imagenes import url_variante
 
 # Importación de modelos locales
 from .models import (
@@ -244,6 +246,7 @@ class PedidoCreateSerializer(serializers.ModelSerializer):
             
             # 2. Crear Items
             items_objs = []
+            vendidos = {}
             for item in items_data:
                 prod_instance = item.get('producto')
                 cantidad = item.get('cantidad') or 0
@@ -255,7 +258,7 @@ class PedidoCreateSerializer(serializers.ModelSerializer):
                     updated = Producto.objects.filter(
                         id=prod_instance.id, 
                         stock__gte=cantidad
-                    ).update(stock=F('stock') - cantidad, veces_vendido=F('veces_vendido') + cantidad)
+                    ).update(stock=F('stock') - cantidad)
                     
                     if updated == 0:
                         # Falló la actualización -> Stock insuficiente o producto desapareció
@@ -267,9 +270,9 @@ class PedidoCreateSerializer(serializers.ModelSerializer):
                             )
                         else:
                             raise serializers.ValidationError(f"Error actualizando stock de {current_prod.nombre}")
-                else:
-                    # Si no maneja stock, solo sumamos ventas
-                    Producto.objects.filter(id=prod_instance.id).update(veces_vendido=F('veces_vendido') + cantidad)
+
+                # Las ventas se acumulan en Redis y se vuelcan por lotes (sin lock de fila)
+                vendidos[prod_instance.id] = vendidos.get(prod_instance.id, 0) + cantidad
                 
                 # Crear objeto item en memoria
                 precio_unitario = item.get('precio_unitario') or Decimal('0')
@@ -285,6 +288,7 @@ class PedidoCreateSerializer(serializers.ModelSerializer):
                     )
                 )
             ItemPedido.objects.bulk_create(items_objs)
+            transaction.on_commit(lambda: ContadorProductoService.registrar_ventas(vendidos))
 
             # 3. Crear Registro de Logística (Si existe la app envios y enviaron datos)
             if ENVIOS_INSTALLED and datos_envio_data:
@@ -866,16 +870,9 @@ class PedidoRepartidorDetalladoSerializer(serializers.ModelSerializer):
         if not obj.cliente:
             return None
         
-        # Construir URL absoluta de la foto
+        # Miniatura del cliente (el repartidor solo la muestra como avatar)
         request = self.context.get('request')
-        foto_url = None
-        if obj.cliente.foto_perfil:
-            try:
-                foto_url = obj.cliente.foto_perfil.url
-                if request and not foto_url.startswith(('http:', 'https:')):
-                    foto_url = request.build_absolute_uri(foto_url)
-            except Exception:
-                foto_url = None
+        foto_url = url_variante(obj.cliente.foto_perfil, 'thumb', request)
 
         return {
             'id': obj.cliente.id,
@@ -888,16 +885,9 @@ class PedidoRepartidorDetalladoSerializer(serializers.ModelSerializer):
         if not obj.proveedor:
             return None
 
-        # Construir URL completa de la foto
+        # Miniatura del logo
         request = self.context.get('request')
-        foto_url = None
-        if obj.proveedor.logo:
-            try:
-                foto_url = obj.proveedor.logo.url
-                if request and not foto_url.startswith(('http:', 'https:')):
-                    foto_url = request.build_absolute_uri(foto_url)
-            except Exception:
-                foto_url = None
+        foto_url = url_variante(obj.proveedor.logo, 'thumb', request)
         
         # Fallback si no hay logo
         if not foto_url:
@@ -42,6 +42,21 @@ class SignalGuard:
 # ==========================================================
 pedido_retrasado = Signal() # sender, pedido, tiempo_retraso
 
+# ==========================================================
+#  PEDIDO ANTERIOR (LECTURA COMPARTIDA)
+# ==========================================================
+# `auditar_cambios_previos` lee el pedido de la BD una vez por save y lo deja
+# en la instancia; los post_save de otras apps (rollup de reportes,
+# contadores de rifas) lo reutilizan en lugar de releerlo. Cada app agrega
+# aquí los campos cuyo valor anterior necesita: un save(update_fields=...)
+# que no toca ninguno no lee el pedido.
+CAMPOS_CON_ANTERIOR = {'estado', 'repartidor'}
+
+
+def pedido_anterior(instance):
+    """Pedido como estaba en BD antes del save en curso (None en altas o si no se leyó)."""
+    return getattr(instance, '_pedido_anterior', None)
+
 
 # ==========================================================
 #  1. PRE-SAVE: AUDITORÍA Y DETECCIÓN DE CAMBIOS
@@ -52,11 +67,18 @@ def auditar_cambios_previos(sender, instance, **kwargs):
     Detecta cambios de estado y asignaciones antes de guardar.
     Registra en el historial automáticamente.
     """
+    instance._pedido_anterior = None
     if not instance.pk: 
         return # Es creación, se maneja en post_save
 
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and not CAMPOS_CON_ANTERIOR & {c.removesuffix('_id') for c in update_fields}:
+        return
+
     try:
+        # El manager ya trae cliente y repartidor (su user_id lo usan las rifas)
         old_instance = Pedido.objects.get(pk=instance.pk)
+        instance._pedido_anterior = old_instance
         
         # A. Registrar Historial de Cambios de Estado
         if old_instance.estado != instance.estado:
@@ -78,6 +100,9 @@ def auditar_cambios_previos(sender, instance, **kwargs):
             elif instance.estado == EstadoPedido.CANCELADO:
                 instance.fecha_cancelado = timezone.now()
 
+            # Métricas en tiempo real (una vez por transición, no por save)
+            registrar_metricas_transicion(instance)
+
         # B. Detectar Asignación de Repartidor
         if not old_instance.repartidor and instance.repartidor:
             logger.info(f"Repartidor {instance.repartidor} asignado al pedido {instance.numero_pedido}")
@@ -140,12 +165,13 @@ def handle_nuevo_pedido(pedido):
     except ImportError:
         logger.warning("Servicio de notificaciones no disponible")
 
-    # 2. Analytics
+    # 2. Analytics (solo si el pedido llega a confirmarse)
     try:
         from analytics.services import registrar_venta
-        registrar_venta(pedido.total)
     except ImportError:
-        pass
+        return
+    total = pedido.total
+    transaction.on_commit(lambda: registrar_venta(total))
 
 
 def actualizar_logistica(pedido):
@@ -210,6 +236,19 @@ def handle_pedido_cancelado(pedido):
     notificar_cliente(pedido, "Tu pedido ha sido cancelado. Revisa los detalles en la app.")
 
 
+def registrar_metricas_transicion(pedido):
+    """Cuenta aceptaciones (con su latencia) y cancelaciones al confirmar la transacción"""
+    try:
+        from analytics import services as analytics
+    except ImportError:
+        return
+
+    if pedido.estado == EstadoPedido.ASIGNADO_REPARTIDOR:
+        transaction.on_commit(lambda: analytics.registrar_aceptacion(pedido))
+    elif pedido.estado == EstadoPedido.CANCELADO:
+        transaction.on_commit(lambda: analytics.registrar_cancelacion(pedido))
+
+
 def notificar_cliente(pedido, mensaje):
     """Helper para enviar push notifications"""
     try:
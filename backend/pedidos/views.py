@@ -14,6 +14,7 @@ from rest_framework.pagination import PageNumberPagination
 
 # Importación de utilidades
 from utils.throttles import PedidoThrottle
+from authentication.principal import principal_de
 
 # Importación de modelos y serializers
 from .models import Pedido, EstadoPedido, TipoPedido, ItemPedido
@@ -69,20 +70,20 @@ def verificar_permiso_cliente(user):
 
 def verificar_permiso_proveedor(user, pedido=None):
     if get_rol_seguro(user) != 'PROVEEDOR': return False
-    if not hasattr(user, 'proveedor'): return False
+    # Ids de perfil desde el principal en caché (sin consultar user.proveedor)
+    proveedor_id = (principal_de(user) or {}).get('proveedor_id')
+    if proveedor_id is None: return False
     # Si hay pedido, validar propiedad
-    if pedido and pedido.proveedor_id != user.proveedor.id: return False
+    if pedido and pedido.proveedor_id != proveedor_id: return False
     return True
 
 def verificar_permiso_repartidor(user, pedido=None):
     if get_rol_seguro(user) != 'REPARTIDOR': return False
-    # Acceso seguro al perfil y repartidor
-    try:
-        repartidor = user.perfil.repartidor
-    except AttributeError:
+    repartidor_id = (principal_de(user) or {}).get('repartidor_id')
+    if repartidor_id is None:
         return False
     
-    if pedido and pedido.repartidor_id and pedido.repartidor_id != repartidor.id:
+    if pedido and pedido.repartidor_id and pedido.repartidor_id != repartidor_id:
         return False
     return True
 
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.7 on 2026-10-19 03:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0009_remove_promocion_producto_asociado_and_more'),
+        ('proveedores', '0003_remove_accionadministrativa_calificacion_promedio_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='popularidad_30d',
+            field=models.IntegerField(default=0, verbose_name='Unidades vendidas (30 días)'),
+        ),
+        migrations.AddField(
+            model_name='producto',
+            name='popularidad_7d',
+            field=models.IntegerField(default=0, verbose_name='Unidades vendidas (7 días)'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['disponible', '-popularidad_7d'], name='productos_disponi_2341de_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-19 06:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0010_producto_popularidad'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='variantes_de',
+            field=models.CharField(blank=True, default='', editable=False, help_text='Imagen cuyos derivados (thumb/card/detail) ya se generaron', max_length=255),
+        ),
+    ]
@@ -109,6 +109,10 @@ class Producto(models.Model):
         blank=True, null=True,
         verbose_name='Imagen (Archivo)'
     )
+    variantes_de = models.CharField(
+        max_length=255, blank=True, default='', editable=False,
+        help_text='Imagen cuyos derivados (thumb/card/detail) ya se generaron'
+    )
     
     imagen_url = models.URLField(
         blank=True, null=True,
@@ -123,8 +127,10 @@ class Producto(models.Model):
     tiene_stock = models.BooleanField(default=False, verbose_name='Controlar Stock')
     stock = models.IntegerField(default=0, validators=[MinValueValidator(0)])
     
-    # Stats
+    # Stats (contadores denormalizados, se actualizan por lotes desde ContadorProductoService)
     veces_vendido = models.IntegerField(default=0)
+    popularidad_7d = models.IntegerField(default=0, verbose_name='Unidades vendidas (7 días)')
+    popularidad_30d = models.IntegerField(default=0, verbose_name='Unidades vendidas (30 días)')
     rating_promedio = models.DecimalField(
         max_digits=3, decimal_places=2, default=0,
         validators=[MinValueValidator(0), MaxValueValidator(5)]
@@ -152,6 +158,7 @@ class Producto(models.Model):
         indexes = [
             models.Index(fields=['proveedor', 'disponible']),
             models.Index(fields=['categoria', 'disponible']),
+            models.Index(fields=['disponible', '-popularidad_7d']),
         ]
     
     def __str__(self):
@@ -179,13 +186,6 @@ class Producto(models.Model):
         if not self.tiene_stock: return True
         updated = Producto.objects.filter(pk=self.pk, stock__gte=cantidad).update(stock=F('stock') - cantidad)
         return updated > 0
-    
-    def incrementar_vendidos(self):
-        Producto.objects.filter(pk=self.pk).update(veces_vendido=F('veces_vendido') + 1)
-
-        # Mantener actualizado el rating ponderado del proveedor cuando cambian ventas.
-        from calificaciones.models import _recalcular_rating_proveedor
-        _recalcular_rating_proveedor(self.proveedor)
 
 
 # ═══════════════════════════════════════════════════════════════════════
@@ -5,6 +5,7 @@ from .models import (
     Carrito, ItemCarrito
 )
 from .visual_services import CategoriaVisualizer
+from utils.imagenes import url_variante
 
 
 def _build_media_url(file_field, request=None):
@@ -69,7 +70,7 @@ class ProductoListSerializer(serializers.ModelSerializer):
         # Prioriza imagen de archivo, devuelve URL absoluta si hay request
         if obj.imagen:
             request = self.context.get('request')
-            return _build_media_url(obj.imagen, request)
+            return url_variante(obj.imagen, 'card', request)
         return obj.imagen_url
 
     def get_proveedor_logo_url(self, obj):
@@ -78,13 +79,13 @@ class ProductoListSerializer(serializers.ModelSerializer):
             return None
         request = self.context.get('request')
         # 1) Logo directo del proveedor
-        logo = _build_media_url(getattr(prov, 'logo', None), request)
+        logo = url_variante(getattr(prov, 'logo', None), 'thumb', request)
         if logo:
             return logo
         # 2) Fallback: foto de perfil del usuario proveedor
         user = getattr(prov, 'user', None)
         perfil = getattr(user, 'perfil', None) if user else None
-        foto = _build_media_url(getattr(perfil, 'foto_perfil', None), request)
+        foto = url_variante(getattr(perfil, 'foto_perfil', None), 'thumb', request)
         if foto:
             return foto
         # 3) Último recurso: avatar generado por nombre
@@ -119,7 +120,7 @@ class ProductoDetalleSerializer(serializers.ModelSerializer):
     def get_imagen_url(self, obj):
         if obj.imagen:
             request = self.context.get('request')
-            return _build_media_url(obj.imagen, request)
+            return url_variante(obj.imagen, 'detail', request)
         return obj.imagen_url
 
     def get_proveedor_logo_url(self, obj):
@@ -127,12 +128,12 @@ class ProductoDetalleSerializer(serializers.ModelSerializer):
         if not prov:
             return None
         request = self.context.get('request')
-        logo = _build_media_url(getattr(prov, 'logo', None), request)
+        logo = url_variante(getattr(prov, 'logo', None), 'thumb', request)
         if logo:
             return logo
         user = getattr(prov, 'user', None)
         perfil = getattr(user, 'perfil', None) if user else None
-        foto = _build_media_url(getattr(perfil, 'foto_perfil', None), request)
+        foto = url_variante(getattr(perfil, 'foto_perfil', None), 'thumb', request)
         if foto:
             return foto
         from urllib.parse import quote
@@ -295,13 +296,7 @@ class AgregarAlCarritoSerializer(serializers.Serializer):
         producto = self.instance 
         cantidad = data.get('cantidad')
         if producto.tiene_stock:
-            carrito = self.context.get('carrito_instance')
-            en_carrito = 0
-            if carrito:
-                 try:
-                     item = ItemCarrito.objects.get(carrito=carrito, producto_id=producto.id)
-                     en_carrito = item.cantidad
-                 except ItemCarrito.DoesNotExist: pass
+            en_carrito = self.context.get('cantidades_en_carrito', {}).get(producto.id, 0)
             
             if producto.stock < (cantidad + en_carrito):
                 raise serializers.ValidationError({'cantidad': f"Stock insuficiente."})
@@ -366,7 +361,7 @@ class ProviderProductoDetailSerializer(ProductoDetalleSerializer):
             'id': p.id,
             'nombre': p.nombre,
             'precio': str(p.precio),
-            'imagen_url': _build_media_url(p.imagen, self.context.get('request')) if p.imagen else p.imagen_url,
+            'imagen_url': url_variante(p.imagen, 'card', self.context.get('request')) if p.imagen else p.imagen_url,
         } for p in relacionados]
 
 class ProviderProductoSerializer(ProductoCreateUpdateSerializer):
@@ -0,0 +1,552 @@
+# productos/services.py
+"""
+Carrito de compras en caché (Redis) con persistencia diferida (write-behind).
+
+El carrito activo vive en la caché como un snapshot por usuario con los
+datos de producto necesarios para pintar la pantalla y calcular totales en
+memoria. Postgres (`Carrito` / `ItemCarrito`) solo se escribe en el checkout
+o cuando el carrito lleva `INACTIVIDAD_SEGUNDOS` sin cambios.
+
+Las mutaciones del snapshot son atómicas (WATCH/MULTI, ver
+`utils.redis_client.actualizar_cache`): dos solicitudes simultáneas del
+mismo usuario no se pisan.
+
+Cada línea nueva crea su fila de `ItemCarrito` al agregarse, así el `id` del
+item que ve la API es siempre el de esa fila (estable entre la caché y la
+BD); las cantidades se persisten de forma diferida. Precio, stock y
+disponibilidad se refrescan desde `Producto` en cada lectura y mutación.
+"""
+
+import logging
+import time
+from decimal import Decimal
+from types import SimpleNamespace
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from utils.redis_client import ConflictoConcurrente, actualizar_cache
+
+logger = logging.getLogger('productos')
+
+CARRITO_TTL_SEGUNDOS = 60 * 60 * 24 * 7   # 7 días en caché
+INACTIVIDAD_SEGUNDOS = 60 * 30            # Persistir tras 30 min sin cambios
+
+
+class ItemCarritoNoEncontrado(Exception):
+    """El item solicitado no está en el carrito del usuario."""
+
+
+class CarritoOcupado(Exception):
+    """Demasiadas escrituras simultáneas sobre el carrito; el cliente puede reintentar."""
+
+
+def _cache_key(user_id):
+    return f"carrito:{user_id}"
+
+
+def _snapshot_producto(producto, cantidad, precio_unitario=None, item_db_id=None):
+    proveedor = producto.proveedor
+    return {
+        'producto_id': producto.id,
+        'item_db_id': item_db_id,
+        'nombre': producto.nombre,
+        'imagen': producto.imagen_final,
+        'disponible': producto.disponible,
+        'tiene_stock': producto.tiene_stock,
+        'stock': producto.stock,
+        'precio_unitario': Decimal(precio_unitario if precio_unitario is not None else producto.precio),
+        'cantidad': cantidad,
+        'proveedor_id': producto.proveedor_id,
+        'proveedor_latitud': getattr(proveedor, 'latitud', None),
+        'proveedor_longitud': getattr(proveedor, 'longitud', None),
+    }
+
+
+class CarritoService:
+    """
+    Operaciones del carrito sobre el snapshot en caché.
+
+    Estructura del snapshot:
+        {
+            'carrito_id': int | None,     # Fila en `carritos` (si ya existe)
+            'items': {producto_id: {...}},  # 'item_db_id' = id de ItemCarrito
+            'actualizado_en': float,      # epoch de la última mutación
+            'version': int,               # +1 por mutación
+            'sucio': bool,                # Cambios pendientes de persistir
+            'persistencia_programada': bool,
+        }
+    """
+
+    # ------------------------------------------------------------------
+    # LECTURA
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _cargar(user):
+        estado = cache.get(_cache_key(user.id))
+        if estado is not None:
+            return estado
+        return CarritoService._hidratar(user)
+
+    @staticmethod
+    def _hidratar(user):
+        """Construye el snapshot desde Postgres (solo en el primer acceso o tras expirar)."""
+        estado = CarritoService._construir(user)
+        # add: no reemplaza un snapshot creado por otra solicitud en medio
+        if not cache.add(_cache_key(user.id), estado, CARRITO_TTL_SEGUNDOS):
+            estado = cache.get(_cache_key(user.id)) or estado
+        return estado
+
+    @staticmethod
+    def _construir(user):
+        from .models import Carrito, ItemCarrito
+
+        carrito = Carrito.objects.filter(usuario=user).only('id').first()
+        items = {}
+        if carrito:
+            qs = ItemCarrito.objects.filter(carrito=carrito).select_related('producto__proveedor')
+            for item in qs:
+                items[item.producto_id] = _snapshot_producto(
+                    item.producto, item.cantidad, item.precio_unitario, item_db_id=item.id
+                )
+
+        return {
+            'carrito_id': carrito.id if carrito else None,
+            'items': items,
+            'actualizado_en': time.time(),
+            'version': 0,
+            'sucio': False,
+            'persistencia_programada': False,
+        }
+
+    @staticmethod
+    def _refrescar(estado):
+        """
+        Actualiza en `estado` precio, stock y disponibilidad de cada item desde
+        `Producto` (una consulta). Un producto eliminado sale del carrito (su
+        fila ya la borró el CASCADE).
+        """
+        from .models import Producto
+
+        if not estado['items']:
+            return estado
+        actuales = {
+            p['id']: p for p in Producto.objects.filter(id__in=list(estado['items'])).values(
+                'id', 'precio', 'stock', 'tiene_stock', 'disponible'
+            )
+        }
+        for producto_id in list(estado['items']):
+            producto = actuales.get(producto_id)
+            if producto is None:
+                del estado['items'][producto_id]
+                continue
+            item = estado['items'][producto_id]
+            item['precio_unitario'] = Decimal(producto['precio'])
+            item['stock'] = producto['stock']
+            item['tiene_stock'] = producto['tiene_stock']
+            item['disponible'] = producto['disponible']
+        return estado
+
+    @staticmethod
+    def obtener(user):
+        """Representación del carrito para la API (mismo formato que `CarritoSerializer`)."""
+        estado = CarritoService._refrescar(CarritoService._cargar(user))
+        return CarritoService.representar(user, estado)
+
+    @staticmethod
+    def cantidades(user):
+        """Dict {producto_id: cantidad} del carrito actual."""
+        return {pid: item['cantidad'] for pid, item in CarritoService._cargar(user)['items'].items()}
+
+    @staticmethod
+    def representar(user, estado):
+        items = []
+        total = Decimal('0.00')
+        cantidad_total = 0
+
+        for item in estado['items'].values():
+            subtotal = item['precio_unitario'] * item['cantidad']
+            total += subtotal
+            cantidad_total += item['cantidad']
+            items.append({
+                'id': item['item_db_id'],
+                'producto_id': item['producto_id'],
+                'producto_nombre': item['nombre'],
+                'producto_imagen': item['imagen'],
+                'producto_disponible': item['disponible'],
+                'cantidad': item['cantidad'],
+                'precio_unitario': f"{item['precio_unitario']:.2f}",
+                'subtotal': subtotal,
+                'proveedor_latitud': item['proveedor_latitud'],
+                'proveedor_longitud': item['proveedor_longitud'],
+            })
+
+        return {
+            'id': estado['carrito_id'],
+            'usuario_id': user.id,
+            'items': items,
+            'total': total,
+            'cantidad_total': cantidad_total,
+        }
+
+    # ------------------------------------------------------------------
+    # ESCRITURA (solo caché)
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _mutar(user, cambio):
+        """
+        Aplica `cambio(estado)` al snapshot de forma atómica, lo deja sucio y
+        programa su persistencia diferida. `cambio` puede repetirse si otra
+        solicitud escribe el carrito en medio.
+        """
+        programar = False
+
+        def aplicar(estado):
+            nonlocal programar
+            if estado is None:
+                estado = CarritoService._construir(user)
+            # Validaciones y totales sobre precio y stock actuales
+            CarritoService._refrescar(estado)
+            CarritoService._asignar_filas(user, estado)
+            cambio(estado)
+            estado['actualizado_en'] = time.time()
+            estado['version'] = estado.get('version', 0) + 1
+            estado['sucio'] = True
+            programar = not estado.get('persistencia_programada')
+            estado['persistencia_programada'] = True
+            return estado
+
+        try:
+            estado = actualizar_cache(_cache_key(user.id), aplicar, CARRITO_TTL_SEGUNDOS)
+        except ConflictoConcurrente as e:
+            raise CarritoOcupado(user.id) from e
+        if programar:
+            CarritoService._programar_persistencia(user.id)
+        return CarritoService.representar(user, estado)
+
+    @staticmethod
+    def _programar_persistencia(user_id):
+        """Encola la persistencia diferida (el snapshot ya tiene `persistencia_programada`)."""
+        from .tasks import persistir_carrito_inactivo
+        try:
+            persistir_carrito_inactivo.apply_async(
+                args=[user_id], countdown=INACTIVIDAD_SEGUNDOS
+            )
+        except Exception as e:
+            # Sin broker el carrito sigue siendo válido; se persistirá en el checkout
+            logger.warning(f"No se pudo programar persistencia del carrito {user_id}: {e}")
+
+            def desmarcar(estado):
+                if estado is None:
+                    return None
+                estado['persistencia_programada'] = False
+                return estado
+
+            try:
+                actualizar_cache(_cache_key(user_id), desmarcar, CARRITO_TTL_SEGUNDOS)
+            except ConflictoConcurrente:
+                # La bandera queda activa hasta el checkout o la expiración
+                logger.warning(f"No se pudo desmarcar la persistencia del carrito {user_id}")
+
+    @staticmethod
+    def _buscar_item(estado, item_id):
+        """producto_id del item cuyo id (`ItemCarrito.id`) es `item_id`."""
+        for producto_id, item in estado['items'].items():
+            if item.get('item_db_id') == item_id:
+                return producto_id
+        raise ItemCarritoNoEncontrado(item_id)
+
+    @staticmethod
+    def _crear_fila(user, estado, producto, cantidad):
+        """
+        Fila de `ItemCarrito` para una línea nueva (y el `Carrito` si falta):
+        el id del item queda fijo desde que se agrega. Idempotente, porque
+        `cambio` puede repetirse. Retorna `(id, creada)`.
+        """
+        from .models import Carrito, ItemCarrito
+
+        if estado['carrito_id'] is None:
+            estado['carrito_id'] = Carrito.objects.get_or_create(usuario=user)[0].id
+        fila, creada = ItemCarrito.objects.get_or_create(
+            carrito_id=estado['carrito_id'],
+            producto_id=producto.id,
+            defaults={'cantidad': cantidad, 'precio_unitario': producto.precio},
+        )
+        return fila.id, creada
+
+    @staticmethod
+    def _asignar_filas(user, estado):
+        """Da fila (y id estable) a items de snapshots anteriores que no la tenían."""
+        for item in estado['items'].values():
+            if item.get('item_db_id') is None:
+                producto = SimpleNamespace(id=item['producto_id'], precio=item['precio_unitario'])
+                item['item_db_id'], _ = CarritoService._crear_fila(user, estado, producto, item['cantidad'])
+
+    @staticmethod
+    def agregar(user, producto, cantidad):
+        creada_aqui = None
+
+        def cambio(estado):
+            nonlocal creada_aqui
+            item = estado['items'].get(producto.id)
+            if item and creada_aqui is not None and item['item_db_id'] == creada_aqui:
+                # Un intento anterior creó la fila con esta cantidad y otra
+                # solicitud ya reconstruyó el carrito desde la BD incluyéndola
+                return
+            if item:
+                item['cantidad'] += cantidad
+            else:
+                item_db_id, creada = CarritoService._crear_fila(user, estado, producto, cantidad)
+                if creada:
+                    creada_aqui = item_db_id
+                estado['items'][producto.id] = _snapshot_producto(producto, cantidad, item_db_id=item_db_id)
+        return CarritoService._mutar(user, cambio)
+
+    @staticmethod
+    def actualizar_cantidad(user, item_id, cantidad):
+        def cambio(estado):
+            item = estado['items'][CarritoService._buscar_item(estado, item_id)]
+
+            # Validación contra el snapshot; el checkout revalida contra la BD
+            if item['tiene_stock'] and item['stock'] < cantidad:
+                raise ValidationError('Stock insuficiente')
+
+            item['cantidad'] = cantidad
+        return CarritoService._mutar(user, cambio)
+
+    @staticmethod
+    def remover(user, item_id):
+        def cambio(estado):
+            del estado['items'][CarritoService._buscar_item(estado, item_id)]
+        return CarritoService._mutar(user, cambio)
+
+    @staticmethod
+    def limpiar(user):
+        def cambio(estado):
+            estado['items'] = {}
+        return CarritoService._mutar(user, cambio)
+
+    # ------------------------------------------------------------------
+    # PERSISTENCIA (write-behind)
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def persistir(user):
+        """
+        Vuelca el snapshot a `Carrito`/`ItemCarrito` en una transacción.
+        Retorna la instancia de `Carrito` (creándola si no existía).
+        """
+        from .models import Carrito, ItemCarrito
+
+        # Se guarda con los precios actuales: el checkout cobra lo que el usuario vio
+        estado = CarritoService._refrescar(CarritoService._cargar(user))
+
+        with transaction.atomic():
+            carrito, _ = Carrito.objects.get_or_create(usuario=user)
+            if estado['sucio'] or estado['carrito_id'] is None:
+                ItemCarrito.objects.filter(carrito=carrito).exclude(
+                    producto_id__in=list(estado['items'])
+                ).delete()
+
+                ahora = timezone.now()
+                ItemCarrito.objects.bulk_create(
+                    [
+                        ItemCarrito(
+                            carrito=carrito,
+                            producto_id=producto_id,
+                            cantidad=item['cantidad'],
+                            precio_unitario=item['precio_unitario'],
+                            created_at=ahora,
+                            updated_at=ahora,
+                        )
+                        for producto_id, item in estado['items'].items()
+                    ],
+                    update_conflicts=True,
+                    unique_fields=['carrito', 'producto'],
+                    update_fields=['cantidad', 'precio_unitario', 'updated_at'],
+                )
+
+        # Si la transacción externa (checkout) hace rollback, el snapshot sigue sucio
+        transaction.on_commit(
+            lambda: CarritoService._marcar_persistido(user.id, carrito.id, estado.get('version', 0))
+        )
+
+        logger.debug(f"Carrito {carrito.id} persistido ({len(estado['items'])} items)")
+        return carrito
+
+    @staticmethod
+    def _marcar_persistido(user_id, carrito_id, version):
+        """
+        Limpia `sucio` solo si nadie cambió el carrito desde la versión
+        persistida; si cambió, la persistencia se vuelve a programar.
+        """
+        cambiado = False
+
+        def marcar(estado):
+            nonlocal cambiado
+            if estado is None:
+                return None
+            estado['carrito_id'] = carrito_id
+            cambiado = estado.get('version', 0) != version
+            if not cambiado:
+                estado['sucio'] = False
+                estado['persistencia_programada'] = False
+            return estado
+
+        try:
+            actualizar_cache(_cache_key(user_id), marcar, CARRITO_TTL_SEGUNDOS)
+        except ConflictoConcurrente:
+            # Sigue sucio: otra pasada de persistencia lo resolverá
+            cambiado = True
+        if cambiado:
+            # Las mutaciones de en medio no programaron (la bandera seguía activa)
+            CarritoService._programar_persistencia(user_id)
+
+    @staticmethod
+    def vaciar_tras_checkout(user, carrito):
+        """Limpia BD y caché una vez confirmado el pedido."""
+        carrito.limpiar()
+
+        def vaciar(estado):
+            return {
+                'carrito_id': carrito.id,
+                'items': {},
+                'actualizado_en': time.time(),
+                'version': (estado or {}).get('version', 0) + 1,
+                'sucio': False,
+                'persistencia_programada': False,
+            }
+
+        def aplicar():
+            try:
+                actualizar_cache(_cache_key(user.id), vaciar, CARRITO_TTL_SEGUNDOS)
+            except ConflictoConcurrente:
+                # Sin snapshot, la siguiente lectura lo reconstruye (vacío) desde la BD
+                cache.delete(_cache_key(user.id))
+
+        transaction.on_commit(aplicar)
+
+    @staticmethod
+    def segundos_inactivo(user_id):
+        """Segundos desde la última mutación, o None si no hay cambios pendientes."""
+        estado = cache.get(_cache_key(user_id))
+        if not estado or not estado.get('sucio'):
+            return None
+        return time.time() - estado['actualizado_en']
+
+
+# ═══════════════════════════════════════════════════════════════════════
+# CONTADORES DE VENTAS Y POPULARIDAD (buffer en Redis + flush por lotes)
+# ═══════════════════════════════════════════════════════════════════════
+
+KEY_VENDIDOS = 'contadores:productos:vendidos'
+KEY_POPULARIDAD_DIA = 'contadores:productos:popularidad:{fecha}'
+
+VENTANA_POPULARIDAD_DIAS = 30
+LOTE_FLUSH = 500
+
+
+def _key_popularidad(fecha):
+    return KEY_POPULARIDAD_DIA.format(fecha=fecha.strftime('%Y%m%d'))
+
+
+class ContadorProductoService:
+    """
+    Acumula incrementos de `veces_vendido` y ventas diarias por producto en
+    hashes de Redis; una tarea periódica los vuelca con un UPDATE por lote.
+    Así un producto en promoción no serializa todos los checkouts sobre su fila.
+    """
+
+    @staticmethod
+    def registrar_ventas(cantidades):
+        """Acumula {producto_id: unidades} en el buffer y en el bucket del día."""
+        from utils.redis_client import get_redis
+
+        cantidades = {pid: cant for pid, cant in cantidades.items() if cant}
+        if not cantidades:
+            return
+
+        key_dia = _key_popularidad(timezone.localdate())
+        try:
+            pipe = get_redis().pipeline(transaction=False)
+            for producto_id, cantidad in cantidades.items():
+                pipe.hincrby(KEY_VENDIDOS, producto_id, cantidad)
+                pipe.hincrby(key_dia, producto_id, cantidad)
+            pipe.expire(key_dia, (VENTANA_POPULARIDAD_DIAS + 2) * 86400)
+            pipe.execute()
+        except Exception as e:
+            # Sin Redis no se pierden ventas: se aplican directamente
+            logger.warning(f"Buffer de contadores no disponible, aplicando directo: {e}")
+            ContadorProductoService._aplicar_vendidos(cantidades)
+
+    @staticmethod
+    def _aplicar_vendidos(deltas):
+        from django.db.models import Case, F, IntegerField, Value, When
+        from .models import Producto
+
+        ids = list(deltas)
+        for i in range(0, len(ids), LOTE_FLUSH):
+            lote = ids[i:i + LOTE_FLUSH]
+            Producto.objects.filter(id__in=lote).update(
+                veces_vendido=F('veces_vendido') + Case(
+                    *[When(id=pid, then=Value(deltas[pid])) for pid in lote],
+                    default=Value(0),
+                    output_field=IntegerField(),
+                )
+            )
+
+    @staticmethod
+    def flush_vendidos():
+        """Vuelca el buffer de `veces_vendido`. Retorna el número de productos actualizados."""
+        from utils.redis_client import get_redis, decodificar_hash, lote_pendiente
+
+        r = get_redis()
+        # Un fallo deja el lote en Redis para el siguiente ciclo
+        with lote_pendiente(r, KEY_VENDIDOS) as temporal:
+            if temporal is None:
+                return 0
+            deltas = decodificar_hash(r.hgetall(temporal))
+            ContadorProductoService._aplicar_vendidos(deltas)
+        return len(deltas)
+
+    @staticmethod
+    def recalcular_popularidad():
+        """
+        Recalcula `popularidad_7d` y `popularidad_30d` sumando los buckets
+        diarios de Redis. Los productos que salen de la ventana vuelven a 0.
+        """
+        from datetime import timedelta
+        from .models import Producto
+        from utils.redis_client import get_redis, decodificar_hash
+
+        hoy = timezone.localdate()
+        pipe = get_redis().pipeline(transaction=False)
+        for dias in range(VENTANA_POPULARIDAD_DIAS):
+            pipe.hgetall(_key_popularidad(hoy - timedelta(days=dias)))
+        buckets = [decodificar_hash(valores) for valores in pipe.execute()]
+
+        scores = {}
+        for dias, bucket in enumerate(buckets):
+            for producto_id, unidades in bucket.items():
+                s7, s30 = scores.get(producto_id, (0, 0))
+                scores[producto_id] = (s7 + (unidades if dias < 7 else 0), s30 + unidades)
+
+        with transaction.atomic():
+            Producto.objects.filter(popularidad_30d__gt=0).exclude(
+                id__in=list(scores)
+            ).update(popularidad_7d=0, popularidad_30d=0)
+
+            existentes = set(Producto.objects.filter(id__in=list(scores)).values_list('id', flat=True))
+            Producto.objects.bulk_update(
+                [
+                    Producto(pk=pid, popularidad_7d=s7, popularidad_30d=s30)
+                    for pid, (s7, s30) in scores.items() if pid in existentes
+                ],
+                ['popularidad_7d', 'popularidad_30d'],
+                batch_size=LOTE_FLUSH,
+            )
+        return len(scores)
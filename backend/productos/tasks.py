@@ -0,0 +1,57 @@
+# productos/tasks.py
+
+from celery import shared_task
+import logging
+
+logger = logging.getLogger('productos')
+
+
+# ==========================================================
+# CARRITO (WRITE-BEHIND)
+# ==========================================================
+
+@shared_task(bind=True, name='productos.persistir_carrito_inactivo', ignore_result=True)
+def persistir_carrito_inactivo(self, user_id):
+    """
+    Persiste el carrito en Postgres cuando lleva INACTIVIDAD_SEGUNDOS sin cambios.
+    Si hubo actividad reciente, se reprograma por el tiempo restante
+    (una sola tarea pendiente por carrito).
+    """
+    from django.contrib.auth import get_user_model
+    from .services import CarritoService, INACTIVIDAD_SEGUNDOS
+
+    inactivo = CarritoService.segundos_inactivo(user_id)
+    if inactivo is None:
+        return
+
+    restante = INACTIVIDAD_SEGUNDOS - inactivo
+    if restante > 0 and not self.request.is_eager:
+        self.apply_async(args=[user_id], countdown=int(restante) + 1)
+        return
+
+    user = get_user_model().objects.filter(pk=user_id).first()
+    if user:
+        CarritoService.persistir(user)
+
+
+# ==========================================================
+# CONTADORES DE VENTAS / POPULARIDAD
+# ==========================================================
+
+@shared_task(name='productos.flush_contadores', ignore_result=True)
+def flush_contadores():
+    """Vuelca el buffer de ventas de productos."""
+    from .services import ContadorProductoService
+
+    productos = ContadorProductoService.flush_vendidos()
+    if productos:
+        logger.info(f"Contadores volcados: {productos} productos")
+
+
+@shared_task(name='productos.recalcular_popularidad', ignore_result=True, acks_late=True)
+def recalcular_popularidad():
+    """Actualiza los scores de popularidad de 7 y 30 días."""
+    from .services import ContadorProductoService
+
+    total = ContadorProductoService.recalcular_popularidad()
+    logger.info(f"Popularidad recalculada para {total} productos")
@@ -2,6 +2,7 @@ from django.urls import reverse
 from django.contrib.auth import get_user_model
 from rest_framework import status
 from rest_framework.test import APITestCase
+from decimal import Decimal
 
 from proveedores.models import Proveedor
 from .models import Categoria, Producto, Promocion
@@ -238,3 +239,259 @@ class PromocionAPITest(APITestCase):
 
         print(f"\n✅ Promoción listada correctamente")
         print(f"✅ Productos en respuesta API: {promo_data['productos_asociados']}")
+
+
+class CarritoCacheTest(APITestCase):
+    """El carrito opera sobre la caché y solo escribe en BD al persistir."""
+
+    def setUp(self):
+        from django.core.cache import cache
+        from unittest import mock
+
+        cache.clear()
+        self.user = User.objects.create_user(
+            email="cliente@carrito.com",
+            username="cliente_carrito",
+            password="password123",
+        )
+        self.proveedor = Proveedor.objects.create(
+            user=self.user,
+            nombre="Proveedor Carrito",
+            ruc="0999999999002",
+            telefono="+593999999998",
+            email="cliente@carrito.com",
+            tipo_proveedor="restaurante",
+            activo=True,
+            verificado=True,
+        )
+        self.pizza = Producto.objects.create(
+            proveedor=self.proveedor, nombre="Pizza", descripcion="Desc",
+            precio=10.00, disponible=True, tiene_stock=True, stock=5,
+        )
+        self.soda = Producto.objects.create(
+            proveedor=self.proveedor, nombre="Soda", descripcion="Desc",
+            precio=1.50, disponible=True,
+        )
+        self.client.force_authenticate(user=self.user)
+
+        patcher = mock.patch("productos.tasks.persistir_carrito_inactivo.apply_async")
+        self.programar = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _ids_por_producto(self, data):
+        return {item["producto_id"]: item["id"] for item in data["items"]}
+
+    def test_acciones_no_escriben_cantidades_en_bd(self):
+        from .models import ItemCarrito
+
+        self.client.post(reverse("productos:agregar-carrito"), {"producto_id": self.pizza.id, "cantidad": 2})
+        res = self.client.post(reverse("productos:agregar-carrito"), {"producto_id": self.soda.id, "cantidad": 4})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["total"], Decimal("26.00"))
+        self.assertEqual(res.data["cantidad_total"], 6)
+
+        # El id de cada item es el de su fila de ItemCarrito
+        ids = self._ids_por_producto(res.data)
+        self.assertEqual(
+            ids, dict(ItemCarrito.objects.values_list("producto_id", "id"))
+        )
+
+        res = self.client.put(
+            reverse("productos:actualizar-cantidad", args=[ids[self.pizza.id]]), {"cantidad": 1}
+        )
+        self.assertEqual(res.data["total"], Decimal("16.00"))
+
+        res = self.client.put(
+            reverse("productos:actualizar-cantidad", args=[ids[self.pizza.id]]), {"cantidad": 9}
+        )
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.delete(reverse("productos:remover-item", args=[max(ids.values()) + 1]))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+        res = self.client.delete(reverse("productos:remover-item", args=[ids[self.soda.id]]))
+        self.assertEqual(res.data["cantidad_total"], 1)
+
+        # Las cantidades siguen siendo las iniciales hasta persistir
+        self.assertEqual(
+            dict(ItemCarrito.objects.values_list("producto_id", "cantidad")),
+            {self.pizza.id: 2, self.soda.id: 4},
+        )
+        # Una sola persistencia programada por carrito sucio
+        self.assertEqual(self.programar.call_count, 1)
+
+    def test_persistir_y_rehidratar(self):
+        from django.core.cache import cache
+        from .models import ItemCarrito
+        from .services import CarritoService
+
+        self.client.post(reverse("productos:agregar-carrito"), {"producto_id": self.pizza.id, "cantidad": 3})
+        with self.captureOnCommitCallbacks(execute=True):
+            carrito = CarritoService.persistir(self.user)
+
+        item = ItemCarrito.objects.get(carrito=carrito)
+        self.assertEqual((item.producto_id, item.cantidad), (self.pizza.id, 3))
+
+        # Tras expirar la caché el carrito se reconstruye desde la BD
+        cache.clear()
+        res = self.client.get(reverse("productos:ver-carrito"))
+        self.assertEqual(res.data["id"], carrito.id)
+        self.assertEqual(res.data["items"][0]["cantidad"], 3)
+
+        # El id del item no cambia al persistir ni al reconstruir
+        self.assertEqual(res.data["items"][0]["id"], item.id)
+        res = self.client.delete(reverse("productos:remover-item", args=[item.id]))
+        self.assertEqual(res.data["items"], [])
+
+    def test_precio_y_stock_se_refrescan(self):
+        from .models import ItemCarrito
+        from .services import CarritoService
+
+        self.client.post(reverse("productos:agregar-carrito"), {"producto_id": self.pizza.id, "cantidad": 2})
+        Producto.objects.filter(id=self.pizza.id).update(precio=Decimal("12.00"), stock=1)
+
+        res = self.client.get(reverse("productos:ver-carrito"))
+        item = res.data["items"][0]
+        self.assertEqual(item["precio_unitario"], "12.00")
+        self.assertEqual(res.data["total"], Decimal("24.00"))
+
+        # La validación de stock usa el valor actual
+        res = self.client.put(
+            reverse("productos:actualizar-cantidad", args=[item["id"]]), {"cantidad": 2}
+        )
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        carrito = CarritoService.persistir(self.user)
+        self.assertEqual(ItemCarrito.objects.get(carrito=carrito).precio_unitario, Decimal("12.00"))
+
+    def test_conflictos_repetidos_no_reintentan_sin_limite(self):
+        from unittest import mock
+        from redis.exceptions import WatchError
+        from utils import redis_client
+
+        with mock.patch.object(redis_client, "get_redis") as cliente:
+            pipe = cliente.return_value.pipeline.return_value.__enter__.return_value
+            pipe.get.return_value = None
+            pipe.execute.side_effect = WatchError
+            res = self.client.post(
+                reverse("productos:agregar-carrito"), {"producto_id": self.pizza.id, "cantidad": 1}
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(pipe.execute.call_count, redis_client.REINTENTOS_WATCH)
+
+    def test_escritura_concurrente_no_se_pierde(self):
+        from unittest import mock
+        from . import services
+        from .services import CarritoService
+
+        original = services._snapshot_producto
+        otra_solicitud = []
+
+        def snapshot(producto, cantidad, *args, **kwargs):
+            # Otra solicitud del usuario escribe el carrito entre la lectura y el guardado
+            if not otra_solicitud:
+                otra_solicitud.append(self.soda)
+                CarritoService.agregar(self.user, self.soda, 2)
+            return original(producto, cantidad, *args, **kwargs)
+
+        with mock.patch.object(services, '_snapshot_producto', side_effect=snapshot):
+            CarritoService.agregar(self.user, self.pizza, 1)
+
+        self.assertEqual(CarritoService.cantidades(self.user), {self.pizza.id: 1, self.soda.id: 2})
+
+    def test_cambios_durante_la_persistencia_siguen_sucios(self):
+        from .services import CarritoService
+
+        CarritoService.agregar(self.user, self.pizza, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            CarritoService.persistir(self.user)
+            CarritoService.agregar(self.user, self.soda, 2)
+
+        self.assertIsNotNone(CarritoService.segundos_inactivo(self.user.id))
+        # La persistencia se reprograma para los cambios que quedaron fuera
+        self.assertEqual(self.programar.call_count, 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            CarritoService.persistir(self.user)
+        self.assertIsNone(CarritoService.segundos_inactivo(self.user.id))
+
+
+class ContadorProductoTest(APITestCase):
+    """Ventas acumuladas en Redis y volcadas por lotes."""
+
+    def setUp(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from utils.redis_client import get_redis
+        from .services import KEY_VENDIDOS, VENTANA_POPULARIDAD_DIAS, _key_popularidad
+
+        self.redis = get_redis()
+        hoy = timezone.localdate()
+        self.redis.delete(KEY_VENDIDOS, *[
+            _key_popularidad(hoy - timedelta(days=d)) for d in range(VENTANA_POPULARIDAD_DIAS)
+        ])
+
+        user = User.objects.create_user(email="p@contadores.com", username="pcont", password="password123")
+        proveedor = Proveedor.objects.create(
+            user=user, nombre="Proveedor Contadores", ruc="0999999999003",
+            telefono="+593999999997", email="p@contadores.com",
+            tipo_proveedor="restaurante", activo=True, verificado=True,
+        )
+        self.hot = Producto.objects.create(
+            proveedor=proveedor, nombre="Hot", descripcion="Desc", precio=5, veces_vendido=10,
+        )
+        self.viejo = Producto.objects.create(
+            proveedor=proveedor, nombre="Viejo", descripcion="Desc", precio=5,
+            popularidad_7d=3, popularidad_30d=8,
+        )
+
+    def test_flush_aplica_incrementos_acumulados(self):
+        from .services import ContadorProductoService
+
+        ContadorProductoService.registrar_ventas({self.hot.id: 2})
+        ContadorProductoService.registrar_ventas({self.hot.id: 3})
+
+        self.hot.refresh_from_db()
+        self.assertEqual(self.hot.veces_vendido, 10)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(ContadorProductoService.flush_vendidos(), 1)
+        self.hot.refresh_from_db()
+        self.assertEqual(self.hot.veces_vendido, 15)
+
+        # El buffer quedó vacío: un segundo flush no duplica
+        self.assertEqual(ContadorProductoService.flush_vendidos(), 0)
+
+    def test_flush_fallido_conserva_el_lote(self):
+        from unittest import mock
+        from .services import ContadorProductoService
+
+        ContadorProductoService.registrar_ventas({self.hot.id: 2})
+        # El worker muere a mitad del flush, sin llegar a ningún except
+        with mock.patch.object(ContadorProductoService, "_aplicar_vendidos", side_effect=SystemExit):
+            with self.assertRaises(SystemExit):
+                ContadorProductoService.flush_vendidos()
+
+        # Ventas nuevas llegan a la clave principal mientras el lote espera
+        ContadorProductoService.registrar_ventas({self.hot.id: 1})
+
+        # El siguiente ciclo retoma el lote pendiente y después el buffer nuevo
+        with self.captureOnCommitCallbacks(execute=True):
+            ContadorProductoService.flush_vendidos()
+        with self.captureOnCommitCallbacks(execute=True):
+            ContadorProductoService.flush_vendidos()
+        self.hot.refresh_from_db()
+        self.assertEqual(self.hot.veces_vendido, 13)
+        self.assertEqual(ContadorProductoService.flush_vendidos(), 0)
+
+    def test_recalcular_popularidad(self):
+        from .services import ContadorProductoService
+
+        ContadorProductoService.registrar_ventas({self.hot.id: 4})
+        ContadorProductoService.recalcular_popularidad()
+
+        self.hot.refresh_from_db()
+        self.viejo.refresh_from_db()
+        self.assertEqual((self.hot.popularidad_7d, self.hot.popularidad_30d), (4, 4))
+        self.assertEqual((self.viejo.popularidad_7d, self.viejo.popularidad_30d), (0, 0))
@@ -6,24 +6,27 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny, IsAuthenticatedOrReadOnly
 from django.db.models import Q, F
 from django.db import transaction 
+from django.core.exceptions import ValidationError as DjangoValidationError
 from rest_framework import serializers
 from decimal import Decimal
 
 from .models import (
     Categoria, Producto, Promocion,
-    Carrito, ItemCarrito
+    Carrito
 )
 from .serializers import (
     CategoriaSerializer,
     ProductoListSerializer, ProductoDetalleSerializer,
     PromocionSerializer,
-    CarritoSerializer, ItemCarritoSerializer,
+    ItemCarritoSerializer,
     AgregarAlCarritoSerializer, ActualizarCantidadSerializer
 )
 from .serializers import ProviderProductoDetailSerializer, ProviderProductoSerializer
+from .services import CarritoOcupado, CarritoService, ItemCarritoNoEncontrado
 from pedidos.serializers import PedidoCreateSerializer, PedidoDetailSerializer
 from pedidos.models import TipoPedido
 from pagos.models import Pago, MetodoPago, TipoMetodoPago, EstadoPago as EstadoPagoPago
+from utils.replica import LecturaReplicaMixin
 import logging
 
 logger = logging.getLogger('productos')
@@ -35,7 +38,7 @@ class StandardResultsSetPagination(PageNumberPagination):
     page_size_query_param = 'page_size'
     max_page_size = 100
 
-class CategoriaViewSet(viewsets.ModelViewSet):
+class CategoriaViewSet(LecturaReplicaMixin, viewsets.ModelViewSet):
     queryset = Categoria.objects.filter(activo=True)
     serializer_class = CategoriaSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
@@ -43,7 +46,7 @@ class CategoriaViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(activo=True)
 
-class ProductoViewSet(viewsets.ReadOnlyModelViewSet):
+class ProductoViewSet(LecturaReplicaMixin, viewsets.ReadOnlyModelViewSet):
     permission_classes = [AllowAny]
     pagination_class = StandardResultsSetPagination  
     
@@ -124,13 +127,15 @@ class ProductoViewSet(viewsets.ReadOnlyModelViewSet):
             # Filtra productos populares (con ventas > 0) y los mezcla aleatoriamente
             productos = self.get_queryset().filter(veces_vendido__gt=0).order_by('?')[:20]
         else:
-            # Ordenamos por veces_vendido (descendente) y rating_promedio (descendente)
-            productos = self.get_queryset().order_by('-veces_vendido', '-rating_promedio')[:20]
+            # Popularidad reciente (7 días), luego histórico y rating
+            productos = self.get_queryset().order_by(
+                '-popularidad_7d', '-veces_vendido', '-rating_promedio'
+            )[:20]
 
         serializer = self.get_serializer(productos, many=True)
         return Response(serializer.data)
 
-class PromocionViewSet(viewsets.ReadOnlyModelViewSet):
+class PromocionViewSet(LecturaReplicaMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = PromocionSerializer
     permission_classes = [AllowAny]
     
@@ -295,35 +300,30 @@ class ProviderProductoViewSet(viewsets.ModelViewSet):
             'ventas_por_dia': ventas_por_dia,
         })
 
-# ... (El resto de vistas del Carrito se mantiene igual, no necesita cambios) ...
+# ═══════════════════════════════════════════════════════════════════════
+# CARRITO (snapshot en caché, ver productos/services.py)
+# ═══════════════════════════════════════════════════════════════════════
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def ver_carrito(request):
-    try:
-        carrito = Carrito.objects.prefetch_related('items__producto').get(usuario=request.user)
-    except Carrito.DoesNotExist:
-        carrito = Carrito.objects.create(usuario=request.user)
-    return Response(CarritoSerializer(carrito).data)
+    return Response(CarritoService.obtener(request.user))
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def agregar_al_carrito(request):
-    carrito, _ = Carrito.objects.get_or_create(usuario=request.user)
-    serializer = AgregarAlCarritoSerializer(data=request.data, context={'carrito_instance': carrito})
+    serializer = AgregarAlCarritoSerializer(
+        data=request.data,
+        context={'cantidades_en_carrito': CarritoService.cantidades(request.user)}
+    )
     serializer.is_valid(raise_exception=True)
     
     producto = serializer.instance 
     cantidad = serializer.validated_data['cantidad']
     
-    item, created = ItemCarrito.objects.get_or_create(
-        carrito=carrito, producto=producto,
-        defaults={'cantidad': cantidad, 'precio_unitario': producto.precio}
-    )
-    if not created:
-        item.cantidad += cantidad
-        item.save()
-    
-    return Response(CarritoSerializer(carrito).data)
+    try:
+        return Response(CarritoService.agregar(request.user, producto, cantidad))
+    except CarritoOcupado:
+        return Response({'error': 'Carrito ocupado, intenta de nuevo'}, status=409)
 
 @api_view(['PUT'])
 @permission_classes([IsAuthenticated])
@@ -331,38 +331,34 @@ def actualizar_cantidad(request, item_id):
     serializer = ActualizarCantidadSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
     try:
-        item = ItemCarrito.objects.get(id=item_id, carrito__usuario=request.user)
-    except ItemCarrito.DoesNotExist:
+        data = CarritoService.actualizar_cantidad(
+            request.user, item_id, serializer.validated_data['cantidad']
+        )
+    except ItemCarritoNoEncontrado:
         return Response({'error': 'Item no encontrado'}, status=404)
-    
-    nueva = serializer.validated_data['cantidad']
-    if item.producto.tiene_stock and item.producto.stock < nueva:
+    except DjangoValidationError:
         return Response({'error': 'Stock insuficiente'}, status=400)
-    
-    item.cantidad = nueva
-    item.save()
-    return Response(CarritoSerializer(item.carrito).data)
+    except CarritoOcupado:
+        return Response({'error': 'Carrito ocupado, intenta de nuevo'}, status=409)
+    return Response(data)
 
 @api_view(['DELETE'])
 @permission_classes([IsAuthenticated])
 def remover_del_carrito(request, item_id):
     try:
-        item = ItemCarrito.objects.get(id=item_id, carrito__usuario=request.user)
-        carrito = item.carrito
-        item.delete()
-        return Response(CarritoSerializer(carrito).data)
-    except ItemCarrito.DoesNotExist:
+        return Response(CarritoService.remover(request.user, item_id))
+    except ItemCarritoNoEncontrado:
         return Response({'error': 'Item no encontrado'}, status=404)
+    except CarritoOcupado:
+        return Response({'error': 'Carrito ocupado, intenta de nuevo'}, status=409)
 
 @api_view(['DELETE'])
 @permission_classes([IsAuthenticated])
 def limpiar_carrito(request):
     try:
-        carrito = Carrito.objects.get(usuario=request.user)
-        carrito.limpiar()
-        return Response(CarritoSerializer(carrito).data)
-    except Carrito.DoesNotExist:
-        return Response({'message': 'Carrito vacío'}, status=404)
+        return Response(CarritoService.limpiar(request.user))
+    except CarritoOcupado:
+        return Response({'error': 'Carrito ocupado, intenta de nuevo'}, status=409)
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -372,10 +368,9 @@ def checkout(request):
     Crea UN SOLO pedido global que contiene todos los productos del carrito,
     independientemente del proveedor. El desglose interno se maneja en los items.
     """
-    try:
-        carrito = Carrito.objects.prefetch_related('items__producto__proveedor').get(usuario=request.user)
-    except Carrito.DoesNotExist:
-        return Response({'error': 'No tienes un carrito'}, status=404)
+    # Volcar el snapshot en caché antes de leer el carrito desde la BD
+    carrito = CarritoService.persistir(request.user)
+    carrito = Carrito.objects.prefetch_related('items__producto__proveedor').get(pk=carrito.pk)
 
     if not carrito.items.exists():
         return Response({'error': 'Carrito vacío'}, status=400)
@@ -474,8 +469,8 @@ def checkout(request):
     except Exception as e:
         logger.warning(f"No se pudo crear el registro de pago para el pedido #{pedido.id}: {e}")
 
-    # Limpiar carrito después de crear el pedido
-    carrito.limpiar()
+    # Limpiar carrito (BD y caché) después de crear el pedido
+    CarritoService.vaciar_tras_checkout(request.user, carrito)
 
     return Response(
         {
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-19 04:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proveedores', '0003_remove_accionadministrativa_calificacion_promedio_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='proveedor',
+            name='suma_calificaciones',
+            field=models.PositiveIntegerField(default=0, verbose_name='Suma de Calificaciones'),
+        ),
+    ]
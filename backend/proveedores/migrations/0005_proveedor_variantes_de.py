@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-19 06:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proveedores', '0004_proveedor_suma_calificaciones'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='proveedor',
+            name='variantes_de',
+            field=models.CharField(blank=True, default='', editable=False, help_text='Logo cuyos derivados (thumb/card/detail) ya se generaron', max_length=255),
+        ),
+    ]
@@ -236,6 +236,10 @@ class Proveedor(models.Model):
         blank=True,
         verbose_name='Logo'
     )
+    variantes_de = models.CharField(
+        max_length=255, blank=True, default='', editable=False,
+        help_text='Logo cuyos derivados (thumb/card/detail) ya se generaron'
+    )
 
     # ============================================
     # AUDITORIA
@@ -572,6 +576,12 @@ class Proveedor(models.Model):
         default=0,
         verbose_name='Total de Reseñas'
     )
+
+    # Suma exacta de estrellas: permite actualizar el promedio con deltas F()
+    suma_calificaciones = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Suma de Calificaciones'
+    )
 
     # ============================================
     # VALIDACIONES
@@ -10,6 +10,7 @@ from .models import (
     RepartidorEstadoLog, CalificacionRepartidor, CalificacionCliente,
     EstadoRepartidor
 )
+from authentication.principal import invalidar as invalidar_principal
 
 
 # ============================
@@ -39,12 +40,14 @@ class RepartidorEstadoLogInline(admin.TabularInline):
 @admin.action(description="Marcar seleccionados como VERIFICADOS")
 def action_marcar_verificados(modeladmin, request, queryset):
     updated = queryset.update(verificado=True)
+    invalidar_principal(*queryset.values_list("user_id", flat=True))
     messages.success(request, f"{updated} repartidor(es) verificados.")
 
 
 @admin.action(description="Desactivar repartidores seleccionados")
 def action_desactivar(modeladmin, request, queryset):
     updated = queryset.update(activo=False, estado=EstadoRepartidor.FUERA_SERVICIO)
+    invalidar_principal(*queryset.values_list("user_id", flat=True))
     messages.warning(request, f"{updated} repartidor(es) desactivados y fuera de servicio.")
 
 
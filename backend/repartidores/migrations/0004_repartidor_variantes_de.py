@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-19 06:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('repartidores', '0003_repartidor_vehiculo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='repartidor',
+            name='variantes_de',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+    ]
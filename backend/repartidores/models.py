@@ -61,6 +61,7 @@ class Repartidor(TimeStampedModel):
 
     # Identidad y medios
     foto_perfil = models.ImageField(upload_to='repartidores/perfil/', blank=True, null=True)
+    variantes_de = models.CharField(max_length=255, blank=True, default='', editable=False)
     cedula = models.CharField(max_length=10, unique=True)
     telefono = models.CharField(max_length=15)
     vehiculo = models.CharField(
@@ -1,6 +1,9 @@
 # repartidores/permissions.py
 from rest_framework.permissions import BasePermission
 
+from authentication.principal import principal_de
+
+
 class IsRepartidor(BasePermission):
     """
     Permiso personalizado: solo usuarios con perfil de repartidor pueden acceder.
@@ -9,11 +12,9 @@ class IsRepartidor(BasePermission):
 
     def has_permission(self, request, view):
         # Verificar autenticación Y que tenga perfil de repartidor
-        if not (request.user and request.user.is_authenticated):
-            return False
-
-        # Verificar que el usuario tenga perfil de repartidor
-        return hasattr(request.user, 'repartidor')
+        # (desde el principal en caché, sin consultar user.repartidor)
+        principal = principal_de(request.user)
+        return principal is not None and principal['repartidor_id'] is not None
 
 
 class IsRepartidorActivo(BasePermission):
@@ -23,8 +24,8 @@ class IsRepartidorActivo(BasePermission):
     message = "Tu cuenta de repartidor no está activa o verificada."
 
     def has_permission(self, request, view):
-        if not hasattr(request.user, 'repartidor'):
+        principal = principal_de(request.user)
+        if principal is None or principal['repartidor_id'] is None:
             return False
 
-        repartidor = request.user.repartidor
-        return repartidor.activo and repartidor.verificado
+        return principal['repartidor_activo'] and principal['repartidor_verificado']
@@ -23,6 +23,7 @@ from utils.throttles import (
     UbicacionThrottle,
     VehiculoThrottle,
     CalificacionThrottle,
+    LimitadorThrottleMixin,
 )
 from .models import (
     Repartidor,
@@ -1661,7 +1662,7 @@ def rechazar_pedido(request, pedido_id):
 # ==========================================================
 
 # Definir throttle para editar perfil
-class EditarPerfilThrottle(UserRateThrottle):
+class EditarPerfilThrottle(LimitadorThrottleMixin, UserRateThrottle):
     rate = "30/hour"
 
 @api_view(["PATCH"])
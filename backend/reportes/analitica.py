@@ -0,0 +1,282 @@
+# reportes/analitica.py
+"""
+Snapshot analítico de pedidos (HechoPedido) y consultas ad-hoc sobre él.
+
+Cada pedido se aplana en una fila con sus dimensiones (fecha, hora,
+proveedor, repartidor, estado, pago), montos, ítems y datos de envío. La
+sincronización incremental toma los pedidos con `actualizado_en` posterior
+a la última marca copiada y los escribe con un upsert por lotes; la
+reconstrucción nocturna además elimina hechos de pedidos borrados.
+
+Las agrupaciones se hacen sobre una sola tabla angosta con índices por día,
+sin JOINs ni bloqueos sobre las tablas operacionales.
+"""
+
+import logging
+from datetime import timedelta
+
+from django.db.models import Avg, Count, Max, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+logger = logging.getLogger('reportes')
+
+LOTE_SINCRONIZACION = 1000
+
+# Ventana que se relee en cada incremental: cubre transacciones que
+# confirmaron tarde con un actualizado_en anterior a la marca
+SOLAPE_INCREMENTAL = timedelta(minutes=5)
+
+# Dimensiones agrupables (nombre público -> columnas de HechoPedido)
+DIMENSIONES = {
+    'dia': ('dia',),
+    'hora': ('hora',),
+    'dia_semana': ('dia_semana',),
+    'proveedor': ('proveedor_id', 'proveedor_nombre'),
+    'repartidor': ('repartidor_id', 'repartidor_nombre'),
+    'tipo': ('tipo',),
+    'estado': ('estado',),
+    'estado_pago': ('estado_pago',),
+    'metodo_pago': ('metodo_pago',),
+}
+
+# Medidas disponibles (nombre público -> agregado)
+MEDIDAS = {
+    'pedidos': lambda: Count('pk'),
+    'ventas': lambda: Sum('total'),
+    'ganancia_app': lambda: Sum('ganancia_app'),
+    'comision_repartidor': lambda: Sum('comision_repartidor'),
+    'comision_proveedor': lambda: Sum('comision_proveedor'),
+    'unidades': lambda: Sum('unidades'),
+    'ticket_promedio': lambda: Avg('total'),
+    'distancia_km': lambda: Sum('distancia_km'),
+    'minutos_entrega_promedio': lambda: Avg('minutos_entrega'),
+}
+
+# Filtros aceptados (nombre público -> lookup)
+FILTROS = {
+    'desde': 'dia__gte',
+    'hasta': 'dia__lte',
+    'estado': 'estado__in',
+    'tipo': 'tipo',
+    'metodo_pago': 'metodo_pago__in',
+    'proveedor': 'proveedor_id',
+    'repartidor': 'repartidor_id',
+}
+
+# Columnas de HechoPedido que se reescriben en cada upsert
+_CAMPOS_HECHO = [
+    'pedido_actualizado_en', 'creado_en', 'dia', 'hora', 'dia_semana',
+    'cliente_id', 'proveedor_id', 'proveedor_nombre', 'repartidor_id', 'repartidor_nombre',
+    'tipo', 'estado', 'estado_pago', 'metodo_pago',
+    'total', 'comision_repartidor', 'comision_proveedor', 'ganancia_app', 'tarifa_servicio',
+    'items', 'unidades', 'distancia_km', 'costo_envio', 'minutos_entrega',
+]
+
+
+class ConsultaAnaliticaInvalida(ValueError):
+    pass
+
+
+# ============================================
+# SINCRONIZACIÓN
+# ============================================
+
+def _proyeccion(pedidos):
+    """Pedidos como dicts planos con ítems y envío resueltos en la misma consulta."""
+    from pedidos.models import ItemPedido
+
+    items = ItemPedido.objects.filter(pedido=OuterRef('pk')).order_by().values('pedido')
+    return pedidos.annotate(
+        n_items=Coalesce(Subquery(items.annotate(n=Count('pk')).values('n')), 0),
+        n_unidades=Coalesce(Subquery(items.annotate(n=Sum('cantidad')).values('n')), 0),
+    ).values(
+        'id', 'actualizado_en', 'creado_en', 'fecha_entregado',
+        'cliente_id', 'proveedor_id', 'proveedor__nombre',
+        'repartidor_id', 'repartidor__user__first_name', 'repartidor__user__last_name',
+        'tipo', 'estado', 'estado_pago', 'metodo_pago',
+        'total', 'comision_repartidor', 'comision_proveedor', 'ganancia_app', 'tarifa_servicio',
+        'n_items', 'n_unidades', 'datos_envio__distancia_km', 'datos_envio__total_envio',
+    )
+
+
+def _hecho(p):
+    from reportes.models import HechoPedido
+
+    creado = timezone.localtime(p['creado_en'])
+    minutos = None
+    if p['fecha_entregado']:
+        minutos = max(0, int((p['fecha_entregado'] - p['creado_en']).total_seconds() // 60))
+    repartidor = f"{p['repartidor__user__first_name'] or ''} {p['repartidor__user__last_name'] or ''}".strip()
+
+    return HechoPedido(
+        pedido_id=p['id'],
+        pedido_actualizado_en=p['actualizado_en'],
+        creado_en=p['creado_en'],
+        dia=creado.date(),
+        hora=creado.hour,
+        dia_semana=creado.isoweekday(),
+        cliente_id=p['cliente_id'],
+        proveedor_id=p['proveedor_id'],
+        proveedor_nombre=p['proveedor__nombre'] or '',
+        repartidor_id=p['repartidor_id'],
+        repartidor_nombre=repartidor,
+        tipo=p['tipo'],
+        estado=p['estado'],
+        estado_pago=p['estado_pago'],
+        metodo_pago=p['metodo_pago'],
+        total=p['total'],
+        comision_repartidor=p['comision_repartidor'],
+        comision_proveedor=p['comision_proveedor'],
+        ganancia_app=p['ganancia_app'],
+        tarifa_servicio=p['tarifa_servicio'],
+        items=p['n_items'],
+        unidades=p['n_unidades'],
+        distancia_km=p['datos_envio__distancia_km'],
+        costo_envio=p['datos_envio__total_envio'],
+        minutos_entrega=minutos,
+    )
+
+
+def _escribir(hechos):
+    from reportes.models import HechoPedido
+
+    HechoPedido.objects.bulk_create(
+        hechos,
+        update_conflicts=True,
+        unique_fields=['pedido'],
+        update_fields=_CAMPOS_HECHO,
+    )
+
+
+def marca_actual():
+    """Última `actualizado_en` de pedido copiada al snapshot (None si está vacío)."""
+    from reportes.models import HechoPedido
+
+    return HechoPedido.objects.aggregate(marca=Max('pedido_actualizado_en'))['marca']
+
+
+def sincronizar(completo=False, lote=LOTE_SINCRONIZACION):
+    """
+    Copia al snapshot los pedidos nuevos o modificados desde la última marca
+    (o todos con `completo=True`).
+
+    Returns:
+        int: pedidos escritos
+    """
+    from pedidos.models import Pedido
+
+    pedidos = Pedido.objects.order_by('actualizado_en', 'pk')
+    marca = None if completo else marca_actual()
+    if marca:
+        # El upsert es idempotente: releer el solape no duplica hechos
+        pedidos = pedidos.filter(actualizado_en__gte=marca - SOLAPE_INCREMENTAL)
+
+    escritos = 0
+    pendientes = []
+    for p in _proyeccion(pedidos).iterator(chunk_size=lote):
+        pendientes.append(_hecho(p))
+        if len(pendientes) >= lote:
+            _escribir(pendientes)
+            escritos += len(pendientes)
+            pendientes = []
+    if pendientes:
+        _escribir(pendientes)
+        escritos += len(pendientes)
+
+    if escritos:
+        logger.info(f"Snapshot analítico sincronizado: {escritos} pedidos ({'completo' if completo else 'incremental'})")
+    return escritos
+
+
+def reconstruir():
+    """Sincronización completa + eliminación de hechos de pedidos borrados."""
+    from pedidos.models import Pedido
+    from reportes.models import HechoPedido
+
+    escritos = sincronizar(completo=True)
+    huerfanos, _ = HechoPedido.objects.exclude(pedido_id__in=Pedido.objects.values('pk')).delete()
+    return {'escritos': escritos, 'eliminados': huerfanos}
+
+
+# ============================================
+# CONSULTAS
+# ============================================
+
+def hechos(**filtros):
+    """QuerySet de HechoPedido con los filtros públicos (ver FILTROS) aplicados."""
+    from reportes.models import HechoPedido
+
+    desconocidos = set(filtros) - set(FILTROS)
+    if desconocidos:
+        raise ConsultaAnaliticaInvalida(f"Filtros no soportados: {', '.join(sorted(desconocidos))}")
+
+    return HechoPedido.objects.filter(**{
+        FILTROS[nombre]: valor
+        for nombre, valor in filtros.items()
+        if valor not in (None, '', [])
+    })
+
+
+def agrupar(por, medidas=('pedidos', 'ventas'), ordenar=None, limite=100, **filtros):
+    """
+    GROUP BY ad-hoc sobre el snapshot.
+
+    Args:
+        por: lista de dimensiones (ver DIMENSIONES)
+        medidas: lista de medidas (ver MEDIDAS)
+        ordenar: medida o dimensión, con '-' para descendente
+        limite: máximo de filas
+        **filtros: ver FILTROS
+
+    Returns:
+        list[dict]
+    """
+    invalidas = [d for d in por if d not in DIMENSIONES] + [m for m in medidas if m not in MEDIDAS]
+    if invalidas or not medidas:
+        raise ConsultaAnaliticaInvalida(f"Dimensiones o medidas no soportadas: {', '.join(invalidas) or '(vacío)'}")
+
+    columnas = [c for d in por for c in DIMENSIONES[d]]
+    consulta = hechos(**filtros).order_by().values(*columnas).annotate(
+        **{m: MEDIDAS[m]() for m in medidas}
+    )
+
+    if ordenar:
+        campo = ordenar.lstrip('-')
+        if campo in DIMENSIONES:
+            campo = DIMENSIONES[campo][0]
+        elif campo not in medidas:
+            raise ConsultaAnaliticaInvalida(f"No se puede ordenar por {ordenar}")
+        consulta = consulta.order_by(f"{'-' if ordenar.startswith('-') else ''}{campo}")
+    elif columnas:
+        consulta = consulta.order_by(*columnas)
+
+    return list(consulta[:limite])
+
+
+def top_proveedores(limite=10, **filtros):
+    from pedidos.models import EstadoPedido
+
+    filas = agrupar(
+        ['proveedor'], ['pedidos', 'ventas'], ordenar='-ventas', limite=limite + 1,
+        estado=[EstadoPedido.ENTREGADO], **filtros
+    )
+    # Los pedidos multi-proveedor no tienen proveedor único
+    return [f for f in filas if f['proveedor_id'] is not None][:limite]
+
+
+def top_repartidores(limite=10, **filtros):
+    from pedidos.models import EstadoPedido
+
+    filas = agrupar(
+        ['repartidor'], ['pedidos', 'comision_repartidor', 'minutos_entrega_promedio'],
+        ordenar='-pedidos', limite=limite + 1, estado=[EstadoPedido.ENTREGADO], **filtros
+    )
+    return [f for f in filas if f['repartidor_id'] is not None][:limite]
+
+
+def resumen_financiero(**filtros):
+    """Resumen financiero de los pedidos entregados del snapshot."""
+    from .utils import calcular_resumen_financiero
+
+    return calcular_resumen_financiero(hechos(**filtros))
@@ -12,4 +12,8 @@ class ReportesConfig(AppConfig):
         """
         import logging
         logger = logging.getLogger('reportes')
+
+        # Mantenimiento incremental del rollup diario de pedidos
+        import reportes.signals  # noqa: F401
+
         logger.info('App de Reportes inicializada')
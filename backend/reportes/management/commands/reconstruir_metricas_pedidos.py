@@ -0,0 +1,48 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from reportes.services import MetricasPedidosService
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye (backfill) el rollup diario de pedidos desde la tabla de pedidos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help='Primer día a reconstruir (YYYY-MM-DD). Por defecto, el primer pedido')
+        parser.add_argument('--hasta', help='Último día a reconstruir (YYYY-MM-DD). Por defecto, hoy')
+        parser.add_argument(
+            '--bloque-dias',
+            type=int,
+            default=31,
+            help='Días por transacción (acota el tamaño de cada reemplazo)',
+        )
+
+    def _fecha(self, valor):
+        try:
+            return date.fromisoformat(valor)
+        except ValueError:
+            raise CommandError(f"Fecha inválida: {valor} (formato YYYY-MM-DD)")
+
+    def handle(self, *args, **options):
+        desde = self._fecha(options['desde']) if options['desde'] else MetricasPedidosService.primer_dia()
+        hasta = self._fecha(options['hasta']) if options['hasta'] else timezone.localdate()
+        bloque = max(1, options['bloque_dias'])
+
+        if desde is None:
+            self.stdout.write(self.style.WARNING('No hay pedidos que procesar'))
+            return
+        if desde > hasta:
+            raise CommandError('--desde no puede ser posterior a --hasta')
+
+        total = 0
+        inicio = desde
+        while inicio <= hasta:
+            fin = min(inicio + timedelta(days=bloque - 1), hasta)
+            filas = MetricasPedidosService.reconstruir(desde=inicio, hasta=fin)
+            self.stdout.write(f"{inicio} a {fin}: {filas} filas")
+            total += filas
+            inicio = fin + timedelta(days=1)
+
+        self.stdout.write(self.style.SUCCESS(f"Total: {total} filas de métricas diarias"))
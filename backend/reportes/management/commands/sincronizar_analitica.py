@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from reportes import analitica
+
+
+class Command(BaseCommand):
+    help = 'Sincroniza el snapshot analítico de pedidos (incremental por defecto)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--completo',
+            action='store_true',
+            help='Reescribir todos los pedidos y eliminar hechos de pedidos borrados',
+        )
+
+    def handle(self, *args, **options):
+        if options['completo']:
+            resultado = analitica.reconstruir()
+            self.stdout.write(self.style.SUCCESS(
+                f"Snapshot reconstruido: {resultado['escritos']} pedidos, {resultado['eliminados']} eliminados"
+            ))
+        else:
+            escritos = analitica.sincronizar()
+            self.stdout.write(self.style.SUCCESS(f"Snapshot sincronizado: {escritos} pedidos"))
@@ -0,0 +1,43 @@
+# Generated by Django 5.1.7 on 2026-10-19 04:09
+
+import django.db.models.deletion
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('proveedores', '0004_proveedor_suma_calificaciones'),
+        ('repartidores', '0003_repartidor_vehiculo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricaDiariaPedido',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField(verbose_name='Día')),
+                ('estado', models.CharField(choices=[('pendiente_repartidor', 'Pendiente de Repartidor'), ('aceptado_repartidor', 'Aceptado por Repartidor'), ('asignado_repartidor', 'Asignado a Repartidor'), ('en_proceso', 'En Proceso (Recogiendo)'), ('en_camino', 'En Camino (Entrega)'), ('entregado', 'Entregado'), ('cancelado', 'Cancelado')], max_length=30, verbose_name='Estado')),
+                ('tipo', models.CharField(choices=[('proveedor', 'Pedido de Proveedor'), ('directo', 'Encargo Directo')], max_length=20, verbose_name='Tipo')),
+                ('metodo_pago', models.CharField(choices=[('efectivo', 'Efectivo'), ('tarjeta', 'Tarjeta'), ('transferencia', 'Transferencia')], max_length=20, verbose_name='Método de Pago')),
+                ('cantidad', models.IntegerField(default=0)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('comision_repartidor', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('comision_proveedor', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('ganancia_app', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+                ('proveedor', models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='proveedores.proveedor', verbose_name='Proveedor')),
+                ('repartidor', models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='repartidores.repartidor', verbose_name='Repartidor')),
+            ],
+            options={
+                'verbose_name': 'Métrica Diaria de Pedidos',
+                'verbose_name_plural': 'Métricas Diarias de Pedidos',
+                'db_table': 'reportes_metricas_diarias_pedidos',
+                'indexes': [models.Index(fields=['dia', 'estado'], name='metrica_dia_estado_idx'), models.Index(fields=['proveedor', 'dia'], name='metrica_proveedor_dia_idx'), models.Index(fields=['repartidor', 'dia'], name='metrica_repartidor_dia_idx')],
+                'constraints': [models.UniqueConstraint(models.F('dia'), django.db.models.functions.comparison.Coalesce('proveedor', models.Value(0)), django.db.models.functions.comparison.Coalesce('repartidor', models.Value(0)), models.F('estado'), models.F('tipo'), models.F('metodo_pago'), name='metrica_diaria_pedido_unica')],
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.1.7 on 2026-10-19 04:12
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reportes', '0001_metrica_diaria_pedido'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrabajoReporte',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('ambito', models.CharField(choices=[('admin', 'Administrador'), ('proveedor', 'Proveedor'), ('repartidor', 'Repartidor')], max_length=20, verbose_name='Ámbito')),
+                ('formato', models.CharField(choices=[('excel', 'Excel'), ('csv', 'CSV')], max_length=10, verbose_name='Formato')),
+                ('parametros', models.JSONField(blank=True, default=dict, verbose_name='Filtros')),
+                ('huella', models.CharField(db_index=True, max_length=64, verbose_name='Huella')),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('procesando', 'Procesando'), ('completado', 'Completado'), ('fallido', 'Fallido')], default='pendiente', max_length=20, verbose_name='Estado')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Pedidos a exportar')),
+                ('procesados', models.PositiveIntegerField(default=0, verbose_name='Pedidos procesados')),
+                ('archivo', models.FileField(blank=True, upload_to='reportes/trabajos/%Y/%m/', verbose_name='Archivo')),
+                ('error', models.TextField(blank=True)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('iniciado_en', models.DateTimeField(blank=True, null=True)),
+                ('finalizado_en', models.DateTimeField(blank=True, null=True)),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trabajos_reporte', to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+            ],
+            options={
+                'verbose_name': 'Trabajo de Reporte',
+                'verbose_name_plural': 'Trabajos de Reporte',
+                'db_table': 'reportes_trabajos',
+                'ordering': ['-creado_en'],
+                'indexes': [models.Index(fields=['usuario', '-creado_en'], name='trabajo_usuario_fecha_idx')],
+            },
+        ),
+    ]
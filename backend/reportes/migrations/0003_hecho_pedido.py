@@ -0,0 +1,51 @@
+# Generated by Django 5.1.7 on 2026-10-19 04:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0009_pedido_tarifa_servicio'),
+        ('reportes', '0002_trabajo_reporte'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HechoPedido',
+            fields=[
+                ('pedido', models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='+', serialize=False, to='pedidos.pedido', verbose_name='Pedido')),
+                ('pedido_actualizado_en', models.DateTimeField(db_index=True)),
+                ('creado_en', models.DateTimeField()),
+                ('dia', models.DateField()),
+                ('hora', models.PositiveSmallIntegerField()),
+                ('dia_semana', models.PositiveSmallIntegerField(help_text='1=lunes ... 7=domingo')),
+                ('cliente_id', models.BigIntegerField()),
+                ('proveedor_id', models.BigIntegerField(blank=True, null=True)),
+                ('proveedor_nombre', models.CharField(blank=True, max_length=200)),
+                ('repartidor_id', models.BigIntegerField(blank=True, null=True)),
+                ('repartidor_nombre', models.CharField(blank=True, max_length=300)),
+                ('tipo', models.CharField(choices=[('proveedor', 'Pedido de Proveedor'), ('directo', 'Encargo Directo')], max_length=20)),
+                ('estado', models.CharField(choices=[('pendiente_repartidor', 'Pendiente de Repartidor'), ('aceptado_repartidor', 'Aceptado por Repartidor'), ('asignado_repartidor', 'Asignado a Repartidor'), ('en_proceso', 'En Proceso (Recogiendo)'), ('en_camino', 'En Camino (Entrega)'), ('entregado', 'Entregado'), ('cancelado', 'Cancelado')], max_length=30)),
+                ('estado_pago', models.CharField(max_length=20)),
+                ('metodo_pago', models.CharField(choices=[('efectivo', 'Efectivo'), ('tarjeta', 'Tarjeta'), ('transferencia', 'Transferencia')], max_length=20)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('comision_repartidor', models.DecimalField(decimal_places=2, default=0, max_digits=8)),
+                ('comision_proveedor', models.DecimalField(decimal_places=2, default=0, max_digits=8)),
+                ('ganancia_app', models.DecimalField(decimal_places=2, default=0, max_digits=8)),
+                ('tarifa_servicio', models.DecimalField(decimal_places=2, default=0, max_digits=6)),
+                ('items', models.PositiveIntegerField(default=0)),
+                ('unidades', models.PositiveIntegerField(default=0)),
+                ('distancia_km', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('costo_envio', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('minutos_entrega', models.PositiveIntegerField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Hecho de Pedido (analítica)',
+                'verbose_name_plural': 'Hechos de Pedidos (analítica)',
+                'db_table': 'reportes_hechos_pedidos',
+                'indexes': [models.Index(fields=['dia', 'estado'], name='hecho_dia_estado_idx'), models.Index(fields=['proveedor_id', 'dia'], name='hecho_proveedor_dia_idx'), models.Index(fields=['repartidor_id', 'dia'], name='hecho_repartidor_dia_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,238 @@
+# reportes/models.py
+"""
+Tablas de agregados para los dashboards de reportes.
+
+MetricaDiariaPedido es un rollup de pedidos por día × proveedor × repartidor
+× estado × tipo × método de pago. Se mantiene incrementalmente en cada
+transición de Pedido (reportes/signals.py) y se reconstruye por rango con
+`python manage.py reconstruir_metricas_pedidos`.
+
+TrabajoReporte registra las exportaciones asíncronas: se encolan en Celery,
+el archivo se escribe en MEDIA y se descarga cuando está listo.
+"""
+
+import uuid
+
+from django.conf import settings
+from django.db import models
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce
+
+from pedidos.models import EstadoPedido, MetodoPago, TipoPedido
+
+
+# Dimensiones del rollup (campo de MetricaDiariaPedido -> atributo de Pedido)
+DIMENSIONES = {
+    'proveedor_id': 'proveedor_id',
+    'repartidor_id': 'repartidor_id',
+    'estado': 'estado',
+    'tipo': 'tipo',
+    'metodo_pago': 'metodo_pago',
+}
+
+# Medidas acumuladas (además de `cantidad`)
+MEDIDAS = ('total', 'comision_repartidor', 'comision_proveedor', 'ganancia_app')
+
+
+class MetricaDiariaPedido(models.Model):
+    """
+    Conteo y montos de pedidos agrupados por día de creación y dimensiones.
+
+    Un pedido aporta a exactamente una fila: al cambiar de estado (o de
+    repartidor, total, etc.) su aporte se resta de la fila anterior y se suma
+    a la nueva. Las FKs no llevan constraint para que el histórico sobreviva
+    al borrado de proveedores/repartidores.
+    """
+
+    dia = models.DateField(verbose_name='Día')
+    proveedor = models.ForeignKey(
+        'proveedores.Proveedor', on_delete=models.DO_NOTHING, db_constraint=False,
+        null=True, blank=True, db_index=False, related_name='+', verbose_name='Proveedor'
+    )
+    repartidor = models.ForeignKey(
+        'repartidores.Repartidor', on_delete=models.DO_NOTHING, db_constraint=False,
+        null=True, blank=True, db_index=False, related_name='+', verbose_name='Repartidor'
+    )
+    estado = models.CharField(max_length=30, choices=EstadoPedido.choices, verbose_name='Estado')
+    tipo = models.CharField(max_length=20, choices=TipoPedido.choices, verbose_name='Tipo')
+    metodo_pago = models.CharField(max_length=20, choices=MetodoPago.choices, verbose_name='Método de Pago')
+
+    cantidad = models.IntegerField(default=0)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    comision_repartidor = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    comision_proveedor = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    ganancia_app = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'reportes_metricas_diarias_pedidos'
+        verbose_name = 'Métrica Diaria de Pedidos'
+        verbose_name_plural = 'Métricas Diarias de Pedidos'
+        constraints = [
+            # Coalesce: en Postgres < 15 los NULL no colisionan en un índice único
+            models.UniqueConstraint(
+                F('dia'),
+                Coalesce('proveedor', Value(0)),
+                Coalesce('repartidor', Value(0)),
+                F('estado'),
+                F('tipo'),
+                F('metodo_pago'),
+                name='metrica_diaria_pedido_unica',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['dia', 'estado'], name='metrica_dia_estado_idx'),
+            models.Index(fields=['proveedor', 'dia'], name='metrica_proveedor_dia_idx'),
+            models.Index(fields=['repartidor', 'dia'], name='metrica_repartidor_dia_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.dia} {self.estado} x{self.cantidad}"
+
+
+# ============================================
+# TRABAJOS DE EXPORTACIÓN ASÍNCRONA
+# ============================================
+
+class AmbitoReporte(models.TextChoices):
+    ADMIN = 'admin', 'Administrador'
+    PROVEEDOR = 'proveedor', 'Proveedor'
+    REPARTIDOR = 'repartidor', 'Repartidor'
+
+
+class FormatoReporte(models.TextChoices):
+    EXCEL = 'excel', 'Excel'
+    CSV = 'csv', 'CSV'
+
+
+class EstadoTrabajo(models.TextChoices):
+    PENDIENTE = 'pendiente', 'Pendiente'
+    PROCESANDO = 'procesando', 'Procesando'
+    COMPLETADO = 'completado', 'Completado'
+    FALLIDO = 'fallido', 'Fallido'
+
+
+class TrabajoReporte(models.Model):
+    """
+    Exportación de pedidos ejecutada fuera del request.
+
+    `huella` identifica la solicitud (usuario + ámbito + formato + filtros
+    normalizados) para reutilizar un trabajo idéntico reciente en lugar de
+    encolar otro.
+    """
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+        related_name='trabajos_reporte', verbose_name='Usuario'
+    )
+    ambito = models.CharField(max_length=20, choices=AmbitoReporte.choices, verbose_name='Ámbito')
+    formato = models.CharField(max_length=10, choices=FormatoReporte.choices, verbose_name='Formato')
+    parametros = models.JSONField(default=dict, blank=True, verbose_name='Filtros')
+    huella = models.CharField(max_length=64, db_index=True, verbose_name='Huella')
+
+    estado = models.CharField(
+        max_length=20, choices=EstadoTrabajo.choices, default=EstadoTrabajo.PENDIENTE,
+        verbose_name='Estado'
+    )
+    total = models.PositiveIntegerField(default=0, verbose_name='Pedidos a exportar')
+    procesados = models.PositiveIntegerField(default=0, verbose_name='Pedidos procesados')
+    archivo = models.FileField(upload_to='reportes/trabajos/%Y/%m/', blank=True, verbose_name='Archivo')
+    error = models.TextField(blank=True)
+
+    creado_en = models.DateTimeField(auto_now_add=True)
+    iniciado_en = models.DateTimeField(null=True, blank=True)
+    finalizado_en = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'reportes_trabajos'
+        verbose_name = 'Trabajo de Reporte'
+        verbose_name_plural = 'Trabajos de Reporte'
+        ordering = ['-creado_en']
+        indexes = [
+            models.Index(fields=['usuario', '-creado_en'], name='trabajo_usuario_fecha_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_formato_display()} {self.ambito} ({self.estado})"
+
+    @property
+    def progreso(self):
+        """Porcentaje completado (0-100)."""
+        if self.estado == EstadoTrabajo.COMPLETADO:
+            return 100
+        if not self.total:
+            return 0
+        return min(99, int(self.procesados * 100 / self.total))
+
+    @property
+    def listo(self):
+        return self.estado == EstadoTrabajo.COMPLETADO and bool(self.archivo)
+
+
+# ============================================
+# SNAPSHOT ANALÍTICO DE PEDIDOS
+# ============================================
+
+class HechoPedido(models.Model):
+    """
+    Una fila por pedido, desnormalizada (sin JOINs al leer): dimensiones de
+    fecha, nombres de proveedor/repartidor, pago, ítems y logística.
+
+    Se sincroniza incrementalmente por `pedido_actualizado_en` y se concilia
+    de noche (reportes/analitica.py). Las consultas ad-hoc de reportes leen
+    de aquí en lugar de la tabla operacional de pedidos.
+    """
+
+    pedido = models.OneToOneField(
+        'pedidos.Pedido', on_delete=models.DO_NOTHING, db_constraint=False,
+        primary_key=True, related_name='+', verbose_name='Pedido'
+    )
+    pedido_actualizado_en = models.DateTimeField(db_index=True)
+
+    # --- FECHA ---
+    creado_en = models.DateTimeField()
+    dia = models.DateField()
+    hora = models.PositiveSmallIntegerField()
+    dia_semana = models.PositiveSmallIntegerField(help_text='1=lunes ... 7=domingo')
+
+    # --- ACTORES ---
+    cliente_id = models.BigIntegerField()
+    proveedor_id = models.BigIntegerField(null=True, blank=True)
+    proveedor_nombre = models.CharField(max_length=200, blank=True)
+    repartidor_id = models.BigIntegerField(null=True, blank=True)
+    repartidor_nombre = models.CharField(max_length=300, blank=True)
+
+    # --- ESTADO Y PAGO ---
+    tipo = models.CharField(max_length=20, choices=TipoPedido.choices)
+    estado = models.CharField(max_length=30, choices=EstadoPedido.choices)
+    estado_pago = models.CharField(max_length=20)
+    metodo_pago = models.CharField(max_length=20, choices=MetodoPago.choices)
+
+    # --- MONTOS ---
+    total = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    comision_repartidor = models.DecimalField(max_digits=8, decimal_places=2, default=0)
+    comision_proveedor = models.DecimalField(max_digits=8, decimal_places=2, default=0)
+    ganancia_app = models.DecimalField(max_digits=8, decimal_places=2, default=0)
+    tarifa_servicio = models.DecimalField(max_digits=6, decimal_places=2, default=0)
+
+    # --- ÍTEMS Y LOGÍSTICA ---
+    items = models.PositiveIntegerField(default=0)
+    unidades = models.PositiveIntegerField(default=0)
+    distancia_km = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    costo_envio = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    minutos_entrega = models.PositiveIntegerField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'reportes_hechos_pedidos'
+        verbose_name = 'Hecho de Pedido (analítica)'
+        verbose_name_plural = 'Hechos de Pedidos (analítica)'
+        indexes = [
+            models.Index(fields=['dia', 'estado'], name='hecho_dia_estado_idx'),
+            models.Index(fields=['proveedor_id', 'dia'], name='hecho_proveedor_dia_idx'),
+            models.Index(fields=['repartidor_id', 'dia'], name='hecho_repartidor_dia_idx'),
+        ]
+
+    def __str__(self):
+        return f"Hecho pedido {self.pedido_id} ({self.estado})"
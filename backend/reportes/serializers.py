@@ -10,8 +10,11 @@ from usuarios.models import Perfil
 from repartidores.models import Repartidor
 from proveedores.models import Proveedor
 from django.db.models import Sum, Count, Avg, Q
+from django.urls import reverse
 from django.utils import timezone
 
+from .models import TrabajoReporte
+
 
 # ============================================
 # SERIALIZER: PEDIDO PARA REPORTE (DETALLADO)
@@ -331,3 +334,40 @@ class ExportarReporteSerializer(serializers.Serializer):
         choices=['excel', 'csv'],
         default='excel'
     )
+
+
+# ============================================
+# SERIALIZER: TRABAJO DE EXPORTACIÓN ASÍNCRONA
+# ============================================
+
+class TrabajoReporteSerializer(serializers.ModelSerializer):
+    """
+    Estado de una exportación asíncrona y enlace de descarga cuando está lista
+    """
+    progreso = serializers.IntegerField(read_only=True)
+    url_descarga = serializers.SerializerMethodField()
+
+    class Meta:
+        model = TrabajoReporte
+        fields = [
+            'id',
+            'ambito',
+            'formato',
+            'parametros',
+            'estado',
+            'progreso',
+            'total',
+            'procesados',
+            'error',
+            'creado_en',
+            'finalizado_en',
+            'url_descarga',
+        ]
+        read_only_fields = fields
+
+    def get_url_descarga(self, obj):
+        if not obj.listo:
+            return None
+        url = reverse('reportes:trabajo-reporte-descargar', args=[obj.pk])
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
@@ -1,4 +1,20 @@
+# reportes/services.py
+
+import hashlib
+import json
 import logging
+import tempfile
+import uuid
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.files import File
+from django.db import connection, transaction
+from django.db.models import Count, F, Min, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from utils.replica import usar_replica
 
 logger = logging.getLogger('reportes')
 
@@ -15,4 +31,585 @@ def enviar_reporte_semanal(estadisticas):
     Simula el envío de un reporte semanal.
     """
     logger.info("📈 [REPORTE SEMANAL] Enviando análisis de rendimiento...")
-    logger.info(f"Top Proveedores: {estadisticas.get('top_proveedores')}")
\ No newline at end of file
+    logger.info(f"Top Proveedores: {estadisticas.get('top_proveedores')}")
+
+
+# ============================================
+# ROLLUP DIARIO DE PEDIDOS
+# ============================================
+
+class MetricasPedidosService:
+    """
+    Mantenimiento y lectura de MetricaDiariaPedido.
+
+    Una "fila" es el aporte de un pedido al rollup: su clave (día local de
+    creación + dimensiones) y sus medidas. Los cambios se aplican como deltas
+    (una sentencia por fila: UPDATE con F() o INSERT … ON CONFLICT DO
+    UPDATE) para no bloquear ni leer la fila agregada.
+    """
+
+    # Campos de Pedido que afectan al rollup (para filtrar update_fields)
+    CAMPOS_PEDIDO = (
+        'creado_en', 'proveedor', 'repartidor', 'estado', 'tipo', 'metodo_pago',
+        'total', 'comision_repartidor', 'comision_proveedor', 'ganancia_app',
+    )
+
+    @staticmethod
+    def _fila(valores):
+        from reportes.models import DIMENSIONES, MEDIDAS
+
+        fila = {'dia': timezone.localdate(valores['creado_en'])}
+        for campo, atributo in DIMENSIONES.items():
+            fila[campo] = valores[atributo]
+        for medida in MEDIDAS:
+            fila[medida] = valores[medida] or 0
+        return fila
+
+    @staticmethod
+    def afecta_rollup(update_fields):
+        """False si un save(update_fields=...) no toca ningún campo del rollup."""
+        if update_fields is None:
+            return True
+        campos = {c.removesuffix('_id') for c in update_fields}
+        return bool(campos & set(MetricasPedidosService.CAMPOS_PEDIDO))
+
+    @staticmethod
+    def fila_desde_pedido(pedido, anterior=None, update_fields=None):
+        """
+        Aporte del pedido en memoria. Con update_fields solo se toman de la
+        instancia los campos realmente guardados; el resto sigue como en BD.
+        """
+        from reportes.models import DIMENSIONES, MEDIDAS
+
+        fila = MetricasPedidosService._fila({
+            a: getattr(pedido, a) for a in ('creado_en', *DIMENSIONES.values(), *MEDIDAS)
+        })
+        if anterior is None or update_fields is None:
+            return fila
+
+        guardados = {c.removesuffix('_id') for c in update_fields}
+        origen = {'dia': 'creado_en', **{m: m for m in MEDIDAS}}
+        origen.update({campo: atributo.removesuffix('_id') for campo, atributo in DIMENSIONES.items()})
+        return {
+            campo: valor if origen[campo] in guardados else anterior[campo]
+            for campo, valor in fila.items()
+        }
+
+    @staticmethod
+    def _sumar(clave, cantidad, montos):
+        """
+        Suma el aporte a su fila (creándola si falta) en una sentencia:
+        INSERT … ON CONFLICT DO UPDATE sobre el índice único del rollup.
+        """
+        from reportes.models import MEDIDAS, MetricaDiariaPedido
+
+        opts = MetricaDiariaPedido._meta
+        q = connection.ops.quote_name
+        tabla = q(opts.db_table)
+        valores = {**clave, 'cantidad': cantidad, **montos, 'actualizado_en': timezone.now()}
+        campos = {nombre: opts.get_field(nombre.removesuffix('_id')) for nombre in valores}
+        columna = {nombre: q(campo.column) for nombre, campo in campos.items()}
+
+        # Mismas expresiones que el UniqueConstraint (FK nulas con COALESCE)
+        objetivo = [
+            f"COALESCE({columna[n]}, 0)" if campos[n].null else columna[n]
+            for n in clave
+        ]
+        asignaciones = [
+            f"{columna[n]} = {tabla}.{columna[n]} + EXCLUDED.{columna[n]}"
+            for n in ('cantidad', *MEDIDAS)
+        ]
+        asignaciones.append(f"{columna['actualizado_en']} = EXCLUDED.{columna['actualizado_en']}")
+        sql = (
+            f"INSERT INTO {tabla} ({', '.join(columna.values())}) "
+            f"VALUES ({', '.join(['%s'] * len(valores))}) "
+            f"ON CONFLICT ({', '.join(objetivo)}) DO UPDATE SET {', '.join(asignaciones)}"
+        )
+        params = [campos[n].get_db_prep_save(v, connection) for n, v in valores.items()]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
+    @staticmethod
+    def _actualizar(clave, cantidad, montos):
+        """Aplica el delta a una fila existente con un UPDATE (sin fila no hay nada que descontar)."""
+        from reportes.models import MetricaDiariaPedido
+
+        cambios = {'cantidad': F('cantidad') + cantidad, 'actualizado_en': timezone.now()}
+        cambios.update({m: F(m) + v for m, v in montos.items() if v})
+        if not MetricaDiariaPedido.objects.filter(**clave).update(**cambios):
+            # El pedido es anterior al rollup: se corrige al reconstruir
+            logger.debug(f"Rollup sin fila para descontar: {clave}")
+
+    @staticmethod
+    def registrar_cambio(anterior, nueva):
+        """
+        Mueve el aporte de un pedido de la fila `anterior` a la `nueva`.
+        Cualquiera de las dos puede ser None (alta o baja del pedido).
+        """
+        from reportes.models import MEDIDAS
+
+        if anterior == nueva:
+            return
+
+        def clave(fila):
+            return {k: v for k, v in fila.items() if k not in MEDIDAS}
+
+        if anterior and nueva and clave(anterior) == clave(nueva):
+            # Misma fila, solo cambian montos (p. ej. comisiones al entregar)
+            MetricasPedidosService._actualizar(
+                clave(nueva), 0, {m: nueva[m] - anterior[m] for m in MEDIDAS}
+            )
+            return
+        if anterior:
+            MetricasPedidosService._actualizar(clave(anterior), -1, {m: -anterior[m] for m in MEDIDAS})
+        if nueva:
+            MetricasPedidosService._sumar(clave(nueva), 1, {m: nueva[m] for m in MEDIDAS})
+
+    @staticmethod
+    def _bloquear_rollup():
+        """
+        Detiene las escrituras incrementales al rollup hasta el fin de la
+        transacción. Las que ya lo tocaron (en la transacción de su pedido)
+        terminan antes, así el GROUP BY posterior ve esos pedidos y ninguno
+        se pierde ni se cuenta dos veces. Las lecturas siguen permitidas.
+        """
+        from reportes.models import MetricaDiariaPedido
+
+        if connection.vendor != 'postgresql':
+            return  # SQLite ya serializa las escrituras
+        tabla = connection.ops.quote_name(MetricaDiariaPedido._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(f"LOCK TABLE {tabla} IN SHARE ROW EXCLUSIVE MODE")
+
+    @staticmethod
+    def reconstruir(desde=None, hasta=None):
+        """
+        Recalcula el rollup desde Pedido para el rango [desde, hasta] (días
+        locales, ambos opcionales) con un único GROUP BY. Reemplaza las filas
+        del rango dentro de una transacción, con el rollup bloqueado antes de
+        agregar.
+
+        Returns:
+            int: filas escritas
+        """
+        from pedidos.models import Pedido
+        from reportes.models import DIMENSIONES, MEDIDAS, MetricaDiariaPedido
+
+        pedidos = Pedido.objects.order_by()
+        existentes = MetricaDiariaPedido.objects.all()
+        if desde:
+            pedidos = pedidos.filter(creado_en__date__gte=desde)
+            existentes = existentes.filter(dia__gte=desde)
+        if hasta:
+            pedidos = pedidos.filter(creado_en__date__lte=hasta)
+            existentes = existentes.filter(dia__lte=hasta)
+
+        agregados = (
+            pedidos.annotate(dia=TruncDate('creado_en'))
+            .values('dia', *DIMENSIONES.values())
+            .annotate(cantidad=Count('id'), **{f'suma_{m}': Sum(m) for m in MEDIDAS})
+        )
+
+        with transaction.atomic():
+            MetricasPedidosService._bloquear_rollup()
+            nuevas = [
+                MetricaDiariaPedido(
+                    dia=a['dia'],
+                    cantidad=a['cantidad'],
+                    **{campo: a[atributo] for campo, atributo in DIMENSIONES.items()},
+                    **{m: a[f'suma_{m}'] or 0 for m in MEDIDAS},
+                )
+                for a in agregados
+            ]
+            existentes.delete()
+            MetricaDiariaPedido.objects.bulk_create(nuevas, batch_size=1000)
+
+        logger.info(f"Rollup de pedidos reconstruido ({desde or 'inicio'} a {hasta or 'hoy'}): {len(nuevas)} filas")
+        return len(nuevas)
+
+    @staticmethod
+    def primer_dia():
+        """Día local del pedido más antiguo (None si no hay pedidos)."""
+        from pedidos.models import Pedido
+
+        primero = Pedido.objects.order_by().aggregate(primero=Min('creado_en'))['primero']
+        return timezone.localdate(primero) if primero else None
+
+    # --- LECTURA ---
+
+    @staticmethod
+    def estadisticas_generales(hoy=None):
+        """Todos los contadores del dashboard de admin en una sola consulta."""
+        from pedidos.models import EstadoPedido, TipoPedido
+        from reportes.models import MetricaDiariaPedido
+
+        hoy = hoy or timezone.localdate()
+        primer_dia_mes = hoy.replace(day=1)
+        entregado = Q(estado=EstadoPedido.ENTREGADO)
+        es_hoy = Q(dia=hoy)
+        es_mes = Q(dia__gte=primer_dia_mes)
+
+        return MetricaDiariaPedido.objects.aggregate(
+            total_pedidos=Sum('cantidad'),
+            pedidos_hoy=Sum('cantidad', filter=es_hoy),
+            pedidos_mes=Sum('cantidad', filter=es_mes),
+            pedidos_confirmados=Sum('cantidad', filter=Q(estado=EstadoPedido.ASIGNADO_REPARTIDOR)),
+            pedidos_en_preparacion=Sum('cantidad', filter=Q(estado=EstadoPedido.EN_PROCESO)),
+            pedidos_en_ruta=Sum('cantidad', filter=Q(estado=EstadoPedido.EN_CAMINO)),
+            pedidos_entregados=Sum('cantidad', filter=entregado),
+            pedidos_cancelados=Sum('cantidad', filter=Q(estado=EstadoPedido.CANCELADO)),
+            pedidos_proveedor=Sum('cantidad', filter=Q(tipo=TipoPedido.PROVEEDOR)),
+            pedidos_directos=Sum('cantidad', filter=Q(tipo=TipoPedido.DIRECTO)),
+            ingresos=Sum('total', filter=entregado),
+            ingresos_hoy=Sum('total', filter=entregado & es_hoy),
+            ingresos_mes=Sum('total', filter=entregado & es_mes),
+            ganancia=Sum('ganancia_app', filter=entregado),
+            ganancia_hoy=Sum('ganancia_app', filter=entregado & es_hoy),
+            ganancia_mes=Sum('ganancia_app', filter=entregado & es_mes),
+            comisiones_repartidor=Sum('comision_repartidor', filter=entregado),
+        )
+
+    @staticmethod
+    def metricas_por_dia(desde, hasta):
+        """
+        Serie diaria [desde, hasta] con un GROUP BY por día. Los días sin
+        pedidos se rellenan con ceros.
+        """
+        from pedidos.models import EstadoPedido
+        from reportes.models import MetricaDiariaPedido
+
+        entregado = Q(estado=EstadoPedido.ENTREGADO)
+        filas = {
+            f['dia']: f
+            for f in MetricaDiariaPedido.objects.filter(dia__range=(desde, hasta))
+            .values('dia')
+            .annotate(
+                pedidos=Sum('cantidad'),
+                entregados=Sum('cantidad', filter=entregado),
+                cancelados=Sum('cantidad', filter=Q(estado=EstadoPedido.CANCELADO)),
+                ingresos=Sum('total', filter=entregado),
+                ganancia=Sum('ganancia_app', filter=entregado),
+            )
+            .order_by('dia')
+        }
+
+        serie = []
+        dia = desde
+        while dia <= hasta:
+            f = filas.get(dia, {})
+            entregados = f.get('entregados') or 0
+            ingresos = f.get('ingresos') or 0
+            serie.append({
+                'fecha': dia,
+                'total_pedidos': f.get('pedidos') or 0,
+                'pedidos_entregados': entregados,
+                'pedidos_cancelados': f.get('cancelados') or 0,
+                'ingresos': ingresos,
+                'ganancia_app': f.get('ganancia') or 0,
+                'ticket_promedio': round(ingresos / entregados, 2) if entregados else 0,
+            })
+            dia += timedelta(days=1)
+        return serie
+
+    @staticmethod
+    def estadisticas_proveedor(proveedor):
+        from pedidos.models import EstadoPedido
+        from reportes.models import MetricaDiariaPedido
+
+        entregado = Q(estado=EstadoPedido.ENTREGADO)
+        return MetricaDiariaPedido.objects.filter(proveedor=proveedor).aggregate(
+            total_pedidos=Sum('cantidad'),
+            pedidos_entregados=Sum('cantidad', filter=entregado),
+            pedidos_cancelados=Sum('cantidad', filter=Q(estado=EstadoPedido.CANCELADO)),
+            pedidos_activos=Sum('cantidad', filter=Q(estado__in=[
+                EstadoPedido.ASIGNADO_REPARTIDOR, EstadoPedido.EN_PROCESO, EstadoPedido.EN_CAMINO
+            ])),
+            ingresos=Sum('total', filter=entregado),
+            comisiones=Sum('comision_proveedor', filter=entregado),
+        )
+
+    @staticmethod
+    def estadisticas_repartidor(repartidor, hoy=None):
+        from pedidos.models import EstadoPedido
+        from reportes.models import MetricaDiariaPedido
+
+        hoy = hoy or timezone.localdate()
+        es_hoy = Q(dia=hoy)
+        es_mes = Q(dia__gte=hoy.replace(day=1))
+        return MetricaDiariaPedido.objects.filter(
+            repartidor=repartidor, estado=EstadoPedido.ENTREGADO
+        ).aggregate(
+            total_entregas=Sum('cantidad'),
+            entregas_hoy=Sum('cantidad', filter=es_hoy),
+            entregas_mes=Sum('cantidad', filter=es_mes),
+            ingresos=Sum('total'),
+            comisiones=Sum('comision_repartidor'),
+            comisiones_hoy=Sum('comision_repartidor', filter=es_hoy),
+            comisiones_mes=Sum('comision_repartidor', filter=es_mes),
+        )
+
+    @staticmethod
+    def top_proveedores(limite=10):
+        from pedidos.models import EstadoPedido
+        from reportes.models import MetricaDiariaPedido
+
+        return (
+            MetricaDiariaPedido.objects.filter(
+                estado=EstadoPedido.ENTREGADO, proveedor__nombre__isnull=False
+            )
+            .values('proveedor_id', 'proveedor__nombre', 'proveedor__tipo_proveedor')
+            .annotate(total_pedidos=Sum('cantidad'), ingresos_totales=Sum('total'))
+            .order_by('-ingresos_totales')[:limite]
+        )
+
+    @staticmethod
+    def top_repartidores(limite=10):
+        from pedidos.models import EstadoPedido
+        from reportes.models import MetricaDiariaPedido
+
+        return (
+            MetricaDiariaPedido.objects.filter(
+                estado=EstadoPedido.ENTREGADO, repartidor__user__isnull=False
+            )
+            .values(
+                'repartidor_id',
+                'repartidor__user__first_name',
+                'repartidor__user__last_name',
+                'repartidor__calificacion_promedio',
+            )
+            .annotate(total_entregas=Sum('cantidad'), comisiones_totales=Sum('comision_repartidor'))
+            .order_by('-total_entregas')[:limite]
+        )
+
+
+# ============================================
+# EXPORTACIONES ASÍNCRONAS
+# ============================================
+
+class TrabajosReporteService:
+    """
+    Cola de exportaciones: la solicitud se registra como TrabajoReporte, una
+    tarea de Celery escribe el archivo en MEDIA reportando progreso y el
+    usuario lo descarga cuando está listo.
+    """
+
+    # Ventana en la que una solicitud idéntica reutiliza el trabajo existente
+    DEDUPLICACION_TTL_SEGUNDOS = 10 * 60
+    # Tiempo que se conservan los archivos generados
+    RETENCION_HORAS = 24
+
+    @staticmethod
+    def _clave_deduplicacion(huella):
+        return f"reportes:trabajo:{huella}"
+
+    @staticmethod
+    def filtro_para(ambito):
+        from reportes.filters import PedidoProveedorFilter, PedidoReporteFilter, PedidoRepartidorFilter
+        from reportes.models import AmbitoReporte
+
+        return {
+            AmbitoReporte.ADMIN: PedidoReporteFilter,
+            AmbitoReporte.PROVEEDOR: PedidoProveedorFilter,
+            AmbitoReporte.REPARTIDOR: PedidoRepartidorFilter,
+        }[ambito]
+
+    @staticmethod
+    def normalizar_parametros(ambito, query_params):
+        """
+        Conserva solo los filtros que entiende el FilterSet del ámbito, como
+        listas ordenadas, para que dos solicitudes equivalentes coincidan.
+        """
+        filtros = TrabajosReporteService.filtro_para(ambito).base_filters
+        return {
+            nombre: sorted(v for v in query_params.getlist(nombre) if v != '')
+            for nombre in sorted(filtros)
+            if any(v != '' for v in query_params.getlist(nombre))
+        }
+
+    @staticmethod
+    def _query_dict(parametros):
+        from django.http import QueryDict
+
+        datos = QueryDict(mutable=True)
+        for nombre, valores in parametros.items():
+            datos.setlist(nombre, valores)
+        return datos
+
+    @staticmethod
+    def validar_parametros(ambito, parametros):
+        """Retorna los errores del FilterSet (dict vacío si son válidos)."""
+        from pedidos.models import Pedido
+
+        filtro = TrabajosReporteService.filtro_para(ambito)(
+            data=TrabajosReporteService._query_dict(parametros), queryset=Pedido.objects.none()
+        )
+        return {} if filtro.is_valid() else filtro.errors
+
+    @staticmethod
+    def huella(usuario, ambito, formato, parametros):
+        contenido = json.dumps(
+            {'usuario': usuario.pk, 'ambito': ambito, 'formato': formato, 'parametros': parametros},
+            sort_keys=True,
+        )
+        return hashlib.sha256(contenido.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _huerfanos():
+        """
+        Trabajos en PROCESANDO más allá del time limit de Celery: el worker
+        murió con la tarea a medias (acks_late la reentrega o se perdió).
+        """
+        from celery import current_app
+        from reportes.models import EstadoTrabajo
+
+        limite = timezone.now() - timedelta(seconds=current_app.conf.task_time_limit)
+        return Q(estado=EstadoTrabajo.PROCESANDO, iniciado_en__lt=limite)
+
+    @staticmethod
+    def solicitar(usuario, ambito, formato, parametros):
+        """
+        Encola una exportación o reutiliza una idéntica solicitada dentro de
+        la ventana de deduplicación (salvo que haya fallado).
+
+        Returns:
+            tuple: (TrabajoReporte, creado)
+        """
+        from reportes.models import EstadoTrabajo, TrabajoReporte
+        from reportes.tasks import generar_trabajo_reporte
+
+        huella = TrabajosReporteService.huella(usuario, ambito, formato, parametros)
+        clave = TrabajosReporteService._clave_deduplicacion(huella)
+        vigentes = TrabajoReporte.objects.exclude(estado=EstadoTrabajo.FALLIDO).exclude(
+            TrabajosReporteService._huerfanos()
+        )
+
+        trabajo_id = cache.get(clave)
+        if trabajo_id:
+            existente = vigentes.filter(pk=trabajo_id).first()
+            if existente:
+                return existente, False
+            cache.delete(clave)
+
+        nuevo_id = uuid.uuid4()
+        if not cache.add(clave, str(nuevo_id), TrabajosReporteService.DEDUPLICACION_TTL_SEGUNDOS):
+            # Otra solicitud idéntica se registró en paralelo
+            existente = vigentes.filter(pk=cache.get(clave)).first()
+            if existente:
+                return existente, False
+
+        trabajo = TrabajoReporte.objects.create(
+            id=nuevo_id,
+            usuario=usuario,
+            ambito=ambito,
+            formato=formato,
+            parametros=parametros,
+            huella=huella,
+        )
+        transaction.on_commit(lambda: generar_trabajo_reporte.delay(str(trabajo.pk)))
+        logger.info(f"Trabajo de reporte {trabajo.pk} encolado por {usuario.email} ({ambito}, {formato})")
+        return trabajo, True
+
+    @staticmethod
+    def queryset_para(trabajo):
+        """Pedidos visibles para el ámbito del trabajo, con sus filtros aplicados."""
+        from pedidos.models import Pedido
+        from reportes.models import AmbitoReporte
+
+        usuario = trabajo.usuario
+        pedidos = Pedido.objects.all()
+        es_admin = usuario.is_staff or usuario.is_superuser or getattr(usuario, 'es_admin', False)
+        if trabajo.ambito == AmbitoReporte.PROVEEDOR and not es_admin:
+            pedidos = pedidos.filter(proveedor__user=usuario)
+        elif trabajo.ambito == AmbitoReporte.REPARTIDOR and not es_admin:
+            pedidos = pedidos.filter(repartidor__user=usuario)
+
+        filtro = TrabajosReporteService.filtro_para(trabajo.ambito)(
+            data=TrabajosReporteService._query_dict(trabajo.parametros), queryset=pedidos
+        )
+        return filtro.qs
+
+    @staticmethod
+    def ejecutar(trabajo_id):
+        """
+        Genera el archivo del trabajo. Solo procesa trabajos pendientes (o
+        huérfanos), así una entrega duplicada de la tarea no repite una
+        exportación en curso.
+        """
+        from reportes.models import EstadoTrabajo, FormatoReporte, TrabajoReporte
+        from reportes.utils import escribir_pedidos_csv, escribir_pedidos_excel
+
+        tomados = TrabajoReporte.objects.filter(
+            Q(estado=EstadoTrabajo.PENDIENTE) | TrabajosReporteService._huerfanos(), pk=trabajo_id
+        ).update(estado=EstadoTrabajo.PROCESANDO, iniciado_en=timezone.now(), procesados=0)
+        if not tomados:
+            logger.info(f"Trabajo de reporte {trabajo_id} ya tomado o inexistente")
+            return None
+
+        trabajo = TrabajoReporte.objects.select_related('usuario').get(pk=trabajo_id)
+        try:
+            # Los pedidos se leen de la réplica (el progreso se escribe en el primario)
+            queryset = TrabajosReporteService.queryset_para(trabajo)
+            with usar_replica():
+                trabajo.total = queryset.count()
+            TrabajoReporte.objects.filter(pk=trabajo.pk).update(total=trabajo.total)
+
+            def al_avanzar(procesados):
+                TrabajoReporte.objects.filter(pk=trabajo.pk).update(procesados=procesados)
+                trabajo.procesados = procesados
+
+            if trabajo.formato == FormatoReporte.EXCEL:
+                escribir, extension = escribir_pedidos_excel, 'xlsx'
+            else:
+                escribir, extension = escribir_pedidos_csv, 'csv'
+
+            # Se escribe en disco local y se copia al storage por bloques
+            with tempfile.TemporaryFile() as temporal:
+                with usar_replica():
+                    escribir(queryset, temporal, al_avanzar=al_avanzar)
+                temporal.seek(0)
+                nombre = f"reporte_{trabajo.ambito}_{timezone.localtime():%Y%m%d_%H%M%S}.{extension}"
+                trabajo.archivo.save(nombre, File(temporal), save=False)
+
+            trabajo.estado = EstadoTrabajo.COMPLETADO
+            trabajo.finalizado_en = timezone.now()
+            trabajo.save(update_fields=['archivo', 'estado', 'procesados', 'finalizado_en'])
+            logger.info(f"Trabajo de reporte {trabajo.pk} completado: {trabajo.procesados} pedidos")
+        except Exception as e:
+            logger.error(f"Trabajo de reporte {trabajo.pk} fallido: {e}")
+            TrabajoReporte.objects.filter(pk=trabajo.pk).update(
+                estado=EstadoTrabajo.FALLIDO, error=str(e)[:1000], finalizado_en=timezone.now()
+            )
+            cache.delete(TrabajosReporteService._clave_deduplicacion(trabajo.huella))
+            trabajo.refresh_from_db()
+        return trabajo
+
+    @staticmethod
+    def limpiar_expirados():
+        """
+        Marca como fallidos los trabajos huérfanos y borra los trabajos (y sus
+        archivos) más antiguos que la retención.
+        """
+        from reportes.models import EstadoTrabajo, TrabajoReporte
+
+        huerfanos = TrabajoReporte.objects.filter(TrabajosReporteService._huerfanos())
+        for huella in huerfanos.values_list('huella', flat=True):
+            cache.delete(TrabajosReporteService._clave_deduplicacion(huella))
+        fallidos = huerfanos.update(
+            estado=EstadoTrabajo.FALLIDO,
+            error='El worker se detuvo antes de terminar el reporte',
+            finalizado_en=timezone.now(),
+        )
+        if fallidos:
+            logger.warning(f"Trabajos de reporte huérfanos marcados como fallidos: {fallidos}")
+
+        limite = timezone.now() - timedelta(hours=TrabajosReporteService.RETENCION_HORAS)
+        eliminados = 0
+        for trabajo in TrabajoReporte.objects.filter(creado_en__lt=limite).iterator(chunk_size=200):
+            if trabajo.archivo:
+                try:
+                    trabajo.archivo.delete(save=False)
+                except Exception as e:
+                    logger.warning(f"No se pudo borrar el archivo del trabajo {trabajo.pk}: {e}")
+            trabajo.delete()
+            eliminados += 1
+        return eliminados
@@ -0,0 +1,44 @@
+# reportes/signals.py
+"""
+Mantenimiento incremental del rollup MetricaDiariaPedido.
+
+Cada save de Pedido mueve su aporte de la fila anterior a la nueva. El
+aporte anterior sale del pedido que `pedidos.signals` ya leyó en su
+pre_save (sin otra consulta); la deriva se corrige con la reconstrucción
+nocturna.
+"""
+
+import logging
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from pedidos.models import Pedido
+from pedidos.signals import CAMPOS_CON_ANTERIOR, pedido_anterior
+
+from .services import MetricasPedidosService
+
+logger = logging.getLogger('reportes')
+
+CAMPOS_CON_ANTERIOR.update(MetricasPedidosService.CAMPOS_PEDIDO)
+
+
+@receiver(post_save, sender=Pedido)
+def actualizar_metricas_diarias(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw or not MetricasPedidosService.afecta_rollup(update_fields):
+        return
+
+    anterior = None
+    if not created:
+        previo = pedido_anterior(instance)
+        if previo is None:
+            logger.warning(f"Rollup sin estado anterior del pedido {instance.pk}; se corrige al reconstruir")
+            return
+        anterior = MetricasPedidosService.fila_desde_pedido(previo)
+    nueva = MetricasPedidosService.fila_desde_pedido(instance, anterior, update_fields)
+    MetricasPedidosService.registrar_cambio(anterior, nueva)
+
+
+@receiver(post_delete, sender=Pedido)
+def descontar_pedido_eliminado(sender, instance, **kwargs):
+    MetricasPedidosService.registrar_cambio(MetricasPedidosService.fila_desde_pedido(instance), None)
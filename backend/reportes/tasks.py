@@ -0,0 +1,63 @@
+# reportes/tasks.py
+
+from celery import shared_task
+from datetime import timedelta
+from django.utils import timezone
+import logging
+
+logger = logging.getLogger('reportes')
+
+# Días hacia atrás que se recalculan cada noche (pedidos que cambian de
+# estado días después de creados afectan a la fila de su día de creación)
+DIAS_RECONSTRUCCION_NOCTURNA = 7
+
+
+@shared_task(name='reportes.reconstruir_metricas_recientes', ignore_result=True, acks_late=True)
+def reconstruir_metricas_recientes(dias=DIAS_RECONSTRUCCION_NOCTURNA):
+    """
+    Corrige la deriva del rollup diario (fallos de señales, updates masivos
+    que no disparan save) recalculando los últimos días desde Pedido.
+    """
+    from .services import MetricasPedidosService
+
+    hoy = timezone.localdate()
+    filas = MetricasPedidosService.reconstruir(desde=hoy - timedelta(days=dias), hasta=hoy)
+    logger.info(f"Reconstrucción nocturna del rollup de pedidos: {filas} filas")
+    return filas
+
+
+@shared_task(name='reportes.generar_trabajo_reporte', ignore_result=True, acks_late=True)
+def generar_trabajo_reporte(trabajo_id):
+    """Genera el archivo de una exportación asíncrona (TrabajoReporte)."""
+    from .services import TrabajosReporteService
+
+    TrabajosReporteService.ejecutar(trabajo_id)
+
+
+@shared_task(name='reportes.limpiar_trabajos_expirados', ignore_result=True, acks_late=True)
+def limpiar_trabajos_expirados():
+    """Elimina los archivos de exportación que superaron la retención."""
+    from .services import TrabajosReporteService
+
+    eliminados = TrabajosReporteService.limpiar_expirados()
+    if eliminados:
+        logger.info(f"Trabajos de reporte expirados eliminados: {eliminados}")
+    return eliminados
+
+
+@shared_task(name='reportes.sincronizar_analitica', ignore_result=True, acks_late=True)
+def sincronizar_analitica():
+    """Copia al snapshot analítico los pedidos modificados desde la última marca."""
+    from . import analitica
+
+    return analitica.sincronizar()
+
+
+@shared_task(name='reportes.reconstruir_analitica', ignore_result=True, acks_late=True)
+def reconstruir_analitica():
+    """Reescribe el snapshot completo y elimina hechos de pedidos borrados."""
+    from . import analitica
+
+    resultado = analitica.reconstruir()
+    logger.info(f"Snapshot analítico reconstruido: {resultado}")
+    return resultado
@@ -1,6 +1,16 @@
+import csv
+import shutil
+import tempfile
 from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import override_settings
 from django.utils import timezone
 from django.urls import reverse
+from openpyxl import load_workbook
 from django.contrib.auth import get_user_model
 from rest_framework import status
 from rest_framework.test import APITestCase
@@ -10,6 +20,11 @@ from proveedores.models import Proveedor
 from repartidores.models import Repartidor
 from usuarios.models import Perfil
 
+from . import analitica
+from .models import HechoPedido, MetricaDiariaPedido, TrabajoReporte
+from .services import MetricasPedidosService
+from .tasks import generar_trabajo_reporte
+
 User = get_user_model()
 
 
@@ -231,3 +246,474 @@ class ReporteRepartidorAPITest(APITestCase):
             ids = [p["id"] for p in res.data]
         self.assertIn(self.pedido_mio.id, ids)
         self.assertIn(self.pedido_otro.id, ids)
+
+
+class MetricaDiariaPedidoTest(APITestCase):
+    """El rollup diario se mantiene en cada transición y coincide con la reconstrucción."""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            email="admin@app.com",
+            username="admin",
+            password="password123",
+        )
+        self.user_rep = User.objects.create_user(
+            email="rep@app.com",
+            username="rep",
+            password="password123",
+        )
+        self.user_rep.roles_aprobados = ['repartidor']
+        self.user_rep.rol_activo = 'repartidor'
+        self.user_rep.save(update_fields=['roles_aprobados', 'rol_activo'])
+        self.repartidor = Repartidor.objects.create(
+            user=self.user_rep,
+            cedula="1111111111",
+            telefono="0999999999",
+            verificado=True,
+            activo=True,
+        )
+        self.proveedor = Proveedor.objects.create(
+            user=self.admin,
+            nombre="Proveedor Rollup",
+            ruc="0999999999001",
+            tipo_proveedor="restaurante",
+            latitud=0,
+            longitud=0,
+            activo=True,
+        )
+
+    def _pedido(self, total):
+        return Pedido.objects.create(
+            cliente=self.admin.perfil,
+            proveedor=self.proveedor,
+            tipo=TipoPedido.PROVEEDOR,
+            total=total,
+            direccion_entrega="Calle 1",
+        )
+
+    def _rollup(self):
+        return {
+            (m.estado, m.repartidor_id): (m.cantidad, m.total)
+            for m in MetricaDiariaPedido.objects.exclude(cantidad=0)
+        }
+
+    def test_transiciones_mueven_el_aporte(self):
+        entregado = self._pedido(20)
+        cancelado = self._pedido(15)
+        self.assertEqual(
+            self._rollup(),
+            {(EstadoPedido.PENDIENTE_REPARTIDOR, None): (2, Decimal('35.00'))},
+        )
+
+        entregado.aceptar_por_repartidor(self.repartidor)
+        entregado.marcar_en_camino()
+        entregado.marcar_entregado()
+        cancelado.cancelar("sin stock", "proveedor")
+
+        self.assertEqual(self._rollup(), {
+            (EstadoPedido.ENTREGADO, self.repartidor.id): (1, Decimal('20.00')),
+            (EstadoPedido.CANCELADO, None): (1, Decimal('15.00')),
+        })
+
+        incremental = self._rollup()
+        MetricasPedidosService.reconstruir()
+        self.assertEqual(self._rollup(), incremental)
+
+        cancelado.delete()
+        self.assertEqual(self._rollup(), {
+            (EstadoPedido.ENTREGADO, self.repartidor.id): (1, Decimal('20.00')),
+        })
+
+    def test_transicion_cuesta_una_sentencia_por_fila(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        pedido = self._pedido(20)
+        with CaptureQueriesContext(connection) as consultas:
+            pedido.aceptar_por_repartidor(self.repartidor)
+
+        sentencias = [q['sql'] for q in consultas.captured_queries]
+        rollup = [sql for sql in sentencias if MetricaDiariaPedido._meta.db_table in sql]
+        # -1 en la fila anterior (UPDATE) y +1 en la nueva (INSERT … ON CONFLICT), sin releer el pedido
+        self.assertEqual([sql.split()[0] for sql in rollup], ['UPDATE', 'INSERT'])
+        self.assertFalse([sql for sql in sentencias if 'SAVEPOINT' in sql])
+        self.assertEqual(self._rollup(), {
+            (EstadoPedido.ASIGNADO_REPARTIDOR, self.repartidor.id): (1, Decimal('20.00')),
+        })
+
+        # Con la fila ya creada el INSERT suma sobre ella
+        otro = self._pedido(5)
+        otro.aceptar_por_repartidor(self.repartidor)
+        self.assertEqual(self._rollup(), {
+            (EstadoPedido.ASIGNADO_REPARTIDOR, self.repartidor.id): (2, Decimal('25.00')),
+        })
+
+    def test_accion_masiva_del_admin_reconstruye_el_rollup(self):
+        from django.contrib import admin
+
+        pedido = self._pedido(25)
+        pedido.aceptar_por_repartidor(self.repartidor)
+        pedido.marcar_en_camino()
+
+        pedido_admin = admin.site._registry[Pedido]
+        with mock.patch.object(pedido_admin, 'message_user'):
+            pedido_admin.marcar_entregado(None, Pedido.objects.filter(pk=pedido.pk))
+
+        self.assertEqual(self._rollup(), {(EstadoPedido.ENTREGADO, self.repartidor.id): (1, Decimal('25.00'))})
+
+    def test_endpoints_leen_del_rollup(self):
+        pedido = self._pedido(40)
+        pedido.aceptar_por_repartidor(self.repartidor)
+        pedido.marcar_entregado()
+        self._pedido(10)
+
+        self.client.force_authenticate(self.admin)
+        res = self.client.get(reverse("reportes:reporte-admin-estadisticas"))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['total_pedidos'], 2)
+        self.assertEqual(res.data['pedidos_hoy'], 2)
+        self.assertEqual(res.data['pedidos_entregados'], 1)
+        self.assertEqual(Decimal(res.data['ingresos_totales']), Decimal('40.00'))
+
+        res = self.client.get(reverse("reportes:reporte-admin-metricas-diarias"), {'dias': 6})
+        self.assertEqual(len(res.data), 7)
+        self.assertEqual(res.data[-1]['total_pedidos'], 2)
+        self.assertEqual(res.data[0]['total_pedidos'], 0)
+
+        self.client.force_authenticate(self.user_rep)
+        res = self.client.get(reverse("reportes:reporte-repartidor-estadisticas"))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['total_entregas'], 1)
+        self.assertEqual(res.data['entregas_hoy'], 1)
+
+    def test_comando_reconstruye_desde_cero(self):
+        self._pedido(12)
+        self._pedido(8)
+        MetricaDiariaPedido.objects.all().delete()
+
+        call_command('reconstruir_metricas_pedidos', stdout=StringIO())
+
+        fila = MetricaDiariaPedido.objects.get()
+        self.assertEqual(fila.dia, timezone.localdate())
+        self.assertEqual(fila.cantidad, 2)
+        self.assertEqual(fila.total, Decimal('20.00'))
+
+
+class ExportacionPedidosTest(APITestCase):
+    """Las exportaciones se transmiten por bloques y conservan columnas y totales."""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            email="admin@app.com",
+            username="admin",
+            password="password123",
+        )
+        self.admin.first_name = "Ana"
+        self.admin.last_name = "Pérez"
+        self.admin.save(update_fields=['first_name', 'last_name'])
+        for total in (10, 32.5):
+            Pedido.objects.create(
+                cliente=self.admin.perfil,
+                tipo=TipoPedido.DIRECTO,
+                total=total,
+                direccion_entrega="Av. Siempre Viva, 742",
+            )
+        self.url = reverse("reportes:reporte-admin-exportar")
+        self.client.force_authenticate(self.admin)
+
+    def test_csv_en_streaming(self):
+        res = self.client.get(self.url, {'formato': 'csv'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+
+        lineas = b''.join(res.streaming_content).decode('utf-8').lstrip('\ufeff').splitlines()
+        filas = list(csv.reader(lineas))
+        self.assertEqual(filas[0][:6], ['ID', 'Tipo', 'Estado', 'Cliente', 'Email Cliente', 'Celular Cliente'])
+        self.assertEqual(len(filas), 3)
+        self.assertEqual(filas[1][3], "Ana Pérez")
+        self.assertEqual(filas[1][7], "Sin asignar")
+        self.assertEqual(filas[1][8], "Av. Siempre Viva, 742")
+        self.assertEqual(sorted(f[9] for f in filas[1:]), ['10.00', '32.50'])
+
+    def test_excel_write_only_con_totales(self):
+        res = self.client.get(self.url, {'formato': 'excel'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        libro = load_workbook(BytesIO(b''.join(res.streaming_content)))
+        filas = list(libro.active.iter_rows(values_only=True))
+        self.assertEqual(filas[0][0], 'ID')
+        self.assertEqual(len(filas), 4)
+        self.assertEqual(filas[-1][0], 'TOTALES:')
+        self.assertEqual(filas[-1][8], 42.5)
+
+    async def test_asgi_transmite_con_iterador_async(self):
+        from rest_framework_simplejwt.tokens import AccessToken
+
+        cabeceras = {'Authorization': f'Bearer {AccessToken.for_user(self.admin)}'}
+        for formato in ('csv', 'excel'):
+            with self.subTest(formato=formato):
+                res = await self.async_client.get(self.url, {'formato': formato}, headers=cabeceras)
+                self.assertEqual(res.status_code, status.HTTP_200_OK)
+                # Con un iterador síncrono Django lo volcaría entero con list()
+                self.assertTrue(res.is_async)
+                contenido = b''.join([bloque async for bloque in res.streaming_content])
+                if formato == 'csv':
+                    self.assertEqual(len(contenido.decode('utf-8').splitlines()), 3)
+                else:
+                    self.assertEqual(len(contenido), int(res['Content-Length']))
+                    self.assertEqual(load_workbook(BytesIO(contenido)).active.max_row, 4)
+
+
+class TrabajoReporteAsincronoTest(APITestCase):
+    """Exportaciones encoladas: progreso, descarga y deduplicación."""
+
+    def setUp(self):
+        cache.clear()
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        ajuste = override_settings(MEDIA_ROOT=self.media)
+        ajuste.enable()
+        self.addCleanup(ajuste.disable)
+
+        self.admin = User.objects.create_superuser(
+            email="admin@app.com",
+            username="admin",
+            password="password123",
+        )
+        self.otro = User.objects.create_user(
+            email="otro@app.com",
+            username="otro",
+            password="password123",
+        )
+        for total, estado in ((10, EstadoPedido.ENTREGADO), (20, EstadoPedido.CANCELADO)):
+            Pedido.objects.create(
+                cliente=self.admin.perfil,
+                tipo=TipoPedido.DIRECTO,
+                estado=estado,
+                total=total,
+                direccion_entrega="Calle 1",
+            )
+        self.url = reverse("reportes:reporte-admin-exportar-async")
+        self.client.force_authenticate(self.admin)
+
+    def _encolar(self, query):
+        # La tarea se encola al hacer commit; aquí corre en el proceso de la prueba
+        with mock.patch.object(generar_trabajo_reporte, 'delay', side_effect=generar_trabajo_reporte), \
+                self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(f"{self.url}?{query}")
+
+    def test_trabajo_genera_archivo_filtrado(self):
+        res = self._encolar("formato=csv&estado=entregado")
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertFalse(res.data['reutilizado'])
+
+        url_estado = reverse("reportes:trabajo-reporte-detail", args=[res.data['id']])
+        estado = self.client.get(url_estado)
+        self.assertEqual(estado.data['estado'], 'completado')
+        self.assertEqual(estado.data['progreso'], 100)
+        self.assertEqual(estado.data['total'], 1)
+        self.assertIsNotNone(estado.data['url_descarga'])
+
+        descarga = self.client.get(reverse("reportes:trabajo-reporte-descargar", args=[res.data['id']]))
+        contenido = b''.join(descarga.streaming_content).decode('utf-8')
+        self.assertEqual(len(contenido.strip().splitlines()), 2)
+        self.assertIn('10.00', contenido)
+
+        # El trabajo solo es visible para quien lo pidió
+        self.client.force_authenticate(self.otro)
+        self.assertEqual(self.client.get(url_estado).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_solicitudes_identicas_se_deduplican(self):
+        primero = self._encolar("formato=excel&estado=entregado&estado=cancelado")
+        segundo = self._encolar("estado=cancelado&estado=entregado&formato=excel")
+        self.assertEqual(primero.data['id'], segundo.data['id'])
+        self.assertTrue(segundo.data['reutilizado'])
+        self.assertEqual(TrabajoReporte.objects.count(), 1)
+
+        otro_formato = self._encolar("formato=csv&estado=entregado&estado=cancelado")
+        self.assertNotEqual(otro_formato.data['id'], primero.data['id'])
+
+    def test_filtros_invalidos(self):
+        res = self._encolar("formato=csv&fecha_inicio=ayer")
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(TrabajoReporte.objects.exists())
+
+    def test_trabajo_huerfano_se_retoma_o_falla(self):
+        from .models import EstadoTrabajo
+        from .services import TrabajosReporteService
+
+        def en_proceso(hace):
+            return TrabajoReporte.objects.create(
+                usuario=self.admin, ambito='admin', formato='csv', parametros={}, huella=str(hace),
+                estado=EstadoTrabajo.PROCESANDO, iniciado_en=timezone.now() - hace,
+            )
+
+        # Una reentrega mientras otro worker lo procesa no lo repite
+        en_curso = en_proceso(timedelta(minutes=1))
+        self.assertIsNone(TrabajosReporteService.ejecutar(en_curso.pk))
+
+        # Pasado el time limit el worker murió: la reentrega lo retoma
+        huerfano = en_proceso(timedelta(hours=1))
+        self.assertEqual(TrabajosReporteService.ejecutar(huerfano.pk).estado, EstadoTrabajo.COMPLETADO)
+
+        # Sin reentrega, la limpieza periódica lo marca fallido
+        perdido = en_proceso(timedelta(hours=1))
+        TrabajosReporteService.limpiar_expirados()
+        perdido.refresh_from_db()
+        en_curso.refresh_from_db()
+        self.assertEqual(perdido.estado, EstadoTrabajo.FALLIDO)
+        self.assertEqual(en_curso.estado, EstadoTrabajo.PROCESANDO)
+
+
+class SnapshotAnaliticoTest(APITestCase):
+    """El snapshot analítico replica los pedidos y responde agrupaciones ad-hoc."""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            email="admin@app.com",
+            username="admin",
+            password="password123",
+        )
+        self.proveedor = Proveedor.objects.create(
+            user=self.admin,
+            nombre="Proveedor Analítica",
+            ruc="0999999999001",
+            tipo_proveedor="restaurante",
+            latitud=0,
+            longitud=0,
+            activo=True,
+        )
+        self.entregado = Pedido.objects.create(
+            cliente=self.admin.perfil,
+            proveedor=self.proveedor,
+            tipo=TipoPedido.PROVEEDOR,
+            estado=EstadoPedido.ENTREGADO,
+            metodo_pago='tarjeta',
+            total=30,
+            direccion_entrega="Calle 1",
+        )
+        self.pendiente = Pedido.objects.create(
+            cliente=self.admin.perfil,
+            tipo=TipoPedido.DIRECTO,
+            total=5,
+            direccion_entrega="Calle 2",
+        )
+        self.client.force_authenticate(self.admin)
+
+    def test_sincronizacion_incremental(self):
+        self.assertEqual(analitica.sincronizar(), 2)
+        self.assertEqual(HechoPedido.objects.get(pk=self.entregado.pk).proveedor_nombre, "Proveedor Analítica")
+
+        self.pendiente.cancelar("cliente", "cliente")
+        analitica.sincronizar()
+        self.assertEqual(HechoPedido.objects.count(), 2)
+        self.assertEqual(HechoPedido.objects.get(pk=self.pendiente.pk).estado, EstadoPedido.CANCELADO)
+
+        self.pendiente.delete()
+        self.assertEqual(analitica.reconstruir()['eliminados'], 1)
+
+    def test_agrupacion_ad_hoc(self):
+        analitica.sincronizar()
+
+        res = self.client.get(
+            reverse("reportes:reporte-admin-consulta-analitica"),
+            {'agrupar': 'metodo_pago', 'medidas': 'pedidos,ventas', 'ordenar': '-ventas'},
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(f['metodo_pago'], f['pedidos'], f['ventas']) for f in res.data['resultados']],
+            [('tarjeta', 1, Decimal('30.00')), ('efectivo', 1, Decimal('5.00'))],
+        )
+
+        res = self.client.get(
+            reverse("reportes:reporte-admin-top-proveedores"), {'fuente': 'analitica'}
+        )
+        self.assertEqual([f['proveedor_id'] for f in res.data], [self.proveedor.id])
+
+        res = self.client.get(reverse("reportes:reporte-admin-resumen-financiero"))
+        self.assertEqual(res.data['cantidad_pedidos'], 1)
+        self.assertEqual(res.data['total_ventas'], Decimal('30.00'))
+
+        res = self.client.get(reverse("reportes:reporte-admin-consulta-analitica"), {'agrupar': 'cliente__user__email'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class LecturaReplicaTest(APITestCase):
+    """Enrutamiento de lecturas a la réplica (utils/replica.py) con read-your-writes."""
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser(
+            email="admin@app.com",
+            username="admin",
+            password="password123",
+        )
+        configurada = mock.patch('utils.replica.replica_configurada', return_value=True)
+        configurada.start()
+        self.addCleanup(configurada.stop)
+
+    def _espiar_lecturas(self):
+        """Registra el alias elegido por el router y lee siempre de 'default' (sin réplica en tests)."""
+        from utils.replica import RouterReplica
+
+        decisiones = []
+        original = RouterReplica.db_for_read
+
+        def db_for_read(router, model, **hints):
+            decisiones.append((model._meta.label, original(router, model, **hints)))
+            return 'default'
+
+        parche = mock.patch.object(RouterReplica, 'db_for_read', db_for_read)
+        parche.start()
+        self.addCleanup(parche.stop)
+        return decisiones
+
+    def test_router_lee_del_primario_lo_escrito_en_el_contexto(self):
+        from utils import replica
+
+        router = replica.RouterReplica()
+        self.assertEqual(router.db_for_read(Pedido), 'default')
+
+        with replica.usar_replica():
+            self.assertEqual(router.db_for_read(Pedido), 'replica')
+            self.assertEqual(router.db_for_write(Pedido), 'default')
+            self.assertEqual(router.db_for_read(Pedido), 'default')
+            self.assertEqual(router.db_for_read(Proveedor), 'replica')
+
+    def test_reportes_leen_de_replica_salvo_usuario_que_acaba_de_escribir(self):
+        from utils import replica
+
+        decisiones = self._espiar_lecturas()
+        self.client.force_authenticate(self.admin)
+
+        res = self.client.get(reverse("reportes:reporte-admin-list"))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn(('pedidos.Pedido', 'replica'), decisiones)
+
+        replica.pegar(self.admin)
+        decisiones.clear()
+        self.client.get(reverse("reportes:reporte-admin-list"))
+        self.assertIn(('pedidos.Pedido', 'default'), decisiones)
+        self.assertNotIn(('pedidos.Pedido', 'replica'), decisiones)
+
+    def test_csv_transmitido_lee_de_replica(self):
+        decisiones = self._espiar_lecturas()
+        self.client.force_authenticate(self.admin)
+
+        res = self.client.get(reverse("reportes:reporte-admin-exportar"), {'formato': 'csv'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        # El cuerpo se consume después de que el middleware cerró su contexto
+        decisiones.clear()
+        b''.join(res.streaming_content)
+        self.assertIn(('pedidos.Pedido', 'replica'), decisiones)
+        self.assertNotIn(('pedidos.Pedido', 'default'), decisiones)
+
+    def test_escritura_pega_al_usuario_al_primario(self):
+        from utils import replica
+
+        self.client.force_authenticate(self.admin)
+        self.assertFalse(replica.pegado(self.admin))
+
+        res = self.client.post(reverse("reportes:reporte-admin-exportar-async"))
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertTrue(replica.pegado(self.admin))
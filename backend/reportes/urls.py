@@ -10,6 +10,7 @@ from .views import (
     ReporteAdminViewSet,
     ReporteProveedorViewSet,
     ReporteRepartidorViewSet,
+    TrabajoReporteViewSet,
 )
 
 app_name = 'reportes'
@@ -30,6 +31,10 @@ router_proveedor.register(r'proveedor', ReporteProveedorViewSet, basename='repor
 router_repartidor = DefaultRouter()
 router_repartidor.register(r'repartidor', ReporteRepartidorViewSet, basename='reporte-repartidor')
 
+# Router para exportaciones asíncronas (cualquier rol, solo sus trabajos)
+router_trabajos = DefaultRouter()
+router_trabajos.register(r'trabajos', TrabajoReporteViewSet, basename='trabajo-reporte')
+
 # ============================================
 # URL PATTERNS
 # ============================================
@@ -64,6 +69,15 @@ urlpatterns = [
     # GET /api/reportes/repartidor/estadisticas/ - Sus estadísticas
     # GET /api/reportes/repartidor/exportar/?formato=excel - Exportar sus entregas
     path('', include(router_repartidor.urls)),
+
+    # ============================================
+    # EXPORTACIONES ASÍNCRONAS
+    # ============================================
+    # POST /api/reportes/{admin|proveedor|repartidor}/exportar-async/?formato=csv - Encolar exportación
+    # GET /api/reportes/trabajos/ - Sus trabajos de exportación
+    # GET /api/reportes/trabajos/{id}/ - Estado y progreso
+    # GET /api/reportes/trabajos/{id}/descargar/ - Descargar el archivo generado
+    path('', include(router_trabajos.urls)),
 ]
 
 
@@ -1,39 +1,190 @@
 # reportes/utils.py
 """
 Utilidades para exportación de reportes
- Exportación a Excel (openpyxl)
- Exportación a CSV
+ Exportación a Excel (openpyxl, modo write-only)
+ Exportación a CSV (streaming)
  Formateo y estilos
 """
-from django.http import HttpResponse
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 from openpyxl.utils import get_column_letter
 import csv
+import tempfile
 from datetime import datetime
+from decimal import Decimal
+from itertools import islice
 import logging
 
+from utils import replica
+
 logger = logging.getLogger('reportes')
 
+# Pedidos leídos por viaje a la BD durante una exportación
+EXPORTACION_CHUNK_SIZE = 2000
+
+# Bloques de FileResponse.block_size leídos por salto de hilo bajo ASGI
+BLOQUES_ARCHIVO_ASYNC = 16
+
+
+# ============================================
+# TRANSMISIÓN BAJO ASGI
+# ============================================
+
+def es_asgi(request):
+    """True si la solicitud (Django o DRF) llegó por el servidor ASGI."""
+    return isinstance(getattr(request, '_request', request), ASGIRequest)
+
+
+async def iterar_en_bloques(iterador, tamano):
+    """
+    Versión async de un iterador síncrono, para StreamingHttpResponse bajo
+    ASGI (con uno síncrono Django haría list() de todo antes del primer byte).
+
+    Cada bloque de `tamano` elementos se lee con sync_to_async, en el hilo
+    de la solicitud, y se envía unido.
+    """
+    siguiente = sync_to_async(lambda: list(islice(iterador, tamano)))
+    while bloque := await siguiente():
+        yield bloque[0][:0].join(bloque)
+
+
+def respuesta_archivo(archivo, filename, content_type=None, asincrono=False):
+    """FileResponse de descarga; con `asincrono` el archivo se lee por bloques fuera del event loop."""
+    response = FileResponse(archivo, as_attachment=True, filename=filename, content_type=content_type)
+    if asincrono:
+        # Los encabezados y el cierre del archivo ya quedaron registrados
+        response.streaming_content = iterar_en_bloques(
+            iter(lambda: archivo.read(response.block_size), b''), BLOQUES_ARCHIVO_ASYNC
+        )
+    return response
+
+
+# ============================================
+# LECTURA DE PEDIDOS PARA EXPORTAR
+# ============================================
+
+# Proyección plana: una sola consulta con JOINs y sin instanciar modelos
+CAMPOS_EXPORTACION = (
+    'id',
+    'tipo',
+    'estado',
+    'cliente__user__first_name',
+    'cliente__user__last_name',
+    'cliente__user__email',
+    'cliente__user__celular',
+    'proveedor__nombre',
+    'repartidor__user__first_name',
+    'repartidor__user__last_name',
+    'direccion_entrega',
+    'total',
+    'comision_repartidor',
+    'comision_proveedor',
+    'ganancia_app',
+    'metodo_pago',
+    'creado_en',
+    'fecha_entregado',
+    'cancelado_por',
+)
+
+# Columnas con montos (se totalizan al final del Excel)
+CAMPOS_MONTO = ('total', 'comision_repartidor', 'comision_proveedor', 'ganancia_app')
+
+# (encabezado, clave de la fila) en el orden de cada formato
+COLUMNAS_EXCEL = [
+    ('ID', 'id'),
+    ('Tipo', 'tipo'),
+    ('Estado', 'estado'),
+    ('Cliente', 'cliente'),
+    ('Email Cliente', 'email'),
+    ('Proveedor', 'proveedor'),
+    ('Repartidor', 'repartidor'),
+    ('Dirección Entrega', 'direccion_entrega'),
+    ('Total', 'total'),
+    ('Comisión Repartidor', 'comision_repartidor'),
+    ('Comisión Proveedor', 'comision_proveedor'),
+    ('Ganancia App', 'ganancia_app'),
+    ('Método Pago', 'metodo_pago'),
+    ('Fecha Creación', 'creado_en'),
+    ('Fecha Entrega', 'fecha_entregado'),
+    ('Cancelado Por', 'cancelado_por'),
+]
+
+COLUMNAS_CSV = COLUMNAS_EXCEL[:5] + [('Celular Cliente', 'celular')] + COLUMNAS_EXCEL[5:]
+
+
+def _nombre_completo(nombre, apellido):
+    return f"{nombre or ''} {apellido or ''}".strip()
+
+
+def iterar_pedidos_exportacion(queryset, chunk_size=EXPORTACION_CHUNK_SIZE, al_avanzar=None):
+    """
+    Recorre el queryset con un cursor del servidor (`iterator`) sobre una
+    proyección `values()`, así la memoria no crece con el número de pedidos.
+
+    Si se indica `al_avanzar(procesados)`, se invoca cada `chunk_size`
+    pedidos y al terminar (para reportar progreso).
+
+    Yields:
+        dict con los valores ya formateados para exportar
+    """
+    from pedidos.models import EstadoPedido, TipoPedido
+
+    tipos = dict(TipoPedido.choices)
+    estados = dict(EstadoPedido.choices)
+
+    procesados = 0
+    for p in queryset.values(*CAMPOS_EXPORTACION).iterator(chunk_size=chunk_size):
+        procesados += 1
+        if al_avanzar and procesados % chunk_size == 0:
+            al_avanzar(procesados)
+        yield {
+            'id': p['id'],
+            'tipo': tipos.get(p['tipo'], p['tipo']),
+            'estado': estados.get(p['estado'], p['estado']),
+            'cliente': _nombre_completo(p['cliente__user__first_name'], p['cliente__user__last_name']),
+            'email': p['cliente__user__email'],
+            'celular': p['cliente__user__celular'] or 'N/A',
+            'proveedor': p['proveedor__nombre'] or 'N/A',
+            'repartidor': (
+                _nombre_completo(p['repartidor__user__first_name'], p['repartidor__user__last_name'])
+                if p['repartidor__user__first_name'] is not None else 'Sin asignar'
+            ),
+            'direccion_entrega': p['direccion_entrega'],
+            'total': p['total'],
+            'comision_repartidor': p['comision_repartidor'],
+            'comision_proveedor': p['comision_proveedor'],
+            'ganancia_app': p['ganancia_app'],
+            'metodo_pago': p['metodo_pago'],
+            'creado_en': p['creado_en'].strftime('%Y-%m-%d %H:%M:%S'),
+            'fecha_entregado': p['fecha_entregado'].strftime('%Y-%m-%d %H:%M:%S') if p['fecha_entregado'] else 'N/A',
+            'cancelado_por': p['cancelado_por'] or 'N/A',
+        }
+
+    if al_avanzar:
+        al_avanzar(procesados)
+
 
 # ============================================
 # EXPORTAR A EXCEL
 # ============================================
 
-def exportar_pedidos_excel(queryset):
+def escribir_pedidos_excel(queryset, destino, al_avanzar=None):
     """
-    Exporta pedidos a formato Excel con formato profesional
+    Escribe el reporte de pedidos en formato Excel sobre `destino` (ruta o
+    archivo binario).
 
-    Args:
-        queryset: QuerySet de Pedido
+    Usa el modo write-only de openpyxl: las filas se vuelcan a disco a medida
+    que se generan y solo los encabezados, montos y totales llevan estilo.
 
     Returns:
-        HttpResponse con archivo Excel
+        int: cantidad de pedidos exportados
     """
-    # Crear workbook
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Reporte de Pedidos"
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Reporte de Pedidos")
 
     # ============================================
     # ESTILOS
@@ -44,10 +195,6 @@ def exportar_pedidos_excel(queryset):
     header_fill = PatternFill(start_color='366092', end_color='366092', fill_type='solid')
     header_alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
 
-    # Estilo de datos
-    data_font = Font(name='Arial', size=10)
-    data_alignment = Alignment(horizontal='left', vertical='center')
-
     # Bordes
     thin_border = Border(
         left=Side(style='thin'),
@@ -56,169 +203,98 @@ def exportar_pedidos_excel(queryset):
         bottom=Side(style='thin')
     )
 
+    formato_dinero = '$#,##0.00'
+    total_font = Font(name='Arial', size=11, bold=True)
+    total_fill = PatternFill(start_color='E7E6E6', end_color='E7E6E6', fill_type='solid')
+    ganancia_fill = PatternFill(start_color='FFD966', end_color='FFD966', fill_type='solid')
+
+    # ============================================
+    # AJUSTAR ANCHOS DE COLUMNA (antes de escribir filas en write-only)
+    # ============================================
+    anchos = [8, 15, 15, 25, 30, 25, 25, 40, 12, 18, 18, 15, 15, 20, 20, 15]
+    for col_num, width in enumerate(anchos, 1):
+        ws.column_dimensions[get_column_letter(col_num)].width = width
+
+    ws.freeze_panes = 'A2'
+
     # ============================================
     # ENCABEZADOS
     # ============================================
-    headers = [
-        'ID',
-        'Tipo',
-        'Estado',
-        'Cliente',
-        'Email Cliente',
-        'Proveedor',
-        'Repartidor',
-        'Dirección Entrega',
-        'Total',
-        'Comisión Repartidor',
-        'Comisión Proveedor',
-        'Ganancia App',
-        'Método Pago',
-        'Fecha Creación',
-        'Fecha Entrega',
-        'Cancelado Por',
-    ]
-
-    # Escribir encabezados
-    for col_num, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col_num)
-        cell.value = header
+    encabezados = []
+    for header, _ in COLUMNAS_EXCEL:
+        cell = WriteOnlyCell(ws, value=header)
         cell.font = header_font
         cell.fill = header_fill
         cell.alignment = header_alignment
         cell.border = thin_border
+        encabezados.append(cell)
+    ws.append(encabezados)
 
     # ============================================
     # DATOS
     # ============================================
-
-    # Optimizar queryset
-    pedidos = queryset.select_related(
-        'cliente__user',
-        'proveedor',
-        'repartidor__user'
-    )
-
-    for row_num, pedido in enumerate(pedidos, 2):
-        # Preparar datos
-        row_data = [
-            pedido.id,
-            pedido.get_tipo_display(),
-            pedido.get_estado_display(),
-            pedido.cliente.user.get_full_name(),
-            pedido.cliente.user.email,
-            pedido.proveedor.nombre if pedido.proveedor else 'N/A',
-            pedido.repartidor.user.get_full_name() if pedido.repartidor else 'Sin asignar',
-            pedido.direccion_entrega,
-            float(pedido.total),
-            float(pedido.comision_repartidor),
-            float(pedido.comision_proveedor),
-            float(pedido.ganancia_app),
-            pedido.metodo_pago,
-            pedido.creado_en.strftime('%Y-%m-%d %H:%M:%S'),
-            pedido.fecha_entregado.strftime('%Y-%m-%d %H:%M:%S') if pedido.fecha_entregado else 'N/A',
-            pedido.cancelado_por or 'N/A',
-        ]
-
-        # Escribir fila
-        for col_num, value in enumerate(row_data, 1):
-            cell = ws.cell(row=row_num, column=col_num)
-            cell.value = value
-            cell.font = data_font
-            cell.alignment = data_alignment
-            cell.border = thin_border
-
-            # Formato para montos
-            if col_num in [9, 10, 11, 12]:  # Columnas de dinero
-                cell.number_format = '$#,##0.00'
-
-    # ============================================
-    # AJUSTAR ANCHOS DE COLUMNA
-    # ============================================
-    column_widths = {
-        'A': 8,   # ID
-        'B': 15,  # Tipo
-        'C': 15,  # Estado
-        'D': 25,  # Cliente
-        'E': 30,  # Email
-        'F': 25,  # Proveedor
-        'G': 25,  # Repartidor
-        'H': 40,  # Dirección
-        'I': 12,  # Total
-        'J': 18,  # Comisión Repartidor
-        'K': 18,  # Comisión Proveedor
-        'L': 15,  # Ganancia App
-        'M': 15,  # Método Pago
-        'N': 20,  # Fecha Creación
-        'O': 20,  # Fecha Entrega
-        'P': 15,  # Cancelado Por
-    }
-
-    for col, width in column_widths.items():
-        ws.column_dimensions[col].width = width
+    claves = [clave for _, clave in COLUMNAS_EXCEL]
+    totales = dict.fromkeys(CAMPOS_MONTO, Decimal('0'))
+    cantidad = 0
+
+    for pedido in iterar_pedidos_exportacion(queryset, al_avanzar=al_avanzar):
+        fila = []
+        for clave in claves:
+            valor = pedido[clave]
+            if clave in CAMPOS_MONTO:
+                totales[clave] += valor
+                valor = WriteOnlyCell(ws, value=float(valor))
+                valor.number_format = formato_dinero
+            fila.append(valor)
+        ws.append(fila)
+        cantidad += 1
 
     # ============================================
     # AGREGAR FILA DE TOTALES
     # ============================================
-    total_row = len(pedidos) + 2
-
-    # Etiqueta
-    ws.cell(row=total_row, column=1).value = 'TOTALES:'
-    ws.cell(row=total_row, column=1).font = Font(name='Arial', size=11, bold=True)
-
-    # Calcular totales
-    totales = queryset.aggregate(
-        total=csv.Sum('total'),
-        comision_repartidor=csv.Sum('comision_repartidor'),
-        comision_proveedor=csv.Sum('comision_proveedor'),
-        ganancia_app=csv.Sum('ganancia_app')
-    )
+    etiqueta = WriteOnlyCell(ws, value='TOTALES:')
+    etiqueta.font = total_font
+    fila_totales = [etiqueta] + [None] * (len(claves) - 1)
+    for col, clave in enumerate(claves):
+        if clave in CAMPOS_MONTO:
+            cell = WriteOnlyCell(ws, value=float(totales[clave]))
+            cell.number_format = formato_dinero
+            cell.font = total_font
+            cell.fill = ganancia_fill if clave == 'ganancia_app' else total_fill
+            fila_totales[col] = cell
+    ws.append(fila_totales)
+
+    wb.save(destino)
+    return cantidad
+
+
+def exportar_pedidos_excel(queryset, asincrono=False):
+    """
+    Exporta pedidos a formato Excel con formato profesional
 
-    # Total
-    cell = ws.cell(row=total_row, column=9)
-    cell.value = float(totales['total'] or 0)
-    cell.number_format = '$#,##0.00'
-    cell.font = Font(name='Arial', size=11, bold=True)
-    cell.fill = PatternFill(start_color='E7E6E6', end_color='E7E6E6', fill_type='solid')
-
-    # Comisión Repartidor
-    cell = ws.cell(row=total_row, column=10)
-    cell.value = float(totales['comision_repartidor'] or 0)
-    cell.number_format = '$#,##0.00'
-    cell.font = Font(name='Arial', size=11, bold=True)
-    cell.fill = PatternFill(start_color='E7E6E6', end_color='E7E6E6', fill_type='solid')
-
-    # Comisión Proveedor
-    cell = ws.cell(row=total_row, column=11)
-    cell.value = float(totales['comision_proveedor'] or 0)
-    cell.number_format = '$#,##0.00'
-    cell.font = Font(name='Arial', size=11, bold=True)
-    cell.fill = PatternFill(start_color='E7E6E6', end_color='E7E6E6', fill_type='solid')
-
-    # Ganancia App
-    cell = ws.cell(row=total_row, column=12)
-    cell.value = float(totales['ganancia_app'] or 0)
-    cell.number_format = '$#,##0.00'
-    cell.font = Font(name='Arial', size=11, bold=True)
-    cell.fill = PatternFill(start_color='FFD966', end_color='FFD966', fill_type='solid')
+    El libro se genera en un archivo temporal y se envía por bloques, de
+    modo que la memoria del worker no depende del tamaño del reporte.
 
-    # ============================================
-    # CONGELAR PANEL
-    # ============================================
-    ws.freeze_panes = 'A2'
+    Args:
+        queryset: QuerySet de Pedido
+        asincrono: True bajo ASGI (ver `es_asgi`)
 
-    # ============================================
-    # GENERAR RESPUESTA
-    # ============================================
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
+    Returns:
+        FileResponse con archivo Excel
+    """
+    archivo = tempfile.TemporaryFile()
+    cantidad = escribir_pedidos_excel(queryset, archivo)
+    archivo.seek(0)
 
     filename = f"reporte_pedidos_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-
-    wb.save(response)
+    response = respuesta_archivo(
+        archivo,
+        filename,
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        asincrono=asincrono,
+    )
 
-    logger.info(f"Reporte Excel generado: {len(pedidos)} pedidos")
+    logger.info(f"Reporte Excel generado: {cantidad} pedidos")
 
     return response
 
@@ -227,77 +303,63 @@ def exportar_pedidos_excel(queryset):
 # EXPORTAR A CSV
 # ============================================
 
-def exportar_pedidos_csv(queryset):
+class _Eco:
+    """Pseudo-buffer: csv.writer devuelve la línea en vez de acumularla."""
+
+    def write(self, value):
+        return value
+
+
+def generar_pedidos_csv(queryset, al_avanzar=None):
+    """
+    Genera el CSV de pedidos línea a línea (con BOM para Excel).
+
+    Yields:
+        str: cada línea del archivo
+    """
+    writer = csv.writer(_Eco(), delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
+
+    # Agregar BOM para Excel (soporte UTF-8)
+    yield '\ufeff'
+    yield writer.writerow([header for header, _ in COLUMNAS_CSV])
+
+    cantidad = 0
+    for pedido in iterar_pedidos_exportacion(queryset, al_avanzar=al_avanzar):
+        for clave in CAMPOS_MONTO:
+            pedido[clave] = f"{pedido[clave]:.2f}"
+        yield writer.writerow([pedido[clave] for _, clave in COLUMNAS_CSV])
+        cantidad += 1
+
+    logger.info(f"Reporte CSV generado: {cantidad} pedidos")
+
+
+def escribir_pedidos_csv(queryset, destino, al_avanzar=None):
+    """Escribe el CSV de pedidos (UTF-8) sobre un archivo binario."""
+    for linea in generar_pedidos_csv(queryset, al_avanzar=al_avanzar):
+        destino.write(linea.encode('utf-8'))
+
+
+def exportar_pedidos_csv(queryset, asincrono=False):
     """
     Exporta pedidos a formato CSV
 
+    La respuesta se transmite mientras se leen los pedidos por bloques, sin
+    armar el archivo completo en memoria.
+
     Args:
         queryset: QuerySet de Pedido
+        asincrono: True bajo ASGI (ver `es_asgi`)
 
     Returns:
-        HttpResponse con archivo CSV
+        StreamingHttpResponse con archivo CSV
     """
-    response = HttpResponse(content_type='text/csv; charset=utf-8')
+    # El cuerpo se genera fuera de la vista: conserva su lectura en la réplica
+    lineas = replica.con_contexto_actual(generar_pedidos_csv(queryset))
+    if asincrono:
+        lineas = iterar_en_bloques(lineas, EXPORTACION_CHUNK_SIZE)
+    response = StreamingHttpResponse(lineas, content_type='text/csv; charset=utf-8')
     filename = f"reporte_pedidos_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
     response['Content-Disposition'] = f'attachment; filename="{filename}"'
-
-    # Agregar BOM para Excel (soporte UTF-8)
-    response.write('\ufeff')
-
-    writer = csv.writer(response, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
-
-    # Encabezados
-    writer.writerow([
-        'ID',
-        'Tipo',
-        'Estado',
-        'Cliente',
-        'Email Cliente',
-        'Celular Cliente',
-        'Proveedor',
-        'Repartidor',
-        'Dirección Entrega',
-        'Total',
-        'Comisión Repartidor',
-        'Comisión Proveedor',
-        'Ganancia App',
-        'Método Pago',
-        'Fecha Creación',
-        'Fecha Entrega',
-        'Cancelado Por',
-    ])
-
-    # Optimizar queryset
-    pedidos = queryset.select_related(
-        'cliente__user',
-        'proveedor',
-        'repartidor__user'
-    )
-
-    # Datos
-    for pedido in pedidos:
-        writer.writerow([
-            pedido.id,
-            pedido.get_tipo_display(),
-            pedido.get_estado_display(),
-            pedido.cliente.user.get_full_name(),
-            pedido.cliente.user.email,
-            pedido.cliente.user.celular or 'N/A',
-            pedido.proveedor.nombre if pedido.proveedor else 'N/A',
-            pedido.repartidor.user.get_full_name() if pedido.repartidor else 'Sin asignar',
-            pedido.direccion_entrega,
-            f"{pedido.total:.2f}",
-            f"{pedido.comision_repartidor:.2f}",
-            f"{pedido.comision_proveedor:.2f}",
-            f"{pedido.ganancia_app:.2f}",
-            pedido.metodo_pago,
-            pedido.creado_en.strftime('%Y-%m-%d %H:%M:%S'),
-            pedido.fecha_entregado.strftime('%Y-%m-%d %H:%M:%S') if pedido.fecha_entregado else 'N/A',
-            pedido.cancelado_por or 'N/A',
-        ])
-
-    logger.info(f"Reporte CSV generado: {len(pedidos)} pedidos")
-
     return response
 
 
@@ -362,7 +424,7 @@ def calcular_resumen_financiero(queryset):
     Calcula resumen financiero de un queryset de pedidos
 
     Args:
-        queryset: QuerySet de Pedido
+        queryset: QuerySet de Pedido o de HechoPedido (snapshot analítico)
 
     Returns:
         Dict con resumen financiero
@@ -379,7 +441,7 @@ def calcular_resumen_financiero(queryset):
         total_comision_proveedor=Sum('comision_proveedor'),
         total_ganancia_app=Sum('ganancia_app'),
         ticket_promedio=Avg('total'),
-        cantidad_pedidos=Count('id')
+        cantidad_pedidos=Count('pk')
     )
 
     return {
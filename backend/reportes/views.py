@@ -8,16 +8,18 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Sum, Count, Avg, Q, F
+from django.db.models import F
 from django.utils import timezone
-from datetime import timedelta, datetime
+from datetime import date, timedelta, datetime
 from django.http import HttpResponse
 import logging
+import os
 
-from pedidos.models import Pedido, EstadoPedido, TipoPedido
+from pedidos.models import Pedido, EstadoPedido
 # Importaciones necesarias para manejar excepciones de perfil
 from proveedores.models import Proveedor
 from repartidores.models import Repartidor
+from utils.replica import LecturaReplicaMixin
 
 from .serializers import (
     PedidoReporteSerializer,
@@ -29,6 +31,7 @@ from .serializers import (
     TopProveedoresSerializer,
     TopRepartidoresSerializer,
     ExportarReporteSerializer,
+    TrabajoReporteSerializer,
 )
 from .filters import (
     PedidoReporteFilter,
@@ -44,16 +47,79 @@ from .permissions import (
     validar_acceso_proveedor,
     validar_acceso_repartidor,
 )
-from .utils import exportar_pedidos_excel, exportar_pedidos_csv
+from analytics import services as metricas_tiempo_real
+
+from . import analitica
+from .models import AmbitoReporte, TrabajoReporte
+from .services import MetricasPedidosService, TrabajosReporteService
+from .utils import es_asgi, exportar_pedidos_excel, exportar_pedidos_csv, respuesta_archivo
 
 logger = logging.getLogger('reportes')
 
 
+def _filtros_analitica(params):
+    """
+    Filtros del snapshot analítico desde query params.
+    Lanza ConsultaAnaliticaInvalida si alguno tiene formato incorrecto.
+    """
+    filtros = {}
+    try:
+        for nombre in ('desde', 'hasta'):
+            if params.get(nombre):
+                filtros[nombre] = date.fromisoformat(params[nombre])
+        for nombre in ('proveedor', 'repartidor'):
+            if params.get(nombre):
+                filtros[nombre] = int(params[nombre])
+    except ValueError:
+        raise analitica.ConsultaAnaliticaInvalida('Fechas (YYYY-MM-DD) o IDs inválidos')
+    for nombre in ('estado', 'metodo_pago'):
+        valores = [v for v in params.getlist(nombre) if v]
+        if valores:
+            filtros[nombre] = valores
+    if params.get('tipo'):
+        filtros['tipo'] = params['tipo']
+    return filtros
+
+
+# ============================================
+# MIXIN: EXPORTACIÓN ASÍNCRONA
+# ============================================
+
+class ExportacionAsincronaMixin:
+    """
+    Agrega POST exportar-async/ a los viewsets de reportes. Los filtros son
+    los mismos query params del listado; la respuesta trae el trabajo para
+    consultar su estado en /api/reportes/trabajos/{id}/.
+    """
+    ambito_reporte = None
+
+    @action(detail=False, methods=['post'], url_path='exportar-async')
+    def exportar_async(self, request):
+        formato = request.query_params.get('formato', 'excel')
+        if formato not in ('excel', 'csv'):
+            return Response(
+                {'error': 'Formato inválido (excel o csv)'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        parametros = TrabajosReporteService.normalizar_parametros(self.ambito_reporte, request.query_params)
+        errores = TrabajosReporteService.validar_parametros(self.ambito_reporte, parametros)
+        if errores:
+            return Response(errores, status=status.HTTP_400_BAD_REQUEST)
+
+        trabajo, creado = TrabajosReporteService.solicitar(
+            request.user, self.ambito_reporte, formato, parametros
+        )
+        data = TrabajoReporteSerializer(trabajo, context={'request': request}).data
+        data['reutilizado'] = not creado
+        return Response(data, status=status.HTTP_202_ACCEPTED)
+
+
 # ============================================
 # VIEWSET: REPORTES PARA ADMINISTRADOR
 # ============================================
 
-class ReporteAdminViewSet(viewsets.ReadOnlyModelViewSet):
+class ReporteAdminViewSet(LecturaReplicaMixin, ExportacionAsincronaMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet para reportes del administrador
      Acceso completo a todos los pedidos
@@ -63,6 +129,7 @@ class ReporteAdminViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [IsAuthenticated, EsAdministrador]
     serializer_class = PedidoReporteSerializer
     filterset_class = PedidoReporteFilter
+    ambito_reporte = AmbitoReporte.ADMIN
 
     def get_queryset(self):
         """
@@ -93,57 +160,17 @@ class ReporteAdminViewSet(viewsets.ReadOnlyModelViewSet):
 
         Estadísticas globales del sistema
         """
-        hoy = timezone.now().date()
-        primer_dia_mes = hoy.replace(day=1)
-
-        # Totales generales
-        total_pedidos = Pedido.objects.count()
-        pedidos_hoy = Pedido.objects.filter(creado_en__date=hoy).count()
-        pedidos_mes = Pedido.objects.filter(creado_en__date__gte=primer_dia_mes).count()
-
-        # Por estado
-        pedidos_confirmados = Pedido.objects.filter(estado=EstadoPedido.ASIGNADO_REPARTIDOR).count()
-        pedidos_en_preparacion = Pedido.objects.filter(estado=EstadoPedido.EN_PROCESO).count()
-        pedidos_en_ruta = Pedido.objects.filter(estado=EstadoPedido.EN_CAMINO).count()
-        pedidos_entregados = Pedido.objects.filter(estado=EstadoPedido.ENTREGADO).count()
-        pedidos_cancelados = Pedido.objects.filter(estado=EstadoPedido.CANCELADO).count()
-
-        # Por tipo
-        pedidos_proveedor = Pedido.objects.filter(tipo=TipoPedido.PROVEEDOR).count()
-        pedidos_directos = Pedido.objects.filter(tipo=TipoPedido.DIRECTO).count()
-
-        # Financiero - Totales
-        ingresos_data = Pedido.objects.filter(estado=EstadoPedido.ENTREGADO).aggregate(
-            total=Sum('total'),
-            ganancia=Sum('ganancia_app')
-        )
+        # Una sola lectura del rollup diario
+        stats = MetricasPedidosService.estadisticas_generales()
 
-        # Financiero - Hoy
-        ingresos_hoy_data = Pedido.objects.filter(
-            estado=EstadoPedido.ENTREGADO,
-            creado_en__date=hoy
-        ).aggregate(
-            total=Sum('total'),
-            ganancia=Sum('ganancia_app')
-        )
-
-        # Financiero - Mes
-        ingresos_mes_data = Pedido.objects.filter(
-            estado=EstadoPedido.ENTREGADO,
-            creado_en__date__gte=primer_dia_mes
-        ).aggregate(
-            total=Sum('total'),
-            ganancia=Sum('ganancia_app')
-        )
+        total_pedidos = stats['total_pedidos'] or 0
+        pedidos_entregados = stats['pedidos_entregados'] or 0
+        pedidos_cancelados = stats['pedidos_cancelados'] or 0
+        ingresos_totales = stats['ingresos'] or 0
 
         # Promedios
-        ticket_promedio = ingresos_data['total'] / pedidos_entregados if pedidos_entregados > 0 else 0
-
-        comision_promedio = Pedido.objects.filter(
-            estado=EstadoPedido.ENTREGADO
-        ).aggregate(
-            promedio=Avg('comision_repartidor')
-        )['promedio'] or 0
+        ticket_promedio = ingresos_totales / pedidos_entregados if pedidos_entregados > 0 else 0
+        comision_promedio = (stats['comisiones_repartidor'] or 0) / pedidos_entregados if pedidos_entregados > 0 else 0
 
         # Tasas
         tasa_entrega = (pedidos_entregados / total_pedidos * 100) if total_pedidos > 0 else 0
@@ -151,21 +178,21 @@ class ReporteAdminViewSet(viewsets.ReadOnlyModelViewSet):
 
         data = {
             'total_pedidos': total_pedidos,
-            'pedidos_hoy': pedidos_hoy,
-            'pedidos_mes_actual': pedidos_mes,
-            'pedidos_confirmados': pedidos_confirmados,
-            'pedidos_en_preparacion': pedidos_en_preparacion,
-            'pedidos_en_ruta': pedidos_en_ruta,
+            'pedidos_hoy': stats['pedidos_hoy'] or 0,
+            'pedidos_mes_actual': stats['pedidos_mes'] or 0,
+            'pedidos_confirmados': stats['pedidos_confirmados'] or 0,
+            'pedidos_en_preparacion': stats['pedidos_en_preparacion'] or 0,
+            'pedidos_en_ruta': stats['pedidos_en_ruta'] or 0,
             'pedidos_entregados': pedidos_entregados,
             'pedidos_cancelados': pedidos_cancelados,
-            'pedidos_proveedor': pedidos_proveedor,
-            'pedidos_directos': pedidos_directos,
-            'ingresos_totales': ingresos_data['total'] or 0,
-            'ingresos_hoy': ingresos_hoy_data['total'] or 0,
-            'ingresos_mes_actual': ingresos_mes_data['total'] or 0,
-            'ganancia_app_total': ingresos_data['ganancia'] or 0,
-            'ganancia_app_hoy': ingresos_hoy_data['ganancia'] or 0,
-            'ganancia_app_mes': ingresos_mes_data['ganancia'] or 0,
+            'pedidos_proveedor': stats['pedidos_proveedor'] or 0,
+            'pedidos_directos': stats['pedidos_directos'] or 0,
+            'ingresos_totales': ingresos_totales,
+            'ingresos_hoy': stats['ingresos_hoy'] or 0,
+            'ingresos_mes_actual': stats['ingresos_mes'] or 0,
+            'ganancia_app_total': stats['ganancia'] or 0,
+            'ganancia_app_hoy': stats['ganancia_hoy'] or 0,
+            'ganancia_app_mes': stats['ganancia_mes'] or 0,
             'ticket_promedio': round(ticket_promedio, 2),
             'comision_promedio_repartidor': round(comision_promedio, 2),
             'tasa_entrega': round(tasa_entrega, 2),
@@ -183,37 +210,10 @@ class ReporteAdminViewSet(viewsets.ReadOnlyModelViewSet):
         Métricas agregadas por día (para gráficos)
         """
         dias = int(request.query_params.get('dias', 30))
-        fecha_inicio = timezone.now().date() - timedelta(days=dias)
-
-        # Agrupar por fecha
-        metricas = []
-        fecha_actual = fecha_inicio
-        hoy = timezone.now().date()
-
-        while fecha_actual <= hoy:
-            pedidos_dia = Pedido.objects.filter(creado_en__date=fecha_actual)
-
-            stats = pedidos_dia.aggregate(
-                total=Count('id'),
-                entregados=Count('id', filter=Q(estado=EstadoPedido.ENTREGADO)),
-                cancelados=Count('id', filter=Q(estado=EstadoPedido.CANCELADO)),
-                ingresos=Sum('total', filter=Q(estado=EstadoPedido.ENTREGADO)),
-                ganancia=Sum('ganancia_app', filter=Q(estado=EstadoPedido.ENTREGADO))
-            )
-
-            ticket_prom = (stats['ingresos'] / stats['entregados']) if stats['entregados'] and stats['ingresos'] else 0
-
-            metricas.append({
-                'fecha': fecha_actual,
-                'total_pedidos': stats['total'] or 0,
-                'pedidos_entregados': stats['entregados'] or 0,
-                'pedidos_cancelados': stats['cancelados'] or 0,
-                'ingresos': stats['ingresos'] or 0,
-                'ganancia_app': stats['ganancia'] or 0,
-                'ticket_promedio': round(ticket_prom, 2),
-            })
+        hoy = timezone.localdate()
 
-            fecha_actual += timedelta(days=1)
+        # Un GROUP BY por día sobre el rollup (antes: una consulta por día)
+        metricas = MetricasPedidosService.metricas_por_dia(hoy - timedelta(days=dias), hoy)
 
         serializer = MetricasDiariasSerializer(metricas, many=True)
         return Response(serializer.data)
@@ -222,25 +222,28 @@ class ReporteAdminViewSet(viewsets.ReadOnlyModelViewSet):
     def top_proveedores(self, request):
         """
         GET /api/reportes/admin/top-proveedores/?limit=10
+        GET /api/reportes/admin/top-proveedores/?fuente=analitica&desde=2025-01-01
 
         Top proveedores por ventas
         """
         limit = int(request.query_params.get('limit', 10))
 
-        proveedores = Pedido.objects.filter(
-            proveedor__isnull=False,
-            estado=EstadoPedido.ENTREGADO
-        ).values(
-            'proveedor__id',
-            'proveedor__nombre',
-            'proveedor__tipo_proveedor'
-        ).annotate(
-            total_pedidos=Count('id'),
-            ingresos_totales=Sum('total')
-        ).order_by('-ingresos_totales')[:limit]
+        if request.query_params.get('fuente') == 'analitica':
+            try:
+                filas = analitica.top_proveedores(limit, **_filtros_analitica(request.query_params))
+            except analitica.ConsultaAnaliticaInvalida as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            return Response([{
+                'proveedor_id': f['proveedor_id'],
+                'proveedor_nombre': f['proveedor_nombre'],
+                'total_pedidos': f['pedidos'],
+                'ingresos_totales': f['ventas'],
+            } for f in filas])
+
+        proveedores = MetricasPedidosService.top_proveedores(limit)
 
         data = [{
-            'proveedor_id': p['proveedor__id'],
+            'proveedor_id': p['proveedor_id'],
             'proveedor_nombre': p['proveedor__nombre'],
             'proveedor_tipo': p['proveedor__tipo_proveedor'],
             'total_pedidos': p['total_pedidos'],
@@ -254,35 +257,107 @@ class ReporteAdminViewSet(viewsets.ReadOnlyModelViewSet):
     def top_repartidores(self, request):
         """
         GET /api/reportes/admin/top-repartidores/?limit=10
+        GET /api/reportes/admin/top-repartidores/?fuente=analitica&desde=2025-01-01
 
         Top repartidores por entregas
         """
         limit = int(request.query_params.get('limit', 10))
 
-        repartidores = Pedido.objects.filter(
-            repartidor__isnull=False,
-            estado=EstadoPedido.ENTREGADO
-        ).values(
-            'repartidor__id',
-            'repartidor__user__first_name',
-            'repartidor__user__last_name'
-        ).annotate(
-            total_entregas=Count('id'),
-            comisiones_totales=Sum('comision_repartidor'),
-            calificacion_promedio=Avg('repartidor__calificacion_promedio')
-        ).order_by('-total_entregas')[:limit]
+        if request.query_params.get('fuente') == 'analitica':
+            try:
+                filas = analitica.top_repartidores(limit, **_filtros_analitica(request.query_params))
+            except analitica.ConsultaAnaliticaInvalida as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            return Response([{
+                'repartidor_id': f['repartidor_id'],
+                'repartidor_nombre': f['repartidor_nombre'],
+                'total_entregas': f['pedidos'],
+                'comisiones_totales': f['comision_repartidor'],
+                'minutos_entrega_promedio': round(f['minutos_entrega_promedio'] or 0, 1),
+            } for f in filas])
+
+        repartidores = MetricasPedidosService.top_repartidores(limit)
 
         data = [{
-            'repartidor_id': r['repartidor__id'],
+            'repartidor_id': r['repartidor_id'],
             'repartidor_nombre': f"{r['repartidor__user__first_name']} {r['repartidor__user__last_name']}",
             'total_entregas': r['total_entregas'],
             'comisiones_totales': r['comisiones_totales'],
-            'calificacion_promedio': round(r['calificacion_promedio'] or 0, 2),
+            'calificacion_promedio': round(r['repartidor__calificacion_promedio'] or 0, 2),
         } for r in repartidores]
 
         serializer = TopRepartidoresSerializer(data, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'], url_path='resumen-financiero')
+    def resumen_financiero(self, request):
+        """
+        GET /api/reportes/admin/resumen-financiero/?desde=2025-01-01&hasta=2025-01-31
+
+        Resumen financiero de pedidos entregados (snapshot analítico)
+        """
+        try:
+            filtros = _filtros_analitica(request.query_params)
+            filtros['estado'] = [EstadoPedido.ENTREGADO]
+            data = analitica.resumen_financiero(**filtros)
+        except analitica.ConsultaAnaliticaInvalida as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        data['actualizado_hasta'] = analitica.marca_actual()
+        return Response(data)
+
+    @action(detail=False, methods=['get'], url_path='tiempo-real')
+    def tiempo_real(self, request):
+        """
+        GET /api/reportes/admin/tiempo-real/?granularidad=minuto&puntos=60
+
+        Pedidos, GMV, cancelaciones y latencia de aceptación por bucket
+        (contadores en Redis, sin consultas sobre pedidos)
+        """
+        try:
+            data = metricas_tiempo_real.tablero(
+                granularidad=request.query_params.get('granularidad', 'minuto'),
+                puntos=int(request.query_params.get('puntos', 60)),
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(data)
+
+    @action(detail=False, methods=['get'], url_path='analitica')
+    def consulta_analitica(self, request):
+        """
+        GET /api/reportes/admin/analitica/?agrupar=proveedor,metodo_pago&medidas=pedidos,ventas
+
+        Agrupaciones ad-hoc sobre el snapshot analítico de pedidos
+        Params: agrupar, medidas, ordenar (-ventas), limit, desde, hasta,
+                estado, tipo, metodo_pago, proveedor, repartidor
+        """
+        params = request.query_params
+        por = [d for d in params.get('agrupar', '').split(',') if d]
+        medidas = [m for m in params.get('medidas', 'pedidos,ventas').split(',') if m]
+        limit = min(int(params.get('limit', 100)), 1000)
+
+        try:
+            filas = analitica.agrupar(
+                por, medidas, ordenar=params.get('ordenar'), limite=limit,
+                **_filtros_analitica(params)
+            )
+        except analitica.ConsultaAnaliticaInvalida as e:
+            return Response(
+                {
+                    'error': str(e),
+                    'dimensiones': sorted(analitica.DIMENSIONES),
+                    'medidas': sorted(analitica.MEDIDAS),
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response({
+            'actualizado_hasta': analitica.marca_actual(),
+            'resultados': filas,
+        })
+
     @action(detail=False, methods=['get'])
     def exportar(self, request):
         """
@@ -299,9 +374,9 @@ class ReporteAdminViewSet(viewsets.ReadOnlyModelViewSet):
         queryset = self.filter_queryset(self.get_queryset())
 
         if formato == 'excel':
-            response = exportar_pedidos_excel(queryset)
+            response = exportar_pedidos_excel(queryset, asincrono=es_asgi(request))
         else:
-            response = exportar_pedidos_csv(queryset)
+            response = exportar_pedidos_csv(queryset, asincrono=es_asgi(request))
 
         logger.info(f"Reporte exportado por admin: {request.user.email} - {formato}")
         return response
@@ -311,7 +386,7 @@ class ReporteAdminViewSet(viewsets.ReadOnlyModelViewSet):
 # VIEWSET: REPORTES PARA PROVEEDOR
 # ============================================
 
-class ReporteProveedorViewSet(viewsets.ReadOnlyModelViewSet):
+class ReporteProveedorViewSet(LecturaReplicaMixin, ExportacionAsincronaMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet para reportes del proveedor
     Solo ve sus propios pedidos
@@ -319,6 +394,7 @@ class ReporteProveedorViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [IsAuthenticated, EsProveedor]
     serializer_class = PedidoReporteSerializer
     filterset_class = PedidoProveedorFilter
+    ambito_reporte = AmbitoReporte.PROVEEDOR
 
     def get_queryset(self):
         """
@@ -369,21 +445,13 @@ class ReporteProveedorViewSet(viewsets.ReadOnlyModelViewSet):
         try:
             proveedor = request.user.proveedor
 
-            queryset = Pedido.objects.filter(proveedor=proveedor)
+            stats = MetricasPedidosService.estadisticas_proveedor(proveedor)
 
-            total_pedidos = queryset.count()
-            pedidos_entregados = queryset.filter(estado=EstadoPedido.ENTREGADO).count()
-            pedidos_cancelados = queryset.filter(estado=EstadoPedido.CANCELADO).count()
-            pedidos_activos = queryset.filter(
-                estado__in=[EstadoPedido.ASIGNADO_REPARTIDOR, EstadoPedido.EN_PROCESO, EstadoPedido.EN_CAMINO]
-            ).count()
-
-            financiero = queryset.filter(estado=EstadoPedido.ENTREGADO).aggregate(
-                ingresos=Sum('total'),
-                comisiones=Sum('comision_proveedor')
-            )
+            total_pedidos = stats['total_pedidos'] or 0
+            pedidos_entregados = stats['pedidos_entregados'] or 0
+            ingresos = stats['ingresos'] or 0
 
-            ticket_promedio = (financiero['ingresos'] / pedidos_entregados) if pedidos_entregados > 0 else 0
+            ticket_promedio = (ingresos / pedidos_entregados) if pedidos_entregados > 0 else 0
             tasa_entrega = (pedidos_entregados / total_pedidos * 100) if total_pedidos > 0 else 0
 
             data = {
@@ -391,10 +459,10 @@ class ReporteProveedorViewSet(viewsets.ReadOnlyModelViewSet):
                 'proveedor_nombre': proveedor.nombre,
                 'total_pedidos': total_pedidos,
                 'pedidos_entregados': pedidos_entregados,
-                'pedidos_cancelados': pedidos_cancelados,
-                'pedidos_activos': pedidos_activos,
-                'ingresos_totales': financiero['ingresos'] or 0,
-                'comisiones_totales': financiero['comisiones'] or 0,
+                'pedidos_cancelados': stats['pedidos_cancelados'] or 0,
+                'pedidos_activos': stats['pedidos_activos'] or 0,
+                'ingresos_totales': ingresos,
+                'comisiones_totales': stats['comisiones'] or 0,
                 'ticket_promedio': round(ticket_promedio, 2),
                 'tasa_entrega': round(tasa_entrega, 2),
             }
@@ -424,9 +492,9 @@ class ReporteProveedorViewSet(viewsets.ReadOnlyModelViewSet):
         formato = request.query_params.get('formato', 'excel')
 
         if formato == 'excel':
-            response = exportar_pedidos_excel(queryset)
+            response = exportar_pedidos_excel(queryset, asincrono=es_asgi(request))
         else:
-            response = exportar_pedidos_csv(queryset)
+            response = exportar_pedidos_csv(queryset, asincrono=es_asgi(request))
 
         logger.info(f"Reporte exportado por proveedor: {request.user.email}")
         return response
@@ -436,7 +504,7 @@ class ReporteProveedorViewSet(viewsets.ReadOnlyModelViewSet):
 # VIEWSET: REPORTES PARA REPARTIDOR
 # ============================================
 
-class ReporteRepartidorViewSet(viewsets.ReadOnlyModelViewSet):
+class ReporteRepartidorViewSet(LecturaReplicaMixin, ExportacionAsincronaMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet para reportes del repartidor
     Solo ve sus propias entregas
@@ -444,6 +512,7 @@ class ReporteRepartidorViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [IsAuthenticated, EsRepartidor]
     serializer_class = PedidoReporteSerializer
     filterset_class = PedidoRepartidorFilter
+    ambito_reporte = AmbitoReporte.REPARTIDOR
 
     def get_queryset(self):
         """
@@ -492,34 +561,20 @@ class ReporteRepartidorViewSet(viewsets.ReadOnlyModelViewSet):
             
         try:
             repartidor = request.user.repartidor
-            hoy = timezone.now().date()
-            primer_dia_mes = hoy.replace(day=1)
-
-            queryset = Pedido.objects.filter(repartidor=repartidor)
-
-            total_entregas = queryset.filter(estado=EstadoPedido.ENTREGADO).count()
-            entregas_hoy = queryset.filter(estado=EstadoPedido.ENTREGADO, creado_en__date=hoy).count()
-            entregas_mes = queryset.filter(estado=EstadoPedido.ENTREGADO, creado_en__date__gte=primer_dia_mes).count()
-
-            comisiones = queryset.filter(estado=EstadoPedido.ENTREGADO).aggregate(
-                total=Sum('comision_repartidor'),
-                hoy=Sum('comision_repartidor', filter=Q(creado_en__date=hoy)),
-                mes=Sum('comision_repartidor', filter=Q(creado_en__date__gte=primer_dia_mes))
-            )
+            stats = MetricasPedidosService.estadisticas_repartidor(repartidor)
 
-            ticket_promedio = queryset.filter(estado=EstadoPedido.ENTREGADO).aggregate(
-                promedio=Avg('total')
-            )['promedio'] or 0
+            total_entregas = stats['total_entregas'] or 0
+            ticket_promedio = (stats['ingresos'] or 0) / total_entregas if total_entregas > 0 else 0
 
             data = {
                 'repartidor_id': repartidor.id,
                 'repartidor_nombre': repartidor.user.get_full_name(),
                 'total_entregas': total_entregas,
-                'entregas_hoy': entregas_hoy,
-                'entregas_mes': entregas_mes,
-                'comisiones_totales': comisiones['total'] or 0,
-                'comisiones_hoy': comisiones['hoy'] or 0,
-                'comisiones_mes': comisiones['mes'] or 0,
+                'entregas_hoy': stats['entregas_hoy'] or 0,
+                'entregas_mes': stats['entregas_mes'] or 0,
+                'comisiones_totales': stats['comisiones'] or 0,
+                'comisiones_hoy': stats['comisiones_hoy'] or 0,
+                'comisiones_mes': stats['comisiones_mes'] or 0,
                 'calificacion_promedio': repartidor.calificacion_promedio,
                 'ticket_promedio': round(ticket_promedio, 2),
             }
@@ -549,9 +604,46 @@ class ReporteRepartidorViewSet(viewsets.ReadOnlyModelViewSet):
         formato = request.query_params.get('formato', 'excel')
 
         if formato == 'excel':
-            response = exportar_pedidos_excel(queryset)
+            response = exportar_pedidos_excel(queryset, asincrono=es_asgi(request))
         else:
-            response = exportar_pedidos_csv(queryset)
+            response = exportar_pedidos_csv(queryset, asincrono=es_asgi(request))
 
         logger.info(f"Reporte exportado por repartidor: {request.user.email}")
         return response
+
+
+# ============================================
+# VIEWSET: TRABAJOS DE EXPORTACIÓN
+# ============================================
+
+class TrabajoReporteViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Estado y descarga de las exportaciones asíncronas del usuario
+    """
+    permission_classes = [IsAuthenticated]
+    serializer_class = TrabajoReporteSerializer
+
+    def get_queryset(self):
+        if getattr(self, 'swagger_fake_view', False):
+            return TrabajoReporte.objects.none()
+        return TrabajoReporte.objects.filter(usuario=self.request.user)
+
+    @action(detail=True, methods=['get'])
+    def descargar(self, request, pk=None):
+        """
+        GET /api/reportes/trabajos/{id}/descargar/
+
+        Devuelve el archivo cuando el trabajo está completado
+        """
+        trabajo = self.get_object()
+        if not trabajo.listo:
+            return Response(
+                {'error': 'El reporte aún no está listo', 'estado': trabajo.estado, 'progreso': trabajo.progreso},
+                status=status.HTTP_409_CONFLICT
+            )
+
+        return respuesta_archivo(
+            trabajo.archivo.open('rb'),
+            os.path.basename(trabajo.archivo.name),
+            asincrono=es_asgi(request),
+        )
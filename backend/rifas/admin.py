@@ -421,7 +421,7 @@ class RifaAdmin(admin.ModelAdmin):
         # Confirmar sorteo
         if request.method == 'POST':
             try:
-                resultado = rifa.realizar_sorteo()
+                resultado = rifa.realizar_sorteo(realizado_por=request.user)
 
                 if resultado and not resultado.get('sin_participantes'):
                     premios_ganados = resultado.get('premios_ganados', [])
@@ -512,7 +512,7 @@ class RifaAdmin(admin.ModelAdmin):
                 continue
 
             try:
-                resultado = rifa.realizar_sorteo()
+                resultado = rifa.realizar_sorteo(realizado_por=request.user)
                 if resultado and not resultado.get('sin_participantes'):
                     sorteadas += 1
                 else:
@@ -0,0 +1,145 @@
+# rifas/contadores.py
+"""
+Contadores materializados de pedidos entregados por (usuario, mes).
+
+Viven en la caché (Redis) y alimentan `Rifa.usuario_es_elegible`, así que
+la elegibilidad y el banner de la rifa cuestan una lectura. Un pedido que
+pasa a ENTREGADO suma 1 al contador del cliente y del repartidor en el mes
+de entrega; cualquier otro cambio sobre un pedido entregado (cancelación,
+corrección de fecha o de actores, borrado) invalida los contadores
+afectados y la siguiente lectura los reconstruye con un COUNT exacto.
+
+Los ajustes se aplican al confirmar la transacción del pedido: antes del
+commit una lectura concurrente reconstruiría con el estado anterior, y un
+rollback dejaría el contador sumado.
+"""
+
+import logging
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+logger = logging.getLogger('rifas')
+
+# Acota la deriva por updates masivos que no disparan señales
+CONTADOR_TTL_SEGUNDOS = 60 * 60 * 12
+
+# Campos de Pedido que afectan a los contadores
+CAMPOS_RELEVANTES = {'estado', 'fecha_entregado', 'cliente', 'repartidor'}
+
+
+def _key(user_id, anio, mes):
+    return f"rifas:entregados:{user_id}:{anio}{mes:02d}"
+
+
+def _mes(fecha):
+    local = timezone.localtime(fecha)
+    return local.year, local.month
+
+
+def obtener(usuario_id, rifa):
+    """Pedidos entregados del usuario en el mes de la rifa (como cliente o repartidor)."""
+    from pedidos.models import EstadoPedido, Pedido
+    from .sorteo import filtro_mes
+
+    anio, mes = rifa.anio or rifa.fecha_inicio.year, rifa.mes or rifa.fecha_inicio.month
+    key = _key(usuario_id, anio, mes)
+    valor = cache.get(key)
+    if valor is not None:
+        return max(0, valor)
+
+    valor = Pedido.objects.filter(
+        Q(cliente__user_id=usuario_id) | Q(repartidor__user_id=usuario_id),
+        estado=EstadoPedido.ENTREGADO,
+    ).filter(filtro_mes(rifa)).count()
+    # add: no pisa un contador reconstruido (y quizá ya incrementado) por
+    # otra lectura mientras se contaba
+    cache.add(key, valor, CONTADOR_TTL_SEGUNDOS)
+    return valor
+
+
+# ============================================
+# MANTENIMIENTO DESDE PEDIDOS
+# ============================================
+
+def afecta_contadores(update_fields):
+    return update_fields is None or bool(CAMPOS_RELEVANTES & {c.removesuffix('_id') for c in update_fields})
+
+
+def estado_desde_pedido(pedido):
+    """Campos del pedido que afectan a los contadores (ver CAMPOS_RELEVANTES)."""
+    return {
+        'estado': pedido.estado,
+        'fecha_entregado': pedido.fecha_entregado,
+        'creado_en': pedido.creado_en,
+        'actualizado_en': pedido.actualizado_en,
+        'cliente__user_id': pedido.cliente.user_id if pedido.cliente_id else None,
+        'repartidor__user_id': pedido.repartidor.user_id if pedido.repartidor_id else None,
+    }
+
+
+def _usuarios(estado):
+    return {estado[c] for c in ('cliente__user_id', 'repartidor__user_id') if estado[c]}
+
+
+def _meses(estado):
+    """Meses en los que el pedido puede contar (ver sorteo.filtro_mes)."""
+    if estado['fecha_entregado']:
+        return {_mes(estado['fecha_entregado'])}
+    return {_mes(f) for f in (estado['creado_en'], estado['actualizado_en']) if f}
+
+
+def _keys(estado):
+    return [_key(u, anio, mes) for u in _usuarios(estado) for anio, mes in _meses(estado)]
+
+
+def registrar_cambio(anterior, nuevo):
+    """
+    Ajusta los contadores según el estado del pedido antes y después del
+    cambio (`None` = no existía / fue eliminado). Los ajustes se aplican al
+    confirmar la transacción en curso.
+    """
+    from pedidos.models import EstadoPedido
+
+    contaba = bool(anterior) and anterior['estado'] == EstadoPedido.ENTREGADO
+    cuenta = bool(nuevo) and nuevo['estado'] == EstadoPedido.ENTREGADO
+    if not contaba and not cuenta:
+        return
+
+    if cuenta and not contaba and nuevo['fecha_entregado']:
+        # Entrega nueva: +1 solo sobre contadores existentes; si no existe,
+        # la próxima lectura lo reconstruye con el valor exacto
+        keys = _keys(nuevo)
+        transaction.on_commit(lambda: _incrementar(keys))
+        return
+
+    if contaba and cuenta and nuevo['fecha_entregado'] and all(
+        anterior[c] == nuevo[c] for c in ('fecha_entregado', 'cliente__user_id', 'repartidor__user_id')
+    ):
+        return
+
+    keys = list(set(_keys(anterior) if contaba else []) | set(_keys(nuevo) if cuenta else []))
+    if keys:
+        transaction.on_commit(lambda: _invalidar(keys))
+
+
+# La caché nunca debe romper el commit del pedido: ante un fallo la entrada
+# expira y la siguiente lectura la reconstruye
+
+def _incrementar(keys):
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            pass
+        except Exception as e:
+            logger.error(f"Error incrementando el contador de rifa {key}: {e}")
+
+
+def _invalidar(keys):
+    try:
+        cache.delete_many(keys)
+    except Exception as e:
+        logger.error(f"Error invalidando contadores de rifa {keys}: {e}")
@@ -0,0 +1,54 @@
+# Generated by Django 5.1.7 on 2026-10-19 04:25
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rifas', '0004_alter_premio_estado'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PadronRifa',
+            fields=[
+                ('rifa', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='padron', serialize=False, to='rifas.rifa', verbose_name='Rifa')),
+                ('usuarios', models.BinaryField(default=bytes)),
+                ('pedidos', models.BinaryField(default=bytes)),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Elegibles')),
+                ('huella', models.CharField(max_length=64, verbose_name='Huella SHA-256')),
+                ('calculado_en', models.DateTimeField(verbose_name='Calculado En')),
+            ],
+            options={
+                'verbose_name': 'Padrón de Rifa',
+                'verbose_name_plural': 'Padrones de Rifas',
+                'db_table': 'rifas_padrones',
+            },
+        ),
+        migrations.CreateModel(
+            name='SorteoRifa',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('semilla', models.CharField(max_length=64, verbose_name='Semilla')),
+                ('ponderado', models.BooleanField(default=False, verbose_name='Ponderado por pedidos')),
+                ('algoritmo', models.CharField(max_length=50, verbose_name='Algoritmo')),
+                ('participantes', models.PositiveIntegerField(verbose_name='Participantes en el pool')),
+                ('pool', models.BinaryField(help_text='zlib(user_ids int64 + pesos int32)')),
+                ('huella', models.CharField(max_length=64, verbose_name='Huella SHA-256 del pool')),
+                ('ganadores', models.JSONField(default=list, help_text='[{posicion, usuario_id}]')),
+                ('realizado_en', models.DateTimeField(auto_now_add=True, verbose_name='Fecha del Sorteo')),
+                ('realizado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sorteos_realizados', to=settings.AUTH_USER_MODEL, verbose_name='Realizado Por')),
+                ('rifa', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='sorteo', to='rifas.rifa', verbose_name='Rifa')),
+            ],
+            options={
+                'verbose_name': 'Sorteo',
+                'verbose_name_plural': 'Sorteos',
+                'db_table': 'rifas_sorteos',
+            },
+        ),
+    ]
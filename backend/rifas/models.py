@@ -14,11 +14,9 @@ FUNCIONALIDAD:
 from django.db import models
 from django.utils import timezone
 from django.core.exceptions import ValidationError
-from django.db.models import Q, Count
+from django.db.models import Q
 from authentication.models import User
-from pedidos.models import Pedido, EstadoPedido
 import uuid
-import random
 import logging
 from datetime import datetime, timedelta
 
@@ -244,46 +242,14 @@ class Rifa(models.Model):
 
     def obtener_participantes_elegibles(self):
         """
-        Obtiene usuarios elegibles para participar
+        Obtiene los usuarios elegibles para participar (recalcula el padrón)
 
         Returns:
-            QuerySet: Usuarios con pedidos mínimos entregados
+            array: user_ids ordenados con los pedidos mínimos entregados en el mes
         """
-        rango_inicio, rango_fin = self._rango_pedidos_mes()
-        rango_entregado = Q(
-            perfil__pedidos__fecha_entregado__gte=rango_inicio,
-            perfil__pedidos__fecha_entregado__lte=rango_fin,
-        )
-        rango_fallback = Q(
-            perfil__pedidos__fecha_entregado__isnull=True,
-            perfil__pedidos__actualizado_en__gte=rango_inicio,
-            perfil__pedidos__actualizado_en__lte=rango_fin,
-        )
-        rango_creado = Q(
-            perfil__pedidos__fecha_entregado__isnull=True,
-            perfil__pedidos__creado_en__gte=rango_inicio,
-            perfil__pedidos__creado_en__lte=rango_fin,
-        )
-        usuarios_elegibles = (
-            User.objects.filter(
-                rol_activo=User.RolChoices.CLIENTE,
-                is_active=True,
-                cuenta_desactivada=False,
-            )
-            .annotate(
-                pedidos_completados=Count(
-                    "perfil__pedidos",
-                    filter=Q(
-                        perfil__pedidos__estado=EstadoPedido.ENTREGADO
-                    )
-                    & (rango_entregado | rango_fallback | rango_creado),
-                )
-            )
-            .filter(pedidos_completados__gte=self.pedidos_minimos)
-            .distinct()
-        )
-
-        return usuarios_elegibles
+        from .sorteo import calcular_padron
+
+        return calcular_padron(self).ids()
 
     def obtener_participaciones(self):
         """
@@ -304,27 +270,10 @@ class Rifa(models.Model):
         Returns:
             dict: {'elegible': bool, 'pedidos': int, 'faltantes': int}
         """
-        rango_inicio, rango_fin = self._rango_pedidos_mes()
-        rango_entregado = Q(
-            fecha_entregado__gte=rango_inicio,
-            fecha_entregado__lte=rango_fin,
-        )
-        rango_fallback = Q(
-            fecha_entregado__isnull=True,
-            actualizado_en__gte=rango_inicio,
-            actualizado_en__lte=rango_fin,
-        )
-        rango_creado = Q(
-            fecha_entregado__isnull=True,
-            creado_en__gte=rango_inicio,
-            creado_en__lte=rango_fin,
-        )
-        # Contar pedidos entregados en el rango
-        filtro_usuario = Q(cliente__user=usuario) | Q(repartidor__user=usuario)
-        pedidos_completados = Pedido.objects.filter(
-            filtro_usuario,
-            estado=EstadoPedido.ENTREGADO,
-        ).filter(rango_entregado | rango_fallback | rango_creado).count()
+        from . import contadores
+
+        # Pedidos entregados en el mes (contador en caché, mantenido por señales)
+        pedidos_completados = contadores.obtener(usuario.id, self)
 
         faltantes = max(0, self.pedidos_minimos - pedidos_completados)
 
@@ -357,84 +306,23 @@ class Rifa(models.Model):
             ),
         }
 
-    def realizar_sorteo(self):
+    def realizar_sorteo(self, ponderado=False, semilla=None, realizado_por=None):
         """
         Realiza el sorteo y selecciona ganadores para cada premio
-        Los premios se sortean del menor al mayor (3ro, 2do, 1ro)
+        Los premios se asignan del 1ro en adelante: con menos participantes
+        que premios quedan sin ganador los de menor rango
+
+        Args:
+            ponderado (bool): Probabilidad proporcional a los pedidos del mes
+            semilla (str): Semilla del RNG (se genera si no se indica)
+            realizado_por (User): Admin que ejecuta el sorteo
 
         Returns:
-            dict: {'premios_ganados': list, 'sin_participantes': bool}
+            dict: {'premios_ganados': list, 'sin_participantes': bool, 'sorteo': SorteoRifa}
         """
-        if self.estado != EstadoRifa.ACTIVA:
-            raise ValidationError("Solo se puede sortear una rifa activa")
-
-        # Verificar que no haya ganadores ya asignados
-        if self.premios.filter(ganador__isnull=False).exists():
-            raise ValidationError("Esta rifa ya tiene ganadores asignados")
-
-        # Obtener participantes registrados
-        participaciones = list(self.obtener_participaciones())
-
-        if not participaciones:
-            logger.warning(
-                f"No hay participantes registrados para la rifa {self.titulo}"
-            )
-            self.estado = EstadoRifa.FINALIZADA
-            self.save()
-            return {"premios_ganados": [], "sin_participantes": True}
-
-        # Obtener premios activos ordenados del 3ro al 1ro
-        premios = self.premios.filter(estado=EstadoPremio.ACTIVO).order_by(
-            "-posicion"
-        )  # 3, 2, 1
-
-        if not premios:
-            raise ValidationError("Esta rifa no tiene premios activos para sortear")
-
-        premios_ganados = []
-        participantes_disponibles = participaciones.copy()
-
-        # Sortear cada premio
-        for premio in premios:
-            if not participantes_disponibles:
-                logger.warning(
-                    f"No hay más participantes para el premio {premio.posicion}"
-                )
-                break
-
-            # Seleccionar ganador aleatorio
-            participacion = random.choice(participantes_disponibles)
-            ganador = participacion.usuario
-            premio.ganador = ganador
-            premio.save()
-
-            # Remover ganador de la lista para que no gane dos veces
-            participantes_disponibles.remove(participacion)
-
-            premios_ganados.append(
-                {
-                    "posicion": premio.posicion,
-                    "descripcion": premio.descripcion,
-                    "ganador": ganador,
-                }
-            )
-
-            # Crear registro de participación
-            if not participacion.ganador:
-                participacion.ganador = True
-                participacion.posicion_premio = premio.posicion
-                participacion.save()
-
-            logger.info(
-                f"Premio {premio.posicion} ({premio.descripcion}) ganado por: "
-                f"{ganador.get_full_name()} ({ganador.email})"
-            )
-
-        # Finalizar rifa
-        self.estado = EstadoRifa.FINALIZADA
-        self.save()
+        from .sorteo import realizar
 
-        return {"premios_ganados": premios_ganados, "sin_participantes": False}
+        return realizar(self, ponderado=ponderado, semilla=semilla, realizado_por=realizado_por)
 
     def cancelar_rifa(self, motivo=None):
         """Cancela la rifa"""
@@ -716,3 +604,97 @@ class Participacion(models.Model):
             self.pedidos_completados = elegibilidad["pedidos"]
 
         super().save(*args, **kwargs)
+
+
+# ============================================
+#  MODELO: PADRÓN Y AUDITORÍA DE SORTEO
+# ============================================
+
+
+class PadronRifa(models.Model):
+    """
+    Usuarios elegibles del mes de la rifa como arrays binarios compactos
+    (ver rifas/sorteo.py): `usuarios` son user_ids int64 ordenados y
+    `pedidos` el conteo int32 de cada uno, en el mismo orden.
+    """
+
+    rifa = models.OneToOneField(
+        Rifa,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="padron",
+        verbose_name="Rifa",
+    )
+
+    usuarios = models.BinaryField(default=bytes)
+    pedidos = models.BinaryField(default=bytes)
+    total = models.PositiveIntegerField(default=0, verbose_name="Elegibles")
+    huella = models.CharField(max_length=64, verbose_name="Huella SHA-256")
+    calculado_en = models.DateTimeField(verbose_name="Calculado En")
+
+    class Meta:
+        db_table = "rifas_padrones"
+        verbose_name = "Padrón de Rifa"
+        verbose_name_plural = "Padrones de Rifas"
+
+    def __str__(self):
+        return f"Padrón {self.rifa.titulo}: {self.total} elegibles"
+
+    def ids(self):
+        from .sorteo import desempaquetar
+
+        if not hasattr(self, "_ids"):
+            self._ids = desempaquetar(self.usuarios)
+        return self._ids
+
+    def conteos(self):
+        from .sorteo import desempaquetar
+
+        if not hasattr(self, "_conteos"):
+            self._conteos = desempaquetar(self.pedidos, "i")
+        return self._conteos
+
+
+class SorteoRifa(models.Model):
+    """
+    Registro auditable de un sorteo: semilla, algoritmo y pool comprimido.
+    Con estos datos `rifas.sorteo.verificar` reproduce a los ganadores.
+    """
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+
+    rifa = models.OneToOneField(
+        Rifa,
+        on_delete=models.CASCADE,
+        related_name="sorteo",
+        verbose_name="Rifa",
+    )
+
+    semilla = models.CharField(max_length=64, verbose_name="Semilla")
+    ponderado = models.BooleanField(default=False, verbose_name="Ponderado por pedidos")
+    algoritmo = models.CharField(max_length=50, verbose_name="Algoritmo")
+    participantes = models.PositiveIntegerField(verbose_name="Participantes en el pool")
+    pool = models.BinaryField(help_text="zlib(user_ids int64 + pesos int32)")
+    huella = models.CharField(max_length=64, verbose_name="Huella SHA-256 del pool")
+    ganadores = models.JSONField(default=list, help_text="[{posicion, usuario_id}]")
+
+    realizado_por = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="sorteos_realizados",
+        verbose_name="Realizado Por",
+    )
+
+    realizado_en = models.DateTimeField(
+        auto_now_add=True, verbose_name="Fecha del Sorteo"
+    )
+
+    class Meta:
+        db_table = "rifas_sorteos"
+        verbose_name = "Sorteo"
+        verbose_name_plural = "Sorteos"
+
+    def __str__(self):
+        return f"Sorteo {self.rifa.titulo} ({self.algoritmo})"
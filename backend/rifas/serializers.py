@@ -895,6 +895,17 @@ class RealizarSorteoSerializer(serializers.Serializer):
         default=False,
         help_text="Permite sorteo manual antes de fecha_fin",
     )
+    ponderado = serializers.BooleanField(
+        required=False,
+        default=False,
+        help_text="Probabilidad proporcional a los pedidos entregados en el mes",
+    )
+    semilla = serializers.CharField(
+        required=False,
+        allow_blank=True,
+        max_length=64,
+        help_text="Semilla pública del RNG (se genera una aleatoria si se omite)",
+    )
 
     def validate_confirmar(self, value):
         """Validar que se confirme el sorteo"""
@@ -1,11 +1,16 @@
 # Crear: rifas/signals.py
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
+from pedidos.models import Pedido
+from pedidos.signals import CAMPOS_CON_ANTERIOR, pedido_anterior
+from . import contadores
 from .models import Rifa, Participacion
 import logging
 
 logger = logging.getLogger('rifas')
 
+CAMPOS_CON_ANTERIOR.update(contadores.CAMPOS_RELEVANTES)
+
 @receiver(post_save, sender=Rifa)
 def rifa_post_save(sender, instance, created, **kwargs):
     """Signal después de guardar rifa"""
@@ -41,7 +46,19 @@ def participacion_pre_save(sender, instance, **kwargs):
         instance._ganador_prev = False
 
 
-def _notificar_ganador_rifa(participacion):
+def _etiqueta_posicion(posicion):
+    return (
+        f"{posicion}er lugar"
+        if posicion == 1
+        else f"{posicion}do lugar"
+        if posicion == 2
+        else f"{posicion}er lugar"
+        if posicion == 3
+        else ""
+    )
+
+
+def _notificar_ganador_rifa(participacion, email=True):
     usuario = participacion.usuario
     rifa = participacion.rifa
     premio = None
@@ -49,15 +66,7 @@ def _notificar_ganador_rifa(participacion):
         premio = rifa.premios.filter(posicion=participacion.posicion_premio).first()
 
     premio_desc = premio.descripcion if premio else "Premio"
-    posicion = (
-        f"{participacion.posicion_premio}er lugar"
-        if participacion.posicion_premio == 1
-        else f"{participacion.posicion_premio}do lugar"
-        if participacion.posicion_premio == 2
-        else f"{participacion.posicion_premio}er lugar"
-        if participacion.posicion_premio == 3
-        else ""
-    )
+    posicion = _etiqueta_posicion(participacion.posicion_premio)
 
     titulo = "Ganaste la rifa"
     mensaje = (
@@ -85,14 +94,85 @@ def _notificar_ganador_rifa(participacion):
     except Exception as e:
         logger.error(f"Error enviando push de rifa: {e}", exc_info=True)
 
+    if not email:
+        return
+
     try:
-        from authentication.email_utils import EmailService
+        from authentication.email_utils import encolar_email
 
-        EmailService.enviar_rifa_ganada(
-            user=usuario,
-            rifa=rifa,
-            premio=premio,
+        encolar_email(
+            'rifa_ganada',
+            usuario,
+            rifa_id=str(rifa.id),
+            premio_id=premio.id if premio else None,
             posicion=participacion.posicion_premio,
         )
     except Exception as e:
         logger.error(f"Error enviando email de rifa: {e}", exc_info=True)
+
+
+def notificar_ganadores(rifa, participaciones):
+    """
+    Push a cada ganador del sorteo y un único envío masivo de email para
+    todos (plantilla renderizada una vez, una conexión SMTP).
+    """
+    for participacion in participaciones:
+        _notificar_ganador_rifa(participacion, email=False)
+
+    try:
+        from authentication.email_masivo import crear_campana, encolar_campana
+
+        premios = {p.posicion: p.descripcion for p in rifa.premios.all()}
+        campana = crear_campana(
+            nombre=f"Ganadores rifa {rifa.titulo}",
+            plantilla='authentication/emails/rifa_ganada',
+            asunto='Ganaste la rifa: {{ rifa }}',
+            contexto={'rifa': rifa.titulo},
+            destinatarios=[
+                (p.usuario, {
+                    'premio': premios.get(p.posicion_premio, "Premio"),
+                    'posicion': _etiqueta_posicion(p.posicion_premio),
+                })
+                for p in participaciones
+            ],
+        )
+        encolar_campana(campana)
+    except Exception as e:
+        logger.error(f"Error encolando emails de ganadores de {rifa.titulo}: {e}", exc_info=True)
+
+
+# ============================================
+# CONTADORES DE ELEGIBILIDAD
+# ============================================
+
+@receiver(post_save, sender=Pedido)
+def pedido_actualizar_contadores(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw or not contadores.afecta_contadores(update_fields):
+        return
+    anterior = None
+    if not created:
+        # Pedido leído una sola vez en el pre_save de pedidos.signals
+        previo = pedido_anterior(instance)
+        if previo is None:
+            logger.warning(f"Contadores de rifa sin estado anterior del pedido {instance.pk}")
+            return
+        anterior = contadores.estado_desde_pedido(previo)
+    _actualizar_contadores(instance, anterior)
+
+
+@receiver(post_delete, sender=Pedido)
+def pedido_eliminado_contadores(sender, instance, **kwargs):
+    _actualizar_contadores(instance, eliminado=True)
+
+
+def _actualizar_contadores(pedido, anterior=None, eliminado=False):
+    # La caché nunca debe romper el flujo del pedido: ante un fallo la
+    # entrada expira y la siguiente lectura la reconstruye
+    try:
+        actual = contadores.estado_desde_pedido(pedido)
+        if eliminado:
+            contadores.registrar_cambio(actual, None)
+        else:
+            contadores.registrar_cambio(anterior, actual)
+    except Exception as e:
+        logger.error(f"Error actualizando contadores de rifa del pedido {pedido.pk}: {e}")
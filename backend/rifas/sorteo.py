@@ -0,0 +1,270 @@
+# rifas/sorteo.py
+"""
+Padrón de elegibles y motor de sorteo de rifas.
+
+El padrón de una rifa es la lista ordenada de user_ids que cumplen los
+pedidos mínimos del mes (como cliente o como repartidor), con su conteo de
+pedidos, empaquetada en arrays binarios. Se calcula con dos GROUP BY sobre
+los pedidos entregados del mes en lugar de anotar un COUNT por cada usuario.
+
+El sorteo toma los participantes registrados que siguen en el padrón y
+extrae los ganadores sin reemplazo en una sola pasada:
+- sin ponderar: `Random.sample` sobre los índices del pool
+- ponderado por pedidos: claves u^(1/w) (Efraimidis-Spirakis) y top-k
+
+El RNG se siembra con una semilla que queda registrada en SorteoRifa junto
+al pool comprimido, así que `verificar(sorteo)` reproduce el resultado.
+"""
+
+import hashlib
+import heapq
+import logging
+import random
+import secrets
+import sys
+import zlib
+from array import array
+from bisect import bisect_left
+
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+logger = logging.getLogger('rifas')
+
+ALGORITMO_SIMPLE = 'sample-v1'
+ALGORITMO_PONDERADO = 'efraimidis-spirakis-v1'
+
+
+# ============================================
+# ARRAYS COMPACTOS
+# ============================================
+
+def empaquetar(valores, tipo='q'):
+    """Serializa enteros como array little-endian (portable entre hosts)."""
+    datos = array(tipo, valores)
+    if sys.byteorder != 'little':
+        datos.byteswap()
+    return datos.tobytes()
+
+
+def desempaquetar(contenido, tipo='q'):
+    datos = array(tipo)
+    datos.frombytes(bytes(contenido or b''))
+    if sys.byteorder != 'little':
+        datos.byteswap()
+    return datos
+
+
+def huella(ids, pesos):
+    """sha256 del pool: permite publicar qué se sorteó sin exponer datos personales."""
+    return hashlib.sha256(empaquetar(ids) + empaquetar(pesos, 'i')).hexdigest()
+
+
+# ============================================
+# ELEGIBILIDAD
+# ============================================
+
+def filtro_mes(rifa, prefijo=''):
+    """
+    Q de pedidos que cuentan para el mes de la rifa: entregados dentro del
+    mes o, si no tienen fecha_entregado, actualizados o creados en él.
+    """
+    inicio, fin = rifa._rango_pedidos_mes()
+    p = prefijo
+    return (
+        Q(**{f'{p}fecha_entregado__gte': inicio, f'{p}fecha_entregado__lte': fin})
+        | Q(**{f'{p}fecha_entregado__isnull': True, f'{p}actualizado_en__gte': inicio, f'{p}actualizado_en__lte': fin})
+        | Q(**{f'{p}fecha_entregado__isnull': True, f'{p}creado_en__gte': inicio, f'{p}creado_en__lte': fin})
+    )
+
+
+def conteos_mes(rifa):
+    """
+    {user_id: pedidos entregados en el mes} de los usuarios que cumplen el
+    mínimo, contando pedidos como cliente y como repartidor.
+    """
+    from pedidos.models import EstadoPedido, Pedido
+
+    entregados = Pedido.objects.filter(estado=EstadoPedido.ENTREGADO).filter(filtro_mes(rifa)).order_by()
+    conteos = {}
+    for usuario in ('cliente__user', 'repartidor__user'):
+        # Solo cuentas activas que aceptan participar en sorteos
+        filas = entregados.filter(**{
+            f'{usuario}__is_active': True,
+            f'{usuario}__cuenta_desactivada': False,
+            f'{usuario}__perfil__participa_en_sorteos': True,
+        }).values_list(f'{usuario}_id').annotate(n=Count('id'))
+        for user_id, n in filas.iterator(chunk_size=5000):
+            conteos[user_id] = conteos.get(user_id, 0) + n
+
+    return {uid: n for uid, n in conteos.items() if n >= rifa.pedidos_minimos}
+
+
+def calcular_padron(rifa):
+    """Recalcula y guarda el padrón de la rifa."""
+    from .models import PadronRifa
+
+    conteos = conteos_mes(rifa)
+    ids = sorted(conteos)
+    pedidos = [conteos[uid] for uid in ids]
+    padron, _ = PadronRifa.objects.update_or_create(
+        rifa=rifa,
+        defaults={
+            'usuarios': empaquetar(ids),
+            'pedidos': empaquetar(pedidos, 'i'),
+            'total': len(ids),
+            'huella': huella(ids, pedidos),
+            'calculado_en': timezone.now(),
+        },
+    )
+    logger.info(f"Padrón de rifa {rifa.titulo}: {len(ids)} elegibles")
+    return padron
+
+
+def pedidos_en_padron(padron, user_id):
+    """Pedidos del usuario según el padrón (None si no está)."""
+    ids = padron.ids()
+    i = bisect_left(ids, user_id)
+    if i < len(ids) and ids[i] == user_id:
+        return padron.conteos()[i]
+    return None
+
+
+# ============================================
+# SORTEO
+# ============================================
+
+def seleccionar(ids, pesos, k, semilla, ponderado=False):
+    """
+    Índices ganadores en orden de extracción (sin reemplazo, una pasada).
+    Determinista para (ids, pesos, k, semilla, ponderado).
+    """
+    rng = random.Random(semilla)
+    k = min(k, len(ids))
+    if not ponderado:
+        return rng.sample(range(len(ids)), k)
+
+    # Cada ítem recibe la clave u^(1/w); los k mayores son una muestra
+    # ponderada sin reemplazo, en orden de extracción
+    claves = ((rng.random() ** (1.0 / w), i) for i, w in enumerate(pesos) if w > 0)
+    return [i for _, i in heapq.nlargest(k, claves)]
+
+
+def _pool(rifa, padron):
+    """Participantes registrados que siguen en el padrón, ordenados por user_id."""
+    elegibles = padron.ids()
+    conteos = padron.conteos()
+    registrados = sorted(rifa.participaciones.values_list('usuario_id', flat=True))
+
+    ids, pesos = array('q'), array('i')
+    j = 0
+    for user_id in registrados:
+        j = bisect_left(elegibles, user_id, j)
+        if j < len(elegibles) and elegibles[j] == user_id:
+            ids.append(user_id)
+            pesos.append(conteos[j])
+    return ids, pesos
+
+
+def realizar(rifa, ponderado=False, semilla=None, realizado_por=None):
+    """
+    Sortea los premios activos de la rifa y la finaliza. El primer extraído
+    gana el 1er premio, así los premios mayores nunca quedan desiertos.
+
+    Returns:
+        dict: {'premios_ganados': list, 'sin_participantes': bool, 'sorteo': SorteoRifa|None}
+    """
+    from django.core.exceptions import ValidationError
+
+    from .models import EstadoPremio, EstadoRifa, Participacion, Premio, Rifa, SorteoRifa
+
+    with transaction.atomic():
+        # Bloquea la rifa: dos sorteos simultáneos no pasan ambos las validaciones
+        rifa.estado = Rifa.objects.select_for_update().values_list('estado', flat=True).get(pk=rifa.pk)
+        if rifa.estado != EstadoRifa.ACTIVA:
+            raise ValidationError("Solo se puede sortear una rifa activa")
+        if rifa.premios.filter(ganador__isnull=False).exists():
+            raise ValidationError("Esta rifa ya tiene ganadores asignados")
+
+        premios = list(rifa.premios.filter(estado=EstadoPremio.ACTIVO).order_by('posicion'))  # 1, 2, 3
+
+        padron = calcular_padron(rifa)
+        ids, pesos = _pool(rifa, padron)
+
+        if not ids:
+            logger.warning(f"No hay participantes elegibles para la rifa {rifa.titulo}")
+            rifa.estado = EstadoRifa.FINALIZADA
+            rifa.save()
+            return {'premios_ganados': [], 'sin_participantes': True, 'sorteo': None}
+
+        if not premios:
+            raise ValidationError("Esta rifa no tiene premios activos para sortear")
+
+        semilla = semilla or secrets.token_hex(16)
+        indices = seleccionar(ids, pesos, len(premios), semilla, ponderado)
+        if len(indices) < len(premios):
+            logger.warning(f"Rifa {rifa.titulo}: {len(premios) - len(indices)} premios sin participantes suficientes")
+
+        ganadores = {ids[i]: premio for i, premio in zip(indices, premios)}
+        for user_id, premio in ganadores.items():
+            premio.ganador_id = user_id
+        Premio.objects.bulk_update(list(ganadores.values()), ['ganador'])
+
+        participaciones = list(
+            rifa.participaciones.filter(usuario_id__in=list(ganadores)).select_related('usuario')
+        )
+        for participacion in participaciones:
+            participacion.ganador = True
+            participacion.posicion_premio = ganadores[participacion.usuario_id].posicion
+        Participacion.objects.bulk_update(participaciones, ['ganador', 'posicion_premio'])
+
+        sorteo = SorteoRifa.objects.create(
+            rifa=rifa,
+            semilla=semilla,
+            ponderado=ponderado,
+            algoritmo=ALGORITMO_PONDERADO if ponderado else ALGORITMO_SIMPLE,
+            participantes=len(ids),
+            pool=zlib.compress(empaquetar(ids) + empaquetar(pesos, 'i')),
+            huella=huella(ids, pesos),
+            ganadores=[
+                {'posicion': premio.posicion, 'usuario_id': user_id}
+                for user_id, premio in ganadores.items()
+            ],
+            realizado_por=realizado_por,
+        )
+
+        rifa.estado = EstadoRifa.FINALIZADA
+        rifa.save()
+
+        # bulk_update no dispara post_save: notificar explícitamente al confirmar
+        from .signals import notificar_ganadores
+        transaction.on_commit(lambda: notificar_ganadores(rifa, participaciones))
+
+    usuarios = {p.usuario_id: p.usuario for p in participaciones}
+    premios_ganados = []
+    for user_id, premio in ganadores.items():
+        ganador = usuarios[user_id]
+        premios_ganados.append({'posicion': premio.posicion, 'descripcion': premio.descripcion, 'ganador': ganador})
+        logger.info(
+            f"Premio {premio.posicion} ({premio.descripcion}) ganado por: "
+            f"{ganador.get_full_name()} ({ganador.email})"
+        )
+
+    logger.info(f"Sorteo de {rifa.titulo}: semilla={semilla} pool={len(ids)} huella={sorteo.huella[:12]}")
+    return {'premios_ganados': premios_ganados, 'sin_participantes': False, 'sorteo': sorteo}
+
+
+def verificar(sorteo):
+    """Repite el sorteo con la semilla y el pool guardados; True si coincide."""
+    datos = zlib.decompress(bytes(sorteo.pool))
+    n = sorteo.participantes
+    ids = desempaquetar(datos[:n * 8])
+    pesos = desempaquetar(datos[n * 8:], 'i')
+    if huella(ids, pesos) != sorteo.huella:
+        return False
+
+    posiciones = sorted(g['posicion'] for g in sorteo.ganadores)
+    indices = seleccionar(ids, pesos, len(posiciones), sorteo.semilla, sorteo.ponderado)
+    esperado = {(p, ids[i]) for p, i in zip(posiciones, indices)}
+    return esperado == {(g['posicion'], g['usuario_id']) for g in sorteo.ganadores}
@@ -1,13 +1,19 @@
 from datetime import timedelta
+from unittest import mock
 from django.utils import timezone
 from django.urls import reverse
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
 from rest_framework.test import APITestCase
 
+from authentication.models import CampanaEmail
 from pedidos.models import Pedido, EstadoPedido
-from .models import Rifa, Premio, EstadoRifa, Participacion
+from . import contadores, sorteo as motor
+from .models import Rifa, Premio, EstadoRifa, Participacion, SorteoRifa
 
 User = get_user_model()
 
@@ -16,6 +22,7 @@ class RifaModelTest(APITestCase):
     """Pruebas de negocio en el modelo Rifa."""
 
     def setUp(self):
+        cache.clear()
         self.admin = User.objects.create_superuser(
             email="admin@app.com",
             username="admin",
@@ -62,29 +69,31 @@ class RifaModelTest(APITestCase):
             rol_activo=User.RolChoices.CLIENTE,
         )
         # Dos pedidos entregados: no elegible aún
-        Pedido.objects.create(
-            cliente=cliente.perfil,
-            estado=EstadoPedido.ENTREGADO,
-            fecha_entregado=self.fecha_inicio + timedelta(hours=1),
-            total=10,
-        )
-        Pedido.objects.create(
-            cliente=cliente.perfil,
-            estado=EstadoPedido.ENTREGADO,
-            fecha_entregado=self.fecha_inicio + timedelta(hours=2),
-            total=12,
-        )
+        with self.captureOnCommitCallbacks(execute=True):
+            Pedido.objects.create(
+                cliente=cliente.perfil,
+                estado=EstadoPedido.ENTREGADO,
+                fecha_entregado=self.fecha_inicio + timedelta(hours=1),
+                total=10,
+            )
+            Pedido.objects.create(
+                cliente=cliente.perfil,
+                estado=EstadoPedido.ENTREGADO,
+                fecha_entregado=self.fecha_inicio + timedelta(hours=2),
+                total=12,
+            )
         eleg = rifa.usuario_es_elegible(cliente)
         self.assertFalse(eleg["elegible"])
         self.assertEqual(eleg["faltantes"], 1)
 
         # Tercer pedido: ahora elegible
-        Pedido.objects.create(
-            cliente=cliente.perfil,
-            estado=EstadoPedido.ENTREGADO,
-            fecha_entregado=self.fecha_inicio + timedelta(hours=3),
-            total=8,
-        )
+        with self.captureOnCommitCallbacks(execute=True):
+            Pedido.objects.create(
+                cliente=cliente.perfil,
+                estado=EstadoPedido.ENTREGADO,
+                fecha_entregado=self.fecha_inicio + timedelta(hours=3),
+                total=8,
+            )
         eleg = rifa.usuario_es_elegible(cliente)
         self.assertTrue(eleg["elegible"])
         self.assertEqual(eleg["pedidos"], 3)
@@ -118,20 +127,173 @@ class RifaModelTest(APITestCase):
                 pedidos_completados=3,
             )
 
-        resultado = rifa.realizar_sorteo()
+        from authentication import tasks
+
+        with mock.patch.object(tasks.enviar_campana_email, "delay") as enviar, \
+                self.captureOnCommitCallbacks(execute=True):
+            resultado = rifa.realizar_sorteo()
         self.assertFalse(resultado["sin_participantes"])
         self.assertEqual(len(resultado["premios_ganados"]), 3)
+        # Un solo envío masivo de email para todos los ganadores
+        campana = CampanaEmail.objects.get()
+        self.assertEqual(campana.envios.count(), 3)
+        enviar.assert_called_once()
         # La rifa debe quedar finalizada
         rifa.refresh_from_db()
         self.assertEqual(rifa.estado, EstadoRifa.FINALIZADA)
         # Registrar participaciones como ganadores
         self.assertEqual(Participacion.objects.filter(rifa=rifa, ganador=True).count(), 3)
 
+        # Ganadores distintos, registrados en bloque y sorteo reproducible
+        ganadores = set(rifa.premios.values_list("ganador_id", flat=True))
+        self.assertEqual(len(ganadores), 3)
+        sorteo = SorteoRifa.objects.get(rifa=rifa)
+        self.assertEqual(sorteo.participantes, 4)
+        self.assertTrue(motor.verificar(sorteo))
+
+    def test_menos_participantes_que_premios_gana_el_primero(self):
+        rifa = self._crear_rifa(pedidos_minimos=2)
+        for posicion in (1, 2, 3):
+            Premio.objects.create(rifa=rifa, posicion=posicion, descripcion=f"Premio {posicion}")
+        u = self._cliente_con_pedidos(1, 2)
+        Participacion.objects.create(rifa=rifa, usuario=u, pedidos_completados=2)
+
+        resultado = rifa.realizar_sorteo()
+        self.assertEqual([p["posicion"] for p in resultado["premios_ganados"]], [1])
+        self.assertEqual(rifa.premios.get(posicion=1).ganador, u)
+        self.assertTrue(motor.verificar(resultado["sorteo"]))
+
+        # La rifa ya no está activa: un segundo sorteo se rechaza
+        with self.assertRaises(ValidationError):
+            Rifa.objects.get(pk=rifa.pk).realizar_sorteo()
+
+    def _cliente_con_pedidos(self, indice, pedidos):
+        u = User.objects.create_user(
+            email=f"padron{indice}@app.com",
+            username=f"padron{indice}",
+            password="pass123",
+            rol_activo=User.RolChoices.CLIENTE,
+        )
+        for h in range(pedidos):
+            Pedido.objects.create(
+                cliente=u.perfil,
+                estado=EstadoPedido.ENTREGADO,
+                fecha_entregado=self.fecha_inicio + timedelta(minutes=h),
+                total=5,
+            )
+        return u
+
+    def test_padron_agrupa_pedidos_del_mes(self):
+        rifa = self._crear_rifa(pedidos_minimos=2)
+        elegible = self._cliente_con_pedidos(1, 3)
+        self._cliente_con_pedidos(2, 1)
+        sin_sorteos = self._cliente_con_pedidos(3, 2)
+        sin_sorteos.perfil.participa_en_sorteos = False
+        sin_sorteos.perfil.save()
+
+        self.assertEqual(list(rifa.obtener_participantes_elegibles()), [elegible.pk])
+        padron = rifa.padron
+        self.assertEqual(motor.pedidos_en_padron(padron, elegible.pk), 3)
+        self.assertIsNone(motor.pedidos_en_padron(padron, sin_sorteos.pk))
+
+    def test_seleccion_determinista_sin_reemplazo(self):
+        ids = list(range(1000))
+        pesos = [1 + (i % 5) for i in ids]
+        for ponderado in (False, True):
+            a = motor.seleccionar(ids, pesos, 3, "semilla-publica", ponderado)
+            b = motor.seleccionar(ids, pesos, 3, "semilla-publica", ponderado)
+            self.assertEqual(a, b)
+            self.assertEqual(len(set(a)), 3)
+        self.assertNotEqual(
+            motor.seleccionar(ids, pesos, 3, "otra", False),
+            motor.seleccionar(ids, pesos, 3, "semilla-publica", False),
+        )
+
+    def test_sorteo_ponderado_con_semilla_excluye_no_elegibles(self):
+        rifa = self._crear_rifa(pedidos_minimos=2)
+        Premio.objects.create(rifa=rifa, posicion=1, descripcion="Premio 1")
+        elegibles = [self._cliente_con_pedidos(i, 2 + i) for i in range(3)]
+        for u in elegibles:
+            Participacion.objects.create(rifa=rifa, usuario=u, pedidos_completados=2)
+        # Registrado pero ya sin pedidos suficientes en el mes
+        caido = self._cliente_con_pedidos(9, 1)
+        Participacion.objects.create(rifa=rifa, usuario=caido, pedidos_completados=2)
+
+        resultado = rifa.realizar_sorteo(ponderado=True, semilla="abc123")
+        sorteo = resultado["sorteo"]
+        self.assertEqual(sorteo.semilla, "abc123")
+        self.assertEqual(sorteo.algoritmo, motor.ALGORITMO_PONDERADO)
+        self.assertEqual(sorteo.participantes, 3)
+        self.assertIn(resultado["premios_ganados"][0]["ganador"], elegibles)
+        self.assertTrue(motor.verificar(sorteo))
+
+        # Alterar el resultado registrado rompe la verificación
+        sorteo.ganadores = [{"posicion": 1, "usuario_id": caido.pk}]
+        self.assertFalse(motor.verificar(sorteo))
+
+    def test_contador_elegibilidad_incremental(self):
+        rifa = self._crear_rifa(pedidos_minimos=2)
+        cliente = User.objects.create_user(
+            email="contador@app.com", username="contador", password="pass123",
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            entregado = Pedido.objects.create(
+                cliente=cliente.perfil, estado=EstadoPedido.ENTREGADO,
+                fecha_entregado=self.fecha_inicio + timedelta(hours=1), total=10,
+            )
+        self.assertEqual(rifa.usuario_es_elegible(cliente)["pedidos"], 1)
+
+        # La entrega suma sobre el contador: la lectura no vuelve a contar
+        pendiente = Pedido.objects.create(cliente=cliente.perfil, estado=EstadoPedido.EN_CAMINO, total=5)
+        pendiente.estado = EstadoPedido.ENTREGADO
+        pendiente.fecha_entregado = self.fecha_inicio + timedelta(hours=2)
+        with self.captureOnCommitCallbacks(execute=True):
+            pendiente.save()
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(contadores.obtener(cliente.id, rifa), 2)
+        self.assertEqual(len(consultas), 0)
+        self.assertTrue(rifa.usuario_es_elegible(cliente)["elegible"])
+
+        # Cancelación y corrección de fecha invalidan y se reconstruye el valor exacto
+        entregado.estado = EstadoPedido.CANCELADO
+        with self.captureOnCommitCallbacks(execute=True):
+            entregado.save()
+        self.assertEqual(rifa.usuario_es_elegible(cliente)["pedidos"], 1)
+
+        pendiente.fecha_entregado = self.fecha_inicio + timedelta(days=62)
+        with self.captureOnCommitCallbacks(execute=True):
+            pendiente.save(update_fields=["fecha_entregado"])
+        self.assertEqual(rifa.usuario_es_elegible(cliente)["pedidos"], 0)
+
+    def test_contador_solo_cambia_al_confirmar(self):
+        rifa = self._crear_rifa(pedidos_minimos=1)
+        cliente = User.objects.create_user(
+            email="commit@app.com", username="commit", password="pass123",
+        )
+        self.assertEqual(contadores.obtener(cliente.id, rifa), 0)
+
+        # Sin commit (rollback) el contador no suma
+        pedido = Pedido.objects.create(cliente=cliente.perfil, estado=EstadoPedido.EN_CAMINO, total=5)
+        pedido.estado = EstadoPedido.ENTREGADO
+        pedido.fecha_entregado = self.fecha_inicio + timedelta(hours=1)
+        with self.captureOnCommitCallbacks(execute=False):
+            pedido.save()
+        self.assertEqual(contadores.obtener(cliente.id, rifa), 0)
+
+        # La reconstrucción no pisa un contador que otra lectura ya dejó en caché
+        key = contadores._key(cliente.id, rifa.anio, rifa.mes)
+        cache.delete(key)
+        with mock.patch.object(contadores.cache, "get", return_value=None):
+            cache.set(key, 7)
+            self.assertEqual(contadores.obtener(cliente.id, rifa), 1)
+        self.assertEqual(cache.get(key), 7)
+
 
 class RifaAPIViewTest(APITestCase):
     """Pruebas de API para rifas (listado, rifa activa y sorteo admin)."""
 
     def setUp(self):
+        cache.clear()
         self.admin = User.objects.create_superuser(
             email="admin@app.com",
             username="admin",
@@ -161,12 +323,13 @@ class RifaAPIViewTest(APITestCase):
         self.premio = Premio.objects.create(rifa=self.rifa, posicion=1, descripcion="Premio API")
 
     def _crear_pedido_entregado(self, usuario):
-        Pedido.objects.create(
-            cliente=usuario.perfil,
-            estado=EstadoPedido.ENTREGADO,
-            fecha_entregado=self.fecha_inicio + timedelta(hours=1),
-            total=10,
-        )
+        with self.captureOnCommitCallbacks(execute=True):
+            Pedido.objects.create(
+                cliente=usuario.perfil,
+                estado=EstadoPedido.ENTREGADO,
+                fecha_entregado=self.fecha_inicio + timedelta(hours=1),
+                total=10,
+            )
 
     def test_listado_requiere_auth(self):
         anon = self.client.__class__()
@@ -435,6 +435,8 @@ class RifaViewSet(viewsets.ModelViewSet):
         input_serializer = RealizarSorteoSerializer(data=request.data)
         input_serializer.is_valid(raise_exception=True)
         forzar = input_serializer.validated_data.get("forzar", False)
+        ponderado = input_serializer.validated_data.get("ponderado", False)
+        semilla = input_serializer.validated_data.get("semilla") or None
 
         if (
             rifa.tipo_sorteo == TipoSorteo.MANUAL
@@ -469,7 +471,9 @@ class RifaViewSet(viewsets.ModelViewSet):
 
         # Realizar sorteo
         try:
-            resultado = rifa.realizar_sorteo()
+            resultado = rifa.realizar_sorteo(
+                ponderado=ponderado, semilla=semilla, realizado_por=request.user
+            )
 
             if resultado.get("sin_participantes"):
                 return Response(
@@ -499,6 +503,7 @@ class RifaViewSet(viewsets.ModelViewSet):
                 for p in premios_ganados
             ]
 
+            sorteo = resultado["sorteo"]
             logger.info(
                 f"Sorteo realizado por {request.user.email} "
                 f"para rifa {rifa.titulo} | Premios: {len(premios_ganados)}"
@@ -512,6 +517,12 @@ class RifaViewSet(viewsets.ModelViewSet):
                     "rifa": RifaListSerializer(rifa, context={"request": request}).data,
                     "total_participantes": rifa.total_participantes,
                     "sin_participantes": False,
+                    "auditoria": {
+                        "semilla": sorteo.semilla,
+                        "algoritmo": sorteo.algoritmo,
+                        "participantes_elegibles": sorteo.participantes,
+                        "huella": sorteo.huella,
+                    },
                 }
             )
 
@@ -0,0 +1,5 @@
+# Carga la app de Celery junto con Django para que @shared_task use su
+# configuración (broker, colas) también desde los procesos web.
+from .celery import app as celery_app
+
+__all__ = ('celery_app',)
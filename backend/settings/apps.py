@@ -0,0 +1,9 @@
+# settings/apps.py
+from django.apps import AppConfig
+
+
+class SettingsConfig(AppConfig):
+    """Sin modelos: agrupa los comandos y pruebas de la infraestructura (servidor, Celery, BD)."""
+
+    name = 'settings'
+    verbose_name = 'Infraestructura'
@@ -0,0 +1,67 @@
+# settings/calentamiento.py
+"""
+Calentamiento de la app antes de atender solicitudes.
+
+Lo que Django y DRF cargan de forma perezosa (URLconf con todas las vistas,
+serializers, patrones de rutas compilados, SDK de Firebase) se importa aquí.
+Con `preload_app` en gunicorn.conf.py se ejecuta una vez en el master antes
+del fork, así la primera solicitud de cada worker no paga esas importaciones
+y la memoria se comparte entre workers.
+"""
+
+import importlib
+import importlib.util
+import sys
+import time
+
+import django
+from django.apps import apps
+from django.conf import settings
+from django.db import connections
+from django.urls import get_resolver
+
+
+def _poblar_rutas(resolver):
+    # reverse_dict importa los URLconf incluidos y compila sus patrones
+    resolver.reverse_dict
+    for patron in resolver.url_patterns:
+        if hasattr(patron, 'url_patterns'):
+            _poblar_rutas(patron)
+
+
+def _importar_serializers():
+    raiz = str(settings.BASE_DIR)
+    for app in apps.get_app_configs():
+        if not app.path.startswith(raiz):
+            continue
+        modulo = f"{app.name}.serializers"
+        if importlib.util.find_spec(modulo) is not None:
+            importlib.import_module(modulo)
+
+
+def calentar():
+    """Importa y prepara la app. Retorna {'segundos', 'modulos'} (módulos nuevos)."""
+    inicio = time.perf_counter()
+    modulos = len(sys.modules)
+
+    if not apps.ready:
+        django.setup()
+
+    _poblar_rutas(get_resolver())
+    _importar_serializers()
+
+    # Firebase Admin: módulos del SDK y credenciales (sin llamadas de red)
+    from notificaciones.services import inicializar_firebase
+    inicializar_firebase()
+    importlib.import_module('firebase_admin.messaging')
+
+    # Ninguna conexión abierta aquí (ni el pool) debe heredarse a través del fork
+    connections.close_all()
+    for conexion in connections.all():
+        if conexion.settings_dict['OPTIONS'].get('pool'):
+            conexion.close_pool()
+
+    return {
+        'segundos': time.perf_counter() - inicio,
+        'modulos': len(sys.modules) - modulos,
+    }
@@ -3,7 +3,11 @@
 import os
 import logging
 from celery import Celery
-from celery.signals import task_prerun, task_postrun, task_failure
+from celery.schedules import crontab
+from celery.signals import celeryd_init, task_prerun, task_postrun, task_failure
+from kombu import Queue
+
+from utils import metricas
 
 # Configuración de logger específico para Celery
 logger = logging.getLogger("celery")
@@ -28,15 +32,158 @@ app.conf.update(
     task_default_retry_delay=60,
     task_max_retries=3,
     result_expires=86400,       # 24 horas
-    worker_prefetch_multiplier=4,
+    worker_prefetch_multiplier=4,   # Cola por defecto; cada cola tiene su perfil (abajo)
     worker_max_tasks_per_child=1000,
     timezone='America/Guayaquil',
     enable_utc=True,
     accept_content=['json'],
     task_serializer='json',
     result_serializer='json',
+    # Tareas con acks_late (idempotentes): si el proceso muere a mitad, se reencolan
+    task_reject_on_worker_lost=True,
+)
+
+# ==========================================================
+# COLAS Y ENRUTAMIENTO
+# ==========================================================
+# Un worker por cola (o grupo de colas) para que una campaña de 100k tokens
+# nunca retrase un push en tiempo real:
+#   celery -A settings worker -Q realtime -n realtime@%h
+#   celery -A settings worker -Q notifications-bulk -n bulk@%h
+#   celery -A settings worker -Q reports -n reports@%h
+#   celery -A settings worker -Q maintenance,celery -n maintenance@%h
+# Sin -Q un worker consume todas las colas con la configuración global.
+# -c y --prefetch-multiplier en la línea de comandos tienen prioridad.
+COLA_POR_DEFECTO = 'celery'
+
+# Procesos y prefetch por cola. Prefetch 1: una tarea larga no retiene
+# tareas ya reservadas por el mismo proceso.
+PERFILES_COLA = {
+    'realtime': {'concurrencia': 4, 'prefetch': 1},
+    'notifications-bulk': {'concurrencia': 2, 'prefetch': 1},
+    'reports': {'concurrencia': 2, 'prefetch': 1},
+    'maintenance': {'concurrencia': 1, 'prefetch': 1},
+    COLA_POR_DEFECTO: {'concurrencia': 2, 'prefetch': 4},
+}
+
+RUTAS_TAREAS = {
+    # Push y emails que el usuario espera en segundos
+    'usuarios.tasks.tarea_enviar_notificacion_individual': 'realtime',
+    'usuarios.tasks.procesar_evento_pedido': 'realtime',
+    'authentication.enviar_email': 'realtime',
+    'pedidos.verificar_pedidos_retrasados': 'realtime',
+    'pedidos.verificar_sin_asignar': 'realtime',
+    # Envíos masivos
+    'usuarios.tasks.tarea_enviar_notificacion_masiva': 'notifications-bulk',
+    'usuarios.tasks.tarea_procesar_campana_promocional': 'notifications-bulk',
+    'authentication.enviar_campana_email': 'notifications-bulk',
+    # Reportes y analítica
+    'reportes.generar_trabajo_reporte': 'reports',
+    'reportes.reconstruir_metricas_recientes': 'reports',
+    'reportes.sincronizar_analitica': 'reports',
+    'reportes.reconstruir_analitica': 'reports',
+    'pedidos.generar_reporte_diario': 'reports',
+    # Mantenimiento y volcados periódicos
+    'usuarios.tasks.tarea_mantenimiento_tokens': 'maintenance',
+    'usuarios.tasks.tarea_generar_variantes_imagen': 'maintenance',
+    'usuarios.tasks.tarea_eliminar_variantes_imagen': 'maintenance',
+    'reportes.limpiar_trabajos_expirados': 'maintenance',
+    'productos.flush_contadores': 'maintenance',
+    'productos.recalcular_popularidad': 'maintenance',
+    'productos.persistir_carrito_inactivo': 'maintenance',
+    'calificaciones.reconciliar_resumenes': 'maintenance',
+    'authentication.flush_logins': 'maintenance',
+    'analytics.flush_metricas': 'maintenance',
+    'pedidos.limpieza_pedidos_abandonados': 'maintenance',
+}
+
+app.conf.update(
+    task_queues=[Queue(nombre) for nombre in PERFILES_COLA],
+    task_default_queue=COLA_POR_DEFECTO,
+    task_routes={tarea: {'queue': cola} for tarea, cola in RUTAS_TAREAS.items()},
 )
 
+
+@celeryd_init.connect
+def configurar_worker_por_cola(sender=None, conf=None, options=None, **kwargs):
+    """Concurrencia y prefetch del worker según las colas que consume (-Q)."""
+    colas = (options or {}).get('queues') or []
+    if isinstance(colas, str):
+        colas = colas.split(',')
+    perfiles = [PERFILES_COLA[cola] for cola in colas if cola in PERFILES_COLA]
+    if not perfiles:
+        return
+    conf.worker_concurrency = max(perfil['concurrencia'] for perfil in perfiles)
+    conf.worker_prefetch_multiplier = min(perfil['prefetch'] for perfil in perfiles)
+    logger.info(
+        f"Worker {sender} ({', '.join(colas)}): concurrencia={conf.worker_concurrency} "
+        f"prefetch={conf.worker_prefetch_multiplier}"
+    )
+
+
+@celeryd_init.connect
+def configurar_conexiones_worker(sender=None, **kwargs):
+    """
+    Conexión persistente en lugar del pool web: cada proceso hijo ejecuta
+    una tarea a la vez. Se aplica antes de crear los procesos hijos, que
+    heredan la configuración.
+    """
+    from django.conf import settings
+    from django.db import connections
+
+    # Conexiones o pools abiertos durante el arranque con la configuración web
+    connections.close_all()
+    for conexion in connections.all(initialized_only=True):
+        if hasattr(conexion, 'close_pool'):
+            conexion.close_pool()
+    for alias in connections:
+        ajustes = connections.settings[alias]
+        ajustes['OPTIONS'].pop('pool', None)
+        ajustes['CONN_MAX_AGE'] = settings.CONN_MAX_AGE_WORKER
+    logger.info(f"Worker {sender}: CONN_MAX_AGE={settings.CONN_MAX_AGE_WORKER} sin pool")
+
+# ==========================================================
+# TAREAS PERIÓDICAS
+# ==========================================================
+app.conf.beat_schedule = {
+    'flush-contadores-productos': {
+        'task': 'productos.flush_contadores',
+        'schedule': 60.0,
+    },
+    'recalcular-popularidad-productos': {
+        'task': 'productos.recalcular_popularidad',
+        'schedule': 15 * 60.0,
+    },
+    'reconciliar-resumenes-calificaciones': {
+        'task': 'calificaciones.reconciliar_resumenes',
+        'schedule': crontab(hour=3, minute=30),
+    },
+    'reconstruir-metricas-pedidos': {
+        'task': 'reportes.reconstruir_metricas_recientes',
+        'schedule': crontab(hour=3, minute=45),
+    },
+    'limpiar-trabajos-reporte': {
+        'task': 'reportes.limpiar_trabajos_expirados',
+        'schedule': 60 * 60.0,
+    },
+    'sincronizar-analitica-pedidos': {
+        'task': 'reportes.sincronizar_analitica',
+        'schedule': 5 * 60.0,
+    },
+    'reconstruir-analitica-pedidos': {
+        'task': 'reportes.reconstruir_analitica',
+        'schedule': crontab(hour=4, minute=0),
+    },
+    'flush-metricas-tiempo-real': {
+        'task': 'analytics.flush_metricas',
+        'schedule': 5 * 60.0,
+    },
+    'flush-logins': {
+        'task': 'authentication.flush_logins',
+        'schedule': 60.0,
+    },
+}
+
 # ==========================================================
 # TAREA DE DIAGNÓSTICO
 # ==========================================================
@@ -55,14 +202,17 @@ def debug_task(self):
 # ==========================================================
 @task_prerun.connect
 def task_prerun_handler(task_id=None, task=None, **kwargs):
+    metricas.inicio_tarea(task_id)
     logger.info(f'Iniciando tarea: {task.name} [{task_id}]')
 
 @task_postrun.connect
-def task_postrun_handler(task_id=None, task=None, **kwargs):
+def task_postrun_handler(task_id=None, task=None, state=None, **kwargs):
+    metricas.fin_tarea(task_id, task.name, state)
     logger.info(f'Tarea finalizada: {task.name} [{task_id}]')
 
 @task_failure.connect
-def task_failure_handler(task_id=None, exception=None, traceback=None, **kwargs):
+def task_failure_handler(task_id=None, exception=None, traceback=None, sender=None, **kwargs):
+    metricas.fallo_tarea(getattr(sender, 'name', 'desconocida'))
     logger.error(f'Tarea fallida [{task_id}]: {exception}', exc_info=True)
 
 if __name__ == '__main__':
@@ -0,0 +1,159 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+def _hijos(pid):
+    """PIDs de los procesos hijos de `pid` (recorriendo /proc)."""
+    hijos = []
+    for entrada in os.listdir('/proc'):
+        if not entrada.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entrada}/stat') as f:
+                # El nombre del proceso va entre paréntesis y puede tener espacios
+                campos = f.read().rsplit(')', 1)[1].split()
+        except OSError:
+            continue
+        if int(campos[1]) == pid:
+            hijos.append(int(entrada))
+    return sorted(hijos)
+
+
+def _memoria(pid):
+    """RSS, PSS y USS (privada) en MiB, de /proc/<pid>/smaps_rollup."""
+    valores = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for linea in f:
+            partes = linea.split()
+            if len(partes) >= 2 and partes[0].endswith(':') and partes[1].isdigit():
+                valores[partes[0][:-1]] = int(partes[1])
+    uss = valores.get('Private_Clean', 0) + valores.get('Private_Dirty', 0)
+    return {
+        'rss': valores.get('Rss', 0) / 1024,
+        'pss': valores.get('Pss', 0) / 1024,
+        'uss': uss / 1024,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Arranca gunicorn con gunicorn.conf.py y mide el arranque en frío (hasta la primera '
+        'respuesta de /health/), la memoria del master y de cada worker (RSS, PSS, USS) y el '
+        'tiempo de apagado ordenado. Con --comparar repite la medición sin preload.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--worker-class', default='')
+        parser.add_argument('--solicitudes', type=int, default=50, help='Solicitudes antes de medir memoria')
+        parser.add_argument('--sin-preload', action='store_true')
+        parser.add_argument('--comparar', action='store_true', help='Medir con y sin preload')
+        parser.add_argument('--timeout', type=float, default=60)
+
+    def handle(self, *args, **options):
+        if not os.path.isdir('/proc'):
+            raise CommandError('Requiere Linux (/proc)')
+
+        if options['comparar']:
+            escenarios = [True, False]
+        else:
+            escenarios = [not options['sin_preload']]
+        for preload in escenarios:
+            self._medir(options, preload)
+
+    def _puerto_libre(self):
+        with socket.socket() as s:
+            s.bind(('127.0.0.1', 0))
+            return s.getsockname()[1]
+
+    def _medir(self, options, preload):
+        puerto = self._puerto_libre()
+        url = f'http://127.0.0.1:{puerto}/health/'
+        entorno = {
+            **os.environ,
+            'GUNICORN_PRELOAD': 'true' if preload else 'false',
+            'GUNICORN_WORKERS': str(options['workers']),
+            'GUNICORN_BIND': f'127.0.0.1:{puerto}',
+        }
+        if options['worker_class']:
+            entorno['GUNICORN_WORKER_CLASS'] = options['worker_class']
+
+        comando = [sys.executable, '-m', 'gunicorn', '-c', str(settings.BASE_DIR / 'gunicorn.conf.py')]
+        inicio = time.perf_counter()
+        proceso = subprocess.Popen(
+            comando, cwd=settings.BASE_DIR, env=entorno,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            arranque = self._esperar_respuesta(url, proceso, inicio, options['timeout'])
+            workers = self._esperar_workers(proceso.pid, options['workers'], options['timeout'])
+
+            with httpx.Client() as cliente:
+                latencias = []
+                for _ in range(options['solicitudes']):
+                    t = time.perf_counter()
+                    cliente.get(url)
+                    latencias.append((time.perf_counter() - t) * 1000)
+
+            master = _memoria(proceso.pid)
+            memoria = [(pid, _memoria(pid)) for pid in workers]
+        finally:
+            t = time.perf_counter()
+            proceso.send_signal(signal.SIGTERM)
+            try:
+                proceso.wait(options['timeout'])
+            except subprocess.TimeoutExpired:
+                proceso.kill()
+                proceso.wait()
+            apagado = time.perf_counter() - t
+
+        self._reportar(preload, arranque, latencias, master, memoria, apagado)
+
+    def _esperar_respuesta(self, url, proceso, inicio, timeout):
+        while time.perf_counter() - inicio < timeout:
+            if proceso.poll() is not None:
+                raise CommandError(f'gunicorn terminó al arrancar (código {proceso.returncode})')
+            try:
+                if httpx.get(url, timeout=1).status_code == 200:
+                    return time.perf_counter() - inicio
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.05)
+        raise CommandError(f'Sin respuesta de {url} tras {timeout}s')
+
+    def _esperar_workers(self, pid, cantidad, timeout):
+        limite = time.perf_counter() + timeout
+        while time.perf_counter() < limite:
+            workers = _hijos(pid)
+            if len(workers) >= cantidad:
+                return workers
+            time.sleep(0.1)
+        raise CommandError(f'Solo arrancaron {len(_hijos(pid))} de {cantidad} workers')
+
+    def _reportar(self, preload, arranque, latencias, master, memoria, apagado):
+        latencias.sort()
+        self.stdout.write(self.style.MIGRATE_HEADING(f"preload_app={preload}"))
+        self.stdout.write(f"Arranque en frío hasta la primera respuesta: {arranque:.2f}s")
+        if latencias:
+            self.stdout.write(
+                f"Latencia /health/ tras el arranque: mediana {latencias[len(latencias) // 2]:.1f}ms "
+                f"máx {latencias[-1]:.1f}ms"
+            )
+        self.stdout.write(f"{'proceso':<16}{'RSS MiB':>10}{'PSS MiB':>10}{'USS MiB':>10}")
+        self.stdout.write(f"{'master':<16}{master['rss']:>10.1f}{master['pss']:>10.1f}{master['uss']:>10.1f}")
+        for pid, m in memoria:
+            self.stdout.write(f"{'worker ' + str(pid):<16}{m['rss']:>10.1f}{m['pss']:>10.1f}{m['uss']:>10.1f}")
+        total_pss = master['pss'] + sum(m['pss'] for _, m in memoria)
+        self.stdout.write(
+            f"Total PSS: {total_pss:.1f} MiB | USS medio por worker: "
+            f"{sum(m['uss'] for _, m in memoria) / max(len(memoria), 1):.1f} MiB"
+        )
+        self.stdout.write(f"Apagado ordenado (SIGTERM): {apagado:.2f}s")
@@ -0,0 +1,143 @@
+import asyncio
+import json
+import time
+
+import httpx
+from django.core.management.base import BaseCommand, CommandError
+
+
+DISTANCE_MATRIX = json.dumps({
+    'status': 'OK',
+    'rows': [{'elements': [{'status': 'OK', 'distance': {'value': 4200}, 'duration': {'value': 720}}]}],
+}).encode()
+
+
+class Command(BaseCommand):
+    help = (
+        'Prueba de carga HTTP concurrente contra un servidor en marcha: solicitudes/s, '
+        'latencias p50/p95/p99 y errores. Con --upstream-lento levanta un Distance Matrix '
+        'falso que responde tras N segundos (arrancar el servidor con '
+        'GOOGLE_MAPS_BASE_URL=http://127.0.0.1:<puerto-upstream> y GOOGLE_MAPS_API_KEY '
+        'no vacía) para medir el throughput con servicios externos lentos.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000/api/envios/cotizar/')
+        parser.add_argument('--metodo', default='POST')
+        parser.add_argument(
+            '--json', dest='cuerpo',
+            default='{"lat_destino": -1.3990, "lng_destino": -78.4280, "tipo_servicio": "delivery"}',
+        )
+        parser.add_argument('--token', default='', help='JWT de acceso (Authorization: Bearer)')
+        parser.add_argument('--api-key', default='')
+        parser.add_argument('--concurrencia', type=int, default=50)
+        parser.add_argument('--solicitudes', type=int, default=500)
+        parser.add_argument('--upstream-lento', type=float, default=None, metavar='SEGUNDOS')
+        parser.add_argument('--puerto-upstream', type=int, default=9100)
+
+    def handle(self, *args, **options):
+        try:
+            cuerpo = json.loads(options['cuerpo']) if options['cuerpo'] else None
+        except ValueError as e:
+            raise CommandError(f"--json inválido: {e}")
+
+        headers = {}
+        if options['token']:
+            headers['Authorization'] = f"Bearer {options['token']}"
+        if options['api_key']:
+            headers['X-API-Key'] = options['api_key']
+
+        resultado = asyncio.run(self._ejecutar(options, cuerpo, headers))
+        self._reportar(options, *resultado)
+
+    # ==========================================
+    # UPSTREAM LENTO
+    # ==========================================
+
+    async def _upstream(self, reader, writer, demora):
+        """HTTP/1.1 mínimo con keep-alive: cada respuesta sale tras `demora` segundos."""
+        try:
+            while True:
+                cabecera = await reader.readuntil(b'\r\n\r\n')
+                longitud = 0
+                for linea in cabecera.split(b'\r\n'):
+                    if linea.lower().startswith(b'content-length:'):
+                        longitud = int(linea.split(b':', 1)[1])
+                if longitud:
+                    await reader.readexactly(longitud)
+
+                await asyncio.sleep(demora)
+                writer.write(
+                    b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n'
+                    b'Content-Length: %d\r\n\r\n%s' % (len(DISTANCE_MATRIX), DISTANCE_MATRIX)
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.CancelledError, ConnectionError):
+            # Cliente desconectado o prueba terminada
+            pass
+        finally:
+            writer.close()
+
+    # ==========================================
+    # GENERADOR DE CARGA
+    # ==========================================
+
+    async def _ejecutar(self, options, cuerpo, headers):
+        servidor = None
+        if options['upstream_lento'] is not None:
+            demora = options['upstream_lento']
+            servidor = await asyncio.start_server(
+                lambda r, w: self._upstream(r, w, demora), '127.0.0.1', options['puerto_upstream'],
+            )
+            self.stdout.write(
+                f"Upstream lento en http://127.0.0.1:{options['puerto_upstream']} ({demora}s por respuesta)"
+            )
+
+        pendientes = options['solicitudes']
+        latencias, estados, errores = [], {}, {}
+        limites = httpx.Limits(max_connections=options['concurrencia'], max_keepalive_connections=options['concurrencia'])
+
+        async with httpx.AsyncClient(limits=limites, timeout=120, headers=headers) as cliente:
+            async def trabajador():
+                nonlocal pendientes
+                while pendientes > 0:
+                    pendientes -= 1
+                    inicio = time.perf_counter()
+                    try:
+                        respuesta = await cliente.request(options['metodo'], options['url'], json=cuerpo)
+                    except httpx.HTTPError as e:
+                        nombre = type(e).__name__
+                        errores[nombre] = errores.get(nombre, 0) + 1
+                        continue
+                    latencias.append(time.perf_counter() - inicio)
+                    estados[respuesta.status_code] = estados.get(respuesta.status_code, 0) + 1
+
+            inicio = time.perf_counter()
+            await asyncio.gather(*(trabajador() for _ in range(options['concurrencia'])))
+            total = time.perf_counter() - inicio
+
+        if servidor is not None:
+            servidor.close()
+            await servidor.wait_closed()
+        return total, latencias, estados, errores
+
+    def _reportar(self, options, total, latencias, estados, errores):
+        def percentil(p):
+            if not latencias:
+                return 0.0
+            ordenadas = sorted(latencias)
+            return ordenadas[min(len(ordenadas) - 1, int(len(ordenadas) * p))] * 1000
+
+        completadas = len(latencias)
+        self.stdout.write(
+            f"{options['metodo']} {options['url']} | concurrencia={options['concurrencia']} "
+            f"solicitudes={options['solicitudes']}"
+        )
+        self.stdout.write(f"Duración: {total:.2f}s | {completadas / total:.1f} solicitudes/s")
+        self.stdout.write(
+            f"Latencia ms: p50={percentil(0.50):.0f} p95={percentil(0.95):.0f} "
+            f"p99={percentil(0.99):.0f} max={percentil(1):.0f}"
+        )
+        self.stdout.write(f"Status: {dict(sorted(estados.items()))}")
+        if errores:
+            self.stdout.write(self.style.WARNING(f"Errores de conexión: {errores}"))
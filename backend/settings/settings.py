@@ -10,7 +10,6 @@ import logging
 from pathlib import Path
 from datetime import timedelta
 from dotenv import load_dotenv
-from django.template import context as django_template_context
 
 # ==========================================
 # 1. INICIALIZACIÓN Y ENTORNO
@@ -20,17 +19,6 @@ load_dotenv()
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
-# Parche de compatibilidad para Python 3.10+ y Django antiguo
-try:
-    def _fixed_basecontext_copy(self):
-        duplicate = object.__new__(type(self))
-        duplicate.__dict__ = self.__dict__.copy()
-        duplicate.dicts = self.dicts[:] if hasattr(self, "dicts") else []
-        return duplicate
-    django_template_context.BaseContext.__copy__ = _fixed_basecontext_copy
-except Exception:
-    pass
-
 # ==========================================
 # 2. CONFIGURACIÓN CORE (AUTO-DETECCIÓN)
 # ==========================================
@@ -44,21 +32,22 @@ NGROK_URL = os.getenv("NGROK_URL", "")
 PRODUCTION_FRONTEND = os.getenv("PRODUCTION_FRONTEND", "")
 
 # Prioridad: PRODUCTION_DOMAIN > NGROK_URL
+# MODO_EJECUCION se informa al arrancar el servidor (gunicorn.conf.py)
 if PRODUCTION_DOMAIN:
     # MODO PRODUCCIÓN
     BASE_URL = PRODUCTION_DOMAIN
     FRONTEND_URL = PRODUCTION_FRONTEND if PRODUCTION_FRONTEND else PRODUCTION_DOMAIN
-    print("Modo: PRODUCCIÓN")
+    MODO_EJECUCION = "PRODUCCIÓN"
 elif NGROK_URL:
     # MODO NGROK
     BASE_URL = NGROK_URL
     FRONTEND_URL = NGROK_URL
-    print("Modo: NGROK")
+    MODO_EJECUCION = "NGROK"
 else:
     # MODO DESARROLLO LOCAL
     BASE_URL = ""
     FRONTEND_URL = ""
-    print("Modo: DESARROLLO LOCAL")
+    MODO_EJECUCION = "DESARROLLO LOCAL"
 
 # ALLOWED_HOSTS dinámico
 if BASE_URL:
@@ -137,6 +126,9 @@ INSTALLED_APPS = [
     "administradores.apps.AdministradoresConfig",
     "reportes.apps.ReportesConfig",
     "calificaciones.apps.CalificacionesConfig",
+    "analytics.apps.AnalyticsConfig",
+    "middleware.apps.MiddlewareConfig",
+    "settings.apps.SettingsConfig",
     # "super_categorias.apps.SuperCategoriasConfig",  # TODO: Módulo pendiente de crear
     "legal.apps.LegalConfig",
     # "supermercado.apps.SupermercadoConfig",  # TODO: Módulo pendiente de crear
@@ -149,6 +141,9 @@ SITE_ID = 1
 # ==========================================
 
 MIDDLEWARE = [
+    "middleware.prometheus.PrometheusMiddleware",
+    "middleware.perfilador_sql.PerfiladorSQLMiddleware",
+    "middleware.replica.ReplicaMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -177,15 +172,72 @@ DATABASES = {
         "PASSWORD": os.getenv("POSTGRES_PASSWORD", "password"),
         "HOST": os.getenv("DB_HOST", "localhost"),
         "PORT": os.getenv("DB_PORT", "5432"),
+        # Verifica la conexión antes de reutilizarla (persistente o del pool)
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {},
     }
 }
 
+# Conexiones según el tipo de proceso:
+# - web (gunicorn/uvicorn, runserver): pool de psycopg por proceso. Cada
+#   solicitud toma una conexión abierta y la devuelve al terminar; sin
+#   handshake con Postgres en el camino de la solicitud.
+# - celery (prefork): cada proceso hijo ejecuta una tarea a la vez, así que
+#   basta una conexión persistente (CONN_MAX_AGE_WORKER) en lugar de un pool.
+#   El worker la aplica al arrancar (settings/celery.py, celeryd_init), sea
+#   cual sea el comando que lo lanzó.
+# DB_POOL=False desactiva el pool (p. ej. detrás de PgBouncer en modo
+# transacción): la web abre y cierra la conexión en cada solicitud. Bajo ASGI
+# una conexión persistente quedaría atada a un hilo de sync_to_async.
+CONN_MAX_AGE_WORKER = int(os.getenv("DB_CONN_MAX_AGE", "600"))
+
+if os.getenv("DB_POOL", "True").lower() not in ("true", "1", "yes"):
+    DATABASES["default"]["CONN_MAX_AGE"] = 0
+else:
+    DATABASES["default"]["OPTIONS"]["pool"] = {
+        # Por proceso: con N workers hay hasta N * max_size conexiones
+        "min_size": int(os.getenv("DB_POOL_MIN", "2")),
+        "max_size": int(os.getenv("DB_POOL_MAX", "10")),
+        # Segundos esperando una conexión libre antes de fallar
+        "timeout": float(os.getenv("DB_POOL_TIMEOUT", "10")),
+        # Cierra las conexiones ociosas (por encima de min_size) y recicla las viejas
+        "max_idle": float(os.getenv("DB_POOL_MAX_IDLE", "300")),
+        "max_lifetime": float(os.getenv("DB_POOL_MAX_LIFETIME", "1800")),
+        "name": "web",
+    }
+
+# Réplica de lectura (opcional, DB_REPLICA_HOST): reportes, dashboard y
+# catálogo leen de ella con read-your-writes (utils/replica.py). Sin réplica
+# todo va a "default". En tests es un espejo de "default"; para probar con
+# otra base basta definir DATABASES["replica"] (SQLite o Postgres) sin MIRROR.
+if os.getenv("DB_REPLICA_HOST"):
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "HOST": os.getenv("DB_REPLICA_HOST"),
+        "PORT": os.getenv("DB_REPLICA_PORT", DATABASES["default"]["PORT"]),
+        "USER": os.getenv("DB_REPLICA_USER", DATABASES["default"]["USER"]),
+        "PASSWORD": os.getenv("DB_REPLICA_PASSWORD", DATABASES["default"]["PASSWORD"]),
+        "OPTIONS": {
+            key: ({**valor, "name": "web-replica"} if key == "pool" else valor)
+            for key, valor in DATABASES["default"]["OPTIONS"].items()
+        },
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_ROUTERS = ["utils.replica.RouterReplica"]
+# Segundos que un usuario lee del primario después de escribir (> retraso de replicación)
+REPLICA_PEGADO_SEGUNDOS = int(os.getenv("DB_REPLICA_PEGADO_SEGUNDOS", "15"))
+
 # ==========================================
 # 7. CACHÉ & REDIS
 # ==========================================
 
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 
+# manage.py test: otra base de Redis para no tocar caché, sesiones ni broker de la app
+if sys.argv[1:2] == ["test"]:
+    REDIS_URL = os.getenv("REDIS_TEST_URL", "redis://localhost:6379/15")
+
 CACHES = {
     "default": {
         "BACKEND": "django_redis.cache.RedisCache",
@@ -233,7 +285,8 @@ ACCOUNT_EMAIL_VERIFICATION = "optional"
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        # JWT con principal en caché (authentication/principal.py)
+        "authentication.principal.PrincipalJWTAuthentication",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
@@ -260,6 +313,9 @@ SIMPLE_JWT = {
     "USER_ID_CLAIM": "user_id",
 }
 
+# TTL del principal autenticado en caché (segundos)
+AUTH_PRINCIPAL_TTL = int(os.getenv("AUTH_PRINCIPAL_TTL", "300"))
+
 # ==========================================
 # 11. STATIC, MEDIA & TEMPLATES
 # ==========================================
@@ -300,9 +356,37 @@ EMAIL_USE_TLS = True
 EMAIL_HOST_USER = os.getenv("EMAIL_HOST_USER")
 EMAIL_HOST_PASSWORD = os.getenv("EMAIL_HOST_PASSWORD")
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
+# Los emails salen desde Celery por una conexión SMTP reutilizada (authentication/email_utils.py)
+EMAIL_TIMEOUT = int(os.getenv("EMAIL_TIMEOUT", "10"))
+EMAIL_MENSAJES_POR_CONEXION = int(os.getenv("EMAIL_MENSAJES_POR_CONEXION", "100"))
+# Envíos masivos (authentication/email_masivo.py): ritmo y tamaño de lote
+EMAIL_MASIVO_POR_SEGUNDO = float(os.getenv("EMAIL_MASIVO_POR_SEGUNDO", "10"))
+EMAIL_MASIVO_LOTE = int(os.getenv("EMAIL_MASIVO_LOTE", "100"))
 
 # Google Maps
 GOOGLE_MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY", "")
+GOOGLE_MAPS_BASE_URL = os.getenv("GOOGLE_MAPS_BASE_URL", "https://maps.googleapis.com")
+
+# Clientes HTTP async hacia servicios externos (utils/vistas_async.py)
+HTTP_EXTERNO_TIMEOUT = float(os.getenv("HTTP_EXTERNO_TIMEOUT", "10"))
+HTTP_EXTERNO_MAX_CONEXIONES = int(os.getenv("HTTP_EXTERNO_MAX_CONEXIONES", "100"))
+
+# Prometheus: token Bearer exigido por /metrics (sin token solo responde en DEBUG)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+# Perfilador SQL por solicitud (middleware/perfilador_sql.py): header
+# X-Perfilar-SQL con el token o muestreo de una fracción del tráfico
+PERFILADOR_SQL_TOKEN = os.getenv("PERFILADOR_SQL_TOKEN", "")
+PERFILADOR_SQL_MUESTREO = float(os.getenv("PERFILADOR_SQL_MUESTREO", "0"))
+PERFILADOR_SQL_UMBRAL_N1 = int(os.getenv("PERFILADOR_SQL_UMBRAL_N1", "5"))
+PERFILADOR_SQL_DIRECTORIO = os.getenv("PERFILADOR_SQL_DIRECTORIO", "")
+
+# Log de solicitudes (middleware/log_api_requests.py): JSON por una cola en segundo plano.
+# 4xx/5xx y solicitudes lentas siempre; el resto se muestrea.
+API_LOG_NIVEL = os.getenv("API_LOG_NIVEL", "")
+API_LOG_MUESTREO = float(os.getenv("API_LOG_MUESTREO", "1"))
+API_LOG_LENTO_MS = float(os.getenv("API_LOG_LENTO_MS", "1000"))
+API_LOG_COLA = os.getenv("API_LOG_COLA", "True").lower() in ("true", "1", "yes")
 
 # ==========================================
 # 13. CONFIGURACIÓN REGIONAL
@@ -0,0 +1,108 @@
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from utils import metricas as prometheus
+
+
+class PoolConexionesTest(SimpleTestCase):
+    """Estadísticas del pool de conexiones de Postgres (utils/metricas.py)."""
+
+    def _muestra(self, nombre, **labels):
+        from prometheus_client import REGISTRY
+        return REGISTRY.get_sample_value(nombre, labels) or 0
+
+    def test_registrar_pool_vuelca_estadisticas(self):
+        from django.db import connections
+
+        pool = mock.Mock()
+        pool.pop_stats.return_value = {
+            'pool_size': 4, 'pool_available': 1, 'requests_waiting': 2,
+            'requests_num': 30, 'requests_queued': 5, 'requests_wait_ms': 1500,
+            'connections_num': 4, 'connections_lost': 1,
+        }
+        solicitudes = self._muestra('db_pool_solicitudes_total', alias='default')
+        perdidas = self._muestra('db_pool_errores_total', alias='default', tipo='perdida')
+
+        with mock.patch.object(type(connections['default']), '_connection_pools', {'default': pool}, create=True):
+            prometheus.registrar_pool(forzar=True)
+            # Dentro del intervalo no vuelve a leer el pool
+            prometheus.registrar_pool()
+
+        pool.pop_stats.assert_called_once()
+        self.assertEqual(self._muestra('db_pool_conexiones', alias='default', estado='abiertas'), 4)
+        self.assertEqual(self._muestra('db_pool_conexiones', alias='default', estado='esperando'), 2)
+        self.assertEqual(self._muestra('db_pool_solicitudes_total', alias='default'), solicitudes + 30)
+        self.assertEqual(self._muestra('db_pool_errores_total', alias='default', tipo='perdida'), perdidas + 1)
+
+
+class CalentamientoTest(SimpleTestCase):
+    """Calentamiento previo al fork de gunicorn (settings/calentamiento.py)."""
+
+    def test_calentar_importa_rutas_y_serializers(self):
+        import sys
+        from django.urls import get_resolver
+        from settings import calentamiento
+
+        with mock.patch.object(calentamiento, 'connections') as conexiones:
+            resumen = calentamiento.calentar()
+
+        conexiones.close_all.assert_called_once()
+        self.assertGreaterEqual(resumen['segundos'], 0)
+        self.assertIn('envios.serializers', sys.modules)
+        self.assertIn('rifas.serializers', sys.modules)
+        self.assertIn('firebase_admin.messaging', sys.modules)
+        # Patrones ya poblados: resolver no vuelve a recorrer los URLconf
+        self.assertTrue(get_resolver()._populated)
+
+
+class ColasCeleryTest(SimpleTestCase):
+    """Enrutamiento por colas y perfil de worker por cola (settings/celery.py)."""
+
+    def _cola(self, tarea):
+        from settings.celery import app
+        return app.amqp.router.route({}, tarea)['queue'].name
+
+    def test_push_en_tiempo_real_y_envios_masivos_en_colas_distintas(self):
+        self.assertEqual(self._cola('usuarios.tasks.tarea_enviar_notificacion_individual'), 'realtime')
+        self.assertEqual(self._cola('authentication.enviar_email'), 'realtime')
+        self.assertEqual(self._cola('usuarios.tasks.tarea_procesar_campana_promocional'), 'notifications-bulk')
+        self.assertEqual(self._cola('authentication.enviar_campana_email'), 'notifications-bulk')
+        self.assertEqual(self._cola('reportes.generar_trabajo_reporte'), 'reports')
+        self.assertEqual(self._cola('usuarios.tasks.tarea_mantenimiento_tokens'), 'maintenance')
+        self.assertEqual(self._cola('debug_task'), 'celery')
+
+    def test_worker_toma_el_perfil_de_su_cola(self):
+        from types import SimpleNamespace
+        from settings.celery import PERFILES_COLA, configurar_worker_por_cola
+
+        conf = SimpleNamespace(worker_concurrency=None, worker_prefetch_multiplier=4)
+        configurar_worker_por_cola(sender='realtime@host', conf=conf, options={'queues': ['realtime']})
+        self.assertEqual(conf.worker_concurrency, PERFILES_COLA['realtime']['concurrencia'])
+        self.assertEqual(conf.worker_prefetch_multiplier, 1)
+
+        # Sin -Q se conserva la configuración global
+        conf = SimpleNamespace(worker_concurrency=None, worker_prefetch_multiplier=4)
+        configurar_worker_por_cola(sender='w@host', conf=conf, options={})
+        self.assertEqual(conf.worker_prefetch_multiplier, 4)
+
+    @override_settings(CONN_MAX_AGE_WORKER=600)
+    def test_worker_usa_conexion_persistente_sin_pool(self):
+        from django.db import connections
+        from settings.celery import configurar_conexiones_worker
+
+        ajustes = connections.settings['default']
+        with mock.patch.dict(ajustes, {'CONN_MAX_AGE': 0}), \
+                mock.patch.dict(ajustes['OPTIONS'], {'pool': {'name': 'web'}}), \
+                mock.patch.object(connections, 'close_all'):
+            # Cualquier comando de arranque (celery, python -m celery) emite celeryd_init
+            configurar_conexiones_worker(sender='w@host')
+            self.assertNotIn('pool', ajustes['OPTIONS'])
+            self.assertEqual(ajustes['CONN_MAX_AGE'], 600)
+
+    def test_tareas_idempotentes_con_ack_tardio(self):
+        from reportes.tasks import generar_trabajo_reporte
+        from usuarios.tasks import tarea_enviar_notificacion_individual
+
+        self.assertTrue(generar_trabajo_reporte.acks_late)
+        self.assertFalse(tarea_enviar_notificacion_individual.acks_late)
@@ -4,7 +4,8 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
-from django.http import JsonResponse
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
+import hmac
 
 # Imports para Documentación (Swagger)
 from rest_framework import permissions
@@ -44,6 +45,24 @@ def health_check(request):
     """Endpoint ligero para balanceadores de carga."""
     return JsonResponse({"status": "ok"})
 
+def metrics(request):
+    """
+    Métricas Prometheus. Exige `Authorization: Bearer <METRICS_TOKEN>`;
+    sin METRICS_TOKEN configurado solo responde en DEBUG.
+    """
+    from utils.metricas import exportar
+
+    token = settings.METRICS_TOKEN
+    if token:
+        recibido = request.META.get("HTTP_AUTHORIZATION", "").removeprefix("Bearer ")
+        if not hmac.compare_digest(recibido.encode(), token.encode()):
+            return HttpResponseForbidden()
+    elif not settings.DEBUG:
+        return HttpResponseForbidden()
+
+    contenido, content_type = exportar()
+    return HttpResponse(contenido, content_type=content_type)
+
 # ==========================================
 # DEFINICIÓN DE RUTAS
 # ==========================================
@@ -51,6 +70,7 @@ urlpatterns = [
     # Sistema
     path("", api_root, name="api-root"),
     path("health/", health_check, name="health-check"),
+    path("metrics", metrics, name="metrics"),
     path("admin/", admin.site.urls),
 
     # Documentación API (Soluciona el 404 en /api/)
@@ -0,0 +1,61 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from utils.imagenes import (
+    CAMPO_GENERADAS,
+    CAMPOS_CON_VARIANTES,
+    generar_variantes,
+    marcar_generadas,
+    ruta_variante,
+    variantes_generadas,
+)
+
+
+class Command(BaseCommand):
+    help = 'Genera derivados (thumb/card/detail en WebP y JPEG) para imágenes ya subidas'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--modelo',
+            choices=sorted(CAMPOS_CON_VARIANTES),
+            help='Procesar solo un modelo (ej: productos.Producto)',
+        )
+        parser.add_argument(
+            '--forzar',
+            action='store_true',
+            help='Regenerar aunque los derivados ya existan',
+        )
+
+    def handle(self, *args, **options):
+        modelos = [options['modelo']] if options['modelo'] else list(CAMPOS_CON_VARIANTES)
+        total = 0
+
+        for etiqueta in modelos:
+            campo = CAMPOS_CON_VARIANTES[etiqueta]
+            Modelo = apps.get_model(etiqueta)
+            queryset = (
+                Modelo.objects.exclude(**{f'{campo}__isnull': True})
+                .exclude(**{campo: ''})
+                .only('pk', campo, CAMPO_GENERADAS)
+            )
+
+            procesados = 0
+            for instancia in queryset.iterator(chunk_size=200):
+                archivo = getattr(instancia, campo)
+                try:
+                    if not options['forzar']:
+                        if variantes_generadas(archivo):
+                            continue
+                        # Derivados de antes de la columna variantes_de: solo se marcan
+                        if archivo.storage.exists(ruta_variante(archivo.name, 'thumb')):
+                            marcar_generadas(archivo)
+                            continue
+                    generar_variantes(archivo)
+                    procesados += 1
+                except Exception as e:
+                    self.stdout.write(self.style.WARNING(f"{etiqueta} {instancia.pk}: {e}"))
+
+            self.stdout.write(f"{etiqueta}: {procesados} imágenes procesadas")
+            total += procesados
+
+        self.stdout.write(self.style.SUCCESS(f"Total: {total} imágenes con derivados generados"))
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-19 06:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0004_alter_solicitudcambiorol_latitud_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='perfil',
+            name='variantes_de',
+            field=models.CharField(blank=True, default='', editable=False, help_text='Foto cuyos derivados (thumb/card/detail) ya se generaron', max_length=255),
+        ),
+    ]
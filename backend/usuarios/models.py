@@ -77,6 +77,10 @@ class Perfil(models.Model):
             validar_tamano_imagen,
         ],
     )
+    variantes_de = models.CharField(
+        max_length=255, blank=True, default="", editable=False,
+        help_text="Foto cuyos derivados (thumb/card/detail) ya se generaron",
+    )
 
     fecha_nacimiento = models.DateField(
         blank=True, null=True, verbose_name="Fecha de nacimiento"
@@ -14,6 +14,7 @@ from .models import (
     UbicacionUsuario,
     SolicitudCambioRol,
 )
+from utils.imagenes import url_variante
 from django.contrib.auth import get_user_model
 User = get_user_model()
 
@@ -39,7 +40,9 @@ LON_MIN, LON_MAX = -92.0, -75.0
 class ImageFieldMixin:
     """Mixin para procesar URLs absolutas de imágenes."""
     
-    def get_image_url(self, image_field):
+    def get_image_url(self, image_field, variante=None):
+        if image_field and variante:
+            return url_variante(image_field, variante, self.context.get("request"))
         if image_field:
             request = self.context.get("request")
             if request:
@@ -115,7 +118,7 @@ class PerfilPublicoSerializer(ImageFieldMixin, serializers.ModelSerializer):
         fields = ["usuario_nombre", "foto_perfil", "calificacion", "total_resenas", "total_pedidos"]
 
     def get_foto_perfil(self, obj):
-        return self.get_image_url(obj.foto_perfil)
+        return self.get_image_url(obj.foto_perfil, variante="card")
 
 
 class ActualizarPerfilSerializer(serializers.ModelSerializer):
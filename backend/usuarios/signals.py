@@ -2,14 +2,19 @@
 # usuarios/signals.py
 
 from django.db import IntegrityError
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_init, post_save
 from django.dispatch import receiver
 from django.contrib.auth.models import Group
 from authentication.models import User
 
 from .models import Perfil
 
-__all__ = ["manage_user_profile"]
+__all__ = [
+    "manage_user_profile",
+    "recordar_imagen_cargada",
+    "encolar_variantes_imagen",
+    "eliminar_variantes_imagen",
+]
 
 
 @receiver(post_save, sender=User)
@@ -29,3 +34,90 @@ def manage_user_profile(sender, instance, created, **kwargs):
     except Exception:
         # El grupo no existe o hay un problema con el ORM, se ignora para no bloquear el login
         pass
+
+
+# ==========================================
+# DERIVADOS DE IMAGEN
+# ==========================================
+
+def _encolar_eliminacion(modelo, campo, nombre):
+    from django.db import transaction
+    from .tasks import tarea_eliminar_variantes_imagen
+
+    transaction.on_commit(lambda: tarea_eliminar_variantes_imagen.delay(modelo, campo, nombre))
+
+
+def recordar_imagen_cargada(sender, instance, **kwargs):
+    """
+    Guarda el nombre de la imagen tal como se cargó, para borrar sus derivados
+    si se reemplaza. Si el campo quedó diferido no hay nada que recordar.
+    """
+    from utils.imagenes import CAMPOS_CON_VARIANTES
+
+    valor = instance.__dict__.get(CAMPOS_CON_VARIANTES[sender._meta.label])
+    instance._imagen_anterior = getattr(valor, 'name', valor) or None
+
+
+def encolar_variantes_imagen(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Encola la generación de derivados cuando se guarda un ImageField
+    cuyo derivado aún no existe (subida nueva o imagen reemplazada), y el
+    borrado de los derivados de la imagen reemplazada.
+    """
+    from django.db import transaction
+    from utils.imagenes import CAMPOS_CON_VARIANTES, variantes_generadas
+
+    campo = CAMPOS_CON_VARIANTES.get(sender._meta.label)
+    if not campo or (update_fields and campo not in update_fields):
+        return
+
+    archivo = getattr(instance, campo, None)
+    nombre = archivo.name if archivo else None
+
+    anterior = getattr(instance, '_imagen_anterior', None)
+    if anterior and anterior != nombre:
+        _encolar_eliminacion(sender._meta.label, campo, anterior)
+    instance._imagen_anterior = nombre
+
+    if not nombre or variantes_generadas(archivo):
+        return
+
+    from .tasks import tarea_generar_variantes_imagen
+
+    transaction.on_commit(
+        lambda: tarea_generar_variantes_imagen.delay(sender._meta.label, instance.pk, campo)
+    )
+
+
+def eliminar_variantes_imagen(sender, instance, **kwargs):
+    """Borra los derivados de la imagen de una instancia eliminada."""
+    from utils.imagenes import CAMPOS_CON_VARIANTES
+
+    campo = CAMPOS_CON_VARIANTES.get(sender._meta.label)
+    archivo = getattr(instance, campo, None) if campo else None
+    if archivo and archivo.name:
+        _encolar_eliminacion(sender._meta.label, campo, archivo.name)
+
+
+def _conectar_variantes_imagen():
+    from utils.imagenes import CAMPOS_CON_VARIANTES
+
+    for modelo in CAMPOS_CON_VARIANTES:
+        post_init.connect(
+            recordar_imagen_cargada,
+            sender=modelo,
+            dispatch_uid=f"imagen_anterior_{modelo}",
+        )
+        post_save.connect(
+            encolar_variantes_imagen,
+            sender=modelo,
+            dispatch_uid=f"variantes_imagen_{modelo}",
+        )
+        post_delete.connect(
+            eliminar_variantes_imagen,
+            sender=modelo,
+            dispatch_uid=f"eliminar_variantes_{modelo}",
+        )
+
+
+_conectar_variantes_imagen()
@@ -231,7 +231,7 @@ def _enviar_lote_promocion(tokens, titulo, mensaje, imagen_url):
 # MANTENIMIENTO DEL SISTEMA
 # ==========================================
 
-@shared_task
+@shared_task(acks_late=True)
 def tarea_mantenimiento_tokens():
     """
     Valida y limpia tokens FCM inválidos periódicamente.
@@ -252,4 +252,52 @@ def tarea_mantenimiento_tokens():
             tokens_eliminados += 1
             
     logger.info(f"Mantenimiento completado. Tokens purgados: {tokens_eliminados}")
-    return {'tokens_eliminados': tokens_eliminados}
\ No newline at end of file
+    return {'tokens_eliminados': tokens_eliminados}
+
+# ==========================================
+# PROCESAMIENTO DE IMÁGENES
+# ==========================================
+
+@shared_task(bind=True, max_retries=2, acks_late=True)
+def tarea_generar_variantes_imagen(self, modelo, pk, campo):
+    """
+    Genera los derivados (thumb/card/detail en WebP y JPEG) de un ImageField.
+
+    Args:
+        modelo (str): 'app_label.Modelo' (ej: 'productos.Producto').
+        pk: Clave primaria de la instancia.
+        campo (str): Nombre del ImageField.
+    """
+    from django.apps import apps
+    from utils.imagenes import generar_variantes
+
+    try:
+        Modelo = apps.get_model(modelo)
+        instancia = Modelo.objects.filter(pk=pk).only('pk', campo).first()
+        if not instancia:
+            logger.warning(f"{modelo} {pk} no encontrado. Variantes omitidas.")
+            return
+
+        generadas = generar_variantes(getattr(instancia, campo))
+        return {'modelo': modelo, 'pk': pk, 'variantes': len(generadas)}
+
+    except (IOError, OSError) as exc:
+        logger.error(f"Error generando variantes {modelo} {pk}.{campo}: {exc}")
+        raise self.retry(exc=exc, countdown=RETRY_DELAY_BASE)
+
+
+@shared_task(acks_late=True, ignore_result=True)
+def tarea_eliminar_variantes_imagen(modelo, campo, nombre):
+    """
+    Borra los derivados de una imagen reemplazada o de una instancia eliminada.
+
+    Args:
+        modelo (str): 'app_label.Modelo' dueño del ImageField (define el storage).
+        campo (str): Nombre del ImageField.
+        nombre (str): Nombre en el storage de la imagen original.
+    """
+    from django.apps import apps
+    from utils.imagenes import eliminar_variantes
+
+    storage = apps.get_model(modelo)._meta.get_field(campo).storage
+    eliminar_variantes(nombre, storage)
@@ -73,3 +73,124 @@ class PerfilEndpointsTest(TestCase):
         self.assertEqual(response.data.get("perfil", {}).get("usuario_nombre"), "Nuevo Nombre")
         # Preferencia debe reflejar el cambio
         self.assertFalse(response.data.get("perfil", {}).get("notificaciones_pedido"))
+
+
+class VariantesImagenTest(TestCase):
+    """Pipeline de derivados: tamaños, formatos, EXIF y resolución de URL."""
+
+    def setUp(self):
+        import tempfile
+        from django.test import override_settings
+
+        from django.core.cache import cache
+
+        self._tmp = tempfile.TemporaryDirectory()
+        self._override = override_settings(MEDIA_ROOT=self._tmp.name)
+        self._override.enable()
+        cache.clear()
+
+    def tearDown(self):
+        self._override.disable()
+        self._tmp.cleanup()
+
+    def _subir_foto(self):
+        from io import BytesIO
+        from PIL import Image
+        from django.core.files.base import ContentFile
+        from usuarios.models import Perfil
+
+        img = Image.new("RGB", (2400, 1600), (200, 30, 30))
+        exif = Image.Exif()
+        exif[0x010F] = "CamaraDePrueba"  # Make
+        buffer = BytesIO()
+        img.save(buffer, format="JPEG", quality=95, exif=exif.tobytes())
+
+        user = User.objects.create_user(
+            email="foto@app.com", username="foto", password="password123",
+            celular="0991112233", first_name="Foto", last_name="User",
+        )
+        perfil, _ = Perfil.objects.get_or_create(user=user)
+        perfil.foto_perfil.save("original.jpg", ContentFile(buffer.getvalue()), save=False)
+        return perfil
+
+    def test_genera_variantes_sin_exif(self):
+        from PIL import Image
+        from utils.imagenes import VARIANTES, generar_variantes
+
+        perfil = self._subir_foto()
+        generadas = generar_variantes(perfil.foto_perfil)
+
+        storage = perfil.foto_perfil.storage
+        for variante, limite in VARIANTES.items():
+            with storage.open(generadas[variante]["webp"]) as f:
+                img = Image.open(f)
+                self.assertEqual(img.format, "WEBP")
+                self.assertLessEqual(max(img.size), max(limite))
+                self.assertEqual(len(img.getexif()), 0)
+            with storage.open(generadas[variante]["jpg"]) as f:
+                self.assertEqual(len(Image.open(f).getexif()), 0)
+
+        tamano_original = storage.size(perfil.foto_perfil.name)
+        self.assertLess(storage.size(generadas["card"]["webp"]) * 5, tamano_original)
+
+    def test_url_variante_con_fallback(self):
+        from utils.imagenes import generar_variantes, url_variante
+
+        from unittest import mock
+
+        perfil = self._subir_foto()
+        storage = perfil.foto_perfil.storage
+        # Resolver la URL no consulta el storage, la caché ni la BD
+        sin_storage = mock.patch.object(storage, 'exists', side_effect=AssertionError)
+        with sin_storage, mock.patch("django.core.cache.cache.get", side_effect=AssertionError), \
+                self.assertNumQueries(0):
+            self.assertEqual(url_variante(perfil.foto_perfil, "thumb"), perfil.foto_perfil.url)
+
+        perfil.save()
+        generar_variantes(perfil.foto_perfil)
+        with sin_storage, self.assertNumQueries(0):
+            self.assertTrue(url_variante(perfil.foto_perfil, "thumb").endswith("__thumb.webp"))
+
+        # La marca vive en la fila: sobrevive a un vaciado de caché
+        from django.core.cache import cache
+        cache.clear()
+        perfil = type(perfil).objects.get(pk=perfil.pk)
+        self.assertTrue(url_variante(perfil.foto_perfil, "thumb").endswith("__thumb.webp"))
+        self.assertIsNone(url_variante(None, "thumb"))
+
+    def test_reemplazar_o_borrar_elimina_derivados(self):
+        from unittest import mock
+        from django.core.files.base import ContentFile
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from utils.imagenes import ruta_variante, variantes_generadas
+        from . import tasks
+
+        perfil = self._subir_foto()
+        storage = perfil.foto_perfil.storage
+        with mock.patch.object(tasks.tarea_generar_variantes_imagen, 'delay', side_effect=tasks.tarea_generar_variantes_imagen), \
+                mock.patch.object(tasks.tarea_eliminar_variantes_imagen, 'delay', side_effect=tasks.tarea_eliminar_variantes_imagen):
+            with self.captureOnCommitCallbacks(execute=True):
+                perfil.save()
+            original = perfil.foto_perfil.name
+            self.assertTrue(storage.exists(ruta_variante(original, "thumb")))
+
+            with storage.open(original) as f:
+                contenido = f.read()
+            with self.captureOnCommitCallbacks(execute=True), \
+                    CaptureQueriesContext(connection) as consultas:
+                perfil.foto_perfil.save("nueva.jpg", ContentFile(contenido))
+            reemplazo = perfil.foto_perfil.name
+            self.assertFalse(storage.exists(ruta_variante(original, "thumb")))
+            self.assertTrue(storage.exists(ruta_variante(reemplazo, "thumb")))
+            perfil.refresh_from_db(fields=["variantes_de"])
+            self.assertTrue(variantes_generadas(perfil.foto_perfil))
+            # Detectar el reemplazo no relee la imagen anterior de la fila
+            self.assertFalse([
+                q for q in consultas.captured_queries
+                if q["sql"].startswith('SELECT "perfiles_usuario"."foto_perfil" FROM')
+            ])
+
+            with self.captureOnCommitCallbacks(execute=True):
+                perfil.delete()
+            self.assertFalse(storage.exists(ruta_variante(reemplazo, "card", "jpg")))
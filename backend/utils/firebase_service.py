@@ -6,6 +6,8 @@ import firebase_admin
 from firebase_admin import credentials, messaging
 from django.conf import settings
 
+from utils.metricas import medir_llamada_externa
+
 logger = logging.getLogger('firebase')
 
 class FirebaseService:
@@ -97,7 +99,8 @@ class FirebaseService:
                 apns=FirebaseService._get_apns_config()
             )
 
-            response = messaging.send(message)
+            with medir_llamada_externa('fcm', 'send'):
+                response = messaging.send(message)
             return {'success': True, 'message_id': response}
 
         except messaging.UnregisteredError:
@@ -127,7 +130,8 @@ class FirebaseService:
                 apns=FirebaseService._get_apns_config()
             )
 
-            response = messaging.send_multicast(message)
+            with medir_llamada_externa('fcm', 'send_multicast'):
+                response = messaging.send_multicast(message)
             
             tokens_invalidos = [
                 tokens[idx] for idx, resp in enumerate(response.responses) 
@@ -0,0 +1,175 @@
+# utils/imagenes.py
+"""
+Pipeline de derivados de imagen (thumb / card / detail).
+
+Los derivados se guardan junto al original con un nombre determinista
+(`<original>__<variante>.<ext>`), de modo que los serializers pueden
+resolver la URL de una variante a partir del nombre del original.
+Al generarlos se guarda ese nombre en la columna `variantes_de` del modelo:
+resolver una URL solo lee la instancia ya cargada, sin consultar caché ni
+storage. Si el derivado aún no existe (tarea pendiente o fallida, o la
+imagen se reemplazó) se devuelve el original como fallback.
+"""
+
+import logging
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Tamaño máximo (lado mayor) por variante
+VARIANTES = {
+    'thumb': (160, 160),
+    'card': (480, 480),
+    'detail': (1080, 1080),
+}
+
+# Formatos generados por variante: WebP para clientes modernos, JPEG como fallback
+FORMATOS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'jpg': {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True},
+}
+
+FORMATO_POR_DEFECTO = 'webp'
+
+# Campos de imagen que disparan el pipeline al guardarse ('app_label.Modelo' -> campo)
+CAMPOS_CON_VARIANTES = {
+    'usuarios.Perfil': 'foto_perfil',
+    'proveedores.Proveedor': 'logo',
+    'productos.Producto': 'imagen',
+    'repartidores.Repartidor': 'foto_perfil',
+}
+
+SEPARADOR_VARIANTE = '__'
+
+# Columna de cada modelo de CAMPOS_CON_VARIANTES con el original ya procesado
+CAMPO_GENERADAS = 'variantes_de'
+
+
+def ruta_variante(nombre_original, variante, formato=FORMATO_POR_DEFECTO):
+    """Ruta de almacenamiento del derivado, en el mismo directorio que el original."""
+    raiz, _ = os.path.splitext(nombre_original)
+    return f"{raiz}{SEPARADOR_VARIANTE}{variante}.{formato}"
+
+
+def variantes_generadas(file_field):
+    """True si los derivados de la imagen actual ya se generaron (sin consultas)."""
+    nombre = getattr(file_field, 'name', None)
+    instancia = getattr(file_field, 'instance', None)
+    # vars(): si la columna quedó diferida se usa el original, no se consulta
+    return bool(nombre) and vars(instancia or object()).get(CAMPO_GENERADAS) == nombre
+
+
+def marcar_generadas(file_field):
+    """Registra en la instancia (y en su fila, si aún tiene esa imagen) que hay derivados."""
+    instancia = file_field.instance
+    setattr(instancia, CAMPO_GENERADAS, file_field.name)
+    if instancia.pk:
+        type(instancia)._base_manager.filter(
+            pk=instancia.pk, **{file_field.field.name: file_field.name}
+        ).update(**{CAMPO_GENERADAS: file_field.name})
+
+
+def es_variante(nombre):
+    """True si el nombre corresponde a un derivado ya generado."""
+    raiz, _ = os.path.splitext(os.path.basename(nombre or ''))
+    return any(raiz.endswith(f"{SEPARADOR_VARIANTE}{v}") for v in VARIANTES)
+
+
+def _preparar_imagen(archivo):
+    """Abre la imagen, aplica la orientación EXIF y la deja en un modo serializable."""
+    img = Image.open(archivo)
+    img = ImageOps.exif_transpose(img)
+
+    if img.mode in ("RGBA", "LA", "P"):
+        # Aplanar transparencia sobre blanco (JPEG no soporta alfa)
+        img = img.convert("RGBA")
+        fondo = Image.new("RGB", img.size, (255, 255, 255))
+        fondo.paste(img, mask=img.split()[-1])
+        img = fondo
+    elif img.mode != "RGB":
+        img = img.convert("RGB")
+
+    # Copia sin metadatos: ni EXIF (GPS, cámara) ni perfiles ICC llegan al derivado
+    limpia = Image.new(img.mode, img.size)
+    limpia.paste(img)
+    return limpia
+
+
+def codificar_variante(img, variante, formato=FORMATO_POR_DEFECTO):
+    """Redimensiona una copia de `img` a la variante indicada y la codifica en memoria."""
+    copia = img.copy()
+    copia.thumbnail(VARIANTES[variante], Image.Resampling.LANCZOS)
+
+    opciones = dict(FORMATOS[formato])
+    output = BytesIO()
+    copia.save(output, **opciones)
+    return output.getvalue()
+
+
+def generar_variantes(file_field):
+    """
+    Genera todos los derivados (variantes × formatos) de un ImageField.
+
+    Sobrescribe derivados previos con el mismo nombre para que la ruta
+    sea estable. Retorna un dict {variante: {formato: ruta}}.
+    """
+    if not file_field or not file_field.name or es_variante(file_field.name):
+        return {}
+
+    storage = file_field.storage
+    with storage.open(file_field.name, 'rb') as original:
+        img = _preparar_imagen(original)
+
+    generadas = {}
+    for variante in VARIANTES:
+        generadas[variante] = {}
+        for formato in FORMATOS:
+            ruta = ruta_variante(file_field.name, variante, formato)
+            contenido = codificar_variante(img, variante, formato)
+            if storage.exists(ruta):
+                storage.delete(ruta)
+            generadas[variante][formato] = storage.save(ruta, ContentFile(contenido))
+
+    marcar_generadas(file_field)
+    logger.info(f"Variantes generadas para {file_field.name}")
+    return generadas
+
+
+def eliminar_variantes(nombre_original, storage):
+    """Borra los derivados asociados a un original (p. ej. al reemplazar la imagen)."""
+    for variante in VARIANTES:
+        for formato in FORMATOS:
+            ruta = ruta_variante(nombre_original, variante, formato)
+            try:
+                if storage.exists(ruta):
+                    storage.delete(ruta)
+            except Exception as e:
+                logger.warning(f"No se pudo borrar variante {ruta}: {e}")
+
+
+def url_variante(file_field, variante, request=None, formato=FORMATO_POR_DEFECTO):
+    """
+    URL (absoluta si hay request) del derivado solicitado.
+
+    Fallback al original cuando el derivado todavía no existe.
+    """
+    if not file_field:
+        return None
+    try:
+        if variantes_generadas(file_field):
+            url = file_field.storage.url(ruta_variante(file_field.name, variante, formato))
+        else:
+            url = file_field.url
+    except Exception:
+        return None
+    if not url:
+        return None
+    if url.startswith('http://') or url.startswith('https://'):
+        return url
+    if request is not None:
+        return request.build_absolute_uri(url)
+    return url
@@ -0,0 +1,102 @@
+# utils/limitador.py
+"""
+Limitador de tasa atómico sobre Redis (GCRA).
+
+Cada clave guarda un único número: el "tiempo teórico de llegada" (TAT) en
+microsegundos. Un script Lua lee el TAT, decide y lo avanza en un solo
+round-trip, así que no hay carreras entre workers y la memoria por clave es
+O(1) (no se guarda la lista de timestamps). El reloj es el de Redis (TIME),
+común a todos los procesos.
+
+Semántica: `limite` solicitudes por `periodo` segundos, con ráfaga de hasta
+`limite` y recuperación gradual de una solicitud cada `periodo / limite`.
+
+Si Redis falla se permite la solicitud (fail-open), igual que el rate
+limiting anterior.
+"""
+
+import logging
+import math
+from typing import NamedTuple
+
+from utils.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+PREFIJO = 'limite:'
+
+# KEYS[1]=clave  ARGV[1]=periodo (µs)  ARGV[2]=límite  ARGV[3]=costo
+# Retorna {permitido, restantes, espera_µs}
+_LUA_GCRA = """
+local periodo = tonumber(ARGV[1])
+local limite = tonumber(ARGV[2])
+local costo = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local ahora = tonumber(t[1]) * 1000000 + tonumber(t[2])
+local intervalo = periodo / limite
+
+local tat = tonumber(redis.call('GET', KEYS[1])) or ahora
+if tat < ahora then tat = ahora end
+local nuevo = tat + intervalo * costo
+
+local exceso = nuevo - ahora - periodo
+if exceso > 0 then
+    return {0, 0, math.ceil(exceso)}
+end
+
+redis.call('SET', KEYS[1], string.format('%.0f', nuevo), 'PX', math.ceil((nuevo - ahora) / 1000))
+return {1, math.floor((periodo - (nuevo - ahora)) / intervalo), 0}
+"""
+
+_scripts = {}
+
+
+class Resultado(NamedTuple):
+    permitido: bool
+    restantes: int
+    espera: float  # segundos hasta que se permita otra solicitud
+
+
+def _script(alias):
+    script = _scripts.get(alias)
+    if script is None:
+        script = _scripts[alias] = get_redis(alias).register_script(_LUA_GCRA)
+    return script
+
+
+def consumir(clave, limite, periodo, costo=1, alias='default'):
+    """
+    Verifica y consume `costo` unidades de la clave en una operación atómica.
+
+    Args:
+        clave: Identificador del límite (p. ej. 'throttle_login_1.2.3.4')
+        limite: Solicitudes permitidas por periodo
+        periodo: Duración de la ventana en segundos
+    """
+    try:
+        permitido, restantes, espera = _script(alias)(
+            keys=[PREFIJO + clave], args=[int(periodo * 1_000_000), int(limite), int(costo)],
+        )
+    except Exception as e:
+        logger.error(f"Error en limitador ({clave}): {e}")
+        return Resultado(True, limite, 0.0)
+    return Resultado(bool(permitido), int(restantes), int(espera) / 1_000_000)
+
+
+def reiniciar(clave, alias='default'):
+    try:
+        get_redis(alias).delete(PREFIJO + clave)
+        return True
+    except Exception as e:
+        logger.error(f"Error reiniciando limitador ({clave}): {e}")
+        return False
+
+
+def segundos_para_reinicio(clave, alias='default'):
+    """Segundos hasta que la clave vuelve a tener todo el cupo (None si no existe)."""
+    try:
+        pttl = get_redis(alias).pttl(PREFIJO + clave)
+    except Exception as e:
+        logger.error(f"Error consultando limitador ({clave}): {e}")
+        return None
+    return math.ceil(pttl / 1000) if pttl > 0 else None
@@ -0,0 +1,115 @@
+# utils/log_cola.py
+"""
+Registros de log creados fuera del hilo de la solicitud.
+
+`RegistroEnCola.registrar(nivel, datos)` solo encola la tupla (un put en una
+cola acotada). Un hilo de fondo crea el LogRecord y lo entrega a los
+handlers del logger, donde ocurre el formateo y la escritura. Si la cola
+está llena el registro se descarta y se cuenta: nunca se bloquea la
+solicitud.
+
+El hilo se arranca en el primer registro de cada proceso (y se reinicia
+tras un fork), así que es seguro con servidores que hacen fork después de
+importar la app.
+"""
+
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+
+
+class FormatoJSON(logging.Formatter):
+    """Una línea JSON por registro; los datos estructurados van en `record.datos`."""
+
+    def format(self, record):
+        linea = {
+            'ts': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            'nivel': record.levelname,
+            'logger': record.name,
+        }
+        datos = getattr(record, 'datos', None)
+        if datos:
+            linea.update(datos)
+        else:
+            linea['mensaje'] = record.getMessage()
+        return json.dumps(linea, ensure_ascii=False, default=str)
+
+
+class RegistroEnCola:
+    """
+    Entrega registros estructurados a `logger` desde un hilo de fondo.
+
+    Args:
+        logger: Logger destino (sus handlers y nivel se respetan)
+        mensaje: Formato %-style aplicado a `datos` solo si un handler lo usa
+        maxsize: Registros pendientes como máximo
+    """
+
+    def __init__(self, logger, mensaje, maxsize=10000):
+        self.logger = logger
+        self.mensaje = mensaje
+        self.maxsize = maxsize
+        self.descartados = 0
+        self._lock = threading.Lock()
+        self._reiniciar()
+        os.register_at_fork(after_in_child=self._reiniciar)
+
+    def _reiniciar(self):
+        # Tras un fork el hilo heredado no existe: cola y consumidor nuevos
+        self._cola = queue.SimpleQueue()
+        self._hilo = None
+
+    def _arrancar(self):
+        with self._lock:
+            if self._hilo is None:
+                hilo = threading.Thread(target=self._consumir, args=(self._cola,), name='log-cola', daemon=True)
+                hilo.start()
+                self._hilo = hilo
+
+    def registrar(self, nivel, datos):
+        if self._hilo is None:
+            self._arrancar()
+        # SimpleQueue (C, sin locks de Python): el límite se verifica aparte
+        if self._cola.qsize() >= self.maxsize:
+            self.descartados += 1
+            return
+        self._cola.put((nivel, datos))
+
+    def vaciar(self, timeout=5):
+        """Espera a que se procesen los registros pendientes."""
+        if self._hilo is None:
+            return
+        listo = threading.Event()
+        self._cola.put((None, listo))
+        listo.wait(timeout)
+
+    def _consumir(self, cola):
+        while True:
+            nivel, datos = cola.get()
+            if nivel is None:
+                datos.set()
+                continue
+            try:
+                record = self.logger.makeRecord(
+                    self.logger.name, nivel, __file__, 0, self.mensaje, (datos,), None,
+                    extra={'datos': datos},
+                )
+                self.logger.handle(record)
+            except Exception:
+                pass
+
+
+def salida_json(logger, stream=None):
+    """
+    Si `logger` no tiene handlers configurados, escribe sus registros como
+    JSON en stderr (sin propagarlos).
+    """
+    if logger.handlers:
+        return
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(FormatoJSON())
+    logger.addHandler(handler)
+    logger.propagate = False
@@ -0,0 +1,198 @@
+# utils/metricas.py
+"""
+Métricas Prometheus de la aplicación.
+
+Define los instrumentos compartidos (latencia HTTP por vista, consultas SQL
+por request, aciertos de caché, servicios externos y tareas Celery) y los
+helpers para registrarlos (incluido el estado del pool de conexiones de
+Postgres). El endpoint `/metrics` los expone con `exportar()`.
+
+Con varios procesos (workers de gunicorn o Celery prefork) cada uno tiene sus
+propios contadores: definir PROMETHEUS_MULTIPROC_DIR (un directorio vacío al
+arrancar, compartido por todos los procesos del host) para que `/metrics`
+agregue los de todos.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram,
+    generate_latest, multiprocess,
+)
+
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+BUCKETS_CONSULTAS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+BUCKETS_TAREAS = (0.05, 0.1, 0.5, 1, 5, 15, 30, 60, 300, 900, 1800)
+
+
+# ============================================
+# INSTRUMENTOS
+# ============================================
+
+HTTP_DURACION = Histogram(
+    'http_solicitud_duracion_segundos', 'Latencia de las solicitudes HTTP por vista',
+    ['vista', 'metodo', 'codigo'], buckets=BUCKETS_LATENCIA,
+)
+DB_CONSULTAS = Histogram(
+    'db_consultas_por_solicitud', 'Consultas SQL ejecutadas por solicitud',
+    ['vista'], buckets=BUCKETS_CONSULTAS,
+)
+DB_DURACION = Histogram(
+    'db_duracion_por_solicitud_segundos', 'Tiempo total en SQL por solicitud',
+    ['vista'], buckets=BUCKETS_LATENCIA,
+)
+CACHE_CONSULTAS = Counter(
+    'cache_consultas', 'Lecturas de caché por resultado (acierto/fallo)',
+    ['cache', 'resultado'],
+)
+EXTERNO_DURACION = Histogram(
+    'servicio_externo_duracion_segundos', 'Latencia de llamadas a servicios externos',
+    ['servicio', 'operacion'], buckets=BUCKETS_LATENCIA,
+)
+EXTERNO_ERRORES = Counter(
+    'servicio_externo_errores', 'Llamadas a servicios externos fallidas',
+    ['servicio', 'operacion'],
+)
+DB_POOL_CONEXIONES = Gauge(
+    'db_pool_conexiones', 'Conexiones del pool de Postgres por estado (abiertas, disponibles, esperando)',
+    ['alias', 'estado'], multiprocess_mode='livesum',
+)
+DB_POOL_SOLICITUDES = Counter(
+    'db_pool_solicitudes', 'Conexiones pedidas al pool',
+    ['alias'],
+)
+DB_POOL_EN_ESPERA = Counter(
+    'db_pool_solicitudes_en_espera', 'Pedidos al pool que esperaron una conexión libre',
+    ['alias'],
+)
+DB_POOL_ESPERA = Counter(
+    'db_pool_espera_segundos', 'Tiempo total esperando conexiones del pool',
+    ['alias'],
+)
+DB_POOL_NUEVAS = Counter(
+    'db_pool_conexiones_nuevas', 'Conexiones abiertas con Postgres por el pool',
+    ['alias'],
+)
+DB_POOL_ERRORES = Counter(
+    'db_pool_errores', 'Conexiones del pool fallidas al abrir o perdidas',
+    ['alias', 'tipo'],
+)
+CELERY_DURACION = Histogram(
+    'celery_tarea_duracion_segundos', 'Duración de las tareas Celery',
+    ['tarea', 'estado'], buckets=BUCKETS_TAREAS,
+)
+CELERY_FALLOS = Counter(
+    'celery_tarea_fallos', 'Tareas Celery que terminaron con excepción',
+    ['tarea'],
+)
+
+
+# ============================================
+# HELPERS
+# ============================================
+
+def registrar_cache(nombre, valor):
+    """Cuenta la lectura de caché `nombre` como acierto o fallo y retorna `valor`."""
+    CACHE_CONSULTAS.labels(nombre, 'fallo' if valor is None else 'acierto').inc()
+    return valor
+
+
+@contextmanager
+def medir_llamada_externa(servicio, operacion):
+    """Mide la latencia del bloque y cuenta como error cualquier excepción que salga de él."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        EXTERNO_ERRORES.labels(servicio, operacion).inc()
+        raise
+    finally:
+        EXTERNO_DURACION.labels(servicio, operacion).observe(time.perf_counter() - inicio)
+
+
+class MedidorConsultas:
+    """
+    Wrapper de ejecución SQL (connection.execute_wrapper) que acumula el
+    número de consultas y el tiempo total en la solicitud actual.
+    """
+
+    def __init__(self):
+        self.consultas = 0
+        self.duracion = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.consultas += 1
+            self.duracion += time.perf_counter() - inicio
+
+
+# Segundos mínimos entre lecturas de las estadísticas del pool en un proceso
+POOL_INTERVALO = 5
+_pool_leido = 0.0
+
+
+def registrar_pool(forzar=False):
+    """
+    Vuelca las estadísticas de los pools de conexiones del proceso
+    (psycopg_pool `pop_stats`, que reinicia los contadores) en las métricas
+    DB_POOL_*. Como mucho una vez cada POOL_INTERVALO segundos.
+    """
+    global _pool_leido
+    ahora = time.monotonic()
+    if not forzar and ahora - _pool_leido < POOL_INTERVALO:
+        return
+    _pool_leido = ahora
+
+    from django.db import connections
+
+    for alias in connections:
+        # Sin crear el pool: solo los que este proceso ya abrió
+        pools = getattr(type(connections[alias]), '_connection_pools', None)
+        pool = pools.get(alias) if pools else None
+        if pool is None:
+            continue
+
+        stats = pool.pop_stats()
+        DB_POOL_CONEXIONES.labels(alias, 'abiertas').set(stats.get('pool_size', 0))
+        DB_POOL_CONEXIONES.labels(alias, 'disponibles').set(stats.get('pool_available', 0))
+        DB_POOL_CONEXIONES.labels(alias, 'esperando').set(stats.get('requests_waiting', 0))
+        DB_POOL_SOLICITUDES.labels(alias).inc(stats.get('requests_num', 0))
+        DB_POOL_EN_ESPERA.labels(alias).inc(stats.get('requests_queued', 0))
+        DB_POOL_ESPERA.labels(alias).inc(stats.get('requests_wait_ms', 0) / 1000)
+        DB_POOL_NUEVAS.labels(alias).inc(stats.get('connections_num', 0))
+        DB_POOL_ERRORES.labels(alias, 'conexion').inc(stats.get('connections_errors', 0))
+        DB_POOL_ERRORES.labels(alias, 'perdida').inc(stats.get('connections_lost', 0))
+
+
+# Inicio de cada tarea en curso del proceso (task_id -> perf_counter)
+_inicio_tareas = {}
+
+
+def inicio_tarea(task_id):
+    _inicio_tareas[task_id] = time.perf_counter()
+
+
+def fin_tarea(task_id, tarea, estado):
+    inicio = _inicio_tareas.pop(task_id, None)
+    if inicio is not None:
+        CELERY_DURACION.labels(tarea, estado or 'DESCONOCIDO').observe(time.perf_counter() - inicio)
+
+
+def fallo_tarea(tarea):
+    CELERY_FALLOS.labels(tarea).inc()
+
+
+def exportar():
+    """Retorna (contenido, content_type) en el formato de texto de Prometheus."""
+    registrar_pool(forzar=True)
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registro = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registro)
+    else:
+        registro = REGISTRY
+    return generate_latest(registro), CONTENT_TYPE_LATEST
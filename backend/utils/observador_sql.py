@@ -0,0 +1,56 @@
+# utils/observador_sql.py
+"""
+Observadores de consultas SQL por solicitud, en WSGI y en ASGI.
+
+Cada conexión lleva un execute_wrapper fijo (instalado al conectarse) que
+delega en los observadores del contexto actual. Bajo ASGI las vistas
+síncronas corren en los hilos de sync_to_async, que heredan el contexto de
+la solicitud: sus consultas llegan a los observadores que el middleware
+registró con `observar()` desde el event loop.
+
+Sin observadores activos (Celery, shell) el wrapper solo pasa la consulta.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+_observadores = ContextVar('observadores_sql', default=())
+
+
+def _despachar(execute, sql, params, many, context):
+    observadores = _observadores.get()
+    # El primero registrado (middleware más externo) envuelve a los demás
+    for observador in reversed(observadores):
+        execute = partial(observador, execute)
+    return execute(sql, params, many, context)
+
+
+def instalar(conexion):
+    if _despachar not in conexion.execute_wrappers:
+        conexion.execute_wrappers.append(_despachar)
+
+
+@receiver(connection_created)
+def _al_conectar(sender, connection, **kwargs):
+    instalar(connection)
+
+
+@contextmanager
+def observar(observador):
+    """
+    `observador(execute, sql, params, many, context)` (la firma de
+    connection.execute_wrapper) recibe las consultas del contexto actual.
+    """
+    # Conexiones de este hilo abiertas antes de importar el módulo
+    for conexion in connections.all(initialized_only=True):
+        instalar(conexion)
+    token = _observadores.set(_observadores.get() + (observador,))
+    try:
+        yield observador
+    finally:
+        _observadores.reset(token)
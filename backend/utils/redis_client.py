@@ -0,0 +1,113 @@
+# utils/redis_client.py
+"""
+Acceso al cliente Redis nativo del alias de caché `default`.
+
+La API de caché de Django solo cubre get/set/incr; los servicios que necesitan
+estructuras de Redis (hashes, sets, pipelines) usan este cliente compartido,
+que reutiliza el pool de conexiones de django-redis.
+"""
+
+import uuid
+from contextlib import contextmanager
+
+from django.core.cache import caches
+from django.db import transaction
+from django_redis import get_redis_connection
+from redis.exceptions import ResponseError, WatchError
+
+
+def get_redis(alias="default"):
+    """Cliente redis-py del alias de caché indicado."""
+    return get_redis_connection(alias)
+
+
+def decodificar_hash(valores, tipo=int):
+    """Convierte la respuesta bytes->bytes de HGETALL a {int: tipo}."""
+    return {int(k): tipo(v) for k, v in valores.items()}
+
+
+def drenar(r, key, leer):
+    """
+    Toma el contenido actual de `key` de forma atómica (RENAME) para que las
+    escrituras que lleguen durante un flush vayan a una clave nueva.
+    """
+    temporal = f"{key}:flush:{uuid.uuid4().hex}"
+    try:
+        r.rename(key, temporal)
+    except ResponseError:
+        return {}  # La clave no existe: nada pendiente
+    valores = leer(temporal)
+    r.delete(temporal)
+    return valores
+
+
+@contextmanager
+def lote_pendiente(r, key, bloqueo_segundos=300):
+    """
+    Como `drenar`, pero la clave temporal solo se borra cuando la transacción
+    del bloque hace commit: si el proceso muere antes, el lote sigue en Redis
+    y el siguiente flush lo retoma antes de tomar uno nuevo. Un candado evita
+    que dos flush trabajen la misma clave a la vez.
+
+    Produce el nombre de la clave a leer, o None si no hay nada pendiente u
+    otro flush está en curso. Usar fuera de una transacción abierta.
+    """
+    candado = f"{key}:flush:candado"
+    if not r.set(candado, 1, nx=True, ex=bloqueo_segundos):
+        yield None
+        return
+    try:
+        temporal = f"{key}:flush"
+        if not r.exists(temporal):
+            try:
+                r.rename(key, temporal)
+            except ResponseError:
+                temporal = None  # La clave no existe: nada pendiente
+        if temporal is None:
+            yield None
+            return
+        with transaction.atomic():
+            yield temporal
+            transaction.on_commit(lambda: r.delete(temporal))
+    finally:
+        r.delete(candado)
+
+
+# Intentos de actualizar_cache antes de rendirse ante escrituras concurrentes
+REINTENTOS_WATCH = 10
+
+
+class ConflictoConcurrente(Exception):
+    """La clave cambió en cada uno de los REINTENTOS_WATCH intentos."""
+
+
+def actualizar_cache(key, actualizar, timeout, alias="default"):
+    """
+    Lee, modifica y guarda una clave de la caché de Django (mismo formato
+    que cache.get/set) con WATCH/MULTI: si otra escritura la cambia en medio
+    se reintenta sobre el valor nuevo, así no se pierden actualizaciones.
+
+    `actualizar(valor)` recibe el valor actual (None si no existe) y retorna
+    el nuevo, o None para no escribir. Puede ejecutarse más de una vez.
+    Retorna el valor guardado (o None).
+
+    Raises:
+        ConflictoConcurrente: tras REINTENTOS_WATCH intentos fallidos
+    """
+    cliente = caches[alias].client
+    clave = cliente.make_key(key)
+    with get_redis(alias).pipeline() as pipe:
+        for _ in range(REINTENTOS_WATCH):
+            try:
+                pipe.watch(clave)
+                crudo = pipe.get(clave)
+                valor = actualizar(None if crudo is None else cliente.decode(crudo))
+                if valor is None:
+                    return None
+                pipe.multi()
+                pipe.set(clave, cliente.encode(valor), ex=timeout)
+                pipe.execute()
+                return valor
+            except WatchError:
+                continue
+    raise ConflictoConcurrente(key)
@@ -0,0 +1,170 @@
+# utils/replica.py
+"""
+Lecturas en la réplica de Postgres (alias "replica") con read-your-writes.
+
+Solo leen de la réplica las vistas que lo piden (`LecturaReplicaMixin`:
+reportes, dashboard y catálogo, en métodos GET/HEAD/OPTIONS) y el código
+envuelto en `usar_replica()` (p. ej. exportaciones en Celery). El resto de
+las lecturas y todas las escrituras van al primario.
+
+Read-your-writes:
+- Dentro de una solicitud (o de `usar_replica()`), tras escribir un modelo
+  sus lecturas vuelven al primario.
+- Un usuario que escribió queda "pegado" al primario durante
+  REPLICA_PEGADO_SEGUNDOS (ReplicaMiddleware lo marca en caché).
+
+Sin el alias "replica" en DATABASES todo va a "default".
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.permissions import SAFE_METHODS
+
+ALIAS_REPLICA = 'replica'
+CLAVE_PEGADO = 'replica:pegado:{}'
+
+
+class _Estado:
+    """Estado de enrutamiento de la solicitud o tarea en curso."""
+
+    __slots__ = ('replica', 'escritas')
+
+    def __init__(self, replica=False, escritas=None):
+        self.replica = replica
+        # Modelos (app_label.Model) escritos en este contexto
+        self.escritas = escritas if escritas is not None else set()
+
+
+# Objeto mutable: los hilos de sync_to_async copian el contexto pero
+# comparten el mismo estado con el middleware
+_estado = ContextVar('replica_estado', default=None)
+
+
+def replica_configurada():
+    return ALIAS_REPLICA in settings.DATABASES
+
+
+# ==========================================
+# CONTEXTO
+# ==========================================
+
+def iniciar():
+    """Estado nuevo para una solicitud. Retorna (estado, token para `terminar`)."""
+    estado = _Estado()
+    return estado, _estado.set(estado)
+
+
+def terminar(token):
+    _estado.reset(token)
+
+
+@contextmanager
+def usar_replica():
+    """Las lecturas dentro del bloque van a la réplica (salvo modelos ya escritos en él)."""
+    actual = _estado.get()
+    token = _estado.set(_Estado(replica=True, escritas=actual.escritas if actual else None))
+    try:
+        yield
+    finally:
+        _estado.reset(token)
+
+
+def con_contexto_actual(iterador):
+    """
+    Consume `iterador` con el enrutamiento de la solicitud en curso.
+
+    El cuerpo de un StreamingHttpResponse se consume después de que
+    ReplicaMiddleware restauró el contexto (y bajo ASGI, en otros hilos):
+    sin esto sus consultas irían al primario aunque la vista leyera de la
+    réplica.
+    """
+    estado = _estado.get()
+    if estado is None:
+        return iterador
+    return _iterar_con_estado(iter(iterador), estado)
+
+
+def _iterar_con_estado(iterador, estado):
+    # El estado se fija por elemento: cada next() puede correr en otro contexto
+    while True:
+        token = _estado.set(estado)
+        try:
+            elemento = next(iterador)
+        except StopIteration:
+            return
+        finally:
+            _estado.reset(token)
+        yield elemento
+
+
+# ==========================================
+# PEGADO AL PRIMARIO POR USUARIO
+# ==========================================
+
+def pegado(usuario):
+    """True si el usuario escribió hace menos de REPLICA_PEGADO_SEGUNDOS."""
+    if not getattr(usuario, 'is_authenticated', False):
+        return False
+    return bool(cache.get(CLAVE_PEGADO.format(usuario.pk)))
+
+
+def pegar(usuario):
+    cache.set(CLAVE_PEGADO.format(usuario.pk), 1, settings.REPLICA_PEGADO_SEGUNDOS)
+
+
+def leer_de_replica(usuario):
+    """Envía a la réplica las lecturas restantes de la solicitud en curso."""
+    estado = _estado.get()
+    if estado is None or not replica_configurada() or pegado(usuario):
+        return
+    estado.replica = True
+
+
+# ==========================================
+# ROUTER
+# ==========================================
+
+class RouterReplica:
+    """DATABASE_ROUTERS: lecturas a la réplica solo con el contexto activo."""
+
+    def db_for_read(self, model, **hints):
+        estado = _estado.get()
+        if (
+            estado is not None and estado.replica
+            and model._meta.label not in estado.escritas
+            and replica_configurada()
+        ):
+            return ALIAS_REPLICA
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        estado = _estado.get()
+        if estado is not None:
+            estado.escritas.add(model._meta.label)
+        # Explícito: una instancia leída de la réplica se guarda en el primario
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Mismos datos en ambos alias
+        return True
+
+
+# ==========================================
+# VISTAS
+# ==========================================
+
+class LecturaReplicaMixin:
+    """
+    Para viewsets de solo lectura o con lecturas pesadas: las solicitudes
+    GET/HEAD/OPTIONS leen de la réplica después de autenticar (la
+    autenticación y los permisos consultan el primario).
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS:
+            leer_de_replica(request.user)
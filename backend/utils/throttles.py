@@ -2,11 +2,43 @@
 """
 Throttles personalizados que respetan DEBUG mode.
 En desarrollo (DEBUG=True), los throttles se desactivan automáticamente.
+
+Todos consumen del limitador atómico de utils/limitador.py (GCRA en Redis)
+en lugar de guardar la lista de timestamps de cada clave en la caché.
 """
 
 from rest_framework.throttling import UserRateThrottle, AnonRateThrottle
 from django.conf import settings
 
+from utils import limitador
+
+
+class LimitadorThrottleMixin:
+    """
+    Reemplaza el historial de SimpleRateThrottle por el limitador atómico:
+    verificar y consumir es un solo round-trip con O(1) memoria por clave.
+    Mantiene get_rate/get_cache_key/throttle_failure de cada throttle.
+    """
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        # Los throttle_failure de authentication/throttles.py registran la IP
+        self.request = request
+        resultado = limitador.consumir(self.key, self.num_requests, self.duration)
+        self.espera = resultado.espera
+        if resultado.permitido:
+            return True
+        return self.throttle_failure()
+
+    def wait(self):
+        return getattr(self, 'espera', None)
+
 
 class DebugBypassThrottleMixin:
     """Mixin que desactiva throttle cuando DEBUG=True"""
@@ -21,12 +53,12 @@ class DebugBypassThrottleMixin:
 # THROTTLES BASE
 # ==========================================================
 
-class DebugBypassUserThrottle(DebugBypassThrottleMixin, UserRateThrottle):
+class DebugBypassUserThrottle(DebugBypassThrottleMixin, LimitadorThrottleMixin, UserRateThrottle):
     """UserRateThrottle que se desactiva en DEBUG"""
     pass
 
 
-class DebugBypassAnonThrottle(DebugBypassThrottleMixin, AnonRateThrottle):
+class DebugBypassAnonThrottle(DebugBypassThrottleMixin, LimitadorThrottleMixin, AnonRateThrottle):
     """AnonRateThrottle que se desactiva en DEBUG"""
     pass
 
@@ -0,0 +1,82 @@
+# utils/vistas_async.py
+"""
+Vistas async para endpoints dominados por I/O externo (Google, FCM,
+sistemas de proveedores).
+
+Bajo ASGI una vista síncrona ocupa un hilo mientras espera al servicio
+externo. `AsyncAPIView` conserva el pipeline de DRF (autenticación,
+permisos, throttles, negociación, manejo de excepciones) pero el handler es
+`async def`: la espera al upstream no bloquea el event loop. La parte de
+DRF que toca caché/BD (`initial`) corre con sync_to_async.
+
+Bajo WSGI (runserver, tests) Django ejecuta la vista con async_to_sync, así
+que funciona igual aunque sin la ganancia de concurrencia.
+"""
+
+import asyncio
+import logging
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from rest_framework.views import APIView
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncAPIView(APIView):
+    """APIView cuyos handlers (get, post, ...) son corrutinas."""
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            response = handler(request, *args, **kwargs)
+            if asyncio.iscoroutine(response):
+                response = await response
+
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+
+# ==========================================
+# CLIENTE HTTP COMPARTIDO
+# ==========================================
+
+_clientes = {}
+
+
+def cliente_http():
+    """
+    httpx.AsyncClient del event loop actual (pool de conexiones y keep-alive
+    reutilizados entre solicitudes). Un AsyncClient no puede usarse desde
+    otro loop, por eso hay uno por loop.
+    """
+    loop = asyncio.get_running_loop()
+    cliente = _clientes.get(loop)
+    if cliente is None or cliente.is_closed:
+        # Loops terminados (p. ej. los de async_to_sync) no vuelven a usarse
+        for otro in [l for l in _clientes if l.is_closed()]:
+            del _clientes[otro]
+        cliente = _clientes[loop] = httpx.AsyncClient(
+            timeout=httpx.Timeout(getattr(settings, 'HTTP_EXTERNO_TIMEOUT', 10)),
+            limits=httpx.Limits(
+                max_connections=getattr(settings, 'HTTP_EXTERNO_MAX_CONEXIONES', 100),
+                max_keepalive_connections=20,
+            ),
+        )
+    return cliente